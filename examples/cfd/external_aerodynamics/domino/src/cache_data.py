@@ -34,11 +34,18 @@ import torch
 from torch.utils.data import DataLoader
 from torch.utils.data.distributed import DistributedSampler
 from physicsnemo.distributed import DistributedManager
+from physicsnemo.utils.domino.cache import write_cached_sample
 
 
 @hydra.main(version_base="1.3", config_path="conf", config_name="config")
 def main(cfg: DictConfig) -> None:
-    compute_scaling_factors(cfg, cfg.data_processor.output_dir, use_cache=False)
+    compute_scaling_factors(
+        cfg,
+        cfg.data_processor.output_dir,
+        use_cache=False,
+        num_workers=cfg.data_processor.num_processors,
+        distributed=True,
+    )
     assert cfg.data_processor.use_cache, "Cache must be enabled for cache processing!"
     # initialize distributed manager
     DistributedManager.initialize()
@@ -123,7 +130,7 @@ def main(cfg: DictConfig) -> None:
         filename = sample["filename"][
             0
         ]  # batch size 1, we can just pull out the filename
-        output_file = output_dir / f"{filename}_cached.npy"
+        output_file = output_dir / f"{filename}_cached"
 
         if output_file.exists():
             print(f"Rank {dist.rank}: Skipping {filename} - cache exists")
@@ -143,7 +150,7 @@ def main(cfg: DictConfig) -> None:
                 print(
                     f"{filename}: surface min/max: {torch.amin(processed_data['surface_fields'], 0)}, {torch.amax(processed_data['surface_fields'], 0)}"
                 )
-            np.save(output_file, processed_data)
+            write_cached_sample(output_file, processed_data)
             print(
                 f"Rank {dist.rank}: Completed {filename} in {time.time() - start_time:.2f}s"
             )
@@ -16,7 +16,7 @@
 
 """
 This code runs the data processing in parallel to load OpenFoam files, process them 
-and save in the npy format for faster processing in the DoMINO datapipes. Several 
+and save in the npz format for faster processing in the DoMINO datapipes. Several 
 parameters such as number of processors, input and output paths, etc. can be 
 configured in config.yaml in the data_processing tab.
 """
@@ -41,13 +41,13 @@ def process_files(*args_list):
             continue
         outname = os.path.join(output_dir, fname)
         print("Filename:%s on processor: %d" % (outname, processor_id))
-        filename = f"{outname}.npy"
+        filename = f"{outname}.npz"
         if os.path.exists(filename):
             print(f"Skipping {filename} - already exists.")
             continue
         start_time = time.time()
         data_dict = fm_data[j]
-        np.save(filename, data_dict)
+        np.savez(filename, **{k: v for k, v in data_dict.items() if v is not None})
         print("Time taken for %d = %f" % (j, time.time() - start_time))
 
 
@@ -0,0 +1,33 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""CPU runnable performance benchmarks of the models, datapipes and metrics.
+
+Run them with ``python -m physicsnemo.benchmarks``, see ``--help`` for the options.
+Cold import times are profiled with ``python -m physicsnemo.benchmarks.import_time``.
+"""
+
+from .core import (
+    Benchmark,
+    BenchmarkResult,
+    compare_results,
+    list_benchmarks,
+    load_results,
+    register_benchmark,
+    run_benchmark,
+    run_benchmarks,
+    save_results,
+)
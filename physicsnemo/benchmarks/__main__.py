@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Command line runner of the benchmarks
+
+Examples
+--------
+Run the small models benchmarks and store the results as the new baseline::
+
+    python -m physicsnemo.benchmarks --filter "models/*" --size small \\
+        --output baseline.json
+
+Compare a later run against it, the exit code is 1 if anything regressed::
+
+    python -m physicsnemo.benchmarks --filter "models/*" --size small \\
+        --baseline baseline.json --output results.json
+"""
+
+import argparse
+import sys
+from typing import List, Optional
+
+from physicsnemo.benchmarks.core import (
+    BenchmarkResult,
+    compare_results,
+    list_benchmarks,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+
+
+def _print_result(result: BenchmarkResult) -> None:
+    if result.skipped is not None:
+        print(f"{result.key:<50} skipped: {result.skipped}")
+        return
+    print(
+        f"{result.key:<50} {result.wall_time * 1e3:10.3f} ms "
+        f"{result.peak_memory_mb:10.1f} MB "
+        f"{result.throughput:12.2f} {result.unit}/s"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs the benchmarks and returns the exit code of the CLI"""
+    parser = argparse.ArgumentParser(
+        prog="python -m physicsnemo.benchmarks", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument(
+        "--filter", default="*", help="Glob pattern of the benchmark names to run"
+    )
+    parser.add_argument(
+        "--size",
+        action="append",
+        dest="sizes",
+        help="Size to run, can be repeated. Runs all sizes by default",
+    )
+    parser.add_argument("--device", default="cpu", help="Device to run on")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed steps")
+    parser.add_argument("--repeats", type=int, default=10, help="Minimum timed steps")
+    parser.add_argument(
+        "--min-time", type=float, default=0.0, help="Minimum timed seconds"
+    )
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON file of results to compare against")
+    parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        default=0.1,
+        help="Relative wall time increase flagged as a regression",
+    )
+    parser.add_argument(
+        "--memory-tolerance",
+        type=float,
+        default=0.1,
+        help="Relative peak memory increase flagged as a regression",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the benchmarks and exit"
+    )
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for benchmark in list_benchmarks(args.filter):
+            print(f"{benchmark.name:<50} {', '.join(benchmark.sizes)}")
+        return 0
+
+    results = run_benchmarks(
+        args.filter,
+        sizes=args.sizes,
+        device=args.device,
+        warmup=args.warmup,
+        repeats=args.repeats,
+        min_time=args.min_time,
+        callback=_print_result,
+    )
+    if args.output:
+        save_results(args.output, results)
+
+    if not args.baseline:
+        return 0
+    comparison = compare_results(
+        results,
+        load_results(args.baseline),
+        time_tolerance=args.time_tolerance,
+        memory_tolerance=args.memory_tolerance,
+    )
+    for key in comparison.missing:
+        print(f"No baseline for {key}")
+    for entry in comparison.improvements:
+        print(f"Improvement {entry.key} {entry.metric}: {entry.ratio:.2f}x baseline")
+    for entry in comparison.regressions:
+        print(f"REGRESSION {entry.key} {entry.metric}: {entry.ratio:.2f}x baseline")
+    return 1 if comparison.regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fnmatch
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import torch
+
+# A benchmark setup builds everything that should not be timed and returns the
+# function running one step together with the number of items one step processes
+SetupFn = Callable[[Dict[str, Any], torch.device], Tuple[Callable[[], Any], int]]
+
+
+@dataclass
+class Benchmark:
+    """Definition of a benchmark
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the benchmark, such as "models/fno/forward"
+    setup : SetupFn
+        Function taking the parameters of a size and the device, returning the step
+        function to time and the number of items processed by one step
+    sizes : Dict[str, Dict[str, Any]]
+        Parameters of every size the benchmark runs at, keyed by size name
+    unit : str, optional
+        Unit of the items used for the throughput, by default "samples"
+    requires : Tuple[str, ...], optional
+        Modules that must be importable to run the benchmark, by default ()
+    requires_cuda : bool, optional
+        Whether the benchmark can only run on GPU, by default False
+    """
+
+    name: str
+    setup: SetupFn
+    sizes: Dict[str, Dict[str, Any]]
+    unit: str = "samples"
+    requires: Tuple[str, ...] = ()
+    requires_cuda: bool = False
+
+    def skip_reason(self, device: torch.device) -> Union[str, None]:
+        """Reason why the benchmark can not run on `device`, None if it can"""
+        if self.requires_cuda and device.type != "cuda":
+            return "requires a CUDA device"
+        missing = [m for m in self.requires if importlib.util.find_spec(m) is None]
+        if missing:
+            return f"missing dependencies {missing}"
+        return None
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements of one benchmark at one size
+
+    Wall times are in seconds per step, peak memory in MB and the throughput in
+    items per second.
+    """
+
+    name: str
+    size: str
+    device: str
+    repeats: int = 0
+    wall_time: float = float("nan")
+    wall_time_min: float = float("nan")
+    wall_time_std: float = float("nan")
+    peak_memory_mb: float = float("nan")
+    throughput: float = float("nan")
+    unit: str = "samples"
+    skipped: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """Identifier of the result used to match it with a baseline"""
+        return f"{self.name}[{self.size}]"
+
+
+_BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def register_benchmark(benchmark: Benchmark) -> Benchmark:
+    """Registers a benchmark so that `run_benchmarks` and the CLI can find it"""
+    if benchmark.name in _BENCHMARKS:
+        raise ValueError(f"Benchmark {benchmark.name} is already registered")
+    _BENCHMARKS[benchmark.name] = benchmark
+    return benchmark
+
+
+def list_benchmarks(pattern: str = "*") -> List[Benchmark]:
+    """Registered benchmarks whose name matches the glob `pattern`"""
+    # Importing the suites registers their benchmarks
+    from physicsnemo.benchmarks import datapipes, metrics, models  # noqa: F401
+
+    return [
+        b for name, b in sorted(_BENCHMARKS.items()) if fnmatch.fnmatch(name, pattern)
+    ]
+
+
+def _current_rss() -> Union[int, None]:
+    """Resident set size of the process in bytes, None if not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class _PeakMemory:
+    """Measures the peak memory used while the context is active
+
+    On GPU this is the peak of the memory allocated by PyTorch. On CPU a thread samples
+    the resident set size of the process, falling back to the growth of its high water
+    mark where the current resident set size is not available.
+    """
+
+    def __init__(self, device: torch.device, interval: float = 1e-3):
+        self.device = device
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, (_current_rss() or 0) - self._start)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+            torch.cuda.reset_peak_memory_stats(self.device)
+            self._start = torch.cuda.memory_allocated(self.device)
+        elif _current_rss() is not None:
+            self._start = _current_rss()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        else:
+            import resource
+
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            scale = 1 if sys.platform == "darwin" else 1024
+            self._start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+            self._scale = scale
+        return self
+
+    def __exit__(self, *exc):
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+            self.peak = torch.cuda.max_memory_allocated(self.device) - self._start
+        elif self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, (_current_rss() or 0) - self._start)
+        else:
+            import resource
+
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * self._scale
+            self.peak = usage - self._start
+        self.peak = max(self.peak, 0)
+        return False
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def run_benchmark(
+    benchmark: Benchmark,
+    size: str,
+    device: Union[str, torch.device] = "cpu",
+    warmup: int = 2,
+    repeats: int = 10,
+    min_time: float = 0.0,
+) -> BenchmarkResult:
+    """Runs one benchmark at one size
+
+    Parameters
+    ----------
+    benchmark : Benchmark
+        Benchmark to run
+    size : str
+        Name of the size to run at
+    device : Union[str, torch.device], optional
+        Device to run on, by default "cpu"
+    warmup : int, optional
+        Number of untimed steps before measuring, by default 2
+    repeats : int, optional
+        Minimum number of timed steps, by default 10
+    min_time : float, optional
+        Keep timing steps until at least this many seconds have passed, by default 0
+
+    Returns
+    -------
+    BenchmarkResult
+        Measurements of the benchmark
+    """
+    device = torch.device(device)
+    result = BenchmarkResult(
+        name=benchmark.name, size=size, device=str(device), unit=benchmark.unit
+    )
+    reason = benchmark.skip_reason(device)
+    if reason is not None:
+        result.skipped = reason
+        return result
+
+    torch.manual_seed(0)
+    step, items = benchmark.setup(benchmark.sizes[size], device)
+    for _ in range(warmup):
+        step()
+    _synchronize(device)
+
+    times = []
+    with _PeakMemory(device) as memory:
+        start = time.perf_counter()
+        while len(times) < repeats or time.perf_counter() - start < min_time:
+            tic = time.perf_counter()
+            step()
+            _synchronize(device)
+            times.append(time.perf_counter() - tic)
+
+    result.repeats = len(times)
+    result.wall_time = statistics.median(times)
+    result.wall_time_min = min(times)
+    result.wall_time_std = statistics.pstdev(times)
+    result.peak_memory_mb = memory.peak / 2**20
+    result.throughput = items / result.wall_time
+    return result
+
+
+def run_benchmarks(
+    pattern: str = "*",
+    sizes: Optional[List[str]] = None,
+    device: Union[str, torch.device] = "cpu",
+    warmup: int = 2,
+    repeats: int = 10,
+    min_time: float = 0.0,
+    callback: Optional[Callable[[BenchmarkResult], None]] = None,
+) -> List[BenchmarkResult]:
+    """Runs the registered benchmarks matching `pattern`
+
+    Parameters
+    ----------
+    pattern : str, optional
+        Glob pattern selecting benchmarks by name, by default "*"
+    sizes : Optional[List[str]], optional
+        Sizes to run, by default None runs all sizes of every benchmark
+    device : Union[str, torch.device], optional
+        Device to run on, by default "cpu"
+    warmup : int, optional
+        Number of untimed steps before measuring, by default 2
+    repeats : int, optional
+        Minimum number of timed steps, by default 10
+    min_time : float, optional
+        Minimum timed duration of every benchmark in seconds, by default 0
+    callback : Optional[Callable[[BenchmarkResult], None]], optional
+        Called with every result as soon as it is available, by default None
+
+    Returns
+    -------
+    List[BenchmarkResult]
+        Results of all benchmarks and sizes
+    """
+    results = []
+    for benchmark in list_benchmarks(pattern):
+        for size in benchmark.sizes:
+            if sizes is not None and size not in sizes:
+                continue
+            result = run_benchmark(benchmark, size, device, warmup, repeats, min_time)
+            if callback is not None:
+                callback(result)
+            results.append(result)
+    return results
+
+
+def environment_info() -> Dict[str, Any]:
+    """Information about the environment the benchmarks ran in"""
+    import physicsnemo
+
+    return {
+        "physicsnemo": physicsnemo.__version__,
+        "torch": torch.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "num_threads": torch.get_num_threads(),
+        "cuda": torch.cuda.get_device_name() if torch.cuda.is_available() else None,
+    }
+
+
+def save_results(file_name: str, results: List[BenchmarkResult]) -> None:
+    """Saves benchmark results as JSON"""
+    with open(file_name, "w") as f:
+        json.dump(
+            {
+                "environment": environment_info(),
+                "results": [asdict(r) for r in results],
+            },
+            f,
+            indent=2,
+        )
+
+
+def load_results(file_name: str) -> List[BenchmarkResult]:
+    """Loads benchmark results saved with `save_results`"""
+    with open(file_name) as f:
+        return [BenchmarkResult(**r) for r in json.load(f)["results"]]
+
+
+@dataclass
+class Regression:
+    """A measurement that got worse than its baseline by more than the tolerance"""
+
+    key: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        """Current value relative to the baseline"""
+        return self.current / self.baseline
+
+
+@dataclass
+class Comparison:
+    """Comparison of results against a baseline"""
+
+    regressions: List[Regression] = field(default_factory=list)
+    improvements: List[Regression] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+
+
+def compare_results(
+    results: List[BenchmarkResult],
+    baseline: List[BenchmarkResult],
+    time_tolerance: float = 0.1,
+    memory_tolerance: float = 0.1,
+) -> Comparison:
+    """Compares results against a baseline
+
+    A result regresses when its median wall time or its peak memory exceeds the
+    baseline by more than the relative tolerance. Skipped results are ignored.
+
+    Parameters
+    ----------
+    results : List[BenchmarkResult]
+        Results of the current run
+    baseline : List[BenchmarkResult]
+        Stored baseline results
+    time_tolerance : float, optional
+        Relative tolerance of the wall time, by default 0.1
+    memory_tolerance : float, optional
+        Relative tolerance of the peak memory, by default 0.1
+
+    Returns
+    -------
+    Comparison
+        Regressions, improvements and results without a baseline
+    """
+    reference = {r.key: r for r in baseline if r.skipped is None}
+    comparison = Comparison()
+    for result in results:
+        if result.skipped is not None:
+            continue
+        base = reference.get(result.key)
+        if base is None:
+            comparison.missing.append(result.key)
+            continue
+        for metric, tolerance in (
+            ("wall_time", time_tolerance),
+            ("peak_memory_mb", memory_tolerance),
+        ):
+            current, previous = getattr(result, metric), getattr(base, metric)
+            # Memory measurements of tiny benchmarks are within the noise
+            if metric == "peak_memory_mb" and max(current, previous) < 1.0:
+                continue
+            if previous <= 0:
+                continue
+            entry = Regression(result.key, metric, previous, current)
+            if current > previous * (1 + tolerance):
+                comparison.regressions.append(entry)
+            elif current < previous * (1 - tolerance):
+                comparison.improvements.append(entry)
+    return comparison
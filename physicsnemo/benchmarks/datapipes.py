@@ -0,0 +1,540 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Throughput benchmarks of the datapipes, on synthetic in-memory data.
+
+One step draws one batch (or one sample for the graph datasets) from the datapipe.
+The `train` benchmarks of the simulation datapipes also run a stand-in model step on
+every batch, comparing the synchronous generation of the batches with the
+asynchronous one, which overlaps it with the model step.
+"""
+
+import itertools
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from physicsnemo.benchmarks.core import Benchmark, register_benchmark
+
+
+def _darcy_setup(params, device):
+    from physicsnemo.datapipes.benchmarks.darcy import Darcy2D
+
+    datapipe = Darcy2D(
+        resolution=params["resolution"],
+        batch_size=params["batch_size"],
+        max_iterations=params["max_iterations"],
+        convergence_threshold=1e-4,
+        iterations_per_convergence_check=10,
+        nr_multigrids=3,
+        normaliser={"permeability": (0.0, 1.0), "darcy": (0.0, 1.0)},
+        device=device,
+    )
+    batches = iter(datapipe)
+    return lambda: next(batches), params["batch_size"]
+
+
+register_benchmark(
+    Benchmark(
+        name="datapipes/darcy2d",
+        setup=_darcy_setup,
+        sizes={
+            "small": dict(resolution=64, batch_size=2, max_iterations=100),
+            "medium": dict(resolution=128, batch_size=4, max_iterations=300),
+        },
+        requires=("warp",),
+    )
+)
+
+
+def _model_step(x: torch.Tensor, num_layers: int) -> torch.Tensor:
+    """Stand-in for a model consuming a batch of 2D fields, a stack of smoothings"""
+    x = x.reshape(-1, 1, *x.shape[-2:])
+    weight = torch.full((1, 1, 3, 3), 1.0 / 9.0, device=x.device)
+    for _ in range(num_layers):
+        x = torch.nn.functional.conv2d(x, weight, padding=1)
+    return x
+
+
+def _darcy_train_setup(async_generation: bool):
+    def setup(params, device):
+        from physicsnemo.datapipes.benchmarks.darcy import Darcy2D
+
+        datapipe = Darcy2D(
+            resolution=params["resolution"],
+            batch_size=params["batch_size"],
+            max_iterations=params["max_iterations"],
+            convergence_threshold=1e-4,
+            iterations_per_convergence_check=10,
+            nr_multigrids=3,
+            device=device,
+            convergence_checks_per_sync=4,
+            async_generation=async_generation,
+        )
+        batches = iter(datapipe)
+
+        def step():
+            out = _model_step(next(batches)["permeability"], params["model_layers"])
+            if out.is_cuda:
+                torch.cuda.synchronize(out.device)
+
+        return step, params["batch_size"]
+
+    return setup
+
+
+_DARCY_TRAIN_SIZES = {
+    "small": dict(resolution=64, batch_size=2, max_iterations=100, model_layers=200),
+    "medium": dict(resolution=128, batch_size=4, max_iterations=300, model_layers=400),
+}
+
+for _mode in ("sync", "async"):
+    register_benchmark(
+        Benchmark(
+            name=f"datapipes/darcy2d/train/{_mode}",
+            setup=_darcy_train_setup(_mode == "async"),
+            sizes=_DARCY_TRAIN_SIZES,
+            requires=("warp",),
+        )
+    )
+
+
+def _kelvin_helmholtz_train_setup(async_generation: bool):
+    def setup(params, device):
+        from physicsnemo.datapipes.benchmarks.kelvin_helmholtz import KelvinHelmholtz2D
+
+        datapipe = KelvinHelmholtz2D(
+            resolution=params["resolution"],
+            batch_size=params["batch_size"],
+            seq_length=2,
+            nr_snapshots=params["nr_snapshots"],
+            iteration_per_snapshot=8,
+            device=device,
+            async_generation=async_generation,
+        )
+        batches = iter(datapipe)
+
+        def step():
+            out = _model_step(next(batches)["density"], params["model_layers"])
+            if out.is_cuda:
+                torch.cuda.synchronize(out.device)
+
+        return step, params["batch_size"]
+
+    return setup
+
+
+_KELVIN_HELMHOLTZ_TRAIN_SIZES = {
+    "small": dict(resolution=32, batch_size=2, nr_snapshots=8, model_layers=50),
+    "medium": dict(resolution=128, batch_size=4, nr_snapshots=16, model_layers=100),
+}
+
+for _mode in ("sync", "async"):
+    register_benchmark(
+        Benchmark(
+            name=f"datapipes/kelvin_helmholtz2d/train/{_mode}",
+            setup=_kelvin_helmholtz_train_setup(_mode == "async"),
+            sizes=_KELVIN_HELMHOLTZ_TRAIN_SIZES,
+            requires=("warp",),
+        )
+    )
+
+
+def _domino_sample(resolution: int, num_points: int):
+    """Synthetic DoMINO sample, a triangulated sphere in a cloud of volume points"""
+    rng = np.random.default_rng(0)
+    theta, phi = np.meshgrid(
+        np.linspace(0, np.pi, resolution),
+        np.linspace(0, 2 * np.pi, 2 * resolution),
+        indexing="ij",
+    )
+    vertices = np.stack(
+        [np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)],
+        axis=-1,
+    ).reshape(-1, 3)
+    ids = np.arange(theta.size).reshape(theta.shape)
+    a, b, c, d = ids[:-1, :-1], ids[:-1, 1:], ids[1:, :-1], ids[1:, 1:]
+    faces = np.concatenate(
+        [np.stack([a, c, b], -1).reshape(-1, 3), np.stack([b, c, d], -1).reshape(-1, 3)]
+    )
+    triangles = vertices[faces]
+    centers = triangles.mean(1)
+    areas = 0.5 * np.linalg.norm(
+        np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]),
+        axis=-1,
+    )
+    normals = centers / np.linalg.norm(centers, axis=-1, keepdims=True)
+    return {
+        "stl_coordinates": vertices.astype(np.float32),
+        "stl_centers": centers.astype(np.float32),
+        "stl_faces": faces.reshape(-1).astype(np.int32),
+        "stl_areas": areas.astype(np.float32),
+        "surface_mesh_centers": centers.astype(np.float32),
+        "surface_normals": normals.astype(np.float32),
+        "surface_areas": areas.astype(np.float32),
+        "surface_fields": rng.standard_normal((len(centers), 4), dtype=np.float32),
+        "volume_mesh_centers": rng.uniform(-3, 3, (num_points, 3)).astype(np.float32),
+        "volume_fields": rng.standard_normal((num_points, 5), dtype=np.float32),
+        "stream_velocity": np.asarray(30.0),
+        "air_density": np.asarray(1.205),
+    }
+
+
+def _domino_setup(use_geometry_cache: bool):
+    def setup(params, device):
+        from physicsnemo.datapipes.cae.domino_datapipe import DoMINODataPipe
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        sample = _domino_sample(params["resolution"], params["num_points"])
+        data_dir = Path(tmp_dir.name) / "data"
+        data_dir.mkdir()
+        datapipe = DoMINODataPipe(
+            data_dir,
+            model_type="combined",
+            phase="train",
+            grid_resolution=[params["grid_resolution"]] * 3,
+            sampling=True,
+            volume_points_sample=params["points_sample"],
+            surface_points_sample=params["points_sample"],
+            geom_points_sample=params["points_sample"],
+            num_surface_neighbors=7,
+            surface_sampling_algorithm="random",
+            normalize_coordinates=True,
+            bounding_box_dims=[[3.0, 3.0, 3.0], [-3.0, -3.0, -3.0]],
+            bounding_box_dims_surf=[[1.5, 1.5, 1.5], [-1.5, -1.5, -1.5]],
+            gpu_preprocessing=False,
+            gpu_output=False,
+            geometry_cache_dir=(
+                Path(tmp_dir.name) / "cache" if use_geometry_cache else None
+            ),
+        )
+        # The cache is keyed by the file of the sample
+        np.savez(data_dir / "sample.npz", **sample)
+        cache_key = datapipe.geometry_cache_key(data_dir / "sample.npz")
+
+        # The default argument keeps the directory alive as long as the step function
+        def step(tmp_dir=tmp_dir):
+            return datapipe.preprocess_data(dict(sample), cache_key)
+
+        return step, 1
+
+    return setup
+
+
+# The geometry cache is filled by the warmup steps, the timed steps read from it
+for _name, _use_geometry_cache in (
+    ("preprocess_cpu", False),
+    ("preprocess_cpu_geometry_cache", True),
+):
+    register_benchmark(
+        Benchmark(
+            name=f"datapipes/domino/{_name}",
+            setup=_domino_setup(_use_geometry_cache),
+            sizes={
+                "small": dict(
+                    resolution=32,
+                    num_points=20_000,
+                    grid_resolution=32,
+                    points_sample=4096,
+                ),
+                "medium": dict(
+                    resolution=256,
+                    num_points=1_000_000,
+                    grid_resolution=64,
+                    points_sample=16384,
+                ),
+            },
+            requires=("warp", "scipy", "zarr", "omegaconf"),
+        )
+    )
+
+
+def _area_weighted_sampling_setup(use_alias_table: bool):
+    def setup(params, device):
+        from physicsnemo.utils.domino.utils import (
+            area_weighted_shuffle_array,
+            build_alias_table,
+        )
+
+        rng = np.random.default_rng(0)
+        points = rng.random((params["num_cells"], 3), dtype=np.float32)
+        areas = rng.random(params["num_cells"], dtype=np.float32) ** 4
+        # The table is built once per geometry, outside of the timed draws
+        table = build_alias_table(areas) if use_alias_table else None
+
+        def step():
+            return area_weighted_shuffle_array(
+                points, params["num_samples"], areas, alias_table=table
+            )
+
+        return step, params["num_samples"]
+
+    return setup
+
+
+for _mode in ("cdf", "alias"):
+    register_benchmark(
+        Benchmark(
+            name=f"datapipes/domino/area_weighted_sampling/{_mode}",
+            setup=_area_weighted_sampling_setup(_mode == "alias"),
+            sizes={
+                "small": dict(num_cells=100_000, num_samples=8192),
+                "medium": dict(num_cells=10_000_000, num_samples=65536),
+            },
+            unit="points",
+            requires=("scipy",),
+        )
+    )
+
+
+def _domino_cached_setup(params, device):
+    from physicsnemo.datapipes.cae.domino_datapipe import CachedDoMINODataset
+    from physicsnemo.utils.domino.cache import write_cached_sample
+    from physicsnemo.utils.domino.utils import build_alias_table
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    rng = np.random.default_rng(0)
+    n = params["num_points"]
+    areas = rng.random(n, dtype=np.float32)
+    prob, alias = build_alias_table(areas)
+    write_cached_sample(
+        Path(tmp_dir.name) / "sample",
+        {
+            "volume_mesh_centers": rng.random((n, 3), dtype=np.float32),
+            "volume_fields": rng.random((n, 5), dtype=np.float32),
+            "surface_mesh_centers": rng.random((n, 3), dtype=np.float32),
+            "surface_normals": rng.random((n, 3), dtype=np.float32),
+            "surface_areas": areas,
+            "surface_fields": rng.random((n, 4), dtype=np.float32),
+            "neighbor_indices": rng.integers(0, n, (n, 7)),
+            "surface_alias_prob": prob,
+            "surface_alias_index": alias,
+        },
+    )
+    dataset = CachedDoMINODataset(
+        tmp_dir.name,
+        sampling=True,
+        volume_points_sample=params["points_sample"],
+        surface_points_sample=params["points_sample"],
+    )
+
+    def step(tmp_dir=tmp_dir):
+        return dataset[0]
+
+    return step, 1
+
+
+register_benchmark(
+    Benchmark(
+        name="datapipes/domino/cached_sample",
+        setup=_domino_cached_setup,
+        sizes={
+            "small": dict(num_points=200_000, points_sample=8192),
+            "medium": dict(num_points=10_000_000, points_sample=65536),
+        },
+        requires=("scipy", "zarr", "omegaconf"),
+    )
+)
+
+
+def _healpix_dataset(num_times: int, nside: int, channels: int):
+    """Synthetic HEALPix dataset with the layout produced by the HEALPix data modules"""
+    import pandas as pd
+    import xarray as xr
+
+    names = [f"var{i}" for i in range(channels)]
+    rng = np.random.default_rng(0)
+    shape = (num_times, channels, 12, nside, nside)
+    coords = {
+        "time": pd.date_range("2000-01-01", periods=num_times, freq="3h"),
+        "channel_in": names,
+        "channel_out": names,
+        "face": np.arange(12),
+        "height": np.arange(nside),
+        "width": np.arange(nside),
+    }
+    spatial = ("face", "height", "width")
+    return xr.Dataset(
+        {
+            "inputs": (
+                ("time", "channel_in") + spatial,
+                rng.standard_normal(shape, dtype=np.float32),
+            ),
+            "targets": (
+                ("time", "channel_out") + spatial,
+                rng.standard_normal(shape, dtype=np.float32),
+            ),
+            "lat": (spatial, rng.uniform(-90, 90, (12, nside, nside))),
+            "lon": (spatial, rng.uniform(0, 360, (12, nside, nside))),
+        },
+        coords=coords,
+    )
+
+
+def _healpix_setup(params, device):
+    from omegaconf import DictConfig
+
+    from physicsnemo.datapipes.healpix.timeseries_dataset import TimeSeriesDataset
+
+    ds = _healpix_dataset(params["num_times"], params["nside"], params["channels"])
+    scaling = DictConfig(
+        {str(c): {"mean": 0.0, "std": 1.0} for c in ds.channel_in.values}
+    )
+    dataset = TimeSeriesDataset(
+        dataset=ds,
+        scaling=scaling,
+        input_time_dim=2,
+        output_time_dim=2,
+        batch_size=params["batch_size"],
+        drop_last=True,
+        add_insolation=True,
+    )
+    indices = itertools.cycle(range(len(dataset)))
+    return lambda: dataset[next(indices)], params["batch_size"]
+
+
+register_benchmark(
+    Benchmark(
+        name="datapipes/healpix_timeseries",
+        setup=_healpix_setup,
+        sizes={
+            "small": dict(num_times=64, nside=16, channels=2, batch_size=4),
+            "medium": dict(num_times=128, nside=32, channels=4, batch_size=8),
+        },
+        requires=("xarray", "pandas", "omegaconf"),
+    )
+)
+
+
+def _grid_mesh_graph(n: int):
+    """Graph of a triangulated n x n grid with node positions"""
+    import dgl
+
+    ids = np.arange(n * n).reshape(n, n)
+    edges = [
+        (ids[:, :-1], ids[:, 1:]),
+        (ids[:-1, :], ids[1:, :]),
+        (ids[:-1, :-1], ids[1:, 1:]),
+    ]
+    src = np.concatenate([e[0].ravel() for e in edges])
+    dst = np.concatenate([e[1].ravel() for e in edges])
+    graph = dgl.graph(
+        (
+            torch.from_numpy(np.concatenate([src, dst])),
+            torch.from_numpy(np.concatenate([dst, src])),
+        ),
+        num_nodes=n * n,
+    )
+    x, y = np.meshgrid(np.linspace(0, 1, n), np.linspace(0, 1, n), indexing="ij")
+    graph.ndata["pos"] = torch.from_numpy(
+        np.stack([x.ravel(), y.ravel()], axis=-1)
+    ).float()
+    return graph
+
+
+def _bsms_setup(params, device):
+    from physicsnemo.datapipes.gnn.bsms import BistrideMultiLayerGraphDataset
+
+    graphs = [_grid_mesh_graph(params["grid_size"]) for _ in range(2)]
+    dataset = BistrideMultiLayerGraphDataset(graphs, num_layers=params["num_layers"])
+    indices = itertools.cycle(range(len(dataset)))
+    return lambda: dataset[next(indices)], 1
+
+
+register_benchmark(
+    Benchmark(
+        name="datapipes/gnn_bsms",
+        setup=_bsms_setup,
+        sizes={
+            "small": dict(grid_size=32, num_layers=2),
+            "medium": dict(grid_size=96, num_layers=4),
+        },
+        unit="graphs",
+        requires=("dgl", "scipy"),
+    )
+)
+
+
+def _era5_hdf5_files(path: Path, num_years: int, num_times: int, channels: int, res):
+    """Synthetic ERA5 HDF5 files with the layout read by `ERA5HDF5Datapipe`"""
+    import h5py
+
+    rng = np.random.default_rng(0)
+    for year in range(num_years):
+        with h5py.File(path / f"{2000 + year}.h5", "w") as f:
+            f["fields"] = rng.standard_normal(
+                (num_times, channels, *res), dtype=np.float32
+            )
+
+
+def _era5_setup(engine):
+    def setup(params, device):
+        from physicsnemo.datapipes.climate import ERA5HDF5Datapipe
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        res = (params["resolution"], 2 * params["resolution"])
+        _era5_hdf5_files(
+            Path(tmp_dir.name), 2, params["num_times"], params["channels"], res
+        )
+        datapipe = ERA5HDF5Datapipe(
+            data_dir=tmp_dir.name,
+            batch_size=params["batch_size"],
+            num_steps=2,
+            latlon_resolution=res,
+            use_cos_zenith=True,
+            cos_zenith_args={"start_year": 2000},
+            num_workers=params["num_workers"],
+            device=device,
+            engine=engine,
+        )
+        epochs = (iter(datapipe) for _ in itertools.count())
+        batches = itertools.chain.from_iterable(epochs)
+
+        # The default argument keeps the data alive as long as the step function
+        def step(tmp_dir=tmp_dir):
+            return next(batches)
+
+        return step, params["batch_size"]
+
+    return setup
+
+
+_ERA5_SIZES = {
+    "small": dict(num_times=32, channels=4, resolution=32, batch_size=4, num_workers=2),
+    "medium": dict(
+        num_times=64, channels=16, resolution=180, batch_size=8, num_workers=8
+    ),
+}
+
+register_benchmark(
+    Benchmark(
+        name="datapipes/era5_hdf5/torch",
+        setup=_era5_setup("torch"),
+        sizes=_ERA5_SIZES,
+        requires=("h5py",),
+    )
+)
+register_benchmark(
+    Benchmark(
+        name="datapipes/era5_hdf5/dali",
+        setup=_era5_setup("dali"),
+        sizes=_ERA5_SIZES,
+        requires=("h5py", "nvidia.dali"),
+        requires_cuda=True,
+    )
+)
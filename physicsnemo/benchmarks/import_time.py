@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cold import time profiling
+
+Imports a module in a fresh interpreter with ``python -X importtime`` and reports the
+time spent importing it and the modules that contributed the most. Modules listed in
+``--preload`` (by default ``torch``, which every model needs) are imported first and
+are not counted.
+
+Example
+-------
+::
+
+    python -m physicsnemo.benchmarks.import_time physicsnemo.models.fno --top 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+_MARKER = "__physicsnemo_import_time__"
+
+
+@dataclass
+class ImportTime:
+    """Cold import time of a module
+
+    Times are in seconds. `modules` maps every module imported as a consequence of
+    importing the target to its self time, excluding its own imports.
+    """
+
+    module: str
+    total: float
+    modules: Dict[str, float] = field(default_factory=dict)
+
+    def top(self, n: int = 10) -> List[tuple]:
+        """The `n` modules with the largest self import time"""
+        return sorted(self.modules.items(), key=lambda x: x[1], reverse=True)[:n]
+
+
+def measure_import_time(
+    module: str, preload: Sequence[str] = ("torch",), repeats: int = 1
+) -> ImportTime:
+    """Measures the cold import time of `module` in fresh interpreters
+
+    Parameters
+    ----------
+    module : str
+        Module to import, such as "physicsnemo.models.fno"
+    preload : Sequence[str], optional
+        Modules imported before `module` whose time is not counted, by default
+        ("torch",)
+    repeats : int, optional
+        Number of fresh interpreters to measure in, the fastest is kept, by default 1
+
+    Returns
+    -------
+    ImportTime
+        Import time of the module
+
+    Raises
+    ------
+    ImportError
+        If the module can not be imported
+    """
+    code = "".join(f"import {m}; " for m in preload)
+    code += f"import sys; sys.stderr.write('{_MARKER}\\n'); import {module}"
+    command = [sys.executable, "-X", "importtime", "-c", code]
+    best = None
+    for _ in range(repeats):
+        proc = subprocess.run(
+            command,  # noqa: S603 runs the current interpreter
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        )
+        if proc.returncode != 0:
+            raise ImportError(f"Could not import {module}:\n{proc.stderr[-2000:]}")
+        lines = proc.stderr.split(_MARKER + "\n", 1)[-1].splitlines()
+        total = 0
+        modules = {}
+        for line in lines:
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:") :].split("|")
+            if not self_us.strip().isdigit():
+                continue  # Header
+            modules[name.strip()] = int(self_us) * 1e-6
+            # Top level imports have a single space before the name
+            if not name.startswith("  "):
+                total += int(cumulative_us) * 1e-6
+        if best is None or total < best.total:
+            best = ImportTime(module, total, modules)
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Profiles import times, returns 1 if a module exceeds the budget"""
+    parser = argparse.ArgumentParser(
+        prog="python -m physicsnemo.benchmarks.import_time",
+        description=__doc__.split("\n")[0],
+    )
+    parser.add_argument("modules", nargs="+", help="Modules to import")
+    parser.add_argument(
+        "--preload",
+        action="append",
+        help="Module imported first and not counted, can be repeated. Default torch",
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules shown")
+    parser.add_argument("--budget", type=float, help="Maximum import time in seconds")
+    args = parser.parse_args(argv)
+
+    exceeded = False
+    for module in args.modules:
+        result = measure_import_time(
+            module, preload=args.preload or ("torch",), repeats=args.repeats
+        )
+        print(f"{module}: {result.total:.3f} s")
+        for name, seconds in result.top(args.top):
+            print(f"    {seconds * 1e3:9.1f} ms  {name}")
+        if args.budget is not None and result.total > args.budget:
+            print(f"{module} exceeds the import time budget of {args.budget:.3f} s")
+            exceeded = True
+    return 1 if exceeded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks of the metric kernels of `physicsnemo.metrics.general`."""
+
+import torch
+
+from physicsnemo.benchmarks.core import Benchmark, register_benchmark
+
+_ENSEMBLE_SIZES = {
+    "small": dict(ensemble=16, height=32, width=64),
+    "medium": dict(ensemble=32, height=128, width=256),
+}
+
+
+def _crps_setup(method):
+    def setup(params, device):
+        from physicsnemo.metrics.general.crps import crps
+
+        shape = (params["height"], params["width"])
+        pred = torch.randn(params["ensemble"], *shape, device=device)
+        obs = torch.randn(*shape, device=device)
+        return lambda: crps(pred, obs, dim=0, method=method), 1
+
+    return setup
+
+
+for _method in ("kernel", "sort", "histogram"):
+    register_benchmark(
+        Benchmark(
+            name=f"metrics/crps/{_method}",
+            setup=_crps_setup(_method),
+            sizes=_ENSEMBLE_SIZES,
+        )
+    )
+
+
+def _histogram_setup(params, device):
+    from physicsnemo.metrics.general.histogram import histogram
+
+    x = torch.randn(
+        params["ensemble"], params["height"], params["width"], device=device
+    )
+    return lambda: histogram(x, bins=32), 1
+
+
+register_benchmark(
+    Benchmark(
+        name="metrics/histogram",
+        setup=_histogram_setup,
+        sizes=_ENSEMBLE_SIZES,
+    )
+)
+
+
+def _power_spectrum_setup(params, device):
+    from physicsnemo.metrics.general.power_spectrum import power_spectrum
+
+    res = params["resolution"]
+    x = torch.randn(params["batch_size"], params["channels"], res, res, device=device)
+    return lambda: power_spectrum(x), params["batch_size"]
+
+
+register_benchmark(
+    Benchmark(
+        name="metrics/power_spectrum",
+        setup=_power_spectrum_setup,
+        sizes={
+            "small": dict(batch_size=4, channels=2, resolution=64),
+            "medium": dict(batch_size=8, channels=4, resolution=256),
+        },
+    )
+)
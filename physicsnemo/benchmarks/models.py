@@ -0,0 +1,321 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Forward and backward benchmarks of the core models.
+
+Every model registers a ``models/{name}/forward`` benchmark, timing an inference
+forward pass, and a ``models/{name}/backward`` benchmark, timing a training step made
+of the forward pass, the backward pass and zeroing the gradients.
+"""
+
+from typing import Any, Callable, Dict, Tuple
+
+import torch
+
+from physicsnemo.benchmarks.core import Benchmark, register_benchmark
+
+# Builds the model and its inputs, returns them with the batch size
+BuildFn = Callable[
+    [Dict[str, Any], torch.device], Tuple[torch.nn.Module, Tuple[Any, ...], int]
+]
+
+
+def _loss(output: Any) -> torch.Tensor:
+    if isinstance(output, (tuple, list)):
+        return sum(_loss(o) for o in output)
+    return output.float().sum()
+
+
+def _register_model(
+    name: str,
+    build: BuildFn,
+    sizes: Dict[str, Dict[str, Any]],
+    requires: Tuple[str, ...] = (),
+    requires_cuda: bool = False,
+) -> None:
+    def forward_setup(params, device):
+        model, inputs, batch_size = build(params, device)
+        model.eval()
+
+        def step():
+            with torch.no_grad():
+                return model(*inputs)
+
+        return step, batch_size
+
+    def backward_setup(params, device):
+        model, inputs, batch_size = build(params, device)
+        model.train()
+
+        def step():
+            model.zero_grad(set_to_none=True)
+            _loss(model(*inputs)).backward()
+
+        return step, batch_size
+
+    for mode, setup in (("forward", forward_setup), ("backward", backward_setup)):
+        register_benchmark(
+            Benchmark(
+                name=f"models/{name}/{mode}",
+                setup=setup,
+                sizes=sizes,
+                requires=requires,
+                requires_cuda=requires_cuda,
+            )
+        )
+
+
+def _build_fno(params, device):
+    from physicsnemo.models.fno import FNO
+
+    model = FNO(
+        in_channels=3,
+        out_channels=1,
+        dimension=2,
+        latent_channels=params["latent_channels"],
+        num_fno_layers=params["num_layers"],
+        num_fno_modes=params["num_modes"],
+        padding=8,
+    ).to(device)
+    res = params["resolution"]
+    x = torch.randn(params["batch_size"], 3, res, res, device=device)
+    return model, (x,), params["batch_size"]
+
+
+_register_model(
+    "fno",
+    _build_fno,
+    {
+        "small": dict(
+            batch_size=4, resolution=32, latent_channels=16, num_layers=2, num_modes=8
+        ),
+        "medium": dict(
+            batch_size=8, resolution=64, latent_channels=32, num_layers=4, num_modes=16
+        ),
+    },
+)
+
+
+def _build_afno(params, device):
+    from physicsnemo.models.afno import AFNO
+
+    res = params["resolution"]
+    model = AFNO(
+        inp_shape=[res, res],
+        in_channels=3,
+        out_channels=1,
+        patch_size=[8, 8],
+        embed_dim=params["embed_dim"],
+        depth=params["depth"],
+        num_blocks=8,
+    ).to(device)
+    x = torch.randn(params["batch_size"], 3, res, res, device=device)
+    return model, (x,), params["batch_size"]
+
+
+_register_model(
+    "afno",
+    _build_afno,
+    {
+        "small": dict(batch_size=4, resolution=32, embed_dim=32, depth=2),
+        "medium": dict(batch_size=8, resolution=64, embed_dim=128, depth=4),
+    },
+)
+
+
+def _build_meshgraphnet(params, device):
+    import dgl
+
+    from physicsnemo.models.meshgraphnet import MeshGraphNet
+
+    model = MeshGraphNet(
+        input_dim_nodes=4,
+        input_dim_edges=3,
+        output_dim=2,
+        processor_size=params["processor_size"],
+        hidden_dim_processor=params["hidden_dim"],
+        hidden_dim_node_encoder=params["hidden_dim"],
+        hidden_dim_edge_encoder=params["hidden_dim"],
+        hidden_dim_node_decoder=params["hidden_dim"],
+    ).to(device)
+    graph = dgl.rand_graph(params["num_nodes"], params["num_edges"]).to(device)
+    nodes = torch.randn(params["num_nodes"], 4, device=device)
+    edges = torch.randn(params["num_edges"], 3, device=device)
+    return model, (nodes, edges, graph), 1
+
+
+_register_model(
+    "meshgraphnet",
+    _build_meshgraphnet,
+    {
+        "small": dict(num_nodes=1000, num_edges=6000, processor_size=4, hidden_dim=32),
+        "medium": dict(
+            num_nodes=10000, num_edges=60000, processor_size=8, hidden_dim=64
+        ),
+    },
+    requires=("dgl",),
+)
+
+
+def _build_graphcast(params, device):
+    from physicsnemo.models.graphcast.graph_cast_net import GraphCastNet
+
+    model = GraphCastNet(
+        mesh_level=params["mesh_level"],
+        input_res=params["input_res"],
+        input_dim_grid_nodes=params["channels"],
+        input_dim_mesh_nodes=3,
+        input_dim_edges=4,
+        output_dim_grid_nodes=params["channels"],
+        processor_layers=params["processor_layers"],
+        hidden_dim=params["hidden_dim"],
+    ).to(device)
+    x = torch.randn(1, params["channels"], *params["input_res"], device=device)
+    return model, (x,), 1
+
+
+_register_model(
+    "graphcast",
+    _build_graphcast,
+    {
+        "small": dict(
+            mesh_level=1,
+            input_res=(10, 20),
+            channels=2,
+            processor_layers=3,
+            hidden_dim=8,
+        ),
+        "medium": dict(
+            mesh_level=3,
+            input_res=(32, 64),
+            channels=8,
+            processor_layers=6,
+            hidden_dim=64,
+        ),
+    },
+    requires=("dgl",),
+)
+
+
+def _build_song_unet(params, device):
+    from physicsnemo.models.diffusion import SongUNet
+
+    res = params["resolution"]
+    model = SongUNet(
+        img_resolution=res,
+        in_channels=2,
+        out_channels=2,
+        model_channels=params["model_channels"],
+        channel_mult=params["channel_mult"],
+        num_blocks=params["num_blocks"],
+        attn_resolutions=[res // 2],
+    ).to(device)
+    batch_size = params["batch_size"]
+    x = torch.randn(batch_size, 2, res, res, device=device)
+    noise_labels = torch.randn(batch_size, device=device)
+    class_labels = torch.zeros(batch_size, 1, device=device)
+    return model, (x, noise_labels, class_labels), batch_size
+
+
+_register_model(
+    "song_unet",
+    _build_song_unet,
+    {
+        "small": dict(
+            batch_size=2,
+            resolution=16,
+            model_channels=16,
+            channel_mult=[1, 2],
+            num_blocks=1,
+        ),
+        "medium": dict(
+            batch_size=4,
+            resolution=32,
+            model_channels=32,
+            channel_mult=[1, 2, 2],
+            num_blocks=2,
+        ),
+    },
+)
+
+
+def _build_transolver(params, device):
+    from physicsnemo.models.transolver import Transolver
+
+    res = params["resolution"]
+    model = Transolver(
+        space_dim=2,
+        n_layers=params["n_layers"],
+        n_hidden=params["n_hidden"],
+        dropout=0,
+        n_head=4,
+        Time_Input=False,
+        act="gelu",
+        mlp_ratio=1,
+        fun_dim=1,
+        out_dim=1,
+        slice_num=params["slice_num"],
+        ref=8,
+        unified_pos=True,
+        H=res,
+        W=res,
+    ).to(device)
+    batch_size = params["batch_size"]
+    # Positions are replaced by the unified position encoding
+    pos = torch.randn(batch_size, res, res, device=device)
+    fx = torch.randn(batch_size, res * res, 1, device=device)
+    return model, (pos, fx), batch_size
+
+
+_register_model(
+    "transolver",
+    _build_transolver,
+    {
+        "small": dict(
+            batch_size=2, resolution=32, n_layers=2, n_hidden=32, slice_num=16
+        ),
+        "medium": dict(
+            batch_size=4, resolution=64, n_layers=8, n_hidden=64, slice_num=32
+        ),
+    },
+)
+
+
+def _build_figconvunet(params, device):
+    from physicsnemo.models.figconvnet.figconvunet import FIGConvUNet
+
+    model = FIGConvUNet(
+        3,
+        1,
+        9,
+        [3] + [params["hidden_channels"]] * 3,
+        mlp_channels=[8, 8],
+    ).to(device)
+    vertices = torch.randn(1, params["num_vertices"], 3, device=device)
+    return model, (vertices,), 1
+
+
+# FIGConvUNet relies on Warp kernels that are only implemented for GPUs
+_register_model(
+    "figconvunet",
+    _build_figconvunet,
+    {
+        "small": dict(num_vertices=1000, hidden_channels=4),
+        "medium": dict(num_vertices=10000, hidden_channels=16),
+    },
+    requires=("warp", "jaxtyping", "webdataset"),
+    requires_cuda=True,
+)
@@ -14,9 +14,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import sys
 from dataclasses import dataclass
-from typing import Dict, Tuple, Union
+from typing import Dict, Iterator, Tuple, Union
 
 import numpy as np
 import torch
@@ -34,6 +35,7 @@ from .kernels.utils import (
     fourier_to_array_batched_2d,
     threshold_3d,
 )
+from .producer import BatchProducer
 
 Tensor = torch.Tensor
 # TODO unsure if better to remove this. Keeping this in for now
@@ -84,6 +86,14 @@ class Darcy2D(Datapipe):
         Dictionary with keys `permeability` and `darcy`. The values for these keys are two floats corresponding to mean and std `(mean, std)`.
     device : Union[str, torch.device], optional
         Device for datapipe to run place data on, by default "cuda"
+    convergence_checks_per_sync : int, optional
+        Number of convergence checks whose residuals are copied to the host at once.
+        Larger values synchronize less often, at the cost of running up to that many
+        checks past convergence, by default 1
+    async_generation : bool, optional
+        Generate the next batch in a background thread, on its own stream on GPU,
+        while the current one is consumed. Batches are double buffered, which takes
+        twice the memory of the outputs, by default False
 
     Raises
     ------
@@ -104,6 +114,8 @@ class Darcy2D(Datapipe):
         nr_multigrids: int = 4,
         normaliser: Union[Dict[str, Tuple[float, float]], None] = None,
         device: Union[str, torch.device] = "cuda",
+        convergence_checks_per_sync: int = 1,
+        async_generation: bool = False,
     ):
         super().__init__(meta=MetaData())
 
@@ -116,8 +128,13 @@ class Darcy2D(Datapipe):
         self.max_iterations = max_iterations
         self.convergence_threshold = convergence_threshold
         self.iterations_per_convergence_check = iterations_per_convergence_check
+        self.convergence_checks_per_sync = convergence_checks_per_sync
         self.nr_multigrids = nr_multigrids
         self.normaliser = normaliser
+        self.async_generation = async_generation
+
+        if convergence_checks_per_sync < 1:
+            raise ValueError("convergence_checks_per_sync must be at least 1")
 
         # check normaliser keys
         if self.normaliser is not None:
@@ -131,6 +148,12 @@ class Darcy2D(Datapipe):
             device = str(device)
         self.device = device
 
+        # in asynchronous mode, batches are generated on a separate stream
+        self.stream = None
+        if self.async_generation and wp.get_device(self.device).is_cuda:
+            self.stream = wp.Stream(self.device)
+            self.torch_stream = wp.stream_to_torch(self.stream)
+
         # spatial dims
         self.dx = 1.0 / (self.resolution + 1)  # pad edges by 1 for multi-grid
         self.dim = (self.batch_size, self.resolution + 1, self.resolution + 1)
@@ -150,23 +173,57 @@ class Darcy2D(Datapipe):
         self.darcy1 = wp.zeros(self.dim, dtype=float, device=self.device)
         self.permeability = wp.zeros(self.dim, dtype=float, device=self.device)
         self.rand_fourier = wp.zeros(self.fourier_dim, dtype=float, device=self.device)
-        self.inf_residual = wp.zeros([1], dtype=float, device=self.device)
+        self.inf_residual = wp.zeros(
+            [self.convergence_checks_per_sync], dtype=float, device=self.device
+        )
+        if self.stream is not None:
+            self.host_residual = wp.zeros(
+                [self.convergence_checks_per_sync],
+                dtype=float,
+                device="cpu",
+                pinned=True,
+            )
 
         # Output tenors
         self.output_k = None
         self.output_p = None
+        # Staging buffers of the asynchronous mode
+        self.staging = [None, None]
+
+    def _stream_scope(self):
+        """Runs the PyTorch operations in scope on the generation stream"""
+        if self.stream is None:
+            return contextlib.nullcontext()
+        return torch.cuda.stream(self.torch_stream)
+
+    def _zero(self, array: wp.array) -> None:
+        if self.stream is None:
+            array.zero_()
+        else:
+            # Warp memsets run on the current stream of the device
+            with self._stream_scope():
+                wp.to_torch(array).zero_()
+
+    def _read_residuals(self) -> np.ndarray:
+        """Copies the residuals to the host, only waiting for the generation stream"""
+        if self.stream is None:
+            return self.inf_residual.numpy()
+        wp.copy(self.host_residual, self.inf_residual, stream=self.stream)
+        self.stream.synchronize()
+        return self.host_residual.numpy()
 
     def initialize_batch(self) -> None:
         """Initializes arrays for new batch of simulations"""
 
         # initialize permeability
-        self.permeability.zero_()
+        self._zero(self.permeability)
         seed = np.random.randint(np.iinfo(np.uint64).max, dtype=np.uint64)
         wp.launch(
             kernel=init_uniform_random_4d,
             dim=self.fourier_dim,
             inputs=[self.rand_fourier, -1.0, 1.0, seed],
             device=self.device,
+            stream=self.stream,
         )
         wp.launch(
             kernel=fourier_to_array_batched_2d,
@@ -179,6 +236,7 @@ class Darcy2D(Datapipe):
                 self.resolution,
             ],
             device=self.device,
+            stream=self.stream,
         )
         wp.launch(
             kernel=threshold_3d,
@@ -190,11 +248,12 @@ class Darcy2D(Datapipe):
                 self.max_permeability,
             ],
             device=self.device,
+            stream=self.stream,
         )
 
         # zero darcy arrays
-        self.darcy0.zero_()
-        self.darcy1.zero_()
+        self._zero(self.darcy0)
+        self._zero(self.darcy1)
 
     def generate_batch(self) -> None:
         """Solve for new batch of simulations"""
@@ -213,50 +272,55 @@ class Darcy2D(Datapipe):
             else:
                 multigrid_dim = self.dim
 
-            # run till max steps is reached
-            for k in range(
-                self.max_iterations // self.iterations_per_convergence_check
-            ):
-                # run jacobi iterations
-                for s in range(self.iterations_per_convergence_check):
-                    # iterate solver
+            # run till max steps is reached, reading the residuals of several
+            # convergence checks at once
+            nr_checks = self.max_iterations // self.iterations_per_convergence_check
+            for k in range(0, nr_checks, self.convergence_checks_per_sync):
+                checks = min(self.convergence_checks_per_sync, nr_checks - k)
+                self._zero(self.inf_residual)
+                for c in range(checks):
+                    # run jacobi iterations
+                    for s in range(self.iterations_per_convergence_check):
+                        # iterate solver
+                        wp.launch(
+                            kernel=darcy_mgrid_jacobi_iterative_batched_2d,
+                            dim=multigrid_dim,
+                            inputs=[
+                                self.darcy0,
+                                self.darcy1,
+                                self.permeability,
+                                1.0,
+                                self.dim[1],
+                                self.dim[2],
+                                self.dx,
+                                grid_reduction_factor,
+                            ],
+                            device=self.device,
+                            stream=self.stream,
+                        )
+
+                        # swap buffers
+                        (self.darcy0, self.darcy1) = (self.darcy1, self.darcy0)
+
+                    # compute residual
                     wp.launch(
-                        kernel=darcy_mgrid_jacobi_iterative_batched_2d,
+                        kernel=mgrid_inf_residual_batched_2d,
                         dim=multigrid_dim,
                         inputs=[
                             self.darcy0,
                             self.darcy1,
-                            self.permeability,
-                            1.0,
-                            self.dim[1],
-                            self.dim[2],
-                            self.dx,
+                            self.inf_residual[c : c + 1],
                             grid_reduction_factor,
                         ],
                         device=self.device,
+                        stream=self.stream,
                     )
-
-                    # swap buffers
-                    (self.darcy0, self.darcy1) = (self.darcy1, self.darcy0)
-
-                # compute residual
-                self.inf_residual.zero_()
-                wp.launch(
-                    kernel=mgrid_inf_residual_batched_2d,
-                    dim=multigrid_dim,
-                    inputs=[
-                        self.darcy0,
-                        self.darcy1,
-                        self.inf_residual,
-                        grid_reduction_factor,
-                    ],
-                    device=self.device,
-                )
-                normalized_inf_residual = self.inf_residual.numpy()[0]
+                normalized_inf_residual = self._read_residuals()[:checks]
 
                 # check if converged
-                if normalized_inf_residual < (
-                    self.convergence_threshold * grid_reduction_factor
+                if np.any(
+                    normalized_inf_residual
+                    < (self.convergence_threshold * grid_reduction_factor)
                 ):
                     break
 
@@ -272,6 +336,7 @@ class Darcy2D(Datapipe):
                         grid_reduction_factor,
                     ],
                     device=self.device,
+                    stream=self.stream,
                 )
 
     def __iter__(self) -> Tuple[Tensor, Tensor]:
@@ -282,41 +347,81 @@ class Darcy2D(Datapipe):
             Infinite iterator that returns a batch of (permeability, darcy pressure)
             fields of size [batch, resolution, resolution]
         """
+        if self.async_generation:
+            yield from self._iter_async()
+            return
+
         # infinite generator
         while True:
             # run simulation
             self.generate_batch()
+            yield self._static_outputs(*self._outputs())
 
-            # convert warp arrays to pytorch
-            permeability = wp.to_torch(self.permeability)
-            darcy = wp.to_torch(self.darcy0)
-
-            # add channel dims
-            permeability = torch.unsqueeze(permeability, axis=1)
-            darcy = torch.unsqueeze(darcy, axis=1)
-
-            # crop edges by 1 from multi-grid TODO messy
-            permeability = permeability[:, :, : self.resolution, : self.resolution]
-            darcy = darcy[:, :, : self.resolution, : self.resolution]
-
-            # normalize values
-            if self.normaliser is not None:
-                permeability = (
-                    permeability - self.normaliser["permeability"][0]
-                ) / self.normaliser["permeability"][1]
-                darcy = (darcy - self.normaliser["darcy"][0]) / self.normaliser[
-                    "darcy"
-                ][1]
-
-            # CUDA graphs static copies
-            if self.output_k is None:
-                self.output_k = permeability
-                self.output_p = darcy
-            else:
-                self.output_k.data.copy_(permeability)
-                self.output_p.data.copy_(darcy)
+    def _outputs(self) -> Tuple[Tensor, Tensor]:
+        """Cropped and normalized permeability and pressure of the generated batch"""
+        # convert warp arrays to pytorch
+        permeability = wp.to_torch(self.permeability)
+        darcy = wp.to_torch(self.darcy0)
+
+        # add channel dims
+        permeability = torch.unsqueeze(permeability, axis=1)
+        darcy = torch.unsqueeze(darcy, axis=1)
 
-            yield {"permeability": self.output_k, "darcy": self.output_p}
+        # crop edges by 1 from multi-grid TODO messy
+        permeability = permeability[:, :, : self.resolution, : self.resolution]
+        darcy = darcy[:, :, : self.resolution, : self.resolution]
+
+        # normalize values
+        if self.normaliser is not None:
+            permeability = (
+                permeability - self.normaliser["permeability"][0]
+            ) / self.normaliser["permeability"][1]
+            darcy = (darcy - self.normaliser["darcy"][0]) / self.normaliser["darcy"][1]
+        return permeability, darcy
+
+    def _static_outputs(self, permeability: Tensor, darcy: Tensor) -> Dict[str, Tensor]:
+        # CUDA graphs static copies
+        if self.output_k is None:
+            self.output_k = permeability
+            self.output_p = darcy
+        else:
+            self.output_k.data.copy_(permeability)
+            self.output_p.data.copy_(darcy)
+
+        return {"permeability": self.output_k, "darcy": self.output_p}
+
+    def _generate_into(self, slot: int) -> None:
+        """Generates a batch into a staging buffer, run in the producer thread"""
+        self.generate_batch()
+        with self._stream_scope():
+            outputs = self._outputs()
+            if self.staging[slot] is None:
+                self.staging[slot] = tuple(x.clone() for x in outputs)
+            else:
+                for buffer, x in zip(self.staging[slot], outputs):
+                    buffer.copy_(x)
+
+    def _iter_async(self) -> Iterator[Dict[str, Tensor]]:
+        producer = BatchProducer(
+            self._generate_into,
+            num_slots=2,
+            stream=None if self.stream is None else self.torch_stream,
+        )
+        try:
+            while True:
+                slot = producer.get()
+                # the staging buffer is reused, the outputs are never aliases of it
+                if self.output_k is None:
+                    self.output_k, self.output_p = (
+                        x.clone() for x in self.staging[slot]
+                    )
+                    outputs = {"permeability": self.output_k, "darcy": self.output_p}
+                else:
+                    outputs = self._static_outputs(*self.staging[slot])
+                producer.release(slot)
+                yield outputs
+        finally:
+            producer.close()
 
     def __len__(self):
         return sys.maxsize
@@ -16,7 +16,7 @@
 
 import sys
 from dataclasses import dataclass
-from typing import Dict, Tuple, Union
+from typing import Dict, Iterator, List, Tuple, Union
 
 import numpy as np
 import torch
@@ -33,6 +33,7 @@ from .kernels.finite_volume import (
     initialize_kelvin_helmoltz_batched_2d,
 )
 from .kernels.initialization import init_uniform_random_2d
+from .producer import BatchProducer
 
 Tensor = torch.Tensor
 # TODO unsure if better to remove this
@@ -83,6 +84,10 @@ class KelvinHelmholtz2D(Datapipe):
         Dictionary with keys `density`, `velocity`, and `pressure`. The values for these keys are two floats corresponding to mean and std `(mean, std)`.
     device : Union[str, torch.device], optional
         Device for datapipe to run place data on, by default "cuda"
+    async_generation : bool, optional
+        Run the next simulation in a background thread, on its own stream on GPU,
+        while the samples of the current one are consumed. The snapshots are double
+        buffered, which takes twice their memory, by default False
     """
 
     def __init__(
@@ -97,6 +102,7 @@ class KelvinHelmholtz2D(Datapipe):
         gamma: float = 5.0 / 3.0,
         normaliser: Union[Dict[str, Tuple[float, float]], None] = None,
         device: Union[str, torch.device] = "cuda",
+        async_generation: bool = False,
     ):
         super().__init__(meta=MetaData())
 
@@ -111,6 +117,7 @@ class KelvinHelmholtz2D(Datapipe):
         self.gamma = gamma
         self.courant_fac = 0.4  # hard set
         self.normaliser = normaliser
+        self.async_generation = async_generation
 
         # check normaliser keys
         if self.normaliser is not None:
@@ -126,6 +133,12 @@ class KelvinHelmholtz2D(Datapipe):
             device = str(device)
         self.device = device
 
+        # in asynchronous mode, simulations are run on a separate stream
+        self.stream = None
+        if self.async_generation and wp.get_device(self.device).is_cuda:
+            self.stream = wp.Stream(self.device)
+            self.torch_stream = wp.stream_to_torch(self.stream)
+
         # spatial dims
         self.dx = 1.0 / resolution
         self.dt = (
@@ -173,23 +186,30 @@ class KelvinHelmholtz2D(Datapipe):
         self.p_yl = wp.zeros(self.dim, dtype=float, device=self.device)
         self.p_yr = wp.zeros(self.dim, dtype=float, device=self.device)
 
-        # allocate arrays for storing results
-        self.seq_rho = [
+        # allocate arrays for storing results, one set per simulation in flight
+        self.seq_buffers = [
+            self._allocate_snapshots() for _ in range(2 if async_generation else 1)
+        ]
+        self.seq_rho, self.seq_vel, self.seq_p = self.seq_buffers[0]
+
+        self.output_rho = None
+        self.output_vel = None
+        self.output_p = None
+
+    def _allocate_snapshots(self) -> Tuple[List[wp.array], ...]:
+        seq_rho = [
             wp.zeros(self.dim, dtype=float, device=self.device)
             for _ in range(self.nr_snapshots)
         ]
-        self.seq_vel = [
+        seq_vel = [
             wp.zeros(self.dim, dtype=wp.vec2, device=self.device)
             for _ in range(self.nr_snapshots)
         ]
-        self.seq_p = [
+        seq_p = [
             wp.zeros(self.dim, dtype=float, device=self.device)
             for _ in range(self.nr_snapshots)
         ]
-
-        self.output_rho = None
-        self.output_vel = None
-        self.output_p = None
+        return seq_rho, seq_vel, seq_p
 
     def initialize_batch(self) -> None:
         """Initializes arrays for new batch of simulations"""
@@ -201,6 +221,7 @@ class KelvinHelmholtz2D(Datapipe):
             dim=[self.batch_size, self.nr_perturbation_freq],
             inputs=[self.w, -self.perturbation_range, self.perturbation_range, seed],
             device=self.device,
+            stream=self.stream,
         )
 
         # initialize fields
@@ -218,6 +239,7 @@ class KelvinHelmholtz2D(Datapipe):
                 self.nr_perturbation_freq,
             ],
             device=self.device,
+            stream=self.stream,
         )
         wp.launch(
             euler_primitive_to_conserved_batched_2d,
@@ -235,6 +257,7 @@ class KelvinHelmholtz2D(Datapipe):
                 self.dim[2],
             ],
             device=self.device,
+            stream=self.stream,
         )
 
     def generate_batch(self) -> None:
@@ -246,9 +269,9 @@ class KelvinHelmholtz2D(Datapipe):
         # run solver
         for s in range(self.nr_snapshots):
             # save arrays for
-            wp.copy(self.seq_rho[s], self.rho)
-            wp.copy(self.seq_vel[s], self.vel)
-            wp.copy(self.seq_p[s], self.p)
+            wp.copy(self.seq_rho[s], self.rho, stream=self.stream)
+            wp.copy(self.seq_vel[s], self.vel, stream=self.stream)
+            wp.copy(self.seq_p[s], self.p, stream=self.stream)
 
             # iterations
             for i in range(self.iteration_per_snapshot):
@@ -269,6 +292,7 @@ class KelvinHelmholtz2D(Datapipe):
                         self.dim[2],
                     ],
                     device=self.device,
+                    stream=self.stream,
                 )
 
                 # compute extrapolations to faces
@@ -298,6 +322,7 @@ class KelvinHelmholtz2D(Datapipe):
                         self.dim[2],
                     ],
                     device=self.device,
+                    stream=self.stream,
                 )
 
                 # compute fluxes
@@ -328,6 +353,7 @@ class KelvinHelmholtz2D(Datapipe):
                         self.dim[2],
                     ],
                     device=self.device,
+                    stream=self.stream,
                 )
 
                 # apply fluxes
@@ -350,6 +376,7 @@ class KelvinHelmholtz2D(Datapipe):
                         self.dim[2],
                     ],
                     device=self.device,
+                    stream=self.stream,
                 )
 
     def __iter__(self) -> Tuple[Tensor, Tensor, Tensor]:
@@ -360,77 +387,109 @@ class KelvinHelmholtz2D(Datapipe):
             Infinite iterator that returns a batch of timeseries with (density, velocity, pressure)
             fields of size [batch, seq_length, dim, resolution, resolution]
         """
+        if self.async_generation:
+            yield from self._iter_async()
+            return
+
         # infinite generator
         while True:
             # run simulation
             self.generate_batch()
 
             # return all samples generated before rerunning simulation
-            batch_ind = [
-                np.arange(self.nr_snapshots - self.seq_length)
-                for _ in range(self.batch_size)
-            ]
-            for b_ind in batch_ind:
-                np.random.shuffle(b_ind)
-            for bb in range(self.nr_snapshots - self.seq_length):
-                # run over batch to gather samples
-                batched_seq_rho = []
-                batched_seq_vel = []
-                batched_seq_p = []
-                for b in range(self.batch_size):
-                    # gather seq from each batch
-                    seq_rho = []
-                    seq_vel = []
-                    seq_p = []
-                    for s in range(self.seq_length):
-                        # get variables
-                        rho = wp.to_torch(self.seq_rho[batch_ind[b][bb] + s])[b]
-                        vel = wp.to_torch(self.seq_vel[batch_ind[b][bb] + s])[b]
-                        p = wp.to_torch(self.seq_p[batch_ind[b][bb] + s])[b]
-
-                        # add channels
-                        rho = torch.unsqueeze(rho, 0)
-                        vel = torch.permute(vel, (2, 0, 1))
-                        p = torch.unsqueeze(p, 0)
-
-                        # normalize values
-                        if self.normaliser is not None:
-                            rho = (
-                                rho - self.normaliser["density"][0]
-                            ) / self.normaliser["density"][1]
-                            vel = (
-                                vel - self.normaliser["velocity"][0]
-                            ) / self.normaliser["velocity"][1]
-                            p = (p - self.normaliser["pressure"][0]) / self.normaliser[
-                                "pressure"
-                            ][1]
-
-                        # store for producing seq
-                        seq_rho.append(rho)
-                        seq_vel.append(vel)
-                        seq_p.append(p)
-
-                    # concat seq
-                    batched_seq_rho.append(torch.stack(seq_rho, axis=0))
-                    batched_seq_vel.append(torch.stack(seq_vel, axis=0))
-                    batched_seq_p.append(torch.stack(seq_p, axis=0))
-
-                # CUDA graphs static copies
-                if self.output_rho is None:
-                    # concat batches
-                    self.output_rho = torch.stack(batched_seq_rho, axis=0)
-                    self.output_vel = torch.stack(batched_seq_vel, axis=0)
-                    self.output_p = torch.stack(batched_seq_p, axis=0)
-                else:
-                    self.output_rho.data.copy_(torch.stack(batched_seq_rho, axis=0))
-                    self.output_vel.data.copy_(torch.stack(batched_seq_vel, axis=0))
-                    self.output_p.data.copy_(torch.stack(batched_seq_p, axis=0))
-
-                yield {
-                    "density": self.output_rho,
-                    "velocity": self.output_vel,
-                    "pressure": self.output_p,
-                }
+            yield from self._samples(self.seq_rho, self.seq_vel, self.seq_p)
+
+    def _samples(
+        self,
+        rho_snapshots: List[wp.array],
+        vel_snapshots: List[wp.array],
+        p_snapshots: List[wp.array],
+    ) -> Iterator[Dict[str, Tensor]]:
+        """Batches of random sequences of the snapshots of a simulation"""
+        batch_ind = [
+            np.arange(self.nr_snapshots - self.seq_length)
+            for _ in range(self.batch_size)
+        ]
+        for b_ind in batch_ind:
+            np.random.shuffle(b_ind)
+        for bb in range(self.nr_snapshots - self.seq_length):
+            # run over batch to gather samples
+            batched_seq_rho = []
+            batched_seq_vel = []
+            batched_seq_p = []
+            for b in range(self.batch_size):
+                # gather seq from each batch
+                seq_rho = []
+                seq_vel = []
+                seq_p = []
+                for s in range(self.seq_length):
+                    # get variables
+                    rho = wp.to_torch(rho_snapshots[batch_ind[b][bb] + s])[b]
+                    vel = wp.to_torch(vel_snapshots[batch_ind[b][bb] + s])[b]
+                    p = wp.to_torch(p_snapshots[batch_ind[b][bb] + s])[b]
+
+                    # add channels
+                    rho = torch.unsqueeze(rho, 0)
+                    vel = torch.permute(vel, (2, 0, 1))
+                    p = torch.unsqueeze(p, 0)
+
+                    # normalize values
+                    if self.normaliser is not None:
+                        rho = (rho - self.normaliser["density"][0]) / self.normaliser[
+                            "density"
+                        ][1]
+                        vel = (vel - self.normaliser["velocity"][0]) / self.normaliser[
+                            "velocity"
+                        ][1]
+                        p = (p - self.normaliser["pressure"][0]) / self.normaliser[
+                            "pressure"
+                        ][1]
+
+                    # store for producing seq
+                    seq_rho.append(rho)
+                    seq_vel.append(vel)
+                    seq_p.append(p)
+
+                # concat seq
+                batched_seq_rho.append(torch.stack(seq_rho, axis=0))
+                batched_seq_vel.append(torch.stack(seq_vel, axis=0))
+                batched_seq_p.append(torch.stack(seq_p, axis=0))
+
+            # CUDA graphs static copies
+            if self.output_rho is None:
+                # concat batches
+                self.output_rho = torch.stack(batched_seq_rho, axis=0)
+                self.output_vel = torch.stack(batched_seq_vel, axis=0)
+                self.output_p = torch.stack(batched_seq_p, axis=0)
+            else:
+                self.output_rho.data.copy_(torch.stack(batched_seq_rho, axis=0))
+                self.output_vel.data.copy_(torch.stack(batched_seq_vel, axis=0))
+                self.output_p.data.copy_(torch.stack(batched_seq_p, axis=0))
+
+            yield {
+                "density": self.output_rho,
+                "velocity": self.output_vel,
+                "pressure": self.output_p,
+            }
+
+    def _generate_into(self, slot: int) -> None:
+        """Runs a simulation into a set of snapshots, run in the producer thread"""
+        self.seq_rho, self.seq_vel, self.seq_p = self.seq_buffers[slot]
+        self.generate_batch()
+
+    def _iter_async(self) -> Iterator[Dict[str, Tensor]]:
+        producer = BatchProducer(
+            self._generate_into,
+            num_slots=2,
+            stream=None if self.stream is None else self.torch_stream,
+        )
+        try:
+            while True:
+                slot = producer.get()
+                yield from self._samples(*self.seq_buffers[slot])
+                producer.release(slot)
+        finally:
+            producer.close()
 
     def __len__(self):
         return sys.maxsize
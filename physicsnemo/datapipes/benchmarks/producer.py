@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import threading
+from typing import Callable, Optional
+
+import torch
+
+
+class BatchProducer:
+    """Generates batches in a background thread while earlier ones are consumed
+
+    Batches are written into a fixed number of staging slots. The producer thread
+    calls `generate` with the index of a free slot, hands the filled slot to the
+    consumer, which returns it with `release` once the batch has been used. With two
+    slots, one batch is generated while the other one is consumed.
+
+    Parameters
+    ----------
+    generate : Callable[[int], None]
+        Function writing a batch into the staging slot of the given index, called in
+        the producer thread
+    num_slots : int, optional
+        Number of staging slots, by default 2
+    stream : Optional[torch.cuda.Stream], optional
+        CUDA stream the batches are generated on. Before a slot is overwritten, the
+        stream waits for the work the consumer queued on it, and a batch is complete
+        before it is handed to the consumer, by default None
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[int], None],
+        num_slots: int = 2,
+        stream: Optional[torch.cuda.Stream] = None,
+    ):
+        if num_slots < 1:
+            raise ValueError("num_slots must be at least 1")
+        self.generate = generate
+        self.stream = stream
+        self._events = [None] * num_slots
+        self._stop = threading.Event()
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        for slot in range(num_slots):
+            self._free.put(slot)
+        self._thread = threading.Thread(
+            target=self._run, name="datapipe-producer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            slot = self._free.get()
+            if slot is None or self._stop.is_set():
+                return
+            try:
+                if self.stream is not None and self._events[slot] is not None:
+                    self.stream.wait_event(self._events[slot])
+                self.generate(slot)
+                if self.stream is not None:
+                    self.stream.synchronize()
+            except Exception as e:
+                self._ready.put((slot, e))
+                return
+            self._ready.put((slot, None))
+
+    def get(self) -> int:
+        """Waits for the next generated batch
+
+        Returns
+        -------
+        int
+            Index of the slot holding the batch
+        """
+        slot, error = self._ready.get()
+        if error is not None:
+            raise RuntimeError("Batch generation failed") from error
+        return slot
+
+    def release(self, slot: int) -> None:
+        """Returns a consumed slot to the producer"""
+        if self.stream is not None:
+            self._events[slot] = torch.cuda.current_stream(
+                self.stream.device
+            ).record_event()
+        self._free.put(slot)
+
+    def close(self) -> None:
+        """Stops the producer thread once the batch in progress is generated"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._free.put(None)
+            self._thread.join()
@@ -15,7 +15,7 @@
 # limitations under the License.
 
 """
-This code provides the datapipe for reading the processed npy files,
+This code provides the datapipe for reading the processed npz or zarr files,
 generating multi-res grids, calculating signed distance fields, 
 positional encodings, sampling random points in the volume and on surface, 
 normalizing fields and returning the output tensors as a dictionary.
@@ -26,43 +26,56 @@ pressure, wall-shear-stress for surface variables. The different parameters such
 variable names, domain resolution, sampling size etc. are configurable in config.yaml. 
 """
 
+import json
+import multiprocessing
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import nullcontext
 from dataclasses import dataclass
+from itertools import islice, repeat
 from pathlib import Path
 from typing import Literal, Optional, Protocol, Sequence, Union
 
-import cuml
-import cupy as cp
 import numpy as np
 import torch
 import torch.cuda.nvtx as nvtx
 import zarr
 from omegaconf import DictConfig
-from scipy.spatial import KDTree
-from torch import Tensor
 from torch.utils.data import Dataset, default_collate
 
 from physicsnemo.distributed import DistributedManager
+from physicsnemo.utils.domino.cache import CachedSample, GeometryCache
+from physicsnemo.utils.domino.statistics import (
+    FieldStatistics,
+    all_reduce_statistics,
+    reduce_statistics,
+)
 from physicsnemo.utils.domino.utils import (
     ArrayType,
+    area_weighted_sample_indices,
     area_weighted_shuffle_array,
+    build_alias_table,
     calculate_center_of_mass,
     calculate_normal_positional_encoding,
     create_grid,
     get_filenames,
-    mean_std_sampling,
+    is_cupy_array,
+    nearest_neighbor_indices,
     normalize,
     pad,
     # sample_array,
     shuffle_array,
     standardize,
 )
+from physicsnemo.utils.lazy_import import LazyModule, is_available
 from physicsnemo.utils.profiling import profile
 from physicsnemo.utils.sdf import signed_distance_field
 
+cp = LazyModule("cupy")
+
 
 def domino_collate_fn(batch):
     """
@@ -74,7 +87,7 @@ def domino_collate_fn(batch):
     """
 
     def convert(obj):
-        if isinstance(obj, cp.ndarray):
+        if is_cupy_array(obj):
             return torch.utils.dlpack.from_dlpack(obj.toDlpack())
         elif isinstance(obj, list):
             return [convert(x) for x in obj]
@@ -153,11 +166,24 @@ class DoMINODataConfig:
             Not available if caching.
             Many preprocessing pieces are disabled if computing scaling factors.
         caching: Whether this is for caching or serving.
+            With area weighted surface sampling, the alias table of the surface areas
+            is cached too (surface_alias_prob and surface_alias_index), so that
+            CachedDoMINODataset samples in O(surface_points_sample).
         deterministic: Whether to use a deterministic seed for sampling and random numbers.
         gpu_preprocessing: Whether to do preprocessing on the GPU (False for CPU).
+            GPU preprocessing uses cupy and cuML, CPU preprocessing numpy, scipy and
+            the Warp CPU device. Falls back to the CPU if cupy, cuML or a GPU are not
+            available.
         gpu_output: Whether to return output on the GPU as cupy arrays.
-            If False, returns numpy arrays.
+            If False, returns numpy arrays. Falls back to False without a GPU.
             You might choose gpu_preprocessing=True and gpu_output=False if caching.
+        geometry_cache_dir: Directory, preferably on a local disk, of a cache of the
+            preprocessing done once per geometry: the signed distance fields on the
+            grids and the neighbors of all surface cells, which later epochs gather
+            for the sampled points. The neighbors are not cached with
+            resample_surfaces. None disables the cache.
+        geometry_cache_max_bytes: Size budget of the geometry cache, least recently
+            used geometries are evicted when it is exceeded. None is unbounded.
     """
 
     data_path: Path
@@ -191,6 +217,8 @@ class DoMINODataConfig:
     deterministic: bool = False
     gpu_preprocessing: bool = True
     gpu_output: bool = True
+    geometry_cache_dir: Optional[Union[str, Path]] = None
+    geometry_cache_max_bytes: Optional[int] = None
 
     def __post_init__(self):
         # Ensure data_path is a Path object:
@@ -221,6 +249,17 @@ class DoMINODataConfig:
             raise ValueError(
                 f"phase should be one of ['train', 'val', 'test'], got {self.phase}"
             )
+        # cupy and cuML only accelerate the preprocessing, which also runs on CPU:
+        if self.gpu_preprocessing:
+            missing = [m for m in ("cupy", "cuml") if not is_available(m)]
+            if missing or not torch.cuda.is_available():
+                reason = f"{missing} not installed" if missing else "no GPU available"
+                warnings.warn(f"Preprocessing DoMINO data on CPU, {reason}")
+                self.gpu_preprocessing = False
+        if self.gpu_output and not torch.cuda.is_available():
+            warnings.warn("Returning DoMINO data on CPU, no GPU available")
+            self.gpu_output = False
+
         if self.scaling_type is not None:
             if self.scaling_type not in [
                 "min_max_scaling",
@@ -255,7 +294,7 @@ class DoMINODataPipe(Dataset):
             DistributedManager.initialize()
 
         dist = DistributedManager()
-        if self.config.gpu_preprocessing or self.config.gpu_output:
+        if self.config.gpu_preprocessing:
             # Make sure we move data to the right device:
             target_device = dist.device.index
             self.device_context = cp.cuda.Device(target_device)
@@ -267,14 +306,24 @@ class DoMINODataPipe(Dataset):
 
         if self.config.deterministic:
             np.random.seed(42)
-            cp.random.seed(42)
+            if self.config.gpu_preprocessing:
+                cp.random.seed(42)
         else:
             np.random.seed(seed=int(time.time()))
-            cp.random.seed(seed=int(time.time()))
+            if self.config.gpu_preprocessing:
+                cp.random.seed(seed=int(time.time()))
 
         self.model_type = model_type
 
         self.filenames = get_filenames(self.config.data_path, exclude_dirs=True)
+        pickled = sorted(f for f in self.filenames if f.endswith(".npy"))
+        if pickled:
+            raise ValueError(
+                f"Found {len(pickled)} .npy samples in {self.config.data_path}, like "
+                f"{pickled[0]}. Samples pickled in .npy files are no longer read, "
+                "convert them to .npz with "
+                "physicsnemo.utils.domino.utils.convert_npy_to_npz"
+            )
         total_files = len(self.filenames)
 
         self.indices = np.array(range(total_files))
@@ -286,6 +335,8 @@ class DoMINODataPipe(Dataset):
         # Determine the array provider based on what device
         # will do preprocessing:
         self.array_provider = cp if self.config.gpu_preprocessing else np
+        # On CPU, the signed distance fields are computed on the Warp CPU device
+        self.sdf_device = None if self.config.gpu_preprocessing else "cpu"
         # Update the arrays for bounding boxes:
 
         if hasattr(self.config.bounding_box_dims, "max") and hasattr(
@@ -311,6 +362,13 @@ class DoMINODataPipe(Dataset):
                 ).astype("float32"),
             ]
 
+        self.geometry_cache = None
+        if self.config.geometry_cache_dir is not None:
+            self.geometry_cache = GeometryCache(
+                str(Path(self.config.geometry_cache_dir).expanduser()),
+                max_bytes=self.config.geometry_cache_max_bytes,
+            )
+
         # Used if threaded data is enabled:
         self.max_workers = 24
         # Create a single thread pool for the class
@@ -344,6 +402,25 @@ class DoMINODataPipe(Dataset):
         if hasattr(self, "executor"):
             self.executor.shutdown()
 
+    def geometry_cache_key(self, filepath):
+        """Key of the cached preprocessing of a file, None without geometry cache"""
+        if self.geometry_cache is None:
+            return None
+        return self.geometry_cache.key(
+            filepath,
+            self.config.grid_resolution,
+            self.config.bounding_box_dims,
+            self.config.bounding_box_dims_surf,
+            self.config.sample_in_bbox,
+            self.config.num_surface_neighbors,
+        )
+
+    def _cached(self, cache_key, name, compute, mmap=True):
+        """`compute()`, cached for the geometry of `cache_key` if not None"""
+        if cache_key is None:
+            return compute()
+        return self.geometry_cache.get_array(cache_key, name, compute, mmap=mmap)
+
     @profile
     def read_data_zarr(self, filepath):
 
@@ -430,28 +507,6 @@ class DoMINODataPipe(Dataset):
 
         return data
 
-    @profile
-    def read_data_npy(self, filepath):
-        with open(filepath, "rb") as f:
-            data = np.load(f, allow_pickle=True).item()
-
-        for key in self.keys_to_read_if_available:
-            if key not in data.keys():
-                data[key] = self.keys_to_read_if_available[key]
-
-        if "filename" in data.keys():
-            data.pop("filename", None)
-
-        if not (isinstance(data["stl_coordinates"], np.ndarray)):
-            data["stl_coordinates"] = np.asarray(data["stl_coordinates"])
-
-        # Maybe move to GPU:
-        with self.device_context:
-            for key in data.keys():
-                if data[key] is not None:
-                    data[key] = self.array_provider.asarray(data[key])
-        return data
-
     @profile
     def read_data_npz(
         self,
@@ -498,8 +553,17 @@ class DoMINODataPipe(Dataset):
     def __len__(self):
         return len(self.indices)
 
+    def read_data(self, filepath):
+        """Reads the arrays of a .zarr or .npz file"""
+        filepath = Path(filepath)
+        if filepath.suffix == ".zarr":
+            return self.read_data_zarr(filepath)
+        elif filepath.suffix == ".npz":
+            return self.read_data_npz(filepath)
+        raise ValueError(f"Unsupported file extension: {filepath.suffix}")
+
     @profile
-    def preprocess_combined(self, data_dict):
+    def preprocess_combined(self, data_dict, cache_key=None):
 
         # Pull these out and force to fp32:
         with self.device_context:
@@ -541,11 +605,19 @@ class DoMINODataPipe(Dataset):
             surf_grid = create_grid(s_max, s_min, [nx, ny, nz])
             surf_grid_reshaped = surf_grid.reshape(nx * ny * nz, 3)
 
-            sdf_surf_grid = signed_distance_field(
-                stl_vertices,
-                mesh_indices_flattened,
-                surf_grid_reshaped,
-                use_sign_winding_number=True,
+            sdf_surf_grid = xp.asarray(
+                self._cached(
+                    cache_key,
+                    "sdf_surf_grid",
+                    lambda: signed_distance_field(
+                        stl_vertices,
+                        mesh_indices_flattened,
+                        surf_grid_reshaped,
+                        use_sign_winding_number=True,
+                        device=self.sdf_device,
+                    ),
+                    mmap=False,
+                )
             ).reshape(nx, ny, nz)
 
         else:
@@ -593,7 +665,9 @@ class DoMINODataPipe(Dataset):
         )
 
     @profile
-    def preprocess_surface(self, data_dict, core_dict, center_of_mass, s_min, s_max):
+    def preprocess_surface(
+        self, data_dict, core_dict, center_of_mass, s_min, s_max, cache_key=None
+    ):
 
         nx, ny, nz = self.config.grid_resolution
 
@@ -660,17 +734,15 @@ class DoMINODataPipe(Dataset):
                     center_of_mass
                 )
 
-            # Fit the kNN (or KDTree, if CPU) on ALL points:
-            if self.array_provider == cp:
-                knn = cuml.neighbors.NearestNeighbors(
-                    n_neighbors=self.config.num_surface_neighbors,
-                    algorithm="rbc",
+            def all_neighbors():
+                return nearest_neighbor_indices(
+                    surface_coordinates,
+                    surface_coordinates,
+                    self.config.num_surface_neighbors,
                 )
-                knn.fit(surface_coordinates)
-            else:
-                # Under the hood this is instantiating a KDTree.
-                # aka here knn is a type, not a class, technically.
-                interp_func = KDTree(surface_coordinates)
+
+            # The resampled surface differs in every epoch
+            surface_neighbors_key = None if self.config.resample_surfaces else cache_key
 
             if self.config.sampling:
                 # Perform the down sampling:
@@ -702,14 +774,25 @@ class DoMINODataPipe(Dataset):
                 surface_fields = surface_fields[idx_surface]
                 pos_normals_com_surface = pos_normals_com_surface[idx_surface]
 
-                # Now, perform the kNN on the sampled points:
-                if self.array_provider == cp:
-                    ii = knn.kneighbors(
-                        surface_coordinates_sampled, return_distance=False
+                if surface_neighbors_key is not None and len(idx_surface) == len(
+                    surface_coordinates_sampled
+                ):
+                    # Gather the neighbors of the sampled points from those of all
+                    # points, computed once per geometry
+                    ii = self._cached(
+                        surface_neighbors_key, "surface_neighbors", all_neighbors
                     )
+                    if is_cupy_array(idx_surface) and not is_cupy_array(ii):
+                        ii = xp.asarray(ii[cp.asnumpy(idx_surface)])
+                    else:
+                        ii = ii[idx_surface]
                 else:
-                    _, ii = interp_func.query(
-                        surface_coordinates_sampled, k=self.config.num_surface_neighbors
+                    # Now, perform the kNN on the sampled points, searching ALL points
+                    # (with cuML on GPU, or a multithreaded KDTree on CPU):
+                    ii = nearest_neighbor_indices(
+                        surface_coordinates,
+                        surface_coordinates_sampled,
+                        self.config.num_surface_neighbors,
                     )
 
                 # Pull out the neighbor elements.  Note that ii is the index into the original
@@ -729,13 +812,27 @@ class DoMINODataPipe(Dataset):
 
             else:
                 # We are *not* sampling, kNN on ALL points:
-                ii = knn.kneighbors(surface_coordinates, return_distance=False)
+                ii = xp.asarray(
+                    self._cached(
+                        surface_neighbors_key, "surface_neighbors", all_neighbors
+                    )
+                )
 
                 # Construct the neighbors arrays:
                 surface_neighbors = surface_coordinates[ii][:, 1:]
                 surface_neighbors_normals = surface_normals[ii][:, 1:]
                 surface_neighbors_sizes = surface_sizes[ii][:, 1:]
 
+                if (
+                    self.config.caching
+                    and self.config.surface_sampling_algorithm == "area_weighted"
+                ):
+                    # The areas of a geometry never change, sampling them is done
+                    # from the cache with a table built once here
+                    prob, alias = build_alias_table(surface_sizes)
+                    return_dict["surface_alias_prob"] = prob
+                    return_dict["surface_alias_index"] = alias
+
             # Have to normalize neighbors after the kNN and sampling
             if self.config.normalize_coordinates:
                 core_dict["surf_grid"] = normalize(core_dict["surf_grid"], s_max, s_min)
@@ -792,6 +889,7 @@ class DoMINODataPipe(Dataset):
         mesh_indices_flattened,
         stl_vertices,
         center_of_mass,
+        cache_key=None,
     ):
 
         return_dict = {}
@@ -838,11 +936,19 @@ class DoMINODataPipe(Dataset):
             grid_reshaped = grid.reshape(nx * ny * nz, 3)
 
             # SDF calculation on the grid using WARP
-            sdf_grid = signed_distance_field(
-                stl_vertices,
-                mesh_indices_flattened,
-                grid_reshaped,
-                use_sign_winding_number=True,
+            sdf_grid = xp.asarray(
+                self._cached(
+                    cache_key,
+                    "sdf_grid",
+                    lambda: signed_distance_field(
+                        stl_vertices,
+                        mesh_indices_flattened,
+                        grid_reshaped,
+                        use_sign_winding_number=True,
+                        device=self.sdf_device,
+                    ),
+                    mmap=False,
+                )
             ).reshape(nx, ny, nz)
 
             if self.config.sampling:
@@ -867,6 +973,7 @@ class DoMINODataPipe(Dataset):
                 volume_coordinates,
                 include_hit_points=True,
                 use_sign_winding_number=True,
+                device=self.sdf_device,
             )
             # TODO - is this needed?
             sdf_nodes = xp.asarray(sdf_nodes)
@@ -929,7 +1036,7 @@ class DoMINODataPipe(Dataset):
         return return_dict
 
     @profile
-    def preprocess_data(self, data_dict):
+    def preprocess_data(self, data_dict, cache_key=None):
 
         (
             return_dict,
@@ -938,7 +1045,7 @@ class DoMINODataPipe(Dataset):
             mesh_indices_flattened,
             stl_vertices,
             center_of_mass,
-        ) = self.preprocess_combined(data_dict)
+        ) = self.preprocess_combined(data_dict, cache_key)
 
         if self.model_type == "volume" or self.model_type == "combined":
             volume_dict = self.preprocess_volume(
@@ -949,13 +1056,14 @@ class DoMINODataPipe(Dataset):
                 mesh_indices_flattened,
                 stl_vertices,
                 center_of_mass,
+                cache_key,
             )
 
             return_dict.update(volume_dict)
 
         if self.model_type == "surface" or self.model_type == "combined":
             surface_dict = self.preprocess_surface(
-                data_dict, return_dict, center_of_mass, s_min, s_max
+                data_dict, return_dict, center_of_mass, s_min, s_max, cache_key
             )
             return_dict.update(surface_dict)
 
@@ -980,17 +1088,9 @@ class DoMINODataPipe(Dataset):
 
         # Get all of the data:
         filepath = self.config.data_path / cfd_filename
+        data_dict = self.read_data(filepath)
 
-        if filepath.suffix == ".zarr":
-            data_dict = self.read_data_zarr(filepath)
-        elif filepath.suffix == ".npz":
-            data_dict = self.read_data_npz(filepath)
-        elif filepath.suffix == ".npy":
-            data_dict = self.read_data_npy(filepath)
-        else:
-            raise ValueError(f"Unsupported file extension: {filepath.suffix}")
-
-        return_dict = self.preprocess_data(data_dict)
+        return_dict = self.preprocess_data(data_dict, self.geometry_cache_key(filepath))
 
         # return only pytorch tensor objects.
         # If returning on CPU (but processed on GPU), convert below.
@@ -998,7 +1098,7 @@ class DoMINODataPipe(Dataset):
         for key, value in return_dict.items():
             if isinstance(value, np.ndarray):
                 return_dict[key] = torch.from_numpy(value)
-            elif isinstance(value, cp.ndarray):
+            elif is_cupy_array(value):
                 return_dict[key] = torch.utils.dlpack.from_dlpack(value.toDlpack())
 
         if self.config.gpu_output:
@@ -1016,241 +1116,229 @@ class DoMINODataPipe(Dataset):
         return return_dict
 
 
-@profile
-def compute_scaling_factors(cfg: DictConfig, input_path: str, use_cache: bool) -> None:
-
-    model_type = cfg.model.model_type
-    max_scaling_factor_files = 20
+def _save_progress(path: str, progress: dict) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
 
-    if model_type == "volume" or model_type == "combined":
-        vol_save_path = os.path.join(cfg.project_dir, "volume_scaling_factors.npy")
-        if not os.path.exists(vol_save_path):
-            print("Computing volume scaling factors")
-            volume_variable_names = list(cfg.variables.volume.solution.keys())
-
-            fm_dict = DoMINODataPipe(
-                input_path,
-                phase="train",
-                grid_resolution=cfg.model.interp_res,
-                volume_variables=volume_variable_names,
-                surface_variables=None,
-                normalize_coordinates=True,
-                sampling=False,
-                sample_in_bbox=True,
-                volume_points_sample=cfg.model.volume_points_sample,
-                geom_points_sample=cfg.model.geom_points_sample,
-                positional_encoding=cfg.model.positional_encoding,
-                model_type=cfg.model.model_type,
-                bounding_box_dims=cfg.data.bounding_box,
-                bounding_box_dims_surf=cfg.data.bounding_box_surface,
-                compute_scaling_factors=True,
-                gpu_preprocessing=True,
-                gpu_output=True,
-            )
 
-            # Calculate mean
-            if cfg.model.normalization == "mean_std_scaling":
-                for j in range(len(fm_dict)):
-                    print("On iteration {j}")
-                    d_dict = fm_dict[j]
-                    vol_fields = d_dict["volume_fields"]
-
-                    if vol_fields is not None:
-                        if j == 0:
-                            vol_fields_sum = np.mean(vol_fields, 0)
-                        else:
-                            vol_fields_sum += np.mean(vol_fields, 0)
-                    else:
-                        vol_fields_sum = 0.0
-
-                vol_fields_mean = vol_fields_sum / len(fm_dict)
-
-                for j in range(len(fm_dict)):
-                    print("On iteration {j} again")
-                    d_dict = fm_dict[j]
-                    vol_fields = d_dict["volume_fields"]
-
-                    if vol_fields is not None:
-                        if j == 0:
-                            vol_fields_sum_square = np.mean(
-                                (vol_fields - vol_fields_mean) ** 2.0, 0
-                            )
-                        else:
-                            vol_fields_sum_square += np.mean(
-                                (vol_fields - vol_fields_mean) ** 2.0, 0
-                            )
-                    else:
-                        vol_fields_sum_square = 0.0
+# DoMINODataPipe of the worker processes computing the scaling factors
+_scaling_datapipe = None
 
-                vol_fields_std = np.sqrt(vol_fields_sum_square / len(fm_dict))
 
-                vol_scaling_factors = [vol_fields_mean, vol_fields_std]
+def _init_scaling_worker(input_path, config: dict) -> None:
+    global _scaling_datapipe
+    # Workers read files independently, they must not join the process group of a
+    # distributed job as DistributedManager.initialize would
+    DistributedManager._shared_state["_is_initialized"] = True
+    torch.set_num_threads(1)
+    _scaling_datapipe = DoMINODataPipe(input_path, **config)
 
-            if cfg.model.normalization == "min_max_scaling":
-                for j in range(len(fm_dict)):
-                    print(f"Min max scaling on iteration {j}")
-                    d_dict = fm_dict[j]
-                    vol_fields = d_dict["volume_fields"]
 
-                    if vol_fields.device.type == "cuda":
-                        xp = cp
-                        vol_fields = vol_fields.cuda()
-                        vol_fields = cp.from_dlpack(vol_fields)
-                    else:
-                        xp = np
-                        vol_fields = vol_fields.cpu().numpy()
-
-                    if vol_fields is not None:
-                        vol_mean = xp.mean(vol_fields, 0)
-                        vol_std = xp.std(vol_fields, 0)
-                        vol_idx = mean_std_sampling(
-                            vol_fields, vol_mean, vol_std, tolerance=12.0
-                        )
-                        vol_fields_sampled = xp.delete(vol_fields, vol_idx, axis=0)
-                        if j == 0:
-                            vol_fields_max = xp.amax(vol_fields_sampled, 0)
-                            vol_fields_min = xp.amin(vol_fields_sampled, 0)
-                        else:
-                            vol_fields_max1 = xp.amax(vol_fields_sampled, 0)
-                            vol_fields_min1 = xp.amin(vol_fields_sampled, 0)
-
-                            for k in range(vol_fields.shape[-1]):
-                                if vol_fields_max1[k] > vol_fields_max[k]:
-                                    vol_fields_max[k] = vol_fields_max1[k]
-
-                                if vol_fields_min1[k] < vol_fields_min[k]:
-                                    vol_fields_min[k] = vol_fields_min1[k]
-                    else:
-                        vol_fields_max = 0.0
-                        vol_fields_min = 0.0
-
-                    if j > max_scaling_factor_files:
-                        break
-                vol_scaling_factors = [vol_fields_max, vol_fields_min]
+def _file_statistics(
+    filename: str, keys: Sequence[str], datapipe: Optional[DoMINODataPipe] = None
+) -> dict:
+    """Statistics of the volume and surface fields of one file"""
+    if datapipe is None:
+        datapipe = _scaling_datapipe
+    data = datapipe.read_data(datapipe.config.data_path / filename)
+    fields = datapipe.preprocess_data(data)
+    return {
+        key: (
+            FieldStatistics.from_fields(fields[f"{key}_fields"])
+            if fields.get(f"{key}_fields") is not None
+            else FieldStatistics()
+        )
+        for key in keys
+    }
 
-            for i, item in enumerate(vol_scaling_factors):
-                if isinstance(item, cp.ndarray):
-                    vol_scaling_factors[i] = item.get()
 
-            np.save(vol_save_path, vol_scaling_factors)
+@profile
+def compute_scaling_factors(
+    cfg: DictConfig,
+    input_path: str,
+    use_cache: bool,
+    num_workers: int = 0,
+    checkpoint_every: int = 64,
+    distributed: bool = False,
+) -> None:
+    """Computes the scaling factors of the volume and surface fields of a dataset
+
+    Saves `volume_scaling_factors.npy` and `surface_scaling_factors.npy` in
+    `cfg.project_dir`, unless they exist: the mean and standard deviation of the
+    fields with "mean_std_scaling" normalization, their maximum and minimum,
+    ignoring outliers beyond 12 standard deviations of the mean of each file, with
+    "min_max_scaling". Files are weighted equally.
+
+    Every file is read once, by a pool of worker processes, and gives mergeable
+    statistics (`FieldStatistics`) that are combined with a tree reduction. Progress
+    is saved every `checkpoint_every` files to `cfg.project_dir`, an interrupted run
+    continues where it stopped.
+
+    Parameters
+    ----------
+    cfg : DictConfig
+        DoMINO configuration
+    input_path : str
+        Directory of the processed files
+    use_cache : bool
+        Not used, kept for compatibility
+    num_workers : int, optional
+        Number of worker processes, 0 reads the files in this process, by default 0
+    checkpoint_every : int, optional
+        Number of files read between two saves of the progress, by default 64
+    distributed : bool, optional
+        Split the files between the ranks of `DistributedManager` and merge their
+        statistics with an all gather, by default False. Must then be called by all
+        ranks
+    """
+    model_type = cfg.model.model_type
+    normalization = cfg.model.normalization
+    if normalization not in ("mean_std_scaling", "min_max_scaling"):
+        raise ValueError(f"Unknown normalization {normalization}")
 
+    save_paths = {}
+    if model_type == "volume" or model_type == "combined":
+        save_paths["volume"] = os.path.join(
+            cfg.project_dir, "volume_scaling_factors.npy"
+        )
     if model_type == "surface" or model_type == "combined":
-        surf_save_path = os.path.join(cfg.project_dir, "surface_scaling_factors.npy")
-
-        if not os.path.exists(surf_save_path):
-            print("Computing surface scaling factors")
-            volume_variable_names = list(cfg.variables.volume.solution.keys())
-            surface_variable_names = list(cfg.variables.surface.solution.keys())
-
-            fm_dict = DoMINODataPipe(
-                input_path,
-                phase="train",
-                grid_resolution=cfg.model.interp_res,
-                volume_variables=None,
-                surface_variables=surface_variable_names,
-                normalize_coordinates=True,
-                sampling=False,
-                sample_in_bbox=True,
-                volume_points_sample=cfg.model.volume_points_sample,
-                geom_points_sample=cfg.model.geom_points_sample,
-                positional_encoding=cfg.model.positional_encoding,
-                model_type=cfg.model.model_type,
-                bounding_box_dims=cfg.data.bounding_box,
-                bounding_box_dims_surf=cfg.data.bounding_box_surface,
-                compute_scaling_factors=True,
-            )
-
-            # Calculate mean
-            if cfg.model.normalization == "mean_std_scaling":
-                for j in range(len(fm_dict)):
-                    print(f"Mean std scaling on iteration {j}")
-                    d_dict = fm_dict[j]
-                    surf_fields = d_dict["surface_fields"].cpu().numpy()
-
-                    if surf_fields is not None:
-                        if j == 0:
-                            surf_fields_sum = np.mean(surf_fields, 0)
-                        else:
-                            surf_fields_sum += np.mean(surf_fields, 0)
-                    else:
-                        surf_fields_sum = 0.0
-
-                surf_fields_mean = surf_fields_sum / len(fm_dict)
-
-                for j in range(len(fm_dict)):
-                    print(f"Mean std scaling on iteration {j} again")
-                    d_dict = fm_dict[j]
-                    surf_fields = d_dict["surface_fields"]
-
-                    if surf_fields is not None:
-                        if j == 0:
-                            surf_fields_sum_square = np.mean(
-                                (surf_fields - surf_fields_mean) ** 2.0, 0
-                            )
-                        else:
-                            surf_fields_sum_square += np.mean(
-                                (surf_fields - surf_fields_mean) ** 2.0, 0
-                            )
-                    else:
-                        surf_fields_sum_square = 0.0
-
-                surf_fields_std = np.sqrt(surf_fields_sum_square / len(fm_dict))
-
-                surf_scaling_factors = [surf_fields_mean, surf_fields_std]
-
-            if cfg.model.normalization == "min_max_scaling":
-                for j in range(len(fm_dict)):
-                    print(f"Min max scaling on iteration {j}")
-                    d_dict = fm_dict[j]
-                    surf_fields = d_dict["surface_fields"]
-                    if surf_fields.device.type == "cuda":
-                        xp = cp
-                        surf_fields = surf_fields.cuda()
-                        surf_fields = cp.from_dlpack(surf_fields)
-                    else:
-                        xp = np
-                        surf_fields = surf_fields.cpu().numpy()
-
-                    if surf_fields is not None:
-                        surf_mean = xp.mean(surf_fields, 0)
-                        surf_std = xp.std(surf_fields, 0)
-                        surf_idx = mean_std_sampling(
-                            surf_fields, surf_mean, surf_std, tolerance=12.0
-                        )
-                        surf_fields_sampled = xp.delete(surf_fields, surf_idx, axis=0)
-                        if j == 0:
-                            surf_fields_max = xp.amax(surf_fields_sampled, 0)
-                            surf_fields_min = xp.amin(surf_fields_sampled, 0)
-                        else:
-                            surf_fields_max1 = xp.amax(surf_fields_sampled, 0)
-                            surf_fields_min1 = xp.amin(surf_fields_sampled, 0)
-
-                            for k in range(surf_fields.shape[-1]):
-                                if surf_fields_max1[k] > surf_fields_max[k]:
-                                    surf_fields_max[k] = surf_fields_max1[k]
-
-                                if surf_fields_min1[k] < surf_fields_min[k]:
-                                    surf_fields_min[k] = surf_fields_min1[k]
-                    else:
-                        surf_fields_max = 0.0
-                        surf_fields_min = 0.0
-
-                    if j > max_scaling_factor_files:
-                        break
+        save_paths["surface"] = os.path.join(
+            cfg.project_dir, "surface_scaling_factors.npy"
+        )
+    keys = [key for key, path in save_paths.items() if not os.path.exists(path)]
+    if not keys:
+        return
+    print(f"Computing {' and '.join(keys)} scaling factors")
 
-                surf_scaling_factors = [surf_fields_max, surf_fields_min]
+    config = dict(
+        model_type="combined" if len(keys) == 2 else keys[0],
+        phase="train",
+        grid_resolution=cfg.model.interp_res,
+        volume_variables=(
+            list(cfg.variables.volume.solution.keys()) if "volume" in keys else None
+        ),
+        surface_variables=(
+            list(cfg.variables.surface.solution.keys()) if "surface" in keys else None
+        ),
+        normalize_coordinates=True,
+        sampling=False,
+        sample_in_bbox=True,
+        bounding_box_dims=cfg.data.bounding_box,
+        bounding_box_dims_surf=cfg.data.bounding_box_surface,
+        compute_scaling_factors=True,
+        gpu_preprocessing=False,
+        gpu_output=False,
+    )
+    datapipe = DoMINODataPipe(input_path, **config)
 
-                for i, item in enumerate(surf_scaling_factors):
-                    if isinstance(item, cp.ndarray):
-                        surf_scaling_factors[i] = item.get()
+    rank, world_size = 0, 1
+    if distributed:
+        dist = DistributedManager()
+        rank, world_size = dist.rank, dist.world_size
+    filenames = sorted(datapipe.filenames)[rank::world_size]
 
-            np.save(surf_save_path, surf_scaling_factors)
+    progress_path = os.path.join(
+        cfg.project_dir, f"scaling_factors_progress_{rank}_of_{world_size}.json"
+    )
+    progress = None
+    if os.path.exists(progress_path):
+        with open(progress_path) as f:
+            progress = json.load(f)
+        if progress["keys"] != keys or progress["files"] != filenames:
+            progress = None
+    if progress is None:
+        empty = FieldStatistics().to_dict()
+        progress = {"keys": keys, "files": filenames, "done": []}
+        progress.update({key: empty for key in keys})
+    else:
+        print(f"Resuming from {len(progress['done'])} of {len(filenames)} files")
+    stats = {key: FieldStatistics.from_dict(progress[key]) for key in keys}
+
+    def merge(names, results):
+        for key in keys:
+            partial = reduce_statistics([r[key] for r in results])
+            stats[key] = stats[key].merge(partial)
+            progress[key] = stats[key].to_dict()
+        progress["done"].extend(names)
+        _save_progress(progress_path, progress)
+        print(f"Scaling factors of {len(progress['done'])} of {len(filenames)} files")
+
+    done = set(progress["done"])
+    pending = [name for name in filenames if name not in done]
+    if pending:
+        if num_workers > 0:
+            pool = ProcessPoolExecutor(
+                num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_scaling_worker,
+                initargs=(input_path, config),
+            )
+            results = pool.map(_file_statistics, pending, repeat(keys))
+        else:
+            pool = nullcontext()
+            results = map(_file_statistics, pending, repeat(keys), repeat(datapipe))
+        with pool:
+            for start in range(0, len(pending), checkpoint_every):
+                names = pending[start : start + checkpoint_every]
+                merge(names, list(islice(results, len(names))))
+
+    if distributed and world_size > 1:
+        stats = {key: all_reduce_statistics(stats[key]) for key in keys}
+
+    for key in keys:
+        if stats[key].num_files == 0:
+            raise ValueError(f"No {key} fields found in {input_path}")
+
+    if rank == 0:
+        for key in keys:
+            if normalization == "mean_std_scaling":
+                factors = [stats[key].mean, stats[key].std]
+            else:
+                factors = [stats[key].max, stats[key].min]
+            np.save(save_paths[key], np.asarray(factors, dtype=np.float32))
+    if distributed and world_size > 1:
+        torch.distributed.barrier()
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+
+
+# Arrays of the cached samples with a row per volume, surface or geometry point
+_VOLUME_POINT_KEYS = [
+    "volume_mesh_centers",
+    "volume_fields",
+    "pos_volume_closest",
+    "pos_volume_center_of_mass",
+    "sdf_nodes",
+]
+_SURFACE_POINT_KEYS = [
+    "surface_mesh_centers",
+    "surface_fields",
+    "surface_areas",
+    "surface_normals",
+    "pos_surface_center_of_mass",
+]
+_SURFACE_NEIGHBOR_KEYS = [
+    "surface_mesh_neighbors",
+    "surface_neighbors_normals",
+    "surface_neighbors_areas",
+]
 
 
 class CachedDoMINODataset(Dataset):
     """
     Dataset for reading cached DoMINO data files, with optional resampling.
     Acts as a drop-in replacement for DoMINODataPipe.
+
+    Samples are directories written by `write_cached_sample`, one .npy file per
+    array and a JSON manifest. Arrays are memory mapped and, when sampling, only the
+    rows of the sampled points are read, so a step reads a small fraction of each
+    file and workers share the page cache instead of holding whole samples.
+
+    Area weighted surface sampling uses the alias table stored in the cached files
+    by DoMINODataPipe. For files cached without it, the tables of the last
+    `alias_table_cache_size` geometries are built and kept in memory instead.
     """
 
     # @nvtx_annotate(message="CachedDoMINODataset __init__")
@@ -1265,6 +1353,7 @@ class CachedDoMINODataset(Dataset):
         model_type=None,  # Model_type, surface, volume or combined
         deterministic_seed=False,
         surface_sampling_algorithm="area_weighted",
+        alias_table_cache_size: int = 0,
     ):
         super().__init__()
 
@@ -1287,8 +1376,14 @@ class CachedDoMINODataset(Dataset):
         self.surface_points = surface_points_sample
         self.geom_points = geom_points_sample
         self.surface_sampling_algorithm = surface_sampling_algorithm
+        self.alias_table_cache_size = alias_table_cache_size
+        self._alias_tables = OrderedDict()
 
-        self.filenames = get_filenames(self.data_path, exclude_dirs=True)
+        self.filenames = [
+            name
+            for name in os.listdir(self.data_path)
+            if CachedSample.is_cached_sample(self.data_path / name)
+        ]
 
         total_files = len(self.filenames)
 
@@ -1298,101 +1393,129 @@ class CachedDoMINODataset(Dataset):
         np.random.shuffle(self.indices)
 
         if not self.filenames:
-            raise AssertionError(f"No cached files found in {self.data_path}")
+            raise AssertionError(
+                f"No cached samples found in {self.data_path}, samples cached as "
+                "pickled .npy files must be cached again with write_cached_sample"
+            )
 
     def __len__(self):
         return len(self.indices)
 
-    # @nvtx_annotate(message="CachedDoMINODataset __getitem__")
-    def __getitem__(self, idx):
-        if self.deterministic_seed:
-            np.random.seed(idx)
-        nvtx.range_push("Load cached file")
-
-        index = self.indices[idx]
-        cfd_filename = self.filenames[index]
-
-        filepath = self.data_path / cfd_filename
-        result = np.load(filepath, allow_pickle=True).item()
-        result = {
-            k: v.numpy() if isinstance(v, Tensor) else v for k, v in result.items()
-        }
-
-        nvtx.range_pop()
-        if not self.sampling:
-            return result
-
-        nvtx.range_push("Sample points")
+    def _surface_alias_table(self, index, sample):
+        """Alias table of the surface areas of file `index`, None if not cached"""
+        if "surface_alias_prob" in sample:
+            return sample.memmap("surface_alias_prob"), sample.memmap(
+                "surface_alias_index"
+            )
+        if self.alias_table_cache_size <= 0:
+            return None
+        table = self._alias_tables.pop(index, None)
+        if table is None:
+            table = build_alias_table(sample.read("surface_areas"))
+        self._alias_tables[index] = table
+        if len(self._alias_tables) > self.alias_table_cache_size:
+            self._alias_tables.popitem(last=False)
+        return table
+
+    def _sample_points(self, idx, index, sample):
+        """Reads the rows of the sampled points, returns them and the names of the
+        arrays consumed by the sampling"""
+        result = {}
+        consumed = set()
 
         # Sample volume points if present
-        if "volume_mesh_centers" in result and self.volume_points:
-            coords_sampled, idx_volume = shuffle_array(
-                result["volume_mesh_centers"], self.volume_points
+        if "volume_mesh_centers" in sample and self.volume_points:
+            num_points = sample.shape("volume_mesh_centers")[0]
+            idx_volume = np.random.choice(
+                num_points, size=min(num_points, self.volume_points), replace=False
             )
-            if coords_sampled.shape[0] < self.volume_points:
-                coords_sampled = pad(
-                    coords_sampled, self.volume_points, pad_value=-10.0
+            for key in _VOLUME_POINT_KEYS:
+                if key in sample:
+                    result[key] = sample.read_rows(key, idx_volume)
+            if len(idx_volume) < self.volume_points:
+                result["volume_mesh_centers"] = pad(
+                    result["volume_mesh_centers"], self.volume_points, pad_value=-10.0
                 )
-
-            result["volume_mesh_centers"] = coords_sampled
-            for key in [
-                "volume_fields",
-                "pos_volume_closest",
-                "pos_volume_center_of_mass",
-                "sdf_nodes",
-            ]:
-                if key in result:
-                    result[key] = result[key][idx_volume]
+            consumed.update(_VOLUME_POINT_KEYS)
 
         # Sample surface points if present
-        if "surface_mesh_centers" in result and self.surface_points:
+        if "surface_mesh_centers" in sample and self.surface_points:
+            num_points = sample.shape("surface_mesh_centers")[0]
             if self.surface_sampling_algorithm == "area_weighted":
-                coords_sampled, idx_surface = area_weighted_shuffle_array(
-                    result["surface_mesh_centers"],
+                alias_table = self._surface_alias_table(index, sample)
+                idx_surface = area_weighted_sample_indices(
+                    num_points,
                     self.surface_points,
-                    result["surface_areas"],
+                    sample.read("surface_areas") if alias_table is None else None,
+                    alias_table=alias_table,
+                    seed=idx if self.deterministic_seed else None,
                 )
             else:
-                coords_sampled, idx_surface = shuffle_array(
-                    result["surface_mesh_centers"], self.surface_points
+                idx_surface = np.random.choice(
+                    num_points, size=min(num_points, self.surface_points), replace=False
                 )
 
-            if coords_sampled.shape[0] < self.surface_points:
-                coords_sampled = pad(
-                    coords_sampled, self.surface_points, pad_value=-10.0
+            keys = _SURFACE_POINT_KEYS
+            if "neighbor_indices" in sample:
+                # Neighbors stored as indices into the surface points
+                ii = sample.read_rows("neighbor_indices", idx_surface)
+                sources = ["surface_mesh_centers", "surface_normals", "surface_areas"]
+                for key, source in zip(_SURFACE_NEIGHBOR_KEYS, sources):
+                    result[key] = sample.read_rows(source, ii)
+            else:
+                keys = keys + _SURFACE_NEIGHBOR_KEYS
+            for key in keys:
+                if key in sample:
+                    result[key] = sample.read_rows(key, idx_surface)
+
+            if len(idx_surface) < self.surface_points:
+                result["surface_mesh_centers"] = pad(
+                    result["surface_mesh_centers"], self.surface_points, pad_value=-10.0
                 )
-
-            ii = result["neighbor_indices"]
-            result["surface_mesh_neighbors"] = result["surface_mesh_centers"][ii]
-            result["surface_neighbors_normals"] = result["surface_normals"][ii]
-            result["surface_neighbors_areas"] = result["surface_areas"][ii]
-
-            result["surface_mesh_centers"] = coords_sampled
-
-            for key in [
-                "surface_fields",
-                "surface_areas",
-                "surface_normals",
-                "pos_surface_center_of_mass",
-                "surface_mesh_neighbors",
-                "surface_neighbors_normals",
-                "surface_neighbors_areas",
-            ]:
-                if key in result:
-                    result[key] = result[key][idx_surface]
-
-            del result["neighbor_indices"]
+            consumed.update(_SURFACE_POINT_KEYS + _SURFACE_NEIGHBOR_KEYS)
+            consumed.update(
+                ["neighbor_indices", "surface_alias_prob", "surface_alias_index"]
+            )
 
         # Sample geometry points if present
-        if "geometry_coordinates" in result and self.geom_points:
-            coords_sampled, _ = shuffle_array(
-                result["geometry_coordinates"], self.geom_points
+        if "geometry_coordinates" in sample and self.geom_points:
+            num_points = sample.shape("geometry_coordinates")[0]
+            idx_geometry = np.random.choice(
+                num_points, size=min(num_points, self.geom_points), replace=False
             )
+            coords_sampled = sample.read_rows("geometry_coordinates", idx_geometry)
             if coords_sampled.shape[0] < self.geom_points:
                 coords_sampled = pad(coords_sampled, self.geom_points, pad_value=-100.0)
             result["geometry_coordinates"] = coords_sampled
+            consumed.add("geometry_coordinates")
+
+        return result, consumed
+
+    # @nvtx_annotate(message="CachedDoMINODataset __getitem__")
+    def __getitem__(self, idx):
+        if self.deterministic_seed:
+            np.random.seed(idx)
+        nvtx.range_push("Load cached file")
+
+        index = self.indices[idx]
+        cfd_filename = self.filenames[index]
+
+        sample = CachedSample(self.data_path / cfd_filename)
+        result = dict(sample.attributes)
 
         nvtx.range_pop()
+        consumed = set()
+        if self.sampling:
+            nvtx.range_push("Sample points")
+            sampled, consumed = self._sample_points(idx, index, sample)
+            result.update(sampled)
+            nvtx.range_pop()
+
+        # Arrays that are not sampled, like the grids, are read whole
+        for key in sample.keys():
+            if key not in consumed:
+                result[key] = sample.read(key)
+
         return result
 
 
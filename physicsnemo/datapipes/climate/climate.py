@@ -17,36 +17,39 @@
 
 import json
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from itertools import chain
+from pathlib import Path
+from typing import Callable, Iterable, List, Mapping, Tuple, Union
 
-import h5py
-import netCDF4 as nc
 import numpy as np
 import pytz
 import torch
-
-try:
-    import nvidia.dali as dali
-    import nvidia.dali.plugin.pytorch as dali_pth
-except ImportError:
-    raise ImportError(
-        "DALI dataset requires NVIDIA DALI package to be installed. "
-        + "The package can be installed at:\n"
-        + "https://docs.nvidia.com/deeplearning/dali/user-guide/docs/installation.html"
-    )
-
-from dataclasses import dataclass
-from pathlib import Path
-from typing import Callable, Iterable, List, Mapping, Tuple, Union
-
 from scipy.io import netcdf_file
 
+from physicsnemo.datapipes.climate.utils.frame_cache import SharedFrameCache
 from physicsnemo.datapipes.climate.utils.invariant import latlon_grid
+from physicsnemo.datapipes.climate.utils.torch_engine import TorchSourceEngine
 from physicsnemo.datapipes.climate.utils.zenith_angle import cos_zenith_angle
 from physicsnemo.datapipes.datapipe import Datapipe
 from physicsnemo.datapipes.meta import DatapipeMetaData
 from physicsnemo.launch.logging import PythonLogger
+from physicsnemo.utils.lazy_import import LazyModule
+from physicsnemo.utils.zenith_angle import cos_zenith_angle_from_timestamp
+
+_DALI_HINT = (
+    "The DALI engine requires NVIDIA DALI package to be installed, "
+    + "use engine='torch' otherwise. The package can be installed at:\n"
+    + "https://docs.nvidia.com/deeplearning/dali/user-guide/docs/installation.html"
+)
+dali = LazyModule("nvidia.dali", hint=_DALI_HINT)
+dali_pth = LazyModule("nvidia.dali.plugin.pytorch", hint=_DALI_HINT)
+h5py = LazyModule("h5py")
+nc = LazyModule("netCDF4")
+zarr = LazyModule("zarr")
 
 Tensor = torch.Tensor
 
@@ -78,6 +81,16 @@ class ClimateDataSourceSpec:
     (num_timesteps, height, width) for each variable they provide. Only the
     variables listed in `variables` will be loaded.
 
+    Packed HDF5 files, written by `physicsnemo.datapipes.climate.utils.quantize`,
+    store `fields` as 16 bit integers with per-channel `scale` and `offset`
+    datasets. The source reads the packed integers and the datapipe decodes them on
+    the device of the pipeline.
+
+    Zarr stores hold all years in a single `fields` array with the same layout as
+    the HDF5 files. `data_dir` is the path or URL of the store, such as
+    "s3://bucket/era5.zarr", and the time steps form a single sequence starting at
+    the `start_year` of the datapipe.
+
     Parameters
     ----------
     data_dir : str
@@ -86,7 +99,8 @@ class ClimateDataSourceSpec:
         The name that is used to label datapipe outputs from this source.
         If None, the datapipe uses the number of the source in sequential order.
     file_type: str
-        Type of files to read, supported values are "hdf5" (default) and "netcdf4"
+        Type of files to read, supported values are "hdf5" (default),
+        "hdf5_packed", "netcdf4" and "zarr"
     stats_files: Union[Mapping[str, str], None], optional
         Numpy files to data statistics for normalization. Supports either a channels
         format, in which case the dict should contain the keys "mean" and "std", or a
@@ -94,6 +108,7 @@ class ClimateDataSourceSpec:
         If None, no normalization will be used, by default None
     metadata_path: Union[Mapping[str, str], None], optional for NetCDF, required for HDF5
         Path to the metadata JSON file for the dataset (usually called data.json).
+        Also required for Zarr stores.
     channels : Union[List[int], None], optional
         Defines which climate variables to load, if None will use all in HDF5 file, by default None
     variables: Union[List[str], None], optional for HDF5 files, mandatory for NetCDF4 files
@@ -113,6 +128,20 @@ class ClimateDataSourceSpec:
         Number of steps between input and output variables. For example, if the dataset
         contains data at every 6 hours, a stride 1 = 6 hour delta t and
         stride 2 = 12 hours delta t, by default 1
+    backend_kwargs : Union[dict, None], optional
+        Options of the file reader. NetCDF4 sources accept "reader", either
+        "netcdf4" (default) or "scipy". Zarr sources accept "storage_options" passed
+        to fsspec, "num_threads" fetching chunks concurrently (default 8) and
+        "read_ahead", the number of following samples of the epoch fetched in the
+        background (default 0), by default None
+    frame_cache_bytes : int, optional
+        Memory budget in bytes of a frame cache shared by all workers of the node,
+        see `SharedFrameCache`. Frames read by one worker are reused by the
+        overlapping time windows of other samples instead of being read again. 0
+        disables the cache, by default 0
+    frame_cache_block_size : int, optional
+        Number of consecutive time steps read together into the frame cache, by
+        default 16
     """
 
     def __init__(
@@ -129,8 +158,11 @@ class ClimateDataSourceSpec:
         num_steps: int = 1,
         stride: int = 1,
         backend_kwargs: Union[dict, None] = None,
+        frame_cache_bytes: int = 0,
+        frame_cache_block_size: int = 16,
     ):
-        self.data_dir = Path(data_dir)
+        # Zarr stores can also be object store URLs
+        self.data_dir = str(data_dir) if file_type == "zarr" else Path(data_dir)
         self.name = name
         self.file_type = file_type
         self.stats_files = (
@@ -146,13 +178,15 @@ class ClimateDataSourceSpec:
         self.num_steps = num_steps
         self.stride = stride
         self.backend_kwargs = {} if backend_kwargs is None else backend_kwargs
+        self.frame_cache_bytes = frame_cache_bytes
+        self.frame_cache_block_size = frame_cache_block_size
         self.logger = PythonLogger()
 
         if file_type == "netcdf4" and not variables:
             raise ValueError("Variables must be specified for a NetCDF4 source.")
 
         # check root directory exists
-        if not self.data_dir.is_dir():
+        if file_type != "zarr" and not self.data_dir.is_dir():
             raise IOError(f"Error, data directory {self.data_dir} does not exist")
         if self.stats_files is None:
             self.logger.warning(
@@ -193,8 +227,14 @@ class ClimateDataSourceSpec:
             In channels specified or number of samples per year is not valid
         """
         # get all input data files
-        suffix = {"hdf5": "h5", "netcdf4": "nc"}[self.file_type]
-        self.data_paths = sorted(self.data_dir.glob(f"*.{suffix}"))
+        if self.file_type == "zarr":
+            # A single store holds all time steps, read as a single year
+            self.data_paths = [self.data_dir]
+        else:
+            suffix = {"hdf5": "h5", "hdf5_packed": "h5", "netcdf4": "nc"}[
+                self.file_type
+            ]
+            self.data_paths = sorted(self.data_dir.glob(f"*.{suffix}"))
         for data_path in self.data_paths:
             self.logger.info(f"Climate data file found: {data_path}")
         self.n_years = len(self.data_paths)
@@ -203,20 +243,29 @@ class ClimateDataSourceSpec:
         # get total number of examples and image shape from the first file,
         # assuming other files have exactly the same format.
         self.logger.info(f"Getting file stats from {self.data_paths[0]}")
-        if self.file_type == "hdf5":
+        if self.file_type in ("hdf5", "hdf5_packed"):
             with h5py.File(self.data_paths[0], "r") as f:
                 dataset_shape = f["fields"].shape
+                self.dtype = f["fields"].dtype
+        elif self.file_type == "zarr":
+            fields = _open_zarr_fields(
+                self.data_dir, self.backend_kwargs.get("storage_options")
+            )
+            dataset_shape = fields.shape
+            self.dtype = fields.dtype
         else:
             with nc.Dataset(self.data_paths[0], "r") as f:
                 var_shape = f[self.variables[0]].shape
                 dataset_shape = (var_shape[0], len(self.variables)) + var_shape[1:]
+            # Scale and offset are applied when reading
+            self.dtype = np.dtype(np.float32)
 
         # truncate the dataset to avoid out-of-range sampling
         data_samples_per_year = dataset_shape[0] - (self.num_steps - 1) * self.stride
         self.data_shape = dataset_shape[2:]
 
         # interpret list of variables into list of channels or vice versa
-        if self.file_type == "hdf5":
+        if self.file_type in ("hdf5", "hdf5_packed", "zarr"):
             with open(self.metadata_path, "r") as f:
                 metadata = json.load(f)
             data_vars = metadata["coords"]["channel"]
@@ -400,6 +449,15 @@ class ClimateDatapipe(Datapipe):
         Rank ID of local process, by default 0
     world_size : int, optional
         Number of training processes, by default 1
+    engine : str, optional
+        Execution engine, "dali" for the DALI pipeline or "torch" to load and
+        preprocess the data in PyTorch worker processes, which needs neither DALI
+        nor a GPU, by default "dali"
+    prefetch_depth : int, optional
+        Number of batches loaded ahead by the torch engine, by default 2
+    pin_memory : bool, optional
+        Copy batches of the torch engine to pinned memory before moving them to the
+        GPU, by default True
     """
 
     def __init__(
@@ -422,8 +480,16 @@ class ClimateDatapipe(Datapipe):
         device: Union[str, torch.device] = "cuda",
         process_rank: int = 0,
         world_size: int = 1,
+        engine: str = "dali",
+        prefetch_depth: int = 2,
+        pin_memory: bool = True,
     ):
         super().__init__(meta=MetaData())
+        if engine not in ("dali", "torch"):
+            raise ValueError(f"Invalid engine {engine}, expected 'dali' or 'torch'")
+        self.engine = engine
+        self.prefetch_depth = prefetch_depth
+        self.pin_memory = pin_memory
         self.sources = list(sources)
         self.batch_size = batch_size
         self.num_workers = num_workers
@@ -479,42 +545,56 @@ class ClimateDatapipe(Datapipe):
             )
         self.crop_window = crop_window
         self.window_latlon = self._crop_to_window(self.data_latlon)
-        self.window_latlon_dali = dali.types.Constant(self.window_latlon)
 
         # load invariants
         self.invariants = {
             var: callback(self.window_latlon) for (var, callback) in invariants.items()
         }
 
+        # Frame caches are created here and shared with the workers
+        self.frame_caches = [
+            SharedFrameCache(
+                frame_shape=(len(spec.channels),) + tuple(spec.data_shape),
+                dtype=spec.dtype,
+                max_bytes=spec.frame_cache_bytes,
+                block_size=spec.frame_cache_block_size,
+            )
+            if spec.frame_cache_bytes > 0
+            else None
+            for spec in self.sources
+        ]
+
         # Create pipeline
-        self.pipe = self._create_pipeline()
+        if self.engine == "dali":
+            self.window_latlon_dali = dali.types.Constant(self.window_latlon)
+            self.pipe = self._create_pipeline()
+        else:
+            self.epoch_idx = 0
+            self.pipe = self._create_torch_engine()
 
     def _source_cls_from_type(self, source_type: str) -> type:
         """Get the external source class based on a string descriptor."""
         return {
             "hdf5": ClimateHDF5DaliExternalSource,
+            "hdf5_packed": ClimatePackedHDF5DaliExternalSource,
             "netcdf4": ClimateNetCDF4DaliExternalSource,
+            "zarr": ClimateZarrDaliExternalSource,
         }[source_type]
 
     def _crop_to_window(self, x):
         cw = self.crop_window
-        if isinstance(x, dali.pipeline.DataNode):
+        if isinstance(x, (np.ndarray, torch.Tensor)):
+            return x[..., cw[0][0] : cw[0][1], cw[1][0] : cw[1][1]]
+        else:
             # DALI doesn't support ellipsis notation
             return x[:, :, cw[0][0] : cw[0][1], cw[1][0] : cw[1][1]]
-        else:
-            return x[..., cw[0][0] : cw[0][1], cw[1][0] : cw[1][1]]
-
-    def _source_outputs(self, spec: ClimateDataSourceSpec) -> List:
-        """Create DALI outputs for a given data source specification.
 
-        Parameters
-        ----------
-        spec: ClimateDataSourceSpec
-            The data source specification.
-        """
-        # HDF5/NetCDF source
+    def _create_source(
+        self, spec: ClimateDataSourceSpec
+    ) -> "ClimateDaliExternalSource":
+        """Create the external source of a data source specification."""
         source_cls = self._source_cls_from_type(spec.file_type)
-        source = source_cls(
+        return source_cls(
             data_paths=spec.data_paths,
             num_samples=spec.total_length,
             channels=spec.channels,
@@ -530,8 +610,29 @@ class ClimateDatapipe(Datapipe):
             shuffle=self.shuffle,
             process_rank=self.process_rank,
             world_size=self.world_size,
+            backend_kwargs=spec.backend_kwargs,
+            frame_cache=self.frame_caches[self.sources.index(spec)],
         )
 
+    def frame_cache_stats(self) -> dict:
+        """Statistics of the frame caches of all workers, by data source name"""
+        return {
+            spec.name if spec.name is not None else i: cache.stats
+            for (i, (spec, cache)) in enumerate(zip(self.sources, self.frame_caches))
+            if cache is not None
+        }
+
+    def _source_outputs(self, spec: ClimateDataSourceSpec) -> List:
+        """Create DALI outputs for a given data source specification.
+
+        Parameters
+        ----------
+        spec: ClimateDataSourceSpec
+            The data source specification.
+        """
+        # HDF5/NetCDF source
+        source = self._create_source(spec)
+
         # Update length of dataset
         self.total_length = len(source) // self.batch_size
 
@@ -542,11 +643,19 @@ class ClimateDatapipe(Datapipe):
             parallel=True,
             batch=False,
         )
+        if spec.file_type == "hdf5_packed":
+            (*aux, scale, offset) = aux
 
         # Crop
         state_seq = self._crop_to_window(state_seq)
         aux = (self._crop_to_window(x) for x in aux)
 
+        # Decode packed data after the copy to the GPU, which moves half the bytes
+        if spec.file_type == "hdf5_packed":
+            if self.device.type == "cuda":
+                state_seq, scale, offset = state_seq.gpu(), scale.gpu(), offset.gpu()
+            state_seq = dali.fn.cast(state_seq, dtype=dali.types.FLOAT) * scale + offset
+
         # Normalize
         if spec.stats_files is not None:
             state_seq = dali.fn.normalize(state_seq, mean=spec.mu, stddev=spec.sd)
@@ -570,7 +679,7 @@ class ClimateDatapipe(Datapipe):
                 inv = self._crop_to_window(inv)
             yield dali.types.Constant(inv)
 
-    def _create_pipeline(self) -> dali.Pipeline:
+    def _create_pipeline(self) -> "dali.Pipeline":
         """Create DALI pipeline
 
         Returns
@@ -598,14 +707,98 @@ class ClimateDatapipe(Datapipe):
 
             if self.device.type == "cuda":
                 # Move tensors to GPU as external_source won't do that
-                outputs = [o.gpu() for o in outputs]
+                outputs = [o if o.device == "gpu" else o.gpu() for o in outputs]
 
             # Set outputs
             pipe.set_outputs(*outputs)
 
         return pipe
 
+    def _create_torch_engine(self) -> TorchSourceEngine:
+        """Create the PyTorch engine running the external sources of all data sources
+
+        Returns
+        -------
+        TorchSourceEngine
+            Engine loading and preprocessing the samples in worker processes
+        """
+        sources = [self._create_source(spec) for spec in self.sources]
+        transforms = []
+        # Packed data is decoded and normalized on the device, after batching
+        self.packed_decoders = []
+        position = 0
+        for spec in self.sources:
+            packed = spec.file_type == "hdf5_packed"
+            normalize = spec.stats_files is not None
+            transforms.append(
+                _ClimateSampleTransform(
+                    crop_window=self.crop_window,
+                    mu=spec.mu if normalize and not packed else None,
+                    sd=spec.sd if normalize and not packed else None,
+                    latlon=self.window_latlon if spec.use_cos_zenith else None,
+                    packed=packed,
+                )
+            )
+            num_outputs = 2 + len(spec.aux_variables) + int(spec.use_cos_zenith)
+            if packed:
+                mu, sd = (
+                    (
+                        torch.as_tensor(spec.mu, dtype=torch.float32).to(self.device),
+                        torch.as_tensor(spec.sd, dtype=torch.float32).to(self.device),
+                    )
+                    if normalize
+                    else (None, None)
+                )
+                self.packed_decoders.append((position, position + num_outputs, mu, sd))
+                num_outputs += 2
+            position += num_outputs
+        # Update length of dataset
+        self.total_length = len(sources[0]) // self.batch_size
+
+        # Invariants are identical for every sample, batch them once
+        self.invariant_tensors = [
+            torch.from_numpy(np.ascontiguousarray(self._crop_to_window(inv)))
+            .unsqueeze(0)
+            .expand(self.batch_size, *inv.shape)
+            .to(self.device)
+            for inv in self.invariants.values()
+        ]
+        return TorchSourceEngine(
+            sources,
+            transforms,
+            batch_size=self.batch_size,
+            num_batches=self.total_length,
+            num_workers=self.num_workers,
+            prefetch_depth=self.prefetch_depth,
+            device=self.device,
+            pin_memory=self.pin_memory,
+        )
+
+    def _decode_packed(self, batch: List[Tensor]) -> List[Tensor]:
+        """Decode and normalize the packed sequences of a torch engine batch"""
+        # Later positions first, removing the scale and offset of a source does not
+        # move the outputs of the sources before it
+        for (state_pos, scale_pos, mu, sd) in reversed(self.packed_decoders):
+            scale, offset = batch[scale_pos], batch[scale_pos + 1]
+            state_seq = batch[state_pos].float() * scale + offset
+            if mu is not None:
+                state_seq = (state_seq - mu) / sd
+            batch[state_pos] = state_seq
+            del batch[scale_pos : scale_pos + 2]
+        return batch
+
+    def _iter_torch(self):
+        epoch_idx = self.epoch_idx
+        self.epoch_idx += 1
+        for batch in self.pipe.epoch(epoch_idx):
+            batch = self._decode_packed(batch)
+            invariants = [inv.clone() for inv in self.invariant_tensors]
+            # Same structure as the DALI iterator, a list with one dict per pipeline
+            yield [dict(zip(self.pipe_outputs, batch + invariants))]
+
     def __iter__(self):
+        if self.engine == "torch":
+            return self._iter_torch()
         # Reset the pipeline before creating an iterator to enable epochs.
         self.pipe.reset()
         # Create DALI PyTorch iterator.
@@ -615,6 +808,64 @@ class ClimateDatapipe(Datapipe):
         return self.total_length
 
 
+class _ClimateSampleTransform:
+    """Crop, normalization and cosine zenith angle of a sample of a data source,
+    mirroring the DALI pipeline for the torch engine.
+
+    Parameters
+    ----------
+    crop_window : Tuple[Tuple[int, int], Tuple[int, int]]
+        Window the data is cropped to
+    mu : Union[np.ndarray, None]
+        Mean of the channels, of shape [1, C, 1, 1], None disables normalization
+    sd : Union[np.ndarray, None]
+        Standard deviation of the channels, of shape [1, C, 1, 1]
+    latlon : Union[np.ndarray, None]
+        Latitude and longitude of the cropped window, of shape [2, H, W], used to
+        compute the cosine zenith angle if not None
+    packed : bool, optional
+        The source returns packed data followed by its scale and offset, which are
+        passed on last for decoding, by default False
+    """
+
+    def __init__(
+        self,
+        crop_window: Tuple[Tuple[int, int], Tuple[int, int]],
+        mu: Union[np.ndarray, None] = None,
+        sd: Union[np.ndarray, None] = None,
+        latlon: Union[np.ndarray, None] = None,
+        packed: bool = False,
+    ):
+        self.crop_window = crop_window
+        self.mu = mu.astype(np.float32) if mu is not None else None
+        self.sd = sd.astype(np.float32) if sd is not None else None
+        self.latlon = latlon
+        self.packed = packed
+
+    def _crop(self, x: np.ndarray) -> np.ndarray:
+        cw = self.crop_window
+        return x[..., cw[0][0] : cw[0][1], cw[1][0] : cw[1][1]]
+
+    def __call__(self, outputs: Tuple[np.ndarray, ...]) -> List[np.ndarray]:
+        state_seq, timestamps, *aux = outputs
+        if self.packed:
+            *aux, scale, offset = aux
+        state_seq = self._crop(state_seq)
+        if self.mu is not None:
+            state_seq = (state_seq - self.mu) / self.sd
+        outputs = [state_seq, timestamps] + [self._crop(x) for x in aux]
+        if self.latlon is not None:
+            cos_zenith = cos_zenith_angle_from_timestamp(
+                timestamps[:, None, None, None],
+                lon=self.latlon[1],
+                lat=self.latlon[0],
+            )
+            outputs.append(cos_zenith.astype(np.float32))
+        if self.packed:
+            outputs += [scale, offset]
+        return outputs
+
+
 class ClimateDaliExternalSource(ABC):
     """DALI Source for lazy-loading the HDF5/NetCDF4 climate files
 
@@ -651,6 +902,9 @@ class ClimateDaliExternalSource(ABC):
         Rank ID of local process, by default 0
     world_size : int, optional
         Number of training processes, by default 1
+    frame_cache : Union[SharedFrameCache, None], optional
+        Cache of the frames of the channels read by this source, shared with the
+        other workers, by default None
 
     Note
     ----
@@ -676,6 +930,7 @@ class ClimateDaliExternalSource(ABC):
         process_rank: int = 0,
         world_size: int = 1,
         backend_kwargs: Union[dict, None] = None,
+        frame_cache: Union[SharedFrameCache, None] = None,
     ):
         self.data_paths = list(data_paths)
         # Will be populated later once each worker starts running in its own process.
@@ -693,6 +948,16 @@ class ClimateDaliExternalSource(ABC):
         self.batch_size = batch_size
         self.shuffle = shuffle
         self.backend_kwargs = {} if backend_kwargs is None else backend_kwargs
+        self.frame_cache = frame_cache
+        # Fail here rather than on the first cache miss inside a worker
+        if frame_cache is not None and (
+            type(self)._num_frames is ClimateDaliExternalSource._num_frames
+            or type(self)._read_frames is ClimateDaliExternalSource._read_frames
+        ):
+            raise NotImplementedError(
+                f"{type(self).__name__} does not support caching, it must implement "
+                "_num_frames and _read_frames to be used with a frame cache"
+            )
 
         self.last_epoch = None
 
@@ -709,7 +974,37 @@ class ClimateDaliExternalSource(ABC):
         """Write data from year index `year_idx` and sample index `idx` to output"""
         pass
 
-    def __call__(self, sample_info: dali.types.SampleInfo) -> Tuple[Tensor, np.ndarray]:
+    def _num_frames(self, year_idx: int) -> int:
+        """Number of time steps in the file of year index `year_idx`"""
+        raise NotImplementedError(f"{type(self).__name__} does not support caching")
+
+    def _read_frames(self, year_idx: int, start: int, stop: int) -> np.ndarray:
+        """Read the time steps `start` to `stop` of year index `year_idx`"""
+        raise NotImplementedError(f"{type(self).__name__} does not support caching")
+
+    def _load_cached_sequence(self, year_idx: int, idx: int) -> np.ndarray:
+        """Load a sequence through the frame cache
+
+        Frames not found in the cache are read in aligned blocks of consecutive time
+        steps, which are added to the cache for the samples sharing them.
+        """
+        cache = self.frame_cache
+        times = [int(idx) + i * self.stride for i in range(self.num_steps)]
+        output = np.empty((self.num_steps,) + cache.frame_shape, dtype=cache.dtype)
+        missing = cache.read(year_idx, times, output)
+        for (start, stop) in cache.blocks(
+            [times[i] for i in missing], self._num_frames(year_idx)
+        ):
+            frames = self._read_frames(year_idx, start, stop)
+            cache.write(year_idx, start, frames)
+            for i in missing:
+                if start <= times[i] < stop:
+                    output[i] = frames[times[i] - start]
+        return output
+
+    def __call__(
+        self, sample_info: "dali.types.SampleInfo"
+    ) -> Tuple[Tensor, np.ndarray]:
         if sample_info.iteration >= self.num_batches:
             raise StopIteration()
 
@@ -726,7 +1021,10 @@ class ClimateDaliExternalSource(ABC):
         year_idx = idx // self.num_samples_per_year
         in_idx = idx % self.num_samples_per_year
 
-        state_seq = self._load_sequence(year_idx, in_idx)
+        if self.frame_cache is not None:
+            state_seq = self._load_cached_sequence(year_idx, in_idx)
+        else:
+            state_seq = self._load_sequence(year_idx, in_idx)
 
         # Load sequence of timestamps
         year = self.start_year + year_idx
@@ -773,6 +1071,12 @@ class ClimateHDF5DaliExternalSource(ClimateDaliExternalSource):
         data = self._get_data_file(year_idx)["fields"]
         return data[idx : idx + self.num_steps * self.stride : self.stride, self.chans]
 
+    def _num_frames(self, year_idx: int) -> int:
+        return self._get_data_file(year_idx)["fields"].shape[0]
+
+    def _read_frames(self, year_idx: int, start: int, stop: int) -> np.ndarray:
+        return self._get_data_file(year_idx)["fields"][start:stop, self.chans]
+
 
 class ClimateNetCDF4DaliExternalSource(ClimateDaliExternalSource):
     """DALI source for reading NetCDF4 formatted climate data files."""
@@ -795,19 +1099,206 @@ class ClimateNetCDF4DaliExternalSource(ClimateDaliExternalSource):
 
         return self.data_files[year_idx]
 
-    def _load_sequence(self, year_idx: int, idx: int) -> np.array:
+    def _read_variables(self, year_idx: int, times: slice) -> np.ndarray:
+        """Read the time steps `times` of all variables of year index `year_idx`"""
         data_file = self._get_data_file(year_idx)
         shape = data_file.variables[self.variables[0]].shape
-        shape = (self.num_steps, len(self.variables)) + shape[1:]
+        shape = (len(range(*times.indices(shape[0]))), len(self.variables)) + shape[1:]
         # TODO: this can be optimized to do the NetCDF scale/offset on GPU
         output = np.empty(shape, dtype=np.float32)
         for (i, var) in enumerate(self.variables):
             v = data_file.variables[var]
-            output[:, i] = v[
-                idx : idx + self.num_steps * self.stride : self.stride
-            ].copy()  # .copy() avoids hanging references
+            output[:, i] = v[times].copy()  # .copy() avoids hanging references
             if hasattr(v, "scale_factor"):
                 output[:, i] *= v.scale_factor
             if hasattr(v, "add_offset"):
                 output[:, i] += v.add_offset
         return output
+
+    def _load_sequence(self, year_idx: int, idx: int) -> np.array:
+        return self._read_variables(
+            year_idx, slice(idx, idx + self.num_steps * self.stride, self.stride)
+        )
+
+    def _num_frames(self, year_idx: int) -> int:
+        data_file = self._get_data_file(year_idx)
+        return data_file.variables[self.variables[0]].shape[0]
+
+    def _read_frames(self, year_idx: int, start: int, stop: int) -> np.ndarray:
+        return self._read_variables(year_idx, slice(start, stop))
+
+
+def _open_zarr_fields(store: str, storage_options: Union[dict, None] = None):
+    """Open the `fields` array of a local or remote Zarr store."""
+    return zarr.open_group(store, mode="r", storage_options=storage_options)["fields"]
+
+
+def _read_zarr_into(array, selection: Tuple, out: np.ndarray) -> None:
+    """Decode an orthogonal selection of a Zarr array into `out`."""
+    if int(zarr.__version__.split(".")[0]) < 3:
+        array.get_orthogonal_selection(selection, out=out)
+    else:
+        # Zarr 3 only decodes into its own buffer types
+        out[...] = array.get_orthogonal_selection(selection)
+
+
+class ClimateZarrDaliExternalSource(ClimateDaliExternalSource):
+    """DALI source for reading climate data from a single chunked Zarr store.
+
+    Sample indices map straight to time steps of the store. The chunks of a sample
+    are fetched concurrently by a thread pool, one task per time chunk and channel
+    chunk, each decoding into its slice of the output. With a "read_ahead" in
+    `backend_kwargs`, the following samples of the epoch are fetched in the
+    background, which pays off when a worker receives consecutive samples, as with
+    the contiguous per-worker shares of a batch of the DALI engine.
+    """
+
+    def __getstate__(self):
+        # Thread pools and pending reads stay in the process that created them
+        state = self.__dict__.copy()
+        state.pop("_executor", None)
+        state.pop("_pending", None)
+        return state
+
+    def _get_data_file(self, year_idx: int):
+        """Return the `fields` array of the store."""
+        if self.data_files[year_idx] is None:
+            self.data_files[year_idx] = _open_zarr_fields(
+                self.data_paths[year_idx], self.backend_kwargs.get("storage_options")
+            )
+        return self.data_files[year_idx]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if getattr(self, "_executor", None) is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.backend_kwargs.get("num_threads", 8)
+            )
+            self._pending = OrderedDict()
+        return self._executor
+
+    def _channel_runs(
+        self, chunk_size: int
+    ) -> List[Tuple[int, int, Union[slice, List[int]]]]:
+        """Runs of output channels stored in the same channel chunk."""
+        runs = []
+        for (p, c) in enumerate(self.chans):
+            if runs and runs[-1][1] == p and runs[-1][2] == c // chunk_size:
+                runs[-1][1] = p + 1
+            else:
+                runs.append([p, p + 1, c // chunk_size])
+        selections = []
+        for (p0, p1, _) in runs:
+            chans = self.chans[p0:p1]
+            if chans == list(range(chans[0], chans[0] + len(chans))):
+                chans = slice(chans[0], chans[0] + len(chans))
+            selections.append((p0, p1, chans))
+        return selections
+
+    def _fetch(
+        self, year_idx: int, start: int, num_steps: int, step: int
+    ) -> Tuple[np.ndarray, List[Future]]:
+        """Start reading `num_steps` time steps `step` apart from `start`."""
+        data = self._get_data_file(year_idx)
+        executor = self._get_executor()
+        output = np.empty(
+            (num_steps, len(self.chans)) + tuple(data.shape[2:]), dtype=data.dtype
+        )
+        time_chunk, channel_chunk = data.chunks[:2]
+        channel_runs = self._channel_runs(channel_chunk)
+        times = start + step * np.arange(num_steps)
+        # Time steps are increasing, those of a chunk are consecutive outputs
+        bounds = np.flatnonzero(np.diff(times // time_chunk)) + 1
+        futures = []
+        for (k0, k1) in zip([0, *bounds.tolist()], [*bounds.tolist(), num_steps]):
+            time_sel = slice(int(times[k0]), int(times[k1 - 1]) + 1, step)
+            for (p0, p1, chan_sel) in channel_runs:
+                futures.append(
+                    executor.submit(
+                        _read_zarr_into,
+                        data,
+                        (time_sel, chan_sel),
+                        output[k0:k1, p0:p1],
+                    )
+                )
+        return output, futures
+
+    def _load_sequence(self, year_idx: int, idx: int) -> np.array:
+        self._get_executor()
+        key = (int(year_idx), int(idx))
+        if key in self._pending:
+            output, futures = self._pending.pop(key)
+        else:
+            output, futures = self._fetch(year_idx, idx, self.num_steps, self.stride)
+        for future in futures:
+            future.result()
+        return output
+
+    def _read_ahead(self, idx_in_epoch: int) -> None:
+        """Start fetching the samples following `idx_in_epoch`."""
+        read_ahead = self.backend_kwargs.get("read_ahead", 0)
+        if read_ahead <= 0 or self.frame_cache is not None:
+            return
+        self._get_executor()
+        end = min(idx_in_epoch + 1 + read_ahead, self.num_batches * self.batch_size)
+        for pos in range(idx_in_epoch + 1, end):
+            idx = self.indices[pos]
+            key = (
+                int(idx // self.num_samples_per_year),
+                int(idx % self.num_samples_per_year),
+            )
+            if key not in self._pending:
+                self._pending[key] = self._fetch(*key, self.num_steps, self.stride)
+        # Samples that went to other workers are dropped
+        while len(self._pending) > read_ahead:
+            _, (_, futures) = self._pending.popitem(last=False)
+            for future in futures:
+                future.cancel()
+
+    def __call__(
+        self, sample_info: "dali.types.SampleInfo"
+    ) -> Tuple[Tensor, np.ndarray]:
+        outputs = super().__call__(sample_info)
+        self._read_ahead(sample_info.idx_in_epoch)
+        return outputs
+
+    def _num_frames(self, year_idx: int) -> int:
+        return self._get_data_file(year_idx).shape[0]
+
+    def _read_frames(self, year_idx: int, start: int, stop: int) -> np.ndarray:
+        output, futures = self._fetch(year_idx, start, stop - start, 1)
+        for future in futures:
+            future.result()
+        return output
+
+
+class ClimatePackedHDF5DaliExternalSource(ClimateHDF5DaliExternalSource):
+    """DALI source for reading packed HDF5 climate data files.
+
+    Returns the packed integer sequences instead of floats, followed by the other
+    outputs and the `scale` and `offset` of the channels, of shape (1, C, 1, 1). The
+    data is decoded as ``packed * scale + offset`` by the consumer.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.packing = [None] * len(self.data_paths)
+
+    def _get_packing(self, year_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the scale and offset of the channels of year `year_idx`."""
+        if self.packing[year_idx] is None:
+            data_file = self._get_data_file(year_idx)
+            self.packing[year_idx] = tuple(
+                data_file[name][:][self.chans].astype(np.float32).reshape(1, -1, 1, 1)
+                for name in ("scale", "offset")
+            )
+        return self.packing[year_idx]
+
+    def __call__(
+        self, sample_info: "dali.types.SampleInfo"
+    ) -> Tuple[Tensor, np.ndarray]:
+        outputs = super().__call__(sample_info)
+        year_idx = self.indices[sample_info.idx_in_epoch] // self.num_samples_per_year
+        return (*outputs, *self._get_packing(year_idx))
+
+    def num_outputs(self):
+        return super().num_outputs() + 2
@@ -14,33 +14,42 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import h5py
-import numpy as np
-import torch
-
-try:
-    import nvidia.dali as dali
-    import nvidia.dali.plugin.pytorch as dali_pth
-except ImportError:
-    raise ImportError(
-        "DALI dataset requires NVIDIA DALI package to be installed. "
-        + "The package can be installed at:\n"
-        + "https://docs.nvidia.com/deeplearning/dali/user-guide/docs/installation.html"
-    )
-
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, Iterable, List, Tuple, Union
 
+import numpy as np
 import pytz
+import torch
+import torch.nn.functional as F
 
 from physicsnemo.datapipes.climate.utils.invariant import latlon_grid
+from physicsnemo.datapipes.climate.utils.torch_engine import TorchSourceEngine
 from physicsnemo.datapipes.climate.utils.zenith_angle import cos_zenith_angle
+from physicsnemo.utils.lazy_import import LazyModule
+from physicsnemo.utils.zenith_angle import cos_zenith_angle_from_timestamp
 
 from ..datapipe import Datapipe
 from ..meta import DatapipeMetaData
 
+_DALI_HINT = (
+    "The DALI engine requires NVIDIA DALI package to be installed, "
+    + "use engine='torch' otherwise. The package can be installed at:\n"
+    + "https://docs.nvidia.com/deeplearning/dali/user-guide/docs/installation.html"
+)
+dali = LazyModule("nvidia.dali", hint=_DALI_HINT)
+dali_pth = LazyModule("nvidia.dali.plugin.pytorch", hint=_DALI_HINT)
+h5py = LazyModule("h5py")
+
+# Interpolation modes of the torch engine equivalent to the DALI ones
+_TORCH_INTERPOLATION = {
+    "INTERP_NN": "nearest",
+    "INTERP_LINEAR": "bilinear",
+    "INTERP_TRIANGULAR": "bilinear",
+    "INTERP_CUBIC": "bicubic",
+}
+
 Tensor = torch.Tensor
 
 
@@ -115,6 +124,16 @@ class ERA5HDF5Datapipe(Datapipe):
         Rank ID of local process, by default 0
     world_size : int, optional
         Number of training processes, by default 1
+    engine : str, optional
+        Execution engine, "dali" for the DALI pipeline or "torch" to load and
+        preprocess the data in PyTorch worker processes, which needs neither DALI
+        nor a GPU. The torch engine supports the "INTERP_NN", "INTERP_LINEAR",
+        "INTERP_TRIANGULAR" and "INTERP_CUBIC" interpolation types, by default "dali"
+    prefetch_depth : int, optional
+        Number of batches loaded ahead by the torch engine, by default 2
+    pin_memory : bool, optional
+        Copy batches of the torch engine to pinned memory before moving them to the
+        GPU, by default True
     """
 
     def __init__(
@@ -138,8 +157,16 @@ class ERA5HDF5Datapipe(Datapipe):
         device: Union[str, torch.device] = "cuda",
         process_rank: int = 0,
         world_size: int = 1,
+        engine: str = "dali",
+        prefetch_depth: int = 2,
+        pin_memory: bool = True,
     ):
         super().__init__(meta=MetaData())
+        if engine not in ("dali", "torch"):
+            raise ValueError(f"Invalid engine {engine}, expected 'dali' or 'torch'")
+        self.engine = engine
+        self.prefetch_depth = prefetch_depth
+        self.pin_memory = pin_memory
         self.batch_size = batch_size
         self.num_workers = num_workers
         self.shuffle = shuffle
@@ -199,11 +226,14 @@ class ERA5HDF5Datapipe(Datapipe):
                 "INTERP_TRIANGULAR",
                 "INTERP_GAUSSIAN",
             ]
+            if engine == "torch":
+                valid_interpolation = list(_TORCH_INTERPOLATION)
             if self.interpolation_type not in valid_interpolation:
                 raise ValueError(
                     f"Interpolation type {self.interpolation_type} not supported"
                 )
-            self.interpolation_type = getattr(dali.types, self.interpolation_type)
+            if engine == "dali":
+                self.interpolation_type = getattr(dali.types, self.interpolation_type)
 
         # Layout
         # Avoiding API change for self.num_history == 0.
@@ -223,7 +253,8 @@ class ERA5HDF5Datapipe(Datapipe):
                 latlon_grid(bounds=self.latlon_bounds, shape=self.latlon_resolution),
                 axis=0,
             )
-            self.latlon_dali = dali.types.Constant(self.data_latlon)
+            if engine == "dali":
+                self.latlon_dali = dali.types.Constant(self.data_latlon)
             self.output_keys += ["cos_zenith"]
 
         if self.use_time_of_year_index:
@@ -232,7 +263,11 @@ class ERA5HDF5Datapipe(Datapipe):
         self.parse_dataset_files()
         self.load_statistics()
 
-        self.pipe = self._create_pipeline()
+        if engine == "dali":
+            self.pipe = self._create_pipeline()
+        else:
+            self.epoch_idx = 0
+            self.pipe = self._create_torch_engine()
 
     def parse_dataset_files(self) -> None:
         """Parses the data directory for valid HDF5 files and determines training samples
@@ -340,7 +375,26 @@ class ERA5HDF5Datapipe(Datapipe):
         if not self.mu.shape == self.sd.shape == (1, len(self.channels), 1, 1):
             raise AssertionError("Error, normalisation arrays have wrong shape")
 
-    def _create_pipeline(self) -> dali.Pipeline:
+    def _create_source(self) -> "ERA5DaliExternalSource":
+        """Create the external source reading the HDF5 files"""
+        return ERA5DaliExternalSource(
+            data_paths=self.data_paths,
+            num_samples=self.total_length,
+            channels=self.channels,
+            stride=self.stride,
+            num_steps=self.num_steps,
+            num_history=self.num_history,
+            num_samples_per_year=self.num_samples_per_year,
+            use_cos_zenith=self.use_cos_zenith,
+            cos_zenith_args=self.cos_zenith_args,
+            use_time_of_year_index=self.use_time_of_year_index,
+            batch_size=self.batch_size,
+            shuffle=self.shuffle,
+            process_rank=self.process_rank,
+            world_size=self.world_size,
+        )
+
+    def _create_pipeline(self) -> "dali.Pipeline":
         """Create DALI pipeline
 
         Returns
@@ -358,22 +412,7 @@ class ERA5HDF5Datapipe(Datapipe):
         )
 
         with pipe:
-            source = ERA5DaliExternalSource(
-                data_paths=self.data_paths,
-                num_samples=self.total_length,
-                channels=self.channels,
-                stride=self.stride,
-                num_steps=self.num_steps,
-                num_history=self.num_history,
-                num_samples_per_year=self.num_samples_per_year,
-                use_cos_zenith=self.use_cos_zenith,
-                cos_zenith_args=self.cos_zenith_args,
-                use_time_of_year_index=self.use_time_of_year_index,
-                batch_size=self.batch_size,
-                shuffle=self.shuffle,
-                process_rank=self.process_rank,
-                world_size=self.world_size,
-            )
+            source = self._create_source()
             # Update length of dataset
             self.length = len(source) // self.batch_size
             # Read current batch.
@@ -447,7 +486,58 @@ class ERA5HDF5Datapipe(Datapipe):
 
         return pipe
 
+    def _create_torch_engine(self) -> TorchSourceEngine:
+        """Create the PyTorch engine running the external source
+
+        Returns
+        -------
+        TorchSourceEngine
+            Engine loading and preprocessing the samples in worker processes
+        """
+        source = self._create_source()
+        # Update length of dataset
+        self.length = len(source) // self.batch_size
+        transform = _ERA5SampleTransform(
+            img_shape=self.img_shape,
+            num_history=self.num_history,
+            mu=self.mu if self.stats_dir is not None else None,
+            sd=self.sd if self.stats_dir is not None else None,
+            latlon=self.data_latlon if self.use_cos_zenith else None,
+            use_time_of_year_index=self.use_time_of_year_index,
+        )
+        return TorchSourceEngine(
+            [source],
+            [transform],
+            batch_size=self.batch_size,
+            num_batches=self.length,
+            num_workers=self.num_workers,
+            prefetch_depth=self.prefetch_depth,
+            device=self.device,
+            pin_memory=self.pin_memory,
+        )
+
+    def _resize(self, x: Tensor) -> Tensor:
+        shape = x.shape
+        x = F.interpolate(
+            x.reshape(-1, *shape[-3:]).float(),
+            size=tuple(self.latlon_resolution),
+            mode=_TORCH_INTERPOLATION[self.interpolation_type],
+        )
+        return x.reshape(*shape[:-2], *x.shape[-2:])
+
+    def _iter_torch(self):
+        epoch_idx = self.epoch_idx
+        self.epoch_idx += 1
+        for batch in self.pipe.epoch(epoch_idx):
+            if self.interpolation_type is not None:
+                batch[0] = self._resize(batch[0])
+                batch[1] = self._resize(batch[1])
+            # Same structure as the DALI iterator, a list with one dict per pipeline
+            yield [dict(zip(self.output_keys, batch))]
+
     def __iter__(self):
+        if self.engine == "torch":
+            return self._iter_torch()
         # Reset the pipeline before creating an iterator to enable epochs.
         self.pipe.reset()
         # Create DALI PyTorch iterator.
@@ -457,6 +547,112 @@ class ERA5HDF5Datapipe(Datapipe):
         return self.length
 
 
+class _ERA5SampleTransform:
+    """Crop, normalization and cosine zenith angle of an ERA5 sample, mirroring the
+    DALI pipeline for the torch engine.
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, int]
+        Shape the images are cropped to
+    num_history : int
+        Number of previous timesteps of the input, the input has no time dimension
+        if 0
+    mu : Union[np.ndarray, None]
+        Mean of the channels, of shape [1, C, 1, 1], None disables normalization
+    sd : Union[np.ndarray, None]
+        Standard deviation of the channels, of shape [1, C, 1, 1]
+    latlon : Union[np.ndarray, None]
+        Latitude and longitude grid of shape [2, H, W], used to compute the cosine
+        zenith angle if not None
+    use_time_of_year_index : bool
+        Whether the time of year index is returned
+    """
+
+    def __init__(
+        self,
+        img_shape: Tuple[int, int],
+        num_history: int,
+        mu: Union[np.ndarray, None],
+        sd: Union[np.ndarray, None],
+        latlon: Union[np.ndarray, None],
+        use_time_of_year_index: bool,
+    ):
+        self.img_shape = tuple(img_shape)
+        self.num_history = num_history
+        self.mu = mu.astype(np.float32) if mu is not None else None
+        self.sd = sd.astype(np.float32) if sd is not None else None
+        self.latlon = latlon
+        self.use_time_of_year_index = use_time_of_year_index
+
+    def __call__(self, outputs: Tuple[np.ndarray, ...]) -> List[np.ndarray]:
+        invar, outvar, timestamps, time_of_year_idx = outputs
+        h, w = self.img_shape
+        invar = invar[..., :h, :w]
+        outvar = outvar[..., :h, :w]
+        if self.mu is not None:
+            if self.num_history == 0:
+                invar = (invar - self.mu[0]) / self.sd[0]
+            else:
+                invar = (invar - self.mu) / self.sd
+            outvar = (outvar - self.mu) / self.sd
+        outputs = [invar, outvar]
+        if self.latlon is not None:
+            cos_zenith = cos_zenith_angle_from_timestamp(
+                timestamps[:, None, None, None],
+                lon=self.latlon[1],
+                lat=self.latlon[0],
+            )
+            outputs.append(cos_zenith.astype(np.float32))
+        if self.use_time_of_year_index:
+            outputs.append(time_of_year_idx)
+        return outputs
+
+
+@dataclass
+class ReadStats:
+    """Counters of the HDF5 reads of an `ERA5DaliExternalSource`
+
+    `bytes_decompressed` counts the size of all chunks intersected by the reads, which
+    HDF5 has to read and decompress unless they are still in its chunk cache.
+    """
+
+    samples: int = 0
+    reads: int = 0
+    bytes_read: int = 0
+    bytes_decompressed: int = 0
+
+    def __iadd__(self, other: "ReadStats") -> "ReadStats":
+        self.samples += other.samples
+        self.reads += other.reads
+        self.bytes_read += other.bytes_read
+        self.bytes_decompressed += other.bytes_decompressed
+        return self
+
+
+def _contiguous_runs(indices: List[int]) -> List[Tuple[int, int, int]]:
+    """Splits indices into runs of consecutive values
+
+    Returns
+    -------
+    List[Tuple[int, int, int]]
+        Start of every run in the indexed dimension, its start in `indices` and its
+        length
+    """
+    runs = []
+    for pos, idx in enumerate(indices):
+        if runs and idx == runs[-1][0] + runs[-1][2]:
+            runs[-1] = (runs[-1][0], runs[-1][1], runs[-1][2] + 1)
+        else:
+            runs.append((idx, pos, 1))
+    return runs
+
+
+def _num_chunks(indices: Iterable[int], chunk_size: int) -> int:
+    """Number of chunks of a dimension holding the given indices"""
+    return len({i // chunk_size for i in indices})
+
+
 class ERA5DaliExternalSource:
     """DALI Source for lazy-loading the HDF5 ERA5 files
 
@@ -495,12 +691,24 @@ class ERA5DaliExternalSource:
     world_size : int, optional
         Number of training processes, by default 1
 
+    Note
+    ----
+    All time steps of a sample are evenly spaced by `stride`, they are read together
+    with one strided hyperslab selection per run of consecutive channels, directly
+    into the buffer the input and output variables are views of. The chunk cache of
+    the files is sized so that chunks shared by these reads are only decompressed
+    once. The reads of every sample are counted in `last_read_stats` and accumulated
+    in `read_stats`, separately in every worker process.
+
     Note
     ----
     For more information about DALI external source operator:
     https://docs.nvidia.com/deeplearning/dali/archives/dali_1_13_0/user-guide/docs/examples/general/data_loading/parallel_external_source.html
     """
 
+    # Minimum size of the HDF5 chunk cache of every file, the default of HDF5 is 1 MB
+    _min_chunk_cache_bytes = 2**20
+
     def __init__(
         self,
         data_paths: Iterable[str],
@@ -534,6 +742,13 @@ class ERA5DaliExternalSource:
 
         self.last_epoch = None
 
+        # Channels are read in runs of consecutive indices, a single run avoids
+        # fancy indexing altogether
+        self.channel_runs = _contiguous_runs(self.chans)
+        self.chunk_cache_bytes = None
+        self.read_stats = ReadStats()
+        self.last_read_stats = ReadStats()
+
         self.indices = np.arange(num_samples)
         # Shard from indices if running in parallel
         self.indices = np.array_split(self.indices, world_size)[process_rank]
@@ -548,17 +763,11 @@ class ERA5DaliExternalSource:
             self.start_year: int = cos_zenith_args.get("start_year")
 
     def __call__(
-        self, sample_info: dali.types.SampleInfo
+        self, sample_info: "dali.types.SampleInfo"
     ) -> Tuple[Tensor, Tensor, np.ndarray]:
         if sample_info.iteration >= self.num_batches:
             raise StopIteration()
 
-        if self.data_files is None:
-            # This will be called once per worker. Workers are persistent,
-            # so there is no need to explicitly close the files - this will be done
-            # when corresponding pipeline/dataset is destroyed.
-            self.data_files = [h5py.File(path, "r") for path in self.data_paths]
-
         # Shuffle before the next epoch starts.
         if self.shuffle and sample_info.epoch_idx != self.last_epoch:
             # All workers use the same rng seed so the resulting
@@ -592,25 +801,97 @@ class ERA5DaliExternalSource:
         else:
             time_of_year_idx = -1
 
-        data = self.data_files[year_idx]["fields"]
+        # Has [T,C,H,W] shape, history and input steps followed by the output steps.
+        sequence = self._read_sequence(year_idx, in_idx)
         if self.num_history == 0:
             # Has [C,H,W] shape.
-            invar = data[in_idx, self.chans]
+            invar = sequence[0]
         else:
             # Has [T,C,H,W] shape.
-            invar = data[
-                in_idx : in_idx + (self.num_history + 1) * self.stride : self.stride,
-                self.chans,
-            ]
-
+            invar = sequence[: self.num_history + 1]
         # Has [T,C,H,W] shape.
-        outvar = np.empty((self.num_steps,) + invar.shape[-3:], dtype=invar.dtype)
-
-        for i in range(self.num_steps):
-            out_idx = in_idx + (self.num_history + i + 1) * self.stride
-            outvar[i] = data[out_idx, self.chans]
+        outvar = sequence[self.num_history + 1 :]
 
         return invar, outvar, timestamps, np.array([time_of_year_idx])
 
+    def _get_data(self, year_idx: int) -> "h5py.Dataset":
+        """Return the fields of year `year_idx`, opening its file if needed."""
+        if self.data_files is None:
+            self.data_files = [None] * len(self.data_paths)
+        if self.data_files[year_idx] is None:
+            # This will be called once per worker. Workers are persistent,
+            # so there is no need to explicitly close the files - this will be done
+            # when corresponding pipeline/dataset is destroyed.
+            if self.chunk_cache_bytes is None:
+                with h5py.File(self.data_paths[year_idx], "r") as f:
+                    data = f["fields"]
+                    # Samples intersect the most chunks when misaligned with them
+                    offsets = range(data.chunks[0] if data.chunks else 1)
+                    self.chunk_cache_bytes = max(
+                        self._min_chunk_cache_bytes,
+                        *(self._sample_chunk_bytes(data, i) for i in offsets),
+                    )
+            self.data_files[year_idx] = h5py.File(
+                self.data_paths[year_idx], "r", rdcc_nbytes=self.chunk_cache_bytes
+            )
+        return self.data_files[year_idx]["fields"]
+
+    def _time_indices(self, in_idx: int) -> List[int]:
+        num_times = self.num_history + self.num_steps + 1
+        return [in_idx + i * self.stride for i in range(num_times)]
+
+    def _sample_chunk_bytes(self, data: "h5py.Dataset", in_idx: int = 0) -> int:
+        """Size of the chunks intersected by the reads of a sample"""
+        if data.chunks is None:
+            # Contiguous layout, only the selected bytes are read
+            return (
+                len(self._time_indices(in_idx))
+                * len(self.chans)
+                * int(np.prod(data.shape[2:]))
+                * data.dtype.itemsize
+            )
+        num_chunks = _num_chunks(self._time_indices(in_idx), data.chunks[0])
+        num_chunks *= _num_chunks(self.chans, data.chunks[1])
+        for size, chunk in zip(data.shape[2:], data.chunks[2:]):
+            num_chunks *= -(-size // chunk)
+        return num_chunks * int(np.prod(data.chunks)) * data.dtype.itemsize
+
+    def _read_sequence(self, year_idx: int, in_idx: int) -> np.ndarray:
+        """Reads all time steps of a sample with the fewest hyperslab reads
+
+        Parameters
+        ----------
+        year_idx : int
+            Index of the year file
+        in_idx : int
+            Index of the first time step of the sample in the year
+
+        Returns
+        -------
+        np.ndarray
+            Selected channels of all time steps of the sample, of shape [T,C,H,W]
+        """
+        data = self._get_data(year_idx)
+        times = self._time_indices(in_idx)
+        time_sel = slice(times[0], times[-1] + 1, self.stride)
+        sequence = np.empty(
+            (len(times), len(self.chans)) + data.shape[2:], dtype=data.dtype
+        )
+        for start, pos, length in self.channel_runs:
+            data.read_direct(
+                sequence,
+                source_sel=np.s_[time_sel, start : start + length],
+                dest_sel=np.s_[:, pos : pos + length],
+            )
+
+        self.last_read_stats = ReadStats(
+            samples=1,
+            reads=len(self.channel_runs),
+            bytes_read=sequence.nbytes,
+            bytes_decompressed=self._sample_chunk_bytes(data, in_idx),
+        )
+        self.read_stats += self.last_read_stats
+        return sequence
+
     def __len__(self):
         return len(self.indices)
@@ -0,0 +1,300 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fcntl
+import logging
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Slot states
+_EMPTY, _LOADING, _READY = 0, 1, 2
+# Counters stored in the header of the segment
+_CLOCK, _HITS, _MISSES, _FRAMES_READ, _BYTES_READ = range(5)
+_HEADER_SIZE = 8
+
+
+def _align(offset: int, alignment: int = 64) -> int:
+    return -(-offset // alignment) * alignment
+
+
+class SharedFrameCache:
+    """Cache of data frames shared by all worker processes of a node
+
+    Frames, all channels of one data source at a single time index, are stored in a
+    shared memory segment keyed by (file index, time index). Any process the cache is
+    pickled to attaches to the same segment, so a frame read by one worker is served
+    from memory to all others. When full, the least recently used frame is evicted.
+
+    Reads are done in blocks of `block_size` consecutive time indices aligned to
+    multiples of `block_size`: a miss loads the whole block containing it with a
+    single contiguous read. Consecutive samples overlap in all but a few frames, so a
+    block serves several samples in sequential order and, with shuffling, any sample
+    drawn from that block while it is cached.
+
+    Parameters
+    ----------
+    frame_shape : Tuple[int, ...]
+        Shape of a frame, usually [C, H, W]
+    dtype : Union[str, np.dtype]
+        Data type of the frames
+    max_bytes : int
+        Memory budget of the cached frames in bytes
+    block_size : int, optional
+        Number of consecutive time indices read together, by default 16
+
+    Note
+    ----
+    The segment lives in /dev/shm on Linux and is removed when the cache object of
+    the process that created it is garbage collected.
+    """
+
+    def __init__(
+        self,
+        frame_shape: Tuple[int, ...],
+        dtype: Union[str, np.dtype],
+        max_bytes: int,
+        block_size: int = 16,
+    ):
+        self.frame_shape = tuple(int(s) for s in frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.block_size = block_size
+        frame_bytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self.capacity = max_bytes // frame_bytes
+        if self.capacity < 1:
+            raise ValueError(
+                f"Frame cache budget of {max_bytes} bytes is smaller than a frame"
+            )
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+
+        self.name = f"physicsnemo_frames_{uuid.uuid4().hex[:16]}"
+        self.lock_path = os.path.join(tempfile.gettempdir(), f"{self.name}.lock")
+        open(self.lock_path, "w").close()
+        self._shm = shared_memory.SharedMemory(
+            name=self.name, create=True, size=self._segment_size()
+        )
+        self._owner = True
+        self._map()
+        self._header[:] = 0
+        self._keys[:] = -1
+        self._state[:] = _EMPTY
+        self._refs[:] = 0
+        self._last_used[:] = 0
+
+    def _segment_size(self) -> int:
+        offset = _align(8 * (_HEADER_SIZE + 5 * self.capacity))
+        return offset + self.capacity * int(np.prod(self.frame_shape)) * (
+            self.dtype.itemsize
+        )
+
+    def _map(self) -> None:
+        buf = self._shm.buf
+        c = self.capacity
+        table = np.ndarray((_HEADER_SIZE + 5 * c,), dtype=np.int64, buffer=buf)
+        self._header = table[:_HEADER_SIZE]
+        self._keys = table[_HEADER_SIZE : _HEADER_SIZE + 2 * c].reshape(c, 2)
+        self._state = table[_HEADER_SIZE + 2 * c : _HEADER_SIZE + 3 * c]
+        self._refs = table[_HEADER_SIZE + 3 * c : _HEADER_SIZE + 4 * c]
+        self._last_used = table[_HEADER_SIZE + 4 * c :]
+        self._frames = np.ndarray(
+            (c,) + self.frame_shape,
+            dtype=self.dtype,
+            buffer=buf,
+            offset=_align(table.nbytes),
+        )
+
+    def __getstate__(self) -> Dict:
+        keys = ("frame_shape", "dtype", "block_size", "capacity", "name", "lock_path")
+        return {k: getattr(self, k) for k in keys}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        try:
+            self._shm = shared_memory.SharedMemory(name=self.name, track=False)
+        except TypeError:  # Python < 3.13
+            self._shm = shared_memory.SharedMemory(name=self.name)
+            # Only the creator may remove the segment
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._owner = False
+        self._map()
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "r") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _tick(self) -> int:
+        self._header[_CLOCK] += 1
+        return self._header[_CLOCK]
+
+    def _slots(self, file_idx: int, times: Sequence[int]) -> Dict[int, int]:
+        """Slots of the cached frames of `times`, must be called with the lock held"""
+        candidates = np.flatnonzero(self._keys[:, 0] == file_idx)
+        candidates = candidates[np.isin(self._keys[candidates, 1], times)]
+        return {int(self._keys[s, 1]): int(s) for s in candidates}
+
+    def read(self, file_idx: int, times: Sequence[int], out: np.ndarray) -> List[int]:
+        """Copies the cached frames of `times` into `out`
+
+        Parameters
+        ----------
+        file_idx : int
+            Index of the file
+        times : Sequence[int]
+            Time indices of the frames in the file
+        out : np.ndarray
+            Output of shape [len(times), *frame_shape]
+
+        Returns
+        -------
+        List[int]
+            Positions in `times` of the frames that are not cached
+        """
+        found, missing = [], []
+        with self._locked():
+            slots = self._slots(file_idx, times)
+            for i, t in enumerate(times):
+                slot = slots.get(t)
+                if slot is None or self._state[slot] != _READY:
+                    missing.append(i)
+                    continue
+                # Referenced slots are not evicted while they are copied
+                self._refs[slot] += 1
+                self._last_used[slot] = self._tick()
+                found.append((i, slot))
+            self._header[_HITS] += len(found)
+            self._header[_MISSES] += len(missing)
+        try:
+            for i, slot in found:
+                out[i] = self._frames[slot]
+        finally:
+            with self._locked():
+                for _, slot in found:
+                    self._refs[slot] -= 1
+        return missing
+
+    def write(self, file_idx: int, start: int, frames: np.ndarray) -> None:
+        """Adds consecutive frames read from a file to the cache
+
+        Parameters
+        ----------
+        file_idx : int
+            Index of the file
+        start : int
+            Time index of the first frame
+        frames : np.ndarray
+            Frames of shape [T, *frame_shape]
+        """
+        reserved = []
+        with self._locked():
+            self._header[_FRAMES_READ] += len(frames)
+            self._header[_BYTES_READ] += frames.nbytes
+            slots = self._slots(file_idx, range(start, start + len(frames)))
+            for i in range(len(frames)):
+                if start + i in slots:
+                    continue
+                free = np.flatnonzero((self._refs == 0) & (self._state != _LOADING))
+                if len(free) == 0:
+                    break
+                empty = free[self._state[free] == _EMPTY]
+                if len(empty) > 0:
+                    slot = empty[0]
+                else:
+                    slot = free[np.argmin(self._last_used[free])]
+                self._keys[slot] = (file_idx, start + i)
+                self._state[slot] = _LOADING
+                self._refs[slot] = 1
+                self._last_used[slot] = self._tick()
+                reserved.append((i, slot))
+        try:
+            for i, slot in reserved:
+                self._frames[slot] = frames[i]
+        finally:
+            with self._locked():
+                for _, slot in reserved:
+                    self._state[slot] = _READY
+                    self._refs[slot] -= 1
+
+    def blocks(self, times: Sequence[int], num_times: int) -> List[Tuple[int, int]]:
+        """Ranges of time indices to read to load the frames of `times`
+
+        Parameters
+        ----------
+        times : Sequence[int]
+            Missing time indices
+        num_times : int
+            Number of time indices in the file
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            Start and end of the aligned blocks holding `times`, adjacent blocks are
+            merged into a single range
+        """
+        ranges = []
+        for block in sorted({t // self.block_size for t in times}):
+            start = block * self.block_size
+            end = min(start + self.block_size, num_times)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Hits, misses and frames and bytes read from storage, of all processes"""
+        return {
+            "hits": int(self._header[_HITS]),
+            "misses": int(self._header[_MISSES]),
+            "frames_read": int(self._header[_FRAMES_READ]),
+            "bytes_read": int(self._header[_BYTES_READ]),
+        }
+
+    def close(self) -> None:
+        """Detaches from the segment, removing it if this process created it"""
+        if getattr(self, "_shm", None) is None:
+            return
+        # Views of the buffer must be released before it can be closed
+        for attr in ("_header", "_keys", "_state", "_refs", "_last_used", "_frames"):
+            self.__dict__.pop(attr, None)
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            try:
+                os.remove(self.lock_path)
+            except FileNotFoundError:
+                pass
+        self._shm = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception as e:
+            # Raising from __del__ only prints a warning, report why instead
+            logger.debug("failed to close the frame cache: %s", e)
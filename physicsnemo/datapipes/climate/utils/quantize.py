@@ -0,0 +1,235 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Quantized, packed HDF5 format of the climate datapipe.
+
+Converts HDF5 files with a float `fields` dataset of shape
+(num_timesteps, num_channels, height, width) into files storing the channels as 16 bit
+integers, with the per-channel affine decoding ``value = packed * scale + offset`` in
+the `scale` and `offset` datasets. This halves the storage and read bandwidth of
+float32 data, and the packed values can be decoded on the GPU by the consumer.
+
+Example
+-------
+::
+
+    python -m physicsnemo.datapipes.climate.utils.quantize data/ packed/ \\
+        --compression gzip --validate
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from physicsnemo.utils.lazy_import import LazyModule
+
+h5py = LazyModule("h5py")
+
+PACKED_DTYPES = ("int16", "uint16")
+
+
+def _channel_range(
+    fields: "h5py.Dataset", block_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    vmin = np.full(fields.shape[1], np.inf)
+    vmax = np.full(fields.shape[1], -np.inf)
+    for start in range(0, fields.shape[0], block_size):
+        block = fields[start : start + block_size]
+        if not np.isfinite(block).all():
+            raise ValueError(
+                "Non-finite values can not be packed, fill them before converting"
+            )
+        vmin = np.minimum(vmin, block.min(axis=(0, 2, 3)))
+        vmax = np.maximum(vmax, block.max(axis=(0, 2, 3)))
+    return vmin, vmax
+
+
+def pack_hdf5_file(
+    src_path: Union[str, Path],
+    dst_path: Union[str, Path],
+    dtype: str = "int16",
+    compression: Optional[str] = None,
+    block_size: int = 16,
+) -> None:
+    """Converts a climate HDF5 file to the packed format
+
+    The range of every channel over the file is mapped linearly to the full range of
+    the integer type, so the quantization error is at most half the `scale` of the
+    channel.
+
+    Parameters
+    ----------
+    src_path : Union[str, Path]
+        HDF5 file with a float `fields` dataset
+    dst_path : Union[str, Path]
+        Packed HDF5 file to write
+    dtype : str, optional
+        Integer type of the packed values, "int16" or "uint16", by default "int16"
+    compression : Optional[str], optional
+        Lossless HDF5 filter, "gzip" or "lzf", applied after byte shuffling, by
+        default None
+    block_size : int, optional
+        Number of time steps converted at once, by default 16
+
+    Raises
+    ------
+    ValueError
+        If the data contains non-finite values or the type is not supported
+    """
+    if dtype not in PACKED_DTYPES:
+        raise ValueError(f"Invalid packed type {dtype}, expected {PACKED_DTYPES}")
+    info = np.iinfo(dtype)
+    with h5py.File(src_path, "r") as src, h5py.File(dst_path, "w") as dst:
+        fields = src["fields"]
+        vmin, vmax = _channel_range(fields, block_size)
+        scale = (vmax - vmin) / (info.max - info.min)
+        # Constant channels are decoded exactly with any scale
+        scale[scale == 0] = 1.0
+        offset = vmin - info.min * scale
+
+        packed = dst.create_dataset(
+            "fields",
+            shape=fields.shape,
+            dtype=dtype,
+            chunks=(1, 1) + fields.shape[2:],
+            compression=compression,
+            shuffle=compression is not None,
+        )
+        dst.create_dataset("scale", data=scale.astype(np.float32))
+        dst.create_dataset("offset", data=offset.astype(np.float32))
+        scale = scale[None, :, None, None]
+        offset = offset[None, :, None, None]
+        for start in range(0, fields.shape[0], block_size):
+            block = fields[start : start + block_size].astype(np.float64)
+            block = np.rint((block - offset) / scale)
+            packed[start : start + len(block)] = np.clip(block, info.min, info.max)
+
+
+def quantization_error(
+    src_path: Union[str, Path], dst_path: Union[str, Path], block_size: int = 16
+) -> Dict[str, np.ndarray]:
+    """Per-channel error of a packed file decoded with float32 arithmetic
+
+    Parameters
+    ----------
+    src_path : Union[str, Path]
+        Original HDF5 file
+    dst_path : Union[str, Path]
+        Packed HDF5 file
+    block_size : int, optional
+        Number of time steps compared at once, by default 16
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Maximum absolute error "max_abs", root mean square error "rms" and the bound
+        of the error "bound", half the scale, of every channel
+    """
+    with h5py.File(src_path, "r") as src, h5py.File(dst_path, "r") as dst:
+        fields, packed = src["fields"], dst["fields"]
+        scale = dst["scale"][:]
+        offset = dst["offset"][:]
+        max_abs = np.zeros(fields.shape[1])
+        sum_sq = np.zeros(fields.shape[1])
+        for start in range(0, fields.shape[0], block_size):
+            decoded = (
+                packed[start : start + block_size].astype(np.float32)
+                * scale[None, :, None, None]
+                + offset[None, :, None, None]
+            )
+            error = decoded - fields[start : start + block_size]
+            max_abs = np.maximum(max_abs, np.abs(error).max(axis=(0, 2, 3)))
+            sum_sq += np.square(error, dtype=np.float64).sum(axis=(0, 2, 3))
+        rms = np.sqrt(sum_sq / (fields.size / fields.shape[1]))
+    return {"max_abs": max_abs, "rms": rms, "bound": scale / 2}
+
+
+def pack_dataset(
+    src_dir: Union[str, Path],
+    dst_dir: Union[str, Path],
+    dtype: str = "int16",
+    compression: Optional[str] = None,
+    validate: bool = False,
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """Converts all HDF5 files of a climate data directory to the packed format
+
+    Parameters
+    ----------
+    src_dir : Union[str, Path]
+        Directory with the yearly HDF5 files
+    dst_dir : Union[str, Path]
+        Directory the packed files are written to, with the same names
+    dtype : str, optional
+        Integer type of the packed values, by default "int16"
+    compression : Optional[str], optional
+        Lossless HDF5 filter, by default None
+    validate : bool, optional
+        Compute the quantization error of every file, by default False
+
+    Returns
+    -------
+    Dict[str, Dict[str, np.ndarray]]
+        Quantization errors by file name if `validate`, else empty
+    """
+    dst_dir = Path(dst_dir)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    errors = {}
+    for src_path in sorted(Path(src_dir).glob("*.h5")):
+        dst_path = dst_dir / src_path.name
+        pack_hdf5_file(src_path, dst_path, dtype=dtype, compression=compression)
+        if validate:
+            errors[src_path.name] = quantization_error(src_path, dst_path)
+    return errors
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Converts a climate data directory to the packed format"""
+    parser = argparse.ArgumentParser(
+        prog="python -m physicsnemo.datapipes.climate.utils.quantize",
+        description=__doc__.split("\n")[0],
+    )
+    parser.add_argument("src_dir", help="Directory with the HDF5 files")
+    parser.add_argument("dst_dir", help="Directory of the packed files")
+    parser.add_argument("--dtype", choices=PACKED_DTYPES, default="int16")
+    parser.add_argument("--compression", choices=("gzip", "lzf"), default=None)
+    parser.add_argument(
+        "--validate", action="store_true", help="Report the quantization error"
+    )
+    args = parser.parse_args(argv)
+
+    errors = pack_dataset(
+        args.src_dir,
+        args.dst_dir,
+        dtype=args.dtype,
+        compression=args.compression,
+        validate=args.validate,
+    )
+    for name, error in errors.items():
+        print(name)
+        print(f"    {'channel':>8} {'max_abs':>12} {'rms':>12} {'bound':>12}")
+        for c in range(len(error["max_abs"])):
+            print(
+                f"    {c:>8} {error['max_abs'][c]:12.4e} {error['rms'][c]:12.4e} "
+                f"{error['bound'][c]:12.4e}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""PyTorch execution engine of the DALI external sources of the climate datapipes.
+
+Runs the same external source objects as the DALI pipelines in a pool of worker
+processes, without DALI or a GPU. Every worker keeps its own copy of the sources, so
+the file handles they open stay open for the lifetime of the worker. Workers write
+samples straight into batch buffers in shared memory, which are then copied into
+(pinned) output tensors on the target device.
+"""
+
+import copy
+import logging
+import queue
+import traceback
+from collections import deque
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+logger = logging.getLogger(__name__)
+
+Tensor = torch.Tensor
+
+# Transform applied in the workers to the outputs of one source
+SampleTransform = Callable[[Sequence[np.ndarray]], Sequence[np.ndarray]]
+
+
+class SampleInfo(NamedTuple):
+    """Position of a sample, with the fields of `nvidia.dali.types.SampleInfo` used by
+    the external sources"""
+
+    idx_in_epoch: int
+    idx_in_batch: int
+    iteration: int
+    epoch_idx: int
+
+
+def _catch_up_shuffle(source, epoch_idx: int) -> None:
+    """Applies the shuffles of the epochs a source has not seen
+
+    The external sources shuffle their indices in place once per epoch, seeded by the
+    epoch index. A worker that received no sample of an epoch must still apply its
+    shuffle for its indices to stay identical to those of the other workers.
+    """
+    if not getattr(source, "shuffle", False):
+        return
+    last_epoch = -1 if source.last_epoch is None else source.last_epoch
+    for epoch in range(last_epoch + 1, epoch_idx):
+        np.random.default_rng(seed=epoch).shuffle(source.indices)
+        source.last_epoch = epoch
+
+
+def _load_sample(
+    sources: Sequence[Callable],
+    transforms: Sequence[Optional[SampleTransform]],
+    info: SampleInfo,
+) -> List[np.ndarray]:
+    """Outputs of all sources for one sample"""
+    outputs = []
+    for source, transform in zip(sources, transforms):
+        _catch_up_shuffle(source, info.epoch_idx)
+        sample = source(info)
+        if transform is not None:
+            sample = transform(sample)
+        outputs.extend(np.asarray(x) for x in sample)
+    return outputs
+
+
+def _write_sample(buffers: List[Tensor], outputs: List[np.ndarray], j: int) -> None:
+    for buffer, x in zip(buffers, outputs):
+        buffer[j].copy_(torch.from_numpy(np.ascontiguousarray(x)))
+
+
+def _worker_loop(sources, transforms, buffers, tasks, results) -> None:
+    # Parallelism comes from the workers, do not oversubscribe the cores
+    torch.set_num_threads(1)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        epoch_idx, iteration, slot, j, batch_size = task
+        try:
+            info = SampleInfo(iteration * batch_size + j, j, iteration, epoch_idx)
+            _write_sample(buffers[slot], _load_sample(sources, transforms, info), j)
+            results.put((slot, None))
+        except Exception:
+            results.put((slot, traceback.format_exc()))
+
+
+class TorchSourceEngine:
+    """Loads batches from DALI style external sources with PyTorch workers
+
+    Parameters
+    ----------
+    sources : Sequence[Callable]
+        External sources called with a `SampleInfo` and returning a tuple of arrays.
+        All sources are called for every sample and their outputs are concatenated
+    transforms : Optional[Sequence[Optional[SampleTransform]]], optional
+        Transform of the outputs of every source, run in the workers, by default None
+    batch_size : int, optional
+        Batch size, by default 1
+    num_batches : int, optional
+        Number of batches of an epoch, by default 1
+    num_workers : int, optional
+        Number of worker processes, 0 loads the samples in the main process, by
+        default 1
+    prefetch_depth : int, optional
+        Number of batches loaded ahead, by default 2
+    device : Union[str, torch.device], optional
+        Device of the output tensors, by default "cpu"
+    pin_memory : bool, optional
+        Copy batches to pinned memory before moving them to a CUDA device, by
+        default True
+    start_method : str, optional
+        Start method of the worker processes, by default "spawn"
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[Callable],
+        transforms: Optional[Sequence[Optional[SampleTransform]]] = None,
+        batch_size: int = 1,
+        num_batches: int = 1,
+        num_workers: int = 1,
+        prefetch_depth: int = 2,
+        device: Union[str, torch.device] = "cpu",
+        pin_memory: bool = True,
+        start_method: str = "spawn",
+    ):
+        if prefetch_depth < 1:
+            raise ValueError("prefetch_depth must be at least 1")
+        self.sources = list(sources)
+        self.transforms = (
+            list(transforms) if transforms is not None else [None] * len(self.sources)
+        )
+        self.batch_size = batch_size
+        self.num_batches = num_batches
+        self.num_workers = num_workers
+        self.prefetch_depth = prefetch_depth if num_workers > 0 else 1
+        self.device = torch.device(device)
+        self.pin_memory = (
+            pin_memory and self.device.type == "cuda" and torch.cuda.is_available()
+        )
+        self.start_method = start_method
+
+        self._buffers = None
+        self._workers = []
+        self._tasks = None
+        self._results = None
+        self._outstanding = 0
+
+    def _allocate_buffers(self) -> None:
+        # Probe the output shapes on a copy, the sources keep their state pristine
+        probe = _load_sample(
+            copy.deepcopy(self.sources), self.transforms, SampleInfo(0, 0, 0, 0)
+        )
+        self._buffers = []
+        for _ in range(self.prefetch_depth):
+            slot = [
+                torch.from_numpy(np.empty((self.batch_size,) + x.shape, dtype=x.dtype))
+                for x in probe
+            ]
+            if self.num_workers > 0:
+                slot = [buffer.share_memory_() for buffer in slot]
+            self._buffers.append(slot)
+
+    def _start_workers(self) -> None:
+        ctx = mp.get_context(self.start_method)
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        for _ in range(self.num_workers):
+            worker = ctx.Process(
+                target=_worker_loop,
+                args=(
+                    self.sources,
+                    self.transforms,
+                    self._buffers,
+                    self._tasks,
+                    self._results,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _poll_result(self, timeout: float):
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _get_result(self):
+        # Wait in rounds so that a dead worker is reported instead of hanging
+        result = self._poll_result(5.0)
+        while result is None:
+            if not all(w.is_alive() for w in self._workers):
+                raise RuntimeError("A datapipe worker process died unexpectedly")
+            result = self._poll_result(5.0)
+        self._outstanding -= 1
+        return result
+
+    def _submit(self, epoch_idx: int, iteration: int, slot: int) -> None:
+        for j in range(self.batch_size):
+            self._tasks.put((epoch_idx, iteration, slot, j, self.batch_size))
+        self._outstanding += self.batch_size
+
+    def _output(self, buffer: Tensor) -> Tensor:
+        if self.device.type == "cpu":
+            return buffer.clone()
+        if self.pin_memory:
+            pinned = torch.empty(
+                buffer.shape, dtype=buffer.dtype, pin_memory=True
+            ).copy_(buffer)
+            return pinned.to(self.device, non_blocking=True)
+        return buffer.to(self.device)
+
+    def epoch(self, epoch_idx: int) -> Iterator[List[Tensor]]:
+        """Iterates over the batches of an epoch
+
+        Parameters
+        ----------
+        epoch_idx : int
+            Index of the epoch, seeding the shuffle of the sources
+
+        Yields
+        ------
+        List[Tensor]
+            Batched outputs of the sources, in order
+        """
+        if self._buffers is None:
+            self._allocate_buffers()
+
+        if self.num_workers == 0:
+            for iteration in range(self.num_batches):
+                for j in range(self.batch_size):
+                    info = SampleInfo(
+                        iteration * self.batch_size + j, j, iteration, epoch_idx
+                    )
+                    outputs = _load_sample(self.sources, self.transforms, info)
+                    _write_sample(self._buffers[0], outputs, j)
+                yield [self._output(buffer) for buffer in self._buffers[0]]
+            return
+
+        if not self._workers:
+            self._start_workers()
+        # Drop the samples of a previous epoch that was not iterated to the end
+        while self._outstanding > 0:
+            self._get_result()
+
+        free = deque(range(self.prefetch_depth))
+        slots = {}
+        remaining = [0] * self.prefetch_depth
+        submitted = 0
+        for iteration in range(self.num_batches):
+            while free and submitted < self.num_batches:
+                slot = free.popleft()
+                self._submit(epoch_idx, submitted, slot)
+                slots[submitted] = slot
+                remaining[slot] = self.batch_size
+                submitted += 1
+
+            slot = slots.pop(iteration)
+            while remaining[slot] > 0:
+                done, error = self._get_result()
+                if error is not None:
+                    raise RuntimeError(f"Datapipe worker failed:\n{error}")
+                remaining[done] -= 1
+            batch = [self._output(buffer) for buffer in self._buffers[slot]]
+            free.append(slot)
+            yield batch
+
+    def close(self) -> None:
+        """Stops the worker processes"""
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5.0)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._outstanding = 0
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception as e:
+            # Raising from __del__ only prints a warning, report why instead
+            logger.debug("failed to close the datapipe workers: %s", e)
@@ -32,14 +32,13 @@ import datetime
 import numpy as np
 import pytz
 
-try:
-    import nvidia.dali as dali
-except ImportError:
-    raise ImportError(
-        "DALI dataset requires NVIDIA DALI package to be installed. "
-        + "The package can be installed at:\n"
-        + "https://docs.nvidia.com/deeplearning/dali/user-guide/docs/installation.html"
-    )
+from physicsnemo.utils.lazy_import import LazyModule
+
+dali = LazyModule(
+    "nvidia.dali",
+    hint="The package can be installed at:\n"
+    + "https://docs.nvidia.com/deeplearning/dali/user-guide/docs/installation.html",
+)
 
 RAD_PER_DEG = np.pi / 180.0
 DATETIME_2000 = datetime.datetime(2000, 1, 1, 12, 0, 0, tzinfo=pytz.utc).timestamp()
@@ -50,8 +49,8 @@ def _dali_mod(a, b):
 
 
 def cos_zenith_angle(
-    time: dali.types.DALIDataType,
-    latlon: dali.types.DALIDataType,
+    time: "dali.types.DALIDataType",
+    latlon: "dali.types.DALIDataType",
 ):
     """
     Dali datapipe for computing Cosine of sun-zenith angle for lon, lat at time (UTC).
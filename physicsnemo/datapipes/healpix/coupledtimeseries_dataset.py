@@ -27,7 +27,6 @@ import xarray as xr
 from omegaconf import DictConfig, OmegaConf
 
 from physicsnemo.datapipes.meta import DatapipeMetaData
-from physicsnemo.utils.insolation import insolation
 
 from . import couplers
 from .timeseries_dataset import TimeSeriesDataset
@@ -232,11 +231,7 @@ class CoupledTimeSeriesDataset(TimeSeriesDataset):
         torch.cuda.nvtx.range_push("CoupledTimeSeriesDataset:__getitem__:process_batch")
         # Insolation
         if self.add_insolation:
-            sol = insolation(
-                self._get_forecast_sol_times(item),
-                self.ds.lat.values,
-                self.ds.lon.values,
-            )[:, None]
+            sol = self._insolation(self._get_forecast_sol_times(item))
             decoder_inputs = np.empty(
                 (this_batch, self.input_time_dim + self.output_time_dim, 1)
                 + self.spatial_dims,
@@ -340,11 +335,7 @@ class CoupledTimeSeriesDataset(TimeSeriesDataset):
         # gather insolation inputs
         time_offset = self.time_step * (self.output_time_dim) * self.integration_step
         sol = torch.tensor(
-            insolation(
-                self._get_forecast_sol_times(self.curr_item) + time_offset,
-                self.ds.lat.values,
-                self.ds.lon.values,
-            )[:, None]
+            self._insolation(self._get_forecast_sol_times(self.curr_item) + time_offset)
         )
         decoder_inputs = np.empty(
             (1, self.input_time_dim + self.output_time_dim, 1) + self.spatial_dims,
@@ -25,6 +25,107 @@ import xarray as xr
 logger = logging.getLogger(__name__)
 
 
+def trailing_average_name(averaging_window: str) -> str:
+    """Name of the variable holding the trailing averages over `averaging_window`
+    in a prebuilt dataset"""
+    return f"trailing_average_{int(pd.Timedelta(averaging_window).total_seconds())}s"
+
+
+def trailing_average(data: xr.DataArray, window: int) -> xr.DataArray:
+    """
+    Trailing average of a time series over `window` time steps
+
+    The average at a time step is taken over the `window` time steps ending at it,
+    or over all time steps up to it for the first `window - 1` ones. It is computed
+    in one pass over time from the difference of cumulative sums, lazily if the
+    data is a dask array.
+
+    Parameters
+    ----------
+    data: xr.DataArray
+        Time series with a `time` dimension
+    window: int
+        Number of time steps averaged
+
+    Returns
+    -------
+    xr.DataArray: The trailing averages, of the shape and type of `data`
+    """
+    cumsum = data.astype("float64").cumsum("time")
+    counts = xr.DataArray(
+        np.minimum(np.arange(1, data.sizes["time"] + 1), window), dims="time"
+    )
+    averages = (cumsum - cumsum.shift(time=window, fill_value=0.0)) / counts
+    return averages.astype(data.dtype)
+
+
+def cache_trailing_averages(
+    path: str, variables: Sequence, averaging_window: str = "24h"
+) -> xr.DataArray:
+    """
+    Stores the trailing averages of coupled variables in a prebuilt dataset
+
+    A `TrailingAverageCoupler` with `prepared_coupled_data=False` reads the cached
+    averages instead of computing them, so that dataloader workers only gather the
+    coupled fields.
+
+    Parameters
+    ----------
+    path: str
+        Path of the prebuilt Zarr dataset
+    variables: Sequence
+        Input variables to average
+    averaging_window: str, optional
+        Period the variables are averaged over, default "24h"
+
+    Returns
+    -------
+    xr.DataArray: The cached averages
+    """
+    ds = xr.open_zarr(path)
+    window = _window_steps(ds, averaging_window)
+    averages = trailing_average(ds.inputs.sel(channel_in=list(variables)), window)
+    averages = averages.rename({"channel_in": "channel_coupled"})
+    averages = averages.reset_coords(drop=True)
+    averages.encoding = {}
+    name = trailing_average_name(averaging_window)
+    averages.to_dataset(name=name).to_zarr(path, mode="a")
+    return xr.open_zarr(path)[name]
+
+
+def _window_steps(dataset: xr.Dataset, averaging_window: str) -> int:
+    """Number of time steps of a dataset in `averaging_window`"""
+    dt = pd.Timedelta(dataset.time[1].values - dataset.time[0].values)
+    averaging_window = pd.Timedelta(averaging_window)
+    if averaging_window % dt != pd.Timedelta(0):
+        raise ValueError(
+            f"Averaging window {averaging_window} is not divisible by dataset dt: {dt}"
+        )
+    return averaging_window // dt
+
+
+def _gather_couplings(
+    coupled_inputs: xr.DataArray,
+    scaling: dict,
+    start: int,
+    offsets: np.ndarray,
+) -> np.ndarray:
+    """
+    Normalized coupled fields of the samples of a batch
+
+    Loads the time steps of all samples at once and gathers them with the index
+    table `offsets` of shape [B, I, T], relative to the batch start `start`.
+    Returns an array of shape [I, B, T * C, F, H, W].
+    """
+    window = coupled_inputs.isel(time=slice(start, start + offsets.max() + 1))
+    window = (window.to_numpy() - scaling["mean"]) / scaling["std"]
+    # [B, I, T, C, F, H, W]
+    couplings = window[offsets]
+    couplings = couplings.reshape(couplings.shape[:2] + (-1,) + couplings.shape[4:])
+    # cast to float32 for pytorch compatibility
+    return couplings.transpose((1, 0, 2, 3, 4, 5)).astype("float32")
+
+
 class ConstantCoupler:
     """
     coupler used to interface two component of earth system
@@ -88,6 +189,7 @@ class ConstantCoupler:
         self._coupled_offsets = None
         self.coupled_mode = False
         self.integrated_couplings = None
+        self.coupled_inputs = self.ds.inputs.sel(channel_in=self.variables)
 
         if not prepared_coupled_data:
             logger.log(
@@ -127,18 +229,13 @@ class ConstantCoupler:
         data_time_step:
             dataset timestep
         """
-        # create array of static coupled offstes that accompany each batch
-        self._coupled_offsets = np.empty(
-            [self.batch_size, self.coupled_integration_dim, len(self.input_times)]
-        )
-        for b in range(self.batch_size):
-            for i in range(self.coupled_integration_dim):
-
-                self._coupled_offsets[b, i, :] = b + np.array(
-                    [ts / data_time_step for ts in self.input_times]
-                )
-
-        self._coupled_offsets = self._coupled_offsets.astype(int)
+        # create the table of coupled offsets of every sample of a batch, relative
+        # to the batch start, of shape [B, I, T]
+        steps = np.array([ts / data_time_step for ts in self.input_times])
+        self._coupled_offsets = np.broadcast_to(
+            np.arange(self.batch_size)[:, None, None] + steps,
+            (self.batch_size, self.coupled_integration_dim, len(self.input_times)),
+        ).astype(int)
 
     def set_scaling(self, scaling_da):
 
@@ -210,10 +307,7 @@ class ConstantCoupler:
             + list(self.spatial_dims)
         )
         # we use a constant set of values so we just copy time 0
-        for i in range(len(self.preset_coupled_fields)):
-            self.preset_coupled_fields[i, :, :, :, :, :] = coupled_fields[
-                0, :, -1, :, :, :
-            ]
+        self.preset_coupled_fields[:] = coupled_fields[0, :, -1, :, :, :]
         # flag for construct integrated coupling method to use this array
         self.coupled_mode = True
 
@@ -240,40 +334,13 @@ class ConstantCoupler:
         if self.coupled_mode:
             return self.preset_coupled_fields
         else:
-            # reset integrated couplings
-            self.integrated_couplings = np.empty(
-                (bsize, self.coupled_integration_dim, self.timevar_dim)
-                + self.spatial_dims
-            )
-
-            index_range = slice(
+            self.integrated_couplings = _gather_couplings(
+                self.coupled_inputs,
+                self.coupled_scaling,
                 batch["time"].start,
-                batch["time"].start + self._coupled_offsets[-1, -1, -1] + 1,
+                self._coupled_offsets[:bsize],
             )
-
-            # extract coupled variables and scale lazily
-            input_array = self.ds.inputs.sel(channel_in=self.variables)
-            ds = (input_array - self.coupled_scaling["mean"]) / self.coupled_scaling[
-                "std"
-            ]
-            # load before entering loop for efficiency
-            ds_index_range = ds.isel(time=index_range).load()
-
-            # use static offsets to create integrated coupling array
-            for b in range(bsize):
-                for i in range(self.coupled_integration_dim):
-                    coupling_temp = ds_index_range.isel(
-                        time=self._coupled_offsets[b, i, :]
-                    )
-                    self.integrated_couplings[
-                        b, i, :, :, :
-                    ] = coupling_temp.to_numpy().reshape(
-                        (self.timevar_dim,) + coupling_temp.shape[2:]
-                    )
-
-            return self.integrated_couplings.transpose((1, 0, 2, 3, 4, 5)).astype(
-                "float32"
-            )  # cast to float for compatability
+            return self.integrated_couplings
 
 
 class TrailingAverageCoupler:
@@ -323,7 +390,9 @@ class TrailingAverageCoupler:
             If True assumes data in dataset has been prepared approiately for training:
             averages have already been calculated so that each time step denotes
             the right side of a averaging_window window.
-            This is highly remcommended for training, default True
+            This is highly remcommended for training. If False the trailing averages
+            are read from the dataset if stored by `cache_trailing_averages`, or
+            computed lazily otherwise, default True
         """
         # extract important meta data from ds
         self.ds = dataset
@@ -344,6 +413,7 @@ class TrailingAverageCoupler:
         self._coupled_offsets = None
         self.integrated_couplings = None
         self.coupled_mode = False  # if forecasting with another coupled model
+        self.coupled_inputs = self.ds.inputs.sel(channel_in=self.variables)
 
         if not prepared_coupled_data:
             logger.log(
@@ -369,25 +439,35 @@ class TrailingAverageCoupler:
         :param data_time_step: dataset timestep
         """
 
-        # create array of static coupled offstes that accompany each batch
-        self._coupled_offsets = np.empty(
-            [self.batch_size, self.coupled_integration_dim, len(self.input_times)]
-        )
-        for b in range(self.batch_size):
-            for i in range(self.coupled_integration_dim):
-
-                self._coupled_offsets[b, i, :] = (
-                    b
-                    + (self.input_time_dim * i + 1) * interval
-                    + np.array([ts / data_time_step for ts in self.input_times])
-                )
-
-        self._coupled_offsets = self._coupled_offsets.astype(int)
+        # create the table of coupled offsets of every sample of a batch, relative
+        # to the batch start, of shape [B, I, T]
+        steps = np.array([ts / data_time_step for ts in self.input_times])
+        self._coupled_offsets = (
+            np.arange(self.batch_size)[:, None, None]
+            + (self.input_time_dim * np.arange(self.coupled_integration_dim) + 1)[
+                None, :, None
+            ]
+            * interval
+            + steps
+        ).astype(int)
 
     def _prepare_coupled_data(self):
 
-        # TODO: write function to lazily compute average as spcified in time scheme
-        raise NotImplementedError("Data preparation not yet implemented")
+        # use the averages cached in the dataset by cache_trailing_averages
+        name = trailing_average_name(self.averaging_window)
+        if (
+            name in self.ds.data_vars
+            and np.isin(self.variables, self.ds[name].channel_coupled).all()
+        ):
+            self.coupled_inputs = (
+                self.ds[name]
+                .sel(channel_coupled=self.variables)
+                .rename({"channel_coupled": "channel_in"})
+            )
+        else:
+            self.coupled_inputs = trailing_average(
+                self.coupled_inputs, _window_steps(self.ds, self.averaging_window)
+            )
 
     def set_scaling(self, scaling_da):
 
@@ -485,16 +565,20 @@ class TrailingAverageCoupler:
 
         coupled_fields = coupled_fields[:, :, :, self.coupled_channel_indices, :, :]
         # TODO: Now support output_time_dim =/= input_time_dim, but presteps need to be 0, will add support for presteps>0
-        coupled_averaging_periods = []
-        for j in range(self.coupled_integration_dim):
-            averaging_periods = [
-                coupled_fields[:, :, s, :, :, :].mean(dim=2, keepdim=True)
-                for s in self.averaging_slices[j]
-            ]
-            coupled_averaging_periods.append(th.concat(averaging_periods, dim=3))
-        self.preset_coupled_fields = th.concat(
-            coupled_averaging_periods, dim=2
-        ).permute(2, 0, 3, 1, 4, 5)
+        # Averages over all slices at once, from differences of cumulative sums
+        bounds = th.tensor(
+            [[(s.start, s.stop) for s in slices] for slices in self.averaging_slices]
+        ).clamp(max=coupled_fields.shape[2])
+        starts, stops = bounds[..., 0], bounds[..., 1]
+        cumsum = coupled_fields.double().cumsum(dim=2)
+        cumsum = th.cat([th.zeros_like(cumsum[:, :, :1]), cumsum], dim=2)
+        # [B, F, J, I, C, H, W]
+        averages = (cumsum[:, :, stops] - cumsum[:, :, starts]) / (stops - starts).to(
+            cumsum
+        )[..., None, None, None]
+        self.preset_coupled_fields = (
+            averages.to(coupled_fields.dtype).flatten(3, 4).permute(2, 0, 3, 1, 4, 5)
+        )
         # flag for construct integrated coupling method to use this array
         self.coupled_mode = True
 
@@ -520,40 +604,10 @@ class TrailingAverageCoupler:
                 raise ValueError(
                     "Coupled fields must be set if no batch or batch size is provided"
                 )
-            # reset integrated couplings
-            self.integrated_couplings = np.empty(
-                (bsize, self.coupled_integration_dim, self.timevar_dim)
-                + self.spatial_dims
-            )
-
-            index_range = slice(
+            self.integrated_couplings = _gather_couplings(
+                self.coupled_inputs,
+                self.coupled_scaling,
                 batch["time"].start,
-                batch["time"].start + self._coupled_offsets[-1, -1, -1] + 1,
+                self._coupled_offsets[:bsize],
             )
-
-            # extract coupled variables and scale lazily
-            ds = (
-                self.ds.inputs.sel(channel_in=self.variables)
-                - self.coupled_scaling["mean"]
-            ) / self.coupled_scaling["std"]
-            # load before entering loop for efficiency
-            ds_index_range = ds.isel(time=index_range).load()
-
-            # use static offsets to create integrated coupling array
-            for b in range(bsize):
-                for i in range(self.coupled_integration_dim):
-                    # coupling_temp = \
-                    #   ds.isel(time=batch["time"].start+self._coupled_offsets[b,i,:]) # changed i to 0 for debugging
-                    # added to test speed, original is commented above
-                    coupling_temp = ds_index_range.isel(
-                        time=self._coupled_offsets[b, i, :]
-                    )
-                    self.integrated_couplings[
-                        b, i, :, :, :
-                    ] = coupling_temp.to_numpy().reshape(
-                        (self.timevar_dim,) + coupling_temp.shape[2:]
-                    )
-
-            return self.integrated_couplings.transpose((1, 0, 2, 3, 4, 5)).astype(
-                "float32"
-            )  # cast to float32 for pytroch compatibility.
+            return self.integrated_couplings
@@ -15,11 +15,19 @@
 # limitations under the License.
 
 # System modules
+import json
 import logging
+import multiprocessing
 import os
+import shutil
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
-from typing import DefaultDict, Optional, Sequence, Union
+from typing import Any, DefaultDict, Dict, List, Optional, Sequence, Union
+
+import dask
+import dask.array
 
 # numpy
 import numpy as np
@@ -37,6 +45,7 @@ from torch.utils.data import DataLoader
 from torch.utils.data.distributed import DistributedSampler
 
 from physicsnemo.distributed import DistributedManager
+from physicsnemo.utils.insolation import insolation
 
 from .coupledtimeseries_dataset import CoupledTimeSeriesDataset
 from .timeseries_dataset import TimeSeriesDataset
@@ -216,70 +225,69 @@ def open_time_series_dataset_classic_prebuilt(
     return result
 
 
-def create_time_series_dataset_classic(
+def insolation_dataarray(dataset: xr.Dataset, chunk_size: int = 32) -> xr.DataArray:
+    """
+    Top of atmosphere insolation at every time step of a dataset
+
+    The insolation is computed lazily, vectorized over chunks of `chunk_size` time
+    steps, on the grid of the `lat` and `lon` coordinates of the dataset
+
+    Parameters
+    ----------
+    dataset: xr.Dataset
+        Dataset with `time`, `lat` and `lon` coordinates
+    chunk_size: int, optional
+        Number of time steps computed at once, default 32
+
+    Returns
+    -------
+    xr.DataArray: The insolation, of dimensions (time, *lat.dims)
+    """
+    lat, lon = dataset.lat.values, dataset.lon.values
+    times = dask.array.from_array(dataset.time.values, chunks=chunk_size)
+    sol = times.map_blocks(
+        partial(insolation, lat=lat, lon=lon),
+        new_axis=list(range(1, lat.ndim + 1)),
+        chunks=times.chunks + tuple((n,) for n in lat.shape),
+        dtype=np.float32,
+    )
+    return xr.DataArray(
+        sol,
+        dims=("time",) + dataset.lat.dims,
+        coords={"time": dataset.time},
+        name="insolation",
+    )
+
+
+def _merge_time_series_dataset_classic(
     src_directory: str,
-    dst_directory: str,
-    dataset_name: str,
     input_variables: Sequence,
     output_variables: Optional[Sequence] = None,
     constants: Optional[DefaultDict] = None,
     prefix: Optional[str] = None,
     suffix: Optional[str] = None,
-    batch_size: int = 32,
     scaling: Optional[DictConfig] = None,
-    overwrite: bool = False,
+    chunks: Optional[Dict[str, int]] = None,
 ) -> xr.Dataset:
     """
-    Opens and merges multiple datasets that that contain individual variables
-    into a single dataset
+    Merges the files of individual variables into the layout of the prebuilt
+    datasets, see `create_time_series_dataset_classic` for the parameters
 
     Parameters
     ----------
-    src_directory: str
-        The directory that contains the input datasets
-    dst_directory: str
-    dataset_name: str
-    input_variables: Sequence
-        The input variables to be merged into the new dataset
-    output_variables: Sequence, optional
-        The output variables to be merged into the new dataset
-        If no output variables are provided the input set is used
-    constants: DefaultDict, optional
-        A set of constants to add to the merged dataset, default None
-    prefix: str, optional
-        The prefix of the input datasets, default None
-    suffix: str, optional
-        The suffix of the input datasets, default None
-    batch_size: str, optional
-        The chunk size to use for the input datasets, default 32
-    scaling: DictConfig, optional
-        Scale factors applied to the listed variables, default None
-    overwrite: bool, optional
-        IF an existing dataset exists at the destination replace it, default False
+    chunks: Dict[str, int], optional
+        Dask chunks the input files are opened with, keeping the merged dataset
+        lazy. If None the variables are loaded into memory, default None
 
     Returns
     -------
     xr.Dataset: The merged dataset
     """
-    dst_zarr = os.path.join(dst_directory, dataset_name + ".zarr")
-    file_exists = os.path.exists(dst_zarr)
-
-    if file_exists and not overwrite:
-        logger.info("opening input datasets")
-        return open_time_series_dataset_classic_prebuilt(
-            directory=dst_directory,
-            dataset_name=dataset_name,
-            constants=constants is not None,
-        )
-
     output_variables = output_variables or input_variables
     all_variables = np.union1d(input_variables, output_variables)
     prefix = prefix or ""
     suffix = suffix or ""
 
-    merge_time = time.time()
-    logger.info("merging input datasets")
-
     datasets = []
     remove_attrs = ["varlev", "mean", "std"]
     for variable in all_variables:
@@ -291,6 +299,8 @@ def create_time_series_dataset_classic(
             ds = xr.open_dataset(file_name)
         if "varlev" in ds.dims:
             ds = ds.isel(varlev=0)
+        if chunks is not None:
+            ds = ds.chunk({dim: n for dim, n in chunks.items() if dim in ds.dims})
 
         for attr in remove_attrs:
             if attr in ds.indexes or attr in ds.variables:
@@ -349,6 +359,91 @@ def create_time_series_dataset_classic(
         )
         result["constants"] = constants_da
 
+    return result
+
+
+def create_time_series_dataset_classic(
+    src_directory: str,
+    dst_directory: str,
+    dataset_name: str,
+    input_variables: Sequence,
+    output_variables: Optional[Sequence] = None,
+    constants: Optional[DefaultDict] = None,
+    prefix: Optional[str] = None,
+    suffix: Optional[str] = None,
+    batch_size: int = 32,
+    scaling: Optional[DictConfig] = None,
+    overwrite: bool = False,
+    add_insolation: bool = False,
+) -> xr.Dataset:
+    """
+    Opens and merges multiple datasets that that contain individual variables
+    into a single dataset
+
+    Parameters
+    ----------
+    src_directory: str
+        The directory that contains the input datasets
+    dst_directory: str
+    dataset_name: str
+    input_variables: Sequence
+        The input variables to be merged into the new dataset
+    output_variables: Sequence, optional
+        The output variables to be merged into the new dataset
+        If no output variables are provided the input set is used
+    constants: DefaultDict, optional
+        A set of constants to add to the merged dataset, default None
+    prefix: str, optional
+        The prefix of the input datasets, default None
+    suffix: str, optional
+        The suffix of the input datasets, default None
+    batch_size: str, optional
+        The chunk size to use for the input datasets, default 32
+    scaling: DictConfig, optional
+        Scale factors applied to the listed variables, default None
+    overwrite: bool, optional
+        IF an existing dataset exists at the destination replace it, default False
+    add_insolation: bool, optional
+        Precompute the insolation of every time step into the `insolation`
+        variable, which the datasets read instead of computing it, default False
+
+    Returns
+    -------
+    xr.Dataset: The merged dataset
+    """
+    dst_zarr = os.path.join(dst_directory, dataset_name + ".zarr")
+    file_exists = os.path.exists(dst_zarr)
+
+    if file_exists and not overwrite:
+        logger.info("opening input datasets")
+        result = open_time_series_dataset_classic_prebuilt(
+            directory=dst_directory,
+            dataset_name=dataset_name,
+            constants=constants is not None,
+        )
+        if add_insolation and "insolation" not in result.data_vars:
+            logger.info(
+                "dataset %s has no precomputed insolation, rebuild it with "
+                "overwrite=True to avoid computing it while loading",
+                dst_zarr,
+            )
+        return result
+
+    merge_time = time.time()
+    logger.info("merging input datasets")
+    result = _merge_time_series_dataset_classic(
+        src_directory=src_directory,
+        input_variables=input_variables,
+        output_variables=output_variables,
+        constants=constants,
+        prefix=prefix,
+        suffix=suffix,
+        scaling=scaling,
+    )
+
+    if add_insolation:
+        result["insolation"] = insolation_dataarray(result, chunk_size=batch_size)
+
     logger.info("merged datasets in %0.1f s", time.time() - merge_time)
     logger.info("writing unified dataset to file (takes long!)")
 
@@ -364,6 +459,362 @@ def create_time_series_dataset_classic(
     return result
 
 
+def _time_regions(start: int, stop: int, size: int) -> List[List[int]]:
+    """Splits the time steps [start, stop) at the multiples of `size`"""
+    edges = [start] + list(range((start // size + 1) * size, stop, size)) + [stop]
+    return [[a, b] for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def _time_dependent(dataset: xr.Dataset) -> List[str]:
+    """Names of the data variables of a dataset with a time dimension"""
+    return [name for name, var in dataset.data_vars.items() if "time" in var.dims]
+
+
+def _open_build_source(
+    merge_kwargs: Dict[str, Any], time_chunk_size: int, add_insolation: bool
+) -> xr.Dataset:
+    """Lazily merged source files, with the time dependent variables in chunks of
+    `time_chunk_size` time steps of all channels and faces"""
+    source = _merge_time_series_dataset_classic(
+        **merge_kwargs, chunks={"time": time_chunk_size}
+    )
+    if add_insolation:
+        source["insolation"] = insolation_dataarray(source, chunk_size=time_chunk_size)
+    for name in _time_dependent(source):
+        chunks = {dim: -1 for dim in source[name].dims}
+        source[name] = source[name].chunk({**chunks, "time": time_chunk_size})
+    return source
+
+
+def _last_source_time(merge_kwargs: Dict[str, Any]) -> np.datetime64:
+    """Last time step of the source files, read from their time coordinate only"""
+    output_variables = merge_kwargs["output_variables"]
+    input_variables = merge_kwargs["input_variables"]
+    last = []
+    for variable in np.union1d(input_variables, output_variables or input_variables):
+        file_name = _get_file_name(
+            merge_kwargs["src_directory"],
+            merge_kwargs["prefix"] or "",
+            variable,
+            merge_kwargs["suffix"] or "",
+        )
+        with xr.open_dataset(file_name) as ds:
+            dim = "sample" if "sample" in ds.sizes else "time"
+            last.append(ds[dim].values.max())
+    return max(last)
+
+
+def _write_time_region(
+    merge_kwargs: Dict[str, Any],
+    time_chunk_size: int,
+    add_insolation: bool,
+    dst_zarr: str,
+    region: Sequence[int],
+    shift: int,
+) -> Sequence[int]:
+    """Writes the time steps [start, stop) of a dataset from its source files"""
+    start, stop = region
+    # Processes of the pool already run in parallel
+    with dask.config.set(scheduler="synchronous"):
+        source = _open_build_source(merge_kwargs, time_chunk_size, add_insolation)
+        data = source[_time_dependent(source)].isel(
+            time=slice(start + shift, stop + shift)
+        )
+        data = data.reset_coords(drop=True).drop_vars("time").load()
+    data.to_zarr(dst_zarr, region={"time": slice(start, stop)})
+    return region
+
+
+def _save_progress(path: str, progress: Dict[str, Any]) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def rechunk_plan(
+    dataset: xr.Dataset, window_length: int, time_chunk_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Estimates the data read from a dataset to load one training sample
+
+    A sample reads `window_length` consecutive time steps of all channels and faces of
+    the time dependent variables, starting at a uniformly random time step. Every
+    chunk it overlaps is read and decompressed entirely, sizes are uncompressed.
+
+    Parameters
+    ----------
+    dataset: xr.Dataset
+        The dataset, its variables chunked as stored
+    window_length: int
+        Number of consecutive time steps read by a sample
+    time_chunk_size: int, optional
+        Time steps per chunk of a planned layout holding all other dimensions in
+        single chunks. If None the chunks of the dataset are used, default None
+
+    Returns
+    -------
+    Dict[str, Any]: Chunk shape, chunks and bytes read per sample and read
+        amplification of every time dependent variable, and their totals
+    """
+    report = {"window_length": window_length, "variables": {}}
+    bytes_read = bytes_used = 0
+    for name in _time_dependent(dataset):
+        var = dataset[name]
+        if time_chunk_size is not None:
+            chunk_shape = tuple(
+                min(time_chunk_size, n) if dim == "time" else n
+                for dim, n in var.sizes.items()
+            )
+        elif var.chunks is not None:
+            chunk_shape = tuple(max(c) for c in var.chunks)
+        else:
+            chunk_shape = tuple(var.encoding.get("chunks", var.shape))
+        time_axis = var.dims.index("time")
+        time_chunk = chunk_shape[time_axis]
+        # Bytes of one time step of all channels and faces
+        step_bytes = var.dtype.itemsize * var.size // var.sizes["time"]
+        # Time chunks overlapped by a window, averaged over its offsets in a chunk
+        offsets = np.arange(time_chunk)
+        time_chunks = float(np.mean((offsets + window_length - 1) // time_chunk + 1))
+        other_chunks = int(
+            np.prod(
+                [
+                    -(-n // c)
+                    for i, (n, c) in enumerate(zip(var.shape, chunk_shape))
+                    if i != time_axis
+                ]
+            )
+        )
+        read = time_chunks * time_chunk * step_bytes
+        used = window_length * step_bytes
+        report["variables"][name] = {
+            "chunk_shape": list(chunk_shape),
+            "chunk_bytes": time_chunk * step_bytes // other_chunks,
+            "chunks_per_sample": time_chunks * other_chunks,
+            "bytes_per_sample": read,
+            "read_amplification": read / used,
+        }
+        bytes_read += read
+        bytes_used += used
+    report["bytes_per_sample"] = bytes_read
+    report["read_amplification"] = bytes_read / max(bytes_used, 1)
+    return report
+
+
+def build_time_series_dataset_classic(
+    src_directory: str,
+    dst_directory: str,
+    dataset_name: str,
+    input_variables: Sequence,
+    output_variables: Optional[Sequence] = None,
+    constants: Optional[DefaultDict] = None,
+    prefix: Optional[str] = None,
+    suffix: Optional[str] = None,
+    batch_size: int = 32,
+    scaling: Optional[DictConfig] = None,
+    overwrite: bool = False,
+    add_insolation: bool = False,
+    time_chunk_size: int = 8,
+    window_length: Optional[int] = None,
+    num_workers: int = 0,
+    chunks_per_task: int = 16,
+) -> xr.Dataset:
+    """
+    Builds, resumes or extends a prebuilt dataset in parallel, chunked for training
+
+    Creates the dataset of `create_time_series_dataset_classic`, with the time
+    dependent variables stored in chunks of `time_chunk_size` time steps holding all
+    channels and faces, so that the window of consecutive time steps of a sample
+    reads a few whole chunks. The time steps are written in regions of
+    `chunks_per_task` chunks by a pool of `num_workers` processes, each reading its
+    region from the source files.
+
+    The regions left to write are recorded in `{dataset_name}.zarr.progress.json`,
+    calling the builder again after an interruption only writes those. Time steps of
+    the source files after the last one of an existing dataset, such as a new year,
+    are appended to it. A complete dataset without new time steps in the source
+    files is opened as is, reading only the time coordinates of the source files.
+    Otherwise a rechunk plan estimating the data read per sample is logged
+    and saved to `{dataset_name}.zarr.plan.json`.
+
+    Parameters
+    ----------
+    src_directory: str
+        The directory that contains the input datasets
+    dst_directory: str
+        The directory of the built dataset
+    dataset_name: str
+        The name of the built dataset
+    input_variables: Sequence
+        The input variables to be merged into the new dataset
+    output_variables: Sequence, optional
+        The output variables to be merged into the new dataset
+        If no output variables are provided the input set is used
+    constants: DefaultDict, optional
+        A set of constants to add to the merged dataset, default None
+    prefix: str, optional
+        The prefix of the input datasets, default None
+    suffix: str, optional
+        The suffix of the input datasets, default None
+    batch_size: int, optional
+        Not used, kept for compatibility with `create_time_series_dataset_classic`,
+        default 32
+    scaling: DictConfig, optional
+        Scale factors applied to the listed variables, default None
+    overwrite: bool, optional
+        Remove an existing dataset and build it again, default False
+    add_insolation: bool, optional
+        Precompute the insolation of every time step into the `insolation`
+        variable, default False
+    time_chunk_size: int, optional
+        Number of time steps of a chunk, usually the number of time steps of a
+        sample, default 8
+    window_length: int, optional
+        Number of time steps of a sample, used for the rechunk plan. If None
+        `time_chunk_size` is used, default None
+    num_workers: int, optional
+        Number of processes writing regions, 0 writes them in this process,
+        default 0
+    chunks_per_task: int, optional
+        Number of time chunks written by a task, default 16
+
+    Returns
+    -------
+    xr.Dataset: The built dataset
+    """
+    dst_zarr = os.path.join(dst_directory, dataset_name + ".zarr")
+    progress_path = dst_zarr + ".progress.json"
+    if overwrite:
+        shutil.rmtree(dst_zarr, ignore_errors=True)
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+
+    merge_kwargs = dict(
+        src_directory=src_directory,
+        input_variables=input_variables,
+        output_variables=output_variables,
+        constants=constants,
+        prefix=prefix,
+        suffix=suffix,
+        scaling=scaling,
+    )
+    if os.path.exists(dst_zarr) and not os.path.exists(progress_path):
+        stored = xr.open_zarr(dst_zarr).time.values
+        if _last_source_time(merge_kwargs) <= stored[-1]:
+            logger.info("%s is up to date with its source files", dst_zarr)
+            return open_time_series_dataset_classic_prebuilt(
+                directory=dst_directory,
+                dataset_name=dataset_name,
+                constants=constants is not None,
+            )
+
+    source = _open_build_source(merge_kwargs, time_chunk_size, add_insolation)
+    os.makedirs(dst_directory, exist_ok=True)
+
+    plan = rechunk_plan(source, window_length or time_chunk_size, time_chunk_size)
+    logger.info(
+        "layout of %s: %d time steps per chunk, %.1f MB and %.2fx the sample size "
+        "read per sample",
+        dst_zarr,
+        time_chunk_size,
+        plan["bytes_per_sample"] / 1e6,
+        plan["read_amplification"],
+    )
+    with open(dst_zarr + ".plan.json", "w") as f:
+        json.dump(plan, f, indent=2)
+
+    if os.path.exists(progress_path):
+        with open(progress_path) as f:
+            progress = json.load(f)
+        logger.info("resuming build of %s", dst_zarr)
+    else:
+        # Regions are aligned to chunks, no two tasks write the same chunk
+        region_size = time_chunk_size * chunks_per_task
+        if not os.path.exists(dst_zarr):
+            start, shift = 0, 0
+            num_new = source.sizes["time"]
+        else:
+            stored = xr.open_zarr(dst_zarr).time.values
+            new = np.flatnonzero(source.time.values > stored[-1])
+            start, num_new = len(stored), len(new)
+            shift = int(new[0]) - start if num_new else 0
+        progress = {
+            "start": start,
+            "stop": start + num_new,
+            "shift": shift,
+            "extended": False,
+            "pending": _time_regions(start, start + num_new, region_size),
+        }
+        if num_new:
+            _save_progress(progress_path, progress)
+
+    start, stop, shift = progress["start"], progress["stop"], progress["shift"]
+    if not progress["extended"] and stop > start:
+        # Create or extend the arrays, their data is written by the tasks
+        template = source.isel(time=slice(start + shift, stop + shift))
+        if start == 0:
+            for var in template.variables.values():
+                if "time" not in var.dims:
+                    var.load()
+            template.to_zarr(dst_zarr, mode="w", compute=False)
+        elif xr.open_zarr(dst_zarr).sizes["time"] == start:
+            template = template[_time_dependent(template)].reset_coords(drop=True)
+            # The last stored chunk may be partial, the tasks align their writes
+            template.to_zarr(
+                dst_zarr, append_dim="time", compute=False, safe_chunks=False
+            )
+        progress["extended"] = True
+        _save_progress(progress_path, progress)
+
+    pending = list(progress["pending"])
+    if pending:
+        logger.info(
+            "writing time steps %d to %d of %s in %d tasks",
+            start,
+            stop,
+            dst_zarr,
+            len(pending),
+        )
+        write_fn = partial(
+            _write_time_region,
+            merge_kwargs,
+            time_chunk_size,
+            add_insolation,
+            dst_zarr,
+            shift=shift,
+        )
+
+        def _done(region):
+            progress["pending"].remove(region)
+            _save_progress(progress_path, progress)
+            logger.debug("wrote time steps %d to %d", *region)
+
+        if num_workers > 0:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(num_workers, mp_context=ctx) as pool:
+                futures = [pool.submit(write_fn, region) for region in pending]
+                try:
+                    for future in as_completed(futures):
+                        _done(future.result())
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        else:
+            for region in pending:
+                _done(write_fn(region))
+
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+
+    return open_time_series_dataset_classic_prebuilt(
+        directory=dst_directory,
+        dataset_name=dataset_name,
+        constants=constants is not None,
+    )
+
+
 class TimeSeriesDataModule:
     """pytorch-lightning module for complete model train, validation, and test data loading. Uses
     dlwp.data.data_loading.TimeSeriesDataset under-the-hood. Loaded data files follow the naming scheme
@@ -398,6 +849,8 @@ class TimeSeriesDataModule:
         pin_memory: bool = True,
         prebuilt_dataset: bool = True,
         forecast_init_times: Optional[Sequence] = None,
+        build_workers: Optional[int] = None,
+        time_chunk_size: Optional[int] = None,
     ):
         """
         Parameters
@@ -468,6 +921,14 @@ class TimeSeriesDataModule:
                 - this is only applied to the test dataloader
                 - providing this parameter configures the data loader to only produce this number of samples, and
                     NOT produce any target array.
+        build_workers: int, optional
+            Number of processes building the prebuilt dataset with
+            `build_time_series_dataset_classic`, chunked for the sample windows,
+            resumable and extended with new time steps of the source files. If None
+            it is built by `create_time_series_dataset_classic`, default None
+        time_chunk_size: int, optional
+            Number of time steps of a chunk of a dataset built with `build_workers`.
+            If None the number of time steps of a sample is used, default None
         """
         super().__init__()
         self.src_directory = src_directory
@@ -495,6 +956,8 @@ class TimeSeriesDataModule:
         self.pin_memory = pin_memory
         self.prebuilt_dataset = prebuilt_dataset
         self.forecast_init_times = forecast_init_times
+        self.build_workers = build_workers
+        self.time_chunk_size = time_chunk_size
 
         self.train_dataset = None
         self.val_dataset = None
@@ -522,10 +985,34 @@ class TimeSeriesDataModule:
             else self.test_dataset.get_constants()
         )
 
+    def _sample_window_length(self) -> int:
+        """Number of consecutive data time steps of a sample"""
+        convert = TimeSeriesDataset._convert_time_step
+        data_time_step = convert(self.data_time_step)
+        interval = convert(self.time_step) // data_time_step
+        gap = convert(self.gap if self.gap is not None else self.time_step)
+        return (
+            interval * (self.input_time_dim + self.output_time_dim - 2)
+            + 1
+            + gap // data_time_step
+        )
+
+    def _create_fn(self):
+        """Function creating the prebuilt dataset"""
+        if self.build_workers is None:
+            return create_time_series_dataset_classic
+        window_length = self._sample_window_length()
+        return partial(
+            build_time_series_dataset_classic,
+            time_chunk_size=self.time_chunk_size or window_length,
+            window_length=window_length,
+            num_workers=self.build_workers,
+        )
+
     def setup(self) -> None:
         """Setup the datasets used for this DataModule"""
         if self.data_format == "classic":
-            create_fn = create_time_series_dataset_classic
+            create_fn = self._create_fn()
             open_fn = (
                 open_time_series_dataset_classic_prebuilt
                 if self.prebuilt_dataset
@@ -554,6 +1041,7 @@ class TimeSeriesDataModule:
                         batch_size=self.dataset_batch_size,
                         scaling=self.scaling,
                         overwrite=False,
+                        add_insolation=self.add_insolation,
                     )
 
                 # wait for rank 0 to complete, because then the files are guaranteed to exist
@@ -588,6 +1076,7 @@ class TimeSeriesDataModule:
                     batch_size=self.dataset_batch_size,
                     scaling=self.scaling,
                     overwrite=False,
+                    add_insolation=self.add_insolation,
                 )
 
                 dataset = open_fn(
@@ -835,6 +1324,8 @@ class CoupledTimeSeriesDataModule(TimeSeriesDataModule):
         add_train_noise: Optional[bool] = False,
         train_noise_params: Optional[DictConfig] = None,
         train_noise_seed: Optional[int] = 42,
+        build_workers: Optional[int] = None,
+        time_chunk_size: Optional[int] = None,
     ):
         """
         Parameters
@@ -914,6 +1405,14 @@ class CoupledTimeSeriesDataModule(TimeSeriesDataModule):
             Dictionary containing parameters for adding noise to the training data
         train_noise_seed: int, optional
             Seed for the random number generator for adding noise to the training data, default 42
+        build_workers: int, optional
+            Number of processes building the prebuilt dataset with
+            `build_time_series_dataset_classic`, chunked for the sample windows,
+            resumable and extended with new time steps of the source files. If None
+            it is built by `create_time_series_dataset_classic`, default None
+        time_chunk_size: int, optional
+            Number of time steps of a chunk of a dataset built with `build_workers`.
+            If None the number of time steps of a sample is used, default None
         """
         self.couplings = couplings
         self.add_train_noise = add_train_noise
@@ -947,6 +1446,8 @@ class CoupledTimeSeriesDataModule(TimeSeriesDataModule):
             pin_memory,
             prebuilt_dataset,
             forecast_init_times,
+            build_workers,
+            time_chunk_size,
         )
 
     def _get_coupled_vars(self):
@@ -959,7 +1460,7 @@ class CoupledTimeSeriesDataModule(TimeSeriesDataModule):
     def setup(self) -> None:
         """Setup the datasets used for this DataModule"""
         if self.data_format == "classic":
-            create_fn = create_time_series_dataset_classic
+            create_fn = self._create_fn()
             open_fn = (
                 open_time_series_dataset_classic_prebuilt
                 if self.prebuilt_dataset
@@ -989,6 +1490,7 @@ class CoupledTimeSeriesDataModule(TimeSeriesDataModule):
                         batch_size=self.dataset_batch_size,
                         scaling=self.scaling,
                         overwrite=False,
+                        add_insolation=self.add_insolation,
                     )
 
                 # wait for rank 0 to complete, because then the files are guaranteed to exist
@@ -1023,6 +1525,7 @@ class CoupledTimeSeriesDataModule(TimeSeriesDataModule):
                     batch_size=self.dataset_batch_size,
                     scaling=self.scaling,
                     overwrite=False,
+                    add_insolation=self.add_insolation,
                 )
 
                 dataset = open_fn(
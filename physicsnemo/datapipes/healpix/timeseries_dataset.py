@@ -18,7 +18,7 @@ import logging
 import time
 import warnings
 from dataclasses import dataclass
-from typing import Optional, Sequence, Union
+from typing import Callable, List, Optional, Sequence, Union
 
 import numpy as np
 import pandas as pd
@@ -46,6 +46,61 @@ class MetaData(DatapipeMetaData):
     ddp_sharding: bool = False
 
 
+class _WindowCache:
+    """Ring buffer of the normalized time steps of the most recent batches
+
+    Time step `t` is kept at position `t % capacity`. A request for a window
+    overlapping the cached time steps only loads the steps following them, so
+    sequential access loads every time step once.
+
+    Parameters
+    ----------
+    capacity: int
+        Number of time steps kept, at least the length of a requested window
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buffers = None
+        self.start = 0
+        self.stop = 0
+
+    def update(
+        self, start: int, stop: int, load: Callable[[int, int], List[np.ndarray]]
+    ) -> None:
+        """Make the time steps `start` to `stop` available
+
+        Parameters
+        ----------
+        start: int
+            First time step of the window
+        stop: int
+            End of the window, at most `capacity` steps after `start`
+        load: Callable[[int, int], List[np.ndarray]]
+            Loads the arrays of the time steps between its two arguments
+        """
+        if self.buffers is None or start < self.start or start > self.stop:
+            self.start = self.stop = start
+        load_start = max(self.stop, start)
+        if stop <= load_start:
+            return
+        arrays = load(load_start, stop)
+        if self.buffers is None:
+            self.buffers = [
+                np.empty((self.capacity,) + a.shape[1:], dtype="float32")
+                for a in arrays
+            ]
+        positions = np.arange(load_start, stop) % self.capacity
+        for buffer, array in zip(self.buffers, arrays):
+            buffer[positions] = array
+        self.stop = stop
+        self.start = max(self.start, stop - self.capacity)
+
+    def gather(self, times: np.ndarray, index: int = 0) -> np.ndarray:
+        """Gather the time steps `times`, of any shape, of the `index`-th array"""
+        return self.buffers[index][times % self.capacity]
+
+
 class TimeSeriesDataset(Dataset, Datapipe):
     """
     Dataset for sampling from continuous time-series data, compatible with pytorch data loading.
@@ -65,6 +120,7 @@ class TimeSeriesDataset(Dataset, Datapipe):
         add_insolation: bool = False,
         forecast_init_times: Optional[Sequence] = None,
         meta: DatapipeMetaData = MetaData(),
+        window_cache: bool = True,
     ):
         """
         Parameters
@@ -101,6 +157,11 @@ class TimeSeriesDataset(Dataset, Datapipe):
                     NOT produce any target array.
         meta: DatapipeMetaData, optional
             Data class for storing essential meta data
+        window_cache: bool, optional
+            Keep the normalized time steps of the most recent batch, so that the
+            next batch only loads the time steps it does not share with it. With
+            sequential access, such as validation and forecasts, every time step is
+            loaded and normalized once, default True
         """
         Datapipe.__init__(
             self,
@@ -180,6 +241,11 @@ class TimeSeriesDataset(Dataset, Datapipe):
             )
             for n in range(self.batch_size)
         ]
+        # The same indices as arrays, gathering all samples of a batch at once
+        self._input_index_array = np.array(self._input_indices, dtype="int")
+        self._output_index_array = np.array(self._output_indices, dtype="int")
+        self.window_cache = window_cache
+        self._window = _WindowCache(self._window_capacity())
 
         self.spatial_dims = (
             self.ds.sizes["face"],
@@ -208,6 +274,40 @@ class TimeSeriesDataset(Dataset, Datapipe):
             # [C, F, H, W] -> [F, C, H, W]
             self.constants = np.transpose(const, axes=(1, 0, 2, 3))
 
+    def _window_capacity(self) -> int:
+        """Number of time steps loaded for a batch"""
+        return self.batch_size + self._window_length
+
+    def _load_normalized(self, start: int, stop: int) -> List[np.ndarray]:
+        """Load and normalize the inputs, and targets, of the time steps `start` to
+        `stop`"""
+        batch = {"time": slice(start, stop)}
+        input_array = self.ds["inputs"].isel(**batch).to_numpy()
+        arrays = [
+            (input_array - self.input_scaling["mean"]) / self.input_scaling["std"]
+        ]
+        if not self.forecast_mode:
+            target_array = self.ds["targets"].isel(**batch).to_numpy()
+            arrays.append(
+                (target_array - self.target_scaling["mean"])
+                / self.target_scaling["std"]
+            )
+        if self.add_insolation and not self.forecast_mode:
+            arrays.append(self._insolation(self.ds.time.values[start:stop]))
+        return arrays
+
+    def _insolation(self, times: np.ndarray) -> np.ndarray:
+        """Insolation at `times`, of shape [T, 1, F, H, W]
+
+        Gathered from the `insolation` variable precomputed in prebuilt datasets
+        when it covers all `times`, computed otherwise.
+        """
+        if "insolation" in self.ds.data_vars:
+            index = self.ds.indexes["time"].get_indexer(times)
+            if (index >= 0).all():
+                return self.ds["insolation"].isel(time=index).to_numpy()[:, None]
+        return insolation(times, self.ds.lat.values, self.ds.lon.values)[:, None]
+
     def get_constants(self):
         """Returns the constants used in this dataset
 
@@ -405,19 +505,13 @@ class TimeSeriesDataset(Dataset, Datapipe):
         # remark: load first then normalize
         torch.cuda.nvtx.range_push("TimeSeriesDataset:__getitem__:load_batch")
         time_index, this_batch = self._get_time_index(item)
-        batch = {"time": slice(*time_index)}
+        start, stop = time_index[0], min(time_index[1], self.ds.sizes["time"])
         load_time = time.time()
 
-        input_array = self.ds["inputs"].isel(**batch).to_numpy()
-        input_array = (input_array - self.input_scaling["mean"]) / self.input_scaling[
-            "std"
-        ]
-
-        if not self.forecast_mode:
-            target_array = self.ds["targets"].isel(**batch).to_numpy()
-            target_array = (
-                target_array - self.target_scaling["mean"]
-            ) / self.target_scaling["std"]
+        window = (
+            self._window if self.window_cache else _WindowCache(self._window_capacity())
+        )
+        window.update(start, stop, self._load_normalized)
 
         logger.log(5, "loaded batch data in %0.2f s", time.time() - load_time)
         torch.cuda.nvtx.range_pop()
@@ -426,41 +520,21 @@ class TimeSeriesDataset(Dataset, Datapipe):
         compute_time = time.time()
         # Insolation
         if self.add_insolation:
-            sol = insolation(
-                self._get_forecast_sol_times(item),
-                self.ds.lat.values,
-                self.ds.lon.values,
-            )[:, None]
-            decoder_inputs = np.empty(
-                (this_batch, self.input_time_dim + self.output_time_dim, 1)
-                + self.spatial_dims,
-                dtype="float32",
-            )
+            if self.forecast_mode:
+                # Output times of forecasts are outside of the loaded window
+                sol = self._insolation(self._get_forecast_sol_times(item))
+                decoder_inputs = np.broadcast_to(sol, (this_batch,) + sol.shape)
+                decoder_inputs = decoder_inputs.astype("float32")
+            else:
+                sol_indices = np.concatenate(
+                    (self._input_index_array, self._output_index_array), axis=1
+                )
+                decoder_inputs = window.gather(start + sol_indices[:this_batch], -1)
 
-        # Get buffers for the batches, which we'll fill in iteratively.
-        inputs = np.empty(
-            (this_batch, self.input_time_dim, self.ds.sizes["channel_in"])
-            + self.spatial_dims,
-            dtype="float32",
-        )
+        # Gather the time steps of all sample windows, of shape [B, T, C, F, H, W]
+        inputs = window.gather(start + self._input_index_array[:this_batch])
         if not self.forecast_mode:
-            targets = np.empty(
-                (this_batch, self.output_time_dim, self.ds.sizes["channel_out"])
-                + self.spatial_dims,
-                dtype="float32",
-            )
-
-        # Iterate over valid sample windows
-        for sample in range(this_batch):
-            inputs[sample] = input_array[self._input_indices[sample]]
-            if not self.forecast_mode:
-                targets[sample] = target_array[self._output_indices[sample]]
-            if self.add_insolation:
-                decoder_inputs[sample] = (
-                    sol
-                    if self.forecast_mode
-                    else sol[self._input_indices[sample] + self._output_indices[sample]]
-                )
+            targets = window.gather(start + self._output_index_array[:this_batch], 1)
 
         inputs_result = [inputs]
         if self.add_insolation:
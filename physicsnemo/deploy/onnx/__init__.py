@@ -14,4 +14,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .utils import export_to_onnx_stream, run_onnx_inference
+from .utils import (
+    OrtSessionConfig,
+    OrtSessionPool,
+    export_to_onnx_stream,
+    get_ort_session,
+    get_session_pool,
+    run_onnx_inference,
+)
@@ -14,9 +14,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import hashlib
 import io
+import json
 import logging
+import os
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import torch
 import torch.nn as nn
 
@@ -25,8 +36,6 @@ try:
 except ImportError:
     ort = None
 
-from typing import Tuple, Union
-
 Tensor = torch.Tensor
 logger = logging.getLogger("__name__")
 
@@ -34,13 +43,13 @@ logger = logging.getLogger("__name__")
 def check_ort_install(func):
     """Decorator to check if ONNX runtime is installed"""
 
+    @functools.wraps(func)
     def _wrapper_ort_install(*args, **kwargs):
         if ort is None:
             raise ModuleNotFoundError(
                 "ONNXRuntime is not installed. 'pip install \
                 onnxruntime onnxruntime_gpu'"
             )
-        func(*args, **kwargs)
         return func(*args, **kwargs)
 
     return _wrapper_ort_install
@@ -50,6 +59,8 @@ def export_to_onnx_stream(
     model: nn.Module,
     invars: Union[Tensor, Tuple[Tensor, ...]],
     verbose: bool = False,
+    dynamic_batch: bool = False,
+    opset_version: int = 15,
 ) -> bytes:
     """Exports PyTorch model to byte stream instead of a file
 
@@ -61,6 +72,11 @@ def export_to_onnx_stream(
         Input tensor(s)
     verbose : bool, optional
         Print out a human-readable representation of the model, by default False
+    dynamic_batch : bool, optional
+        Export the leading dimension of all inputs and outputs as a dynamic "batch"
+        axis, so the model can run with any batch size, by default False
+    opset_version : int, optional
+        ONNX opset version, by default 15
 
     Returns
     -------
@@ -89,25 +105,126 @@ def export_to_onnx_stream(
     else:
         model_device = "cpu"
 
+    model = model.cpu()
+    export_kwargs = {}
+    if dynamic_batch:
+        # Named inputs and outputs are needed to mark their axes as dynamic
+        with torch.no_grad():
+            outvars = model(*invars)
+        num_outputs = 1 if isinstance(outvars, Tensor) else len(outvars)
+        input_names = [f"input{i}" for i in range(len(invars))]
+        output_names = [f"output{i}" for i in range(num_outputs)]
+        export_kwargs = dict(
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes={name: {0: "batch"} for name in input_names + output_names},
+        )
+
     with io.BytesIO() as onnx_model:
         # Export to ONNX.
         torch.onnx.export(
-            model.cpu(),
+            model,
             invars,
             onnx_model,
             operator_export_type=torch.onnx.OperatorExportTypes.ONNX,
-            opset_version=15,
+            opset_version=opset_version,
             verbose=verbose,
+            **export_kwargs,
         )
         # Move model back to original device
         model.to(model_device)
         return onnx_model.getvalue()
 
 
+@dataclass(frozen=True)
+class OrtSessionConfig:
+    """Options of ONNX runtime sessions, persistable as JSON
+
+    Parameters
+    ----------
+    graph_optimization_level : str, optional
+        One of "disable", "basic", "extended" or "all", by default "all"
+    intra_op_num_threads : int, optional
+        Threads used to parallelize an operator, 0 lets ORT decide, by default 0
+    inter_op_num_threads : int, optional
+        Threads used to run operators in parallel, 0 lets ORT decide, by default 0
+    execution_mode : str, optional
+        "sequential" or "parallel" execution of the graph, by default "sequential"
+    enable_mem_pattern : bool, optional
+        Preallocate memory based on the observed allocation pattern, by default True
+    optimized_model_dir : Optional[str], optional
+        If set, the optimized graph of every model is saved in this directory and
+        later sessions load it instead of optimizing the model again, by default None
+    """
+
+    graph_optimization_level: str = "all"
+    intra_op_num_threads: int = 0
+    inter_op_num_threads: int = 0
+    execution_mode: str = "sequential"
+    enable_mem_pattern: bool = True
+    optimized_model_dir: Optional[str] = None
+
+    def save(self, path: str) -> None:
+        """Saves the config as JSON"""
+        with open(path, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "OrtSessionConfig":
+        """Loads a config saved with `save`"""
+        with open(path, "r") as f:
+            return cls(**json.load(f))
+
+    def digest(self) -> str:
+        """Short hash of the options that change the optimized graph"""
+        return hashlib.sha256(
+            json.dumps(asdict(self), sort_keys=True).encode()
+        ).hexdigest()[:16]
+
+    @check_ort_install
+    def session_options(self) -> "ort.SessionOptions":
+        """ONNX runtime session options of this config"""
+        levels = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }
+        modes = {
+            "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+            "parallel": ort.ExecutionMode.ORT_PARALLEL,
+        }
+        if self.graph_optimization_level not in levels:
+            raise ValueError(
+                f"Invalid graph optimization level {self.graph_optimization_level}, "
+                f"expected one of {list(levels)}"
+            )
+        if self.execution_mode not in modes:
+            raise ValueError(
+                f"Invalid execution mode {self.execution_mode}, "
+                f"expected one of {list(modes)}"
+            )
+        options = ort.SessionOptions()
+        options.graph_optimization_level = levels[self.graph_optimization_level]
+        options.intra_op_num_threads = self.intra_op_num_threads
+        options.inter_op_num_threads = self.inter_op_num_threads
+        options.execution_mode = modes[self.execution_mode]
+        options.enable_mem_pattern = self.enable_mem_pattern
+        return options
+
+
+def _providers(device: Union[str, torch.device]) -> List[str]:
+    providers = ["CPUExecutionProvider"]
+    if "cuda" in str(device):
+        providers = ["CUDAExecutionProvider"] + providers
+    return providers
+
+
 @check_ort_install
 def get_ort_session(
     model: Union[bytes, str],
     device: torch.device = "cuda",
+    config: Optional[OrtSessionConfig] = None,
 ):
     """Create a ORT session for performing inference of an onnx model
 
@@ -117,29 +234,264 @@ def get_ort_session(
         ONNX model byte string or file name/path
     device : torch.device, optional
         Device to run ORT, by default "cuda"
+    config : Optional[OrtSessionConfig], optional
+        Session options, by default None uses the ORT defaults
 
     Returns
     -------
     ort.InferenceSession
         ONNX runtime session
     """
-    providers = ["CPUExecutionProvider"]
-    if "cuda" in str(device):
-        providers = ["CUDAExecutionProvider"] + providers
-
+    options = config.session_options() if config is not None else None
     # Must run on GPU as Rfft is currently implemented only for GPU.
-    ort_sess = ort.InferenceSession(model, providers=providers)
+    ort_sess = ort.InferenceSession(
+        model, sess_options=options, providers=_providers(device)
+    )
     return ort_sess
 
 
+def _model_digest(model: Union[bytes, str]) -> str:
+    if isinstance(model, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(model).hexdigest()
+    # Files are identified by path and modification time to avoid reading them
+    stat = os.stat(model)
+    key = f"{os.path.abspath(model)}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class _PoolEntry:
+    def __init__(self, max_sessions: int):
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+
+
+class OrtSessionPool:
+    """Pool of ONNX runtime sessions reused across inference calls
+
+    Creating a session parses and optimizes the whole graph, which usually costs much
+    more than running it. Sessions are keyed by the hash of the model, the device and
+    the session config. Up to `sessions_per_model` sessions are created per key for
+    concurrent callers, who otherwise wait for a session to be released.
+
+    Parameters
+    ----------
+    sessions_per_model : int, optional
+        Maximum number of sessions of one model, by default 1
+    max_models : int, optional
+        Maximum number of models with cached sessions, the least recently used model
+        is evicted first, by default 8
+
+    Example
+    -------
+    >>> pool = OrtSessionPool(sessions_per_model=4)
+    >>> with pool.session(onnx_bytes, device="cpu") as sess:  # doctest: +SKIP
+    ...     outputs = sess.run(None, inputs)
+    """
+
+    def __init__(self, sessions_per_model: int = 1, max_models: int = 8):
+        if sessions_per_model < 1:
+            raise ValueError("sessions_per_model must be at least 1")
+        self.sessions_per_model = sessions_per_model
+        self.max_models = max_models
+        self._entries: "OrderedDict[Tuple[str, str, OrtSessionConfig], _PoolEntry]"
+        self._entries = OrderedDict()
+        self._digests: Dict[int, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def _digest(self, model: Union[bytes, str]) -> str:
+        if not isinstance(model, bytes):
+            return _model_digest(model)
+        # Serving calls pass the same bytes object over and over, hash it once
+        cached = self._digests.get(id(model))
+        if cached is not None and cached[0] is model:
+            return cached[1]
+        digest = _model_digest(model)
+        if len(self._digests) >= 4 * self.max_models:
+            self._digests.clear()
+        self._digests[id(model)] = (model, digest)
+        return digest
+
+    def _entry(self, key) -> _PoolEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(self.sessions_per_model)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_models:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            return entry
+
+    def _create(
+        self,
+        model: Union[bytes, str],
+        digest: str,
+        device: str,
+        config: OrtSessionConfig,
+    ):
+        if config.optimized_model_dir is None:
+            return get_ort_session(model, device, config)
+        # Reuse the graph optimized by a previous session, possibly of another process
+        name = f"{digest[:32]}-{config.digest()}-{device.replace(':', '')}.onnx"
+        optimized = os.path.join(config.optimized_model_dir, name)
+        if os.path.exists(optimized):
+            logger.debug(f"Loading optimized ONNX model {optimized}")
+            optimized_config = replace(
+                config, graph_optimization_level="disable", optimized_model_dir=None
+            )
+            return get_ort_session(optimized, device, optimized_config)
+        os.makedirs(config.optimized_model_dir, exist_ok=True)
+        options = config.session_options()
+        # Write to a unique file first, concurrent processes may optimize the same model
+        tmp = f"{optimized}.{os.getpid()}.{threading.get_ident()}.tmp"
+        options.optimized_model_filepath = tmp
+        sess = ort.InferenceSession(
+            model, sess_options=options, providers=_providers(device)
+        )
+        if os.path.exists(tmp):
+            os.replace(tmp, optimized)
+        return sess
+
+    @check_ort_install
+    @contextmanager
+    def session(
+        self,
+        model: Union[bytes, str],
+        device: Union[str, torch.device] = "cuda",
+        config: Optional[OrtSessionConfig] = None,
+    ) -> Iterator["ort.InferenceSession"]:
+        """Checks out a session of `model`, creating it if needed
+
+        Parameters
+        ----------
+        model : Union[bytes, str]
+            ONNX model byte string or file name/path
+        device : Union[str, torch.device], optional
+            Device to run ORT, by default "cuda"
+        config : Optional[OrtSessionConfig], optional
+            Session options, by default None uses `OrtSessionConfig()`
+
+        Yields
+        ------
+        ort.InferenceSession
+            Session only used by the caller until the context exits
+        """
+        device = str(device)
+        config = config or OrtSessionConfig()
+        digest = self._digest(model)
+        entry = self._entry((digest, device, config))
+
+        sess = None
+        try:
+            sess = entry.idle.get_nowait()
+        except queue.Empty:
+            with entry.lock:
+                create = entry.created < entry.max_sessions
+                if create:
+                    entry.created += 1
+            if create:
+                try:
+                    sess = self._create(model, digest, device, config)
+                except BaseException:
+                    with entry.lock:
+                        entry.created -= 1
+                    raise
+            else:
+                sess = entry.idle.get()
+        try:
+            yield sess
+        finally:
+            entry.idle.put(sess)
+
+    def clear(self) -> None:
+        """Drops all cached sessions"""
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+
+
+_session_pool = OrtSessionPool()
+
+
+def get_session_pool() -> OrtSessionPool:
+    """The session pool used by `run_onnx_inference` by default"""
+    return _session_pool
+
+
+_ORT_TYPES = {
+    "tensor(float)": torch.float32,
+    "tensor(double)": torch.float64,
+    "tensor(float16)": torch.float16,
+    "tensor(int64)": torch.int64,
+    "tensor(int32)": torch.int32,
+    "tensor(int16)": torch.int16,
+    "tensor(int8)": torch.int8,
+    "tensor(uint8)": torch.uint8,
+    "tensor(bool)": torch.bool,
+}
+
+
+# Element types of the tensors bound to a session, bfloat16 has no numpy type
+_ELEMENT_TYPES = {
+    torch.float32: np.float32,
+    torch.float64: np.float64,
+    torch.float16: np.float16,
+    torch.int64: np.int64,
+    torch.int32: np.int32,
+    torch.int16: np.int16,
+    torch.int8: np.int8,
+    torch.uint8: np.uint8,
+    torch.bool: np.bool_,
+}
+
+
+def _element_type(dtype: torch.dtype) -> type:
+    if dtype not in _ELEMENT_TYPES:
+        raise ValueError(
+            f"Tensors of type {dtype} can not be bound to an ONNX Runtime session, "
+            "convert them to torch.float16 or torch.float32"
+        )
+    return _ELEMENT_TYPES[dtype]
+
+
+def _ort_device(tensor: Tensor) -> Tuple[str, int]:
+    if tensor.device.type == "cuda":
+        return "cuda", tensor.device.index or 0
+    return "cpu", 0
+
+
+def _output_shape(
+    shape: Sequence[Union[int, str, None]], dims: Dict[str, int]
+) -> Union[Tuple[int, ...], None]:
+    """Resolves the symbolic dimensions of an output from those of the inputs"""
+    out = []
+    for dim in shape:
+        if isinstance(dim, int):
+            out.append(dim)
+        elif isinstance(dim, str) and dim in dims:
+            out.append(dims[dim])
+        else:
+            return None
+    return tuple(out)
+
+
 @check_ort_install
 def run_onnx_inference(
     model: Union[bytes, str],
     invars: Union[Tensor, Tuple[Tensor, ...]],
     device: torch.device = "cuda",
+    config: Optional[OrtSessionConfig] = None,
+    pool: Optional[OrtSessionPool] = None,
 ) -> Tuple[Tensor]:
     """Runs ONNX model in ORT session
 
+    Sessions are taken from a session pool so that repeated calls do not parse and
+    optimize the model again. Inputs and outputs are bound to the session through
+    IO binding, which reads the input tensors in place and writes the outputs
+    directly into the returned tensors when their shapes can be inferred.
+
     Parameters
     ----------
     model : Union[bytes, str]
@@ -148,20 +500,71 @@ def run_onnx_inference(
         Input tensors
     device : torch.device, optional
         Device to run ORT, by default "cuda"
+    config : Optional[OrtSessionConfig], optional
+        Session options, by default None
+    pool : Optional[OrtSessionPool], optional
+        Session pool, by default None uses the pool of `get_session_pool`
 
     Returns
     -------
     Tuple[Tensor]
         Tuple of output tensors on CPU
     """
-    ort_sess = get_ort_session(model, device)
-    # fmt: off
+    pool = pool or get_session_pool()
     if isinstance(invars, Tensor):
         invars = (invars,)
-    ort_inputs = {inp.name: v.detach().cpu().numpy()
-                  for inp, v in zip(ort_sess.get_inputs(), invars)}
-    # fmt: on
-    ort_outputs = ort_sess.run(None, ort_inputs)
-    # Convert to tensors
-    outputs = tuple([torch.Tensor(v) for v in ort_outputs])
-    return outputs
+    ort_device = torch.device(device) if "cuda" in str(device) else torch.device("cpu")
+
+    with pool.session(model, device, config) as ort_sess:
+        binding = ort_sess.io_binding()
+        dims = {}
+        # Keep references to the bound tensors until the run completes
+        inputs = []
+        for inp, v in zip(ort_sess.get_inputs(), invars):
+            v = v.detach().to(ort_device).contiguous()
+            inputs.append(v)
+            dims.update(
+                {
+                    dim: size
+                    for dim, size in zip(inp.shape, v.shape)
+                    if isinstance(dim, str)
+                }
+            )
+            device_type, device_id = _ort_device(v)
+            binding.bind_input(
+                name=inp.name,
+                device_type=device_type,
+                device_id=device_id,
+                element_type=_element_type(v.dtype),
+                shape=tuple(v.shape),
+                buffer_ptr=v.data_ptr(),
+            )
+
+        # Outputs are written in place into CPU tensors when their shape is known
+        outputs = []
+        for out in ort_sess.get_outputs():
+            shape = _output_shape(out.shape, dims)
+            dtype = _ORT_TYPES.get(out.type)
+            if shape is None or dtype is None:
+                binding.bind_output(out.name, "cpu")
+                outputs.append(None)
+                continue
+            buffer = torch.empty(shape, dtype=dtype)
+            binding.bind_output(
+                name=out.name,
+                device_type="cpu",
+                device_id=0,
+                element_type=_element_type(dtype),
+                shape=shape,
+                buffer_ptr=buffer.data_ptr(),
+            )
+            outputs.append(buffer)
+
+        ort_sess.run_with_iobinding(binding)
+        ort_outputs = binding.get_outputs()
+
+    # Outputs allocated by ORT are wrapped without copy
+    return tuple(
+        buffer if buffer is not None else torch.from_numpy(v.numpy())
+        for buffer, v in zip(outputs, ort_outputs)
+    )
@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Command line entry point of the inference server
+
+Example
+-------
+Serve two checkpoints, batching up to 16 samples within 10 ms::
+
+    python -m physicsnemo.deploy.server --port 8000 --max-batch-size 16 \\
+        --max-queue-delay 0.01 fno=fno.mdlus afno=afno.mdlus
+"""
+
+import argparse
+import logging
+import sys
+from typing import List, Optional
+
+from physicsnemo.deploy.server import InferenceServer, ModelConfig
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Serves the given checkpoints until interrupted"""
+    parser = argparse.ArgumentParser(
+        prog="python -m physicsnemo.deploy.server",
+        description=__doc__.split("\n")[0],
+    )
+    parser.add_argument(
+        "models", nargs="+", help="Models to serve as name=checkpoint.mdlus"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--device", default="cpu", help="Device to run models on")
+    parser.add_argument("--workers", type=int, default=4, help="Inference threads")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-queue-delay", type=float, default=0.005, help="Seconds")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=1, help="Concurrent batches per model"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    configs = []
+    for spec in args.models:
+        name, sep, checkpoint = spec.partition("=")
+        if not sep:
+            parser.error(f"Invalid model {spec}, expected name=checkpoint.mdlus")
+        configs.append(
+            ModelConfig(
+                name=name,
+                checkpoint=checkpoint,
+                device=args.device,
+                max_batch_size=args.max_batch_size,
+                max_queue_delay=args.max_queue_delay,
+                max_concurrency=args.max_concurrency,
+            )
+        )
+
+    server = InferenceServer(
+        configs, host=args.host, port=args.port, num_workers=args.workers
+    )
+    try:
+        server.start().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
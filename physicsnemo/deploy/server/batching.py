@@ -0,0 +1,292 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+Tensor = torch.Tensor
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelConfig:
+    """Serving configuration of a model
+
+    Parameters
+    ----------
+    name : str
+        Name the model is served under
+    checkpoint : Optional[str], optional
+        `.mdlus` checkpoint the model is loaded from with `Module.from_checkpoint`,
+        by default None when the model instance is provided directly
+    device : str, optional
+        Device the model runs on, by default "cpu"
+    max_batch_size : int, optional
+        Maximum number of samples concatenated into one forward pass, by default 8
+    max_queue_delay : float, optional
+        Maximum time in seconds the first request of a batch waits for more requests
+        before the batch runs, by default 0.005
+    max_concurrency : int, optional
+        Maximum number of batches of this model running at the same time, by
+        default 1
+    """
+
+    name: str
+    checkpoint: Optional[str] = None
+    device: str = "cpu"
+    max_batch_size: int = 8
+    max_queue_delay: float = 0.005
+    max_concurrency: int = 1
+
+    def __post_init__(self):
+        if self.max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if self.max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if self.max_queue_delay < 0:
+            raise ValueError("max_queue_delay can not be negative")
+
+
+class _Request:
+    def __init__(self, inputs: Tuple[Tensor, ...]):
+        self.inputs = inputs
+        self.size = inputs[0].shape[0]
+        # Requests can only share a batch if all but their batch dimension match
+        self.signature = tuple((tuple(x.shape[1:]), x.dtype) for x in inputs)
+        self.future = Future()
+        self.arrival = time.perf_counter()
+
+
+class ModelStats:
+    """Queue, latency and throughput statistics of a served model
+
+    Latencies are kept for the most recent `window` requests.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.requests = 0
+        self.samples = 0
+        self.batches = 0
+        self.failures = 0
+        self._queue_times: Deque[float] = collections.deque(maxlen=window)
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+        self._compute_times: Deque[float] = collections.deque(maxlen=window)
+
+    def record_batch(
+        self, requests: List[_Request], start: float, end: float, failed: bool
+    ) -> None:
+        """Records a batch that started computing at `start` and ended at `end`"""
+        with self._lock:
+            self.batches += 1
+            self._compute_times.append(end - start)
+            for request in requests:
+                self.requests += 1
+                self.samples += request.size
+                self.failures += failed
+                self._queue_times.append(start - request.arrival)
+                self._latencies.append(end - request.arrival)
+
+    def snapshot(self, queue_size: int = 0) -> Dict[str, Any]:
+        """Statistics as a JSON serializable dictionary, times in milliseconds"""
+
+        def summary(values):
+            if not values:
+                return {"mean": 0.0, "p50": 0.0, "p99": 0.0}
+            ordered = sorted(values)
+            return {
+                "mean": statistics.fmean(ordered) * 1e3,
+                "p50": ordered[len(ordered) // 2] * 1e3,
+                "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e3,
+            }
+
+        with self._lock:
+            elapsed = time.perf_counter() - self._start
+            return {
+                "queue_size": queue_size,
+                "requests": self.requests,
+                "samples": self.samples,
+                "batches": self.batches,
+                "failures": self.failures,
+                "mean_batch_size": self.samples / max(self.batches, 1),
+                "queue_time_ms": summary(self._queue_times),
+                "compute_time_ms": summary(self._compute_times),
+                "latency_ms": summary(self._latencies),
+                "requests_per_second": self.requests / elapsed,
+                "samples_per_second": self.samples / elapsed,
+            }
+
+
+class DynamicBatcher:
+    """Groups concurrent requests of a model into batches
+
+    A scheduler thread takes the oldest queued request and waits up to
+    `max_queue_delay` for further requests with the same input shapes, until
+    `max_batch_size` samples are gathered. The inputs are concatenated along the first
+    dimension, the batch runs on `executor` and every request receives its slice of
+    the outputs. At most `max_concurrency` batches of the model run at the same time.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Model to run, called with the batched input tensors as positional arguments
+    config : ModelConfig
+        Batching configuration
+    executor : Executor
+        Executor running the batches, usually shared between models
+    """
+
+    def __init__(self, model: torch.nn.Module, config: ModelConfig, executor: Executor):
+        self.model = model
+        self.config = config
+        self.stats = ModelStats()
+        self._executor = executor
+        self._queue: Deque[_Request] = collections.deque()
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(config.max_concurrency)
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._schedule, name=f"batcher-{config.name}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, inputs: Sequence[Tensor]) -> Future:
+        """Queues a request
+
+        Parameters
+        ----------
+        inputs : Sequence[Tensor]
+            Input tensors sharing the same leading batch dimension
+
+        Returns
+        -------
+        Future
+            Resolves to the tuple of output tensors of the request
+        """
+        inputs = tuple(inputs)
+        if len(inputs) == 0:
+            raise ValueError("At least one input tensor is required")
+        if any(x.ndim == 0 or x.shape[0] != inputs[0].shape[0] for x in inputs):
+            raise ValueError("All inputs must share the same leading batch dimension")
+        request = _Request(inputs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Model {self.config.name} is not served anymore")
+            self._queue.append(request)
+            self._cond.notify()
+        return request.future
+
+    def infer(
+        self, inputs: Sequence[Tensor], timeout: Optional[float] = None
+    ) -> Tuple[Tensor, ...]:
+        """Runs a request and waits for its outputs"""
+        return self.submit(inputs).result(timeout)
+
+    def queue_size(self) -> int:
+        """Number of requests waiting to be scheduled"""
+        with self._cond:
+            return len(self._queue)
+
+    def close(self) -> None:
+        """Stops scheduling, queued requests still run"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _next_batch(self) -> List[_Request]:
+        """Waits for the next batch, empty once closed and drained"""
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return []
+                self._cond.wait()
+            first = self._queue[0]
+            deadline = first.arrival + self.config.max_queue_delay
+            while not self._closed:
+                size = sum(
+                    r.size for r in self._queue if r.signature == first.signature
+                )
+                remaining = deadline - time.perf_counter()
+                if size >= self.config.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size, skipped = [], 0, collections.deque()
+            while self._queue:
+                request = self._queue.popleft()
+                if request.signature != first.signature or (
+                    batch and size + request.size > self.config.max_batch_size
+                ):
+                    skipped.append(request)
+                    continue
+                batch.append(request)
+                size += request.size
+            # Requests left out keep their place in the queue
+            self._queue.extendleft(reversed(skipped))
+            return batch
+
+    def _schedule(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._slots.acquire()
+            try:
+                self._executor.submit(self._run, batch)
+            except RuntimeError as e:  # Executor shut down
+                self._slots.release()
+                for request in batch:
+                    request.future.set_exception(e)
+
+    def _run(self, batch: List[_Request]) -> None:
+        start = time.perf_counter()
+        failed = False
+        try:
+            device = torch.device(self.config.device)
+            inputs = [
+                torch.cat([r.inputs[i] for r in batch]).to(device)
+                for i in range(len(batch[0].inputs))
+            ]
+            with torch.inference_mode():
+                outputs = self.model(*inputs)
+            if isinstance(outputs, Tensor):
+                outputs = (outputs,)
+            outputs = [o.cpu() for o in outputs]
+            offset = 0
+            for request in batch:
+                request.future.set_result(
+                    tuple(o[offset : offset + request.size] for o in outputs)
+                )
+                offset += request.size
+        except Exception as e:
+            failed = True
+            logger.exception(f"Inference of model {self.config.name} failed")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finally:
+            self.stats.record_batch(batch, start, time.perf_counter(), failed)
+            self._slots.release()
@@ -0,0 +1,301 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+from physicsnemo.deploy.server.batching import DynamicBatcher, ModelConfig
+
+Tensor = torch.Tensor
+logger = logging.getLogger(__name__)
+
+# Tensor data types of the KServe v2 inference protocol implemented by Triton
+_DATATYPES = {
+    "BOOL": torch.bool,
+    "UINT8": torch.uint8,
+    "INT8": torch.int8,
+    "INT16": torch.int16,
+    "INT32": torch.int32,
+    "INT64": torch.int64,
+    "FP16": torch.float16,
+    "FP32": torch.float32,
+    "FP64": torch.float64,
+}
+_DATATYPE_NAMES = {v: k for k, v in _DATATYPES.items()}
+
+
+class _RequestError(Exception):
+    """Error of a client request, answered with the given HTTP status"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _decode_tensor(spec: Dict[str, Any]) -> Tensor:
+    try:
+        dtype = _DATATYPES[spec["datatype"]]
+        return torch.tensor(spec["data"], dtype=dtype).reshape(spec["shape"])
+    except KeyError as e:
+        raise _RequestError(f"Invalid input tensor, missing or unsupported {e}")
+    except (RuntimeError, TypeError, ValueError) as e:
+        raise _RequestError(f"Invalid input tensor {spec.get('name')}: {e}")
+
+
+def _encode_tensor(name: str, tensor: Tensor) -> Dict[str, Any]:
+    if tensor.dtype not in _DATATYPE_NAMES:
+        tensor = tensor.float()
+    return {
+        "name": name,
+        "datatype": _DATATYPE_NAMES[tensor.dtype],
+        "shape": list(tensor.shape),
+        "data": tensor.flatten().tolist(),
+    }
+
+
+class InferenceServer:
+    """Local HTTP inference server with dynamic batching
+
+    Serves `physicsnemo.Module` checkpoints, or any `torch.nn.Module`, over the
+    subset of the KServe v2 HTTP/REST protocol used with Triton, so that clients can
+    target either server:
+
+    - ``GET /v2/health/live`` and ``GET /v2/health/ready``
+    - ``GET /v2/models/{name}`` model metadata
+    - ``GET /v2/models/{name}/ready``
+    - ``POST /v2/models/{name}/infer`` with JSON tensors, inputs are passed to the
+      model positionally in request order and outputs are named ``output{i}``
+    - ``GET /v2/models/stats`` and ``GET /v2/models/{name}/stats`` queue, latency and
+      throughput statistics
+
+    Requests of every model are grouped into batches by a `DynamicBatcher` and run on
+    a thread pool shared by all models.
+
+    Parameters
+    ----------
+    models : Optional[List[ModelConfig]], optional
+        Models loaded from their checkpoints, by default None
+    host : str, optional
+        Address to listen on, by default "127.0.0.1"
+    port : int, optional
+        Port to listen on, 0 picks a free port, by default 8000
+    num_workers : int, optional
+        Threads running batches, by default 4
+
+    Example
+    -------
+    >>> from physicsnemo.deploy.server import InferenceServer, ModelConfig
+    >>> config = ModelConfig("fno", checkpoint="fno.mdlus", max_batch_size=16)
+    >>> with InferenceServer([config], port=8000) as server:  # doctest: +SKIP
+    ...     server.wait()
+    """
+
+    def __init__(
+        self,
+        models: Optional[List[ModelConfig]] = None,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        num_workers: int = 4,
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_workers, thread_name_prefix="inference"
+        )
+        self._batchers: Dict[str, DynamicBatcher] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+        for config in models or []:
+            self.add_model(config)
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_model(
+        self, config: ModelConfig, model: Optional[torch.nn.Module] = None
+    ) -> DynamicBatcher:
+        """Starts serving a model
+
+        Parameters
+        ----------
+        config : ModelConfig
+            Serving configuration of the model
+        model : Optional[torch.nn.Module], optional
+            Model instance, by default None loads `config.checkpoint`
+
+        Returns
+        -------
+        DynamicBatcher
+            Batcher of the model, which can also be used without HTTP
+        """
+        if model is None:
+            if config.checkpoint is None:
+                raise ValueError(f"Model {config.name} has no checkpoint to load")
+            from physicsnemo.models.module import Module
+
+            model = Module.from_checkpoint(
+                config.checkpoint, map_location=config.device
+            )
+        model = model.to(config.device).eval()
+        with self._lock:
+            if config.name in self._batchers:
+                raise ValueError(f"Model {config.name} is already served")
+            batcher = DynamicBatcher(model, config, self._executor)
+            self._batchers[config.name] = batcher
+        logger.info(f"Serving model {config.name} on {config.device}")
+        return batcher
+
+    def remove_model(self, name: str) -> None:
+        """Stops serving a model once its queued requests completed"""
+        with self._lock:
+            batcher = self._batchers.pop(name)
+        batcher.close()
+
+    def infer(
+        self, name: str, inputs: List[Tensor], timeout: Optional[float] = None
+    ) -> Tuple[Tensor, ...]:
+        """Runs a request in process, bypassing HTTP"""
+        return self._batcher(name).infer(inputs, timeout)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistics of all served models"""
+        with self._lock:
+            batchers = dict(self._batchers)
+        return {name: b.stats.snapshot(b.queue_size()) for name, b in batchers.items()}
+
+    def start(self) -> "InferenceServer":
+        """Starts answering HTTP requests in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._httpd.serve_forever, name="inference-server", daemon=True
+            )
+            self._thread.start()
+            logger.info(f"Inference server listening on {self.url}")
+        return self
+
+    def wait(self) -> None:
+        """Blocks until the server is stopped"""
+        if self._thread is not None:
+            self._thread.join()
+
+    def stop(self) -> None:
+        """Stops the server, letting queued requests complete"""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread = None
+        self._httpd.server_close()
+        for name in list(self._batchers):
+            self.remove_model(name)
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "InferenceServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _batcher(self, name: str) -> DynamicBatcher:
+        with self._lock:
+            if name not in self._batchers:
+                raise _RequestError(f"Unknown model {name}", status=404)
+            return self._batchers[name]
+
+    def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        parts = [p for p in path.split("?")[0].split("/") if p]
+        if method == "GET" and parts[:2] == ["v2", "health"] and len(parts) == 3:
+            return 200, {}
+        if parts[:2] != ["v2", "models"]:
+            raise _RequestError(f"Unknown endpoint {path}", status=404)
+        if method == "GET" and parts[2:] == ["stats"]:
+            return 200, self.stats()
+        if len(parts) < 3:
+            raise _RequestError(f"Unknown endpoint {path}", status=404)
+
+        batcher = self._batcher(parts[2])
+        action = parts[3:]
+        if method == "GET" and action == []:
+            return 200, {
+                "name": batcher.config.name,
+                "platform": "pytorch",
+                "max_batch_size": batcher.config.max_batch_size,
+            }
+        if method == "GET" and action == ["ready"]:
+            return 200, {}
+        if method == "GET" and action == ["stats"]:
+            return 200, batcher.stats.snapshot(batcher.queue_size())
+        if method == "POST" and action == ["infer"]:
+            try:
+                request = json.loads(body)
+                inputs = [_decode_tensor(spec) for spec in request["inputs"]]
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                raise _RequestError(f"Invalid inference request: {e}")
+            try:
+                future = batcher.submit(inputs)
+            except ValueError as e:
+                raise _RequestError(str(e))
+            outputs = future.result()
+            response = {
+                "model_name": batcher.config.name,
+                "outputs": [
+                    _encode_tensor(f"output{i}", o) for i, o in enumerate(outputs)
+                ],
+            }
+            if "id" in request:
+                response["id"] = request["id"]
+            return 200, response
+        raise _RequestError(f"Unknown endpoint {path}", status=404)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                try:
+                    status, payload = server._route(method, self.path, body)
+                except _RequestError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
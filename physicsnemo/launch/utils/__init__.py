@@ -14,4 +14,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .checkpoint import get_checkpoint_dir, load_checkpoint, save_checkpoint
+from .checkpoint import (
+    AsyncCheckpointWriter,
+    get_checkpoint_dir,
+    load_checkpoint,
+    save_checkpoint,
+    wait_for_checkpoints,
+)
+from .incremental_checkpoint import (
+    gc_checkpoint_blobs,
+    load_incremental_checkpoint,
+    save_incremental_checkpoint,
+)
+from .sharded_checkpoint import load_sharded_checkpoint, save_sharded_checkpoint
@@ -14,10 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import os
+import queue
 import re
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, NewType, Optional, Union
+from typing import Any, Dict, List, NewType, Optional, Tuple, Union
 
 import fsspec
 import fsspec.utils
@@ -29,7 +32,7 @@ import physicsnemo
 from physicsnemo.distributed import DistributedManager
 from physicsnemo.launch.logging import PythonLogger
 from physicsnemo.utils.capture import _StaticCapture
-from physicsnemo.utils.filesystem import LOCAL_CACHE, _download_cached
+from physicsnemo.utils.filesystem import LOCAL_CACHE, _download_cached, _get_fs
 
 optimizer = NewType("optimizer", torch.optim)
 scheduler = NewType("scheduler", _LRScheduler)
@@ -37,6 +40,8 @@ scaler = NewType("scaler", GradScaler)
 
 checkpoint_logging = PythonLogger("checkpoint")
 
+_TENSOR_REF = "__checkpoint_tensor__"
+
 
 def _get_checkpoint_filename(
     path: str,
@@ -65,7 +70,8 @@ def _get_checkpoint_filename(
     saving : bool, optional
         Get filename for saving a new checkpoint, by default False
     model_type : str
-        Model type, by default "mdlus" for PhysicsNeMo models and "pt" for PyTorch models
+        Model type, by default "mdlus" for PhysicsNeMo models and "pt" for PyTorch
+        models. "manifest" is used for the manifests of incremental checkpoints
 
 
     Returns
@@ -98,7 +104,9 @@ def _get_checkpoint_filename(
     checkpoint_filename = f"{path}/{base_name}.{model_parallel_rank}"
 
     # File extension for PhysicsNeMo models or PyTorch models
-    file_extension = ".mdlus" if model_type == "mdlus" else ".pt"
+    file_extension = {"mdlus": ".mdlus", "manifest": ".manifest.json"}.get(
+        model_type, ".pt"
+    )
 
     # If epoch is provided load that file
     if index is not None:
@@ -199,6 +207,56 @@ def _unique_model_names(
     return output_dict
 
 
+def _make_checkpoint_dir(path: str) -> None:
+    """Creates the checkpoint directory if it does not exist.
+    Only applicable to Posix filesystems ("file" protocol), not object stores.
+    """
+    protocol = fsspec.utils.get_protocol(path)
+    if protocol == "file" and not Path(path).is_dir():
+        checkpoint_logging.warning(
+            f"Output directory {path} does not exist, will " "attempt to create"
+        )
+        Path(path).mkdir(parents=True, exist_ok=True)
+
+
+def _training_state_dict(
+    optimizer: Union[optimizer, None] = None,
+    scheduler: Union[scheduler, None] = None,
+    scaler: Union[scaler, None] = None,
+    epoch: Union[int, None] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Gathers the training state (everything but the models) into one dictionary"""
+    checkpoint_dict = {}
+    # Optimizer state dict
+    if optimizer:
+        opt_state_dict = optimizer.state_dict()
+        # Strip out torch dynamo wrapper prefix
+        for pg in opt_state_dict.get("param_groups", []):
+            param_names = pg.get("param_names")
+            if param_names is None:
+                continue
+            pg["param_names"] = [pn.removeprefix("_orig_mod.") for pn in param_names]
+        checkpoint_dict["optimizer_state_dict"] = opt_state_dict
+
+    # Scheduler state dict
+    if scheduler:
+        checkpoint_dict["scheduler_state_dict"] = scheduler.state_dict()
+
+    # Scaler state dict
+    if scaler:
+        checkpoint_dict["scaler_state_dict"] = scaler.state_dict()
+    # Static capture is being used, save its grad scaler
+    if _StaticCapture._amp_scalers:
+        checkpoint_dict["static_capture_state_dict"] = _StaticCapture.state_dict()
+
+    if epoch:
+        checkpoint_dict["epoch"] = epoch
+    if metadata:
+        checkpoint_dict["metadata"] = metadata
+    return checkpoint_dict
+
+
 def save_checkpoint(
     path: str,
     models: Union[torch.nn.Module, List[torch.nn.Module], None] = None,
@@ -207,7 +265,9 @@ def save_checkpoint(
     scaler: Union[scaler, None] = None,
     epoch: Union[int, None] = None,
     metadata: Optional[Dict[str, Any]] = None,
-) -> None:
+    async_save: bool = False,
+    incremental: bool = False,
+) -> Union[Future, None]:
     """Training checkpoint saving utility
 
     This will save a training checkpoint in the provided path following the file naming
@@ -232,16 +292,51 @@ def save_checkpoint(
         valid index, by default None
     metadata : Optional[Dict[str, Any]], optional
         Additional metadata to save, by default None
+    async_save : bool, optional
+        Snapshot the state into CPU staging buffers and write the checkpoint from a
+        background thread, see `AsyncCheckpointWriter`, by default False
+    incremental : bool, optional
+        Save a content addressed checkpoint that only writes the tensors that changed
+        since the previous saves, see `save_incremental_checkpoint`, by default False
+
+    Returns
+    -------
+    Union[Future, None]
+        Future of the background write when `async_save` is set, otherwise None
     """
+    if incremental:
+        if async_save:
+            raise ValueError("Incremental checkpoints can not be saved asynchronously")
+        from physicsnemo.launch.utils.incremental_checkpoint import (
+            save_incremental_checkpoint,
+        )
+
+        save_incremental_checkpoint(
+            path,
+            models=models,
+            optimizer=optimizer,
+            scheduler=scheduler,
+            scaler=scaler,
+            epoch=epoch,
+            metadata=metadata,
+        )
+        return None
+
+    if async_save:
+        return _get_async_writer().save(
+            path,
+            models=models,
+            optimizer=optimizer,
+            scheduler=scheduler,
+            scaler=scaler,
+            epoch=epoch,
+            metadata=metadata,
+        )
+
     protocol = fsspec.utils.get_protocol(path)
     fs = fsspec.filesystem(protocol)
     # Create checkpoint directory if it does not exist.
-    # Only applicable to Posix filesystems ("file" protocol), not object stores.
-    if protocol == "file" and not Path(path).is_dir():
-        checkpoint_logging.warning(
-            f"Output directory {path} does not exist, will " "attempt to create"
-        )
-        Path(path).mkdir(parents=True, exist_ok=True)
+    _make_checkpoint_dir(path)
 
     # == Saving model checkpoint ==
     if models:
@@ -268,37 +363,14 @@ def save_checkpoint(
             checkpoint_logging.success(f"Saved model state dictionary: {file_name}")
 
     # == Saving training checkpoint ==
-    checkpoint_dict = {}
-    # Optimizer state dict
-    if optimizer:
-        opt_state_dict = optimizer.state_dict()
-        # Strip out torch dynamo wrapper prefix
-        for pg in opt_state_dict.get("param_groups", []):
-            param_names = pg.get("param_names")
-            if param_names is None:
-                continue
-            pg["param_names"] = [pn.removeprefix("_orig_mod.") for pn in param_names]
-        checkpoint_dict["optimizer_state_dict"] = opt_state_dict
-
-    # Scheduler state dict
-    if scheduler:
-        checkpoint_dict["scheduler_state_dict"] = scheduler.state_dict()
-
-    # Scaler state dict
-    if scaler:
-        checkpoint_dict["scaler_state_dict"] = scaler.state_dict()
-    # Static capture is being used, save its grad scaler
-    if _StaticCapture._amp_scalers:
-        checkpoint_dict["static_capture_state_dict"] = _StaticCapture.state_dict()
+    checkpoint_dict = _training_state_dict(
+        optimizer, scheduler, scaler, epoch, metadata
+    )
 
     # Output file name
     output_filename = _get_checkpoint_filename(
         path, index=epoch, saving=True, model_type="pt"
     )
-    if epoch:
-        checkpoint_dict["epoch"] = epoch
-    if metadata:
-        checkpoint_dict["metadata"] = metadata
 
     # Save checkpoint to memory
     if bool(checkpoint_dict):
@@ -310,6 +382,275 @@ def save_checkpoint(
         checkpoint_logging.success(f"Saved training checkpoint: {output_filename}")
 
 
+def _join(prefix: str, key: Any) -> str:
+    return f"{prefix}/{key}" if prefix else str(key)
+
+
+def _flatten(obj: Any, prefix: str, tensors: Dict[str, torch.Tensor]) -> Any:
+    """Collects the tensors of a nested state into `tensors` and returns the same
+    structure with every tensor replaced by a reference to its key"""
+    if isinstance(obj, torch.Tensor):
+        tensors[prefix] = obj
+        return {_TENSOR_REF: prefix}
+    elif isinstance(obj, dict):
+        out = copy.copy(obj)  # Preserve dict subclasses such as OrderedDict
+        for k, v in obj.items():
+            out[k] = _flatten(v, _join(prefix, k), tensors)
+        return out
+    elif type(obj) in (list, tuple):
+        return type(obj)(
+            _flatten(v, _join(prefix, i), tensors) for i, v in enumerate(obj)
+        )
+    return obj
+
+
+def _unflatten(skeleton: Any, tensors: Dict[str, torch.Tensor]) -> Any:
+    """Inverse of `_flatten`"""
+    if isinstance(skeleton, dict):
+        if len(skeleton) == 1 and _TENSOR_REF in skeleton:
+            return tensors[skeleton[_TENSOR_REF]]
+        out = copy.copy(skeleton)
+        for k, v in skeleton.items():
+            out[k] = _unflatten(v, tensors)
+        return out
+    elif type(skeleton) in (list, tuple):
+        return type(skeleton)(_unflatten(v, tensors) for v in skeleton)
+    return skeleton
+
+
+def _snapshot(obj: Any, buffers: Dict[str, torch.Tensor], key: str) -> Any:
+    """Copies a (nested) state dictionary into CPU staging buffers
+
+    Tensors are copied into the buffer stored under their key in `buffers`, which is
+    reused across snapshots as long as shape and dtype do not change. Device to host
+    copies are issued asynchronously into pinned memory, so the caller has to
+    synchronize before the snapshot is read.
+    """
+    if isinstance(obj, torch.Tensor):
+        obj = obj.detach()
+        if obj.layout != torch.strided:
+            return obj.to("cpu", copy=True)
+        buffer = buffers.get(key)
+        if buffer is None or buffer.shape != obj.shape or buffer.dtype != obj.dtype:
+            buffer = torch.empty(
+                obj.shape, dtype=obj.dtype, device="cpu", pin_memory=obj.is_cuda
+            )
+            buffers[key] = buffer
+        buffer.copy_(obj, non_blocking=obj.is_cuda)
+        return buffer
+    elif isinstance(obj, dict):
+        out = copy.copy(obj)  # Preserve dict subclasses such as OrderedDict
+        for k, v in obj.items():
+            out[k] = _snapshot(v, buffers, f"{key}/{k}")
+        return out
+    elif type(obj) in (list, tuple):
+        return type(obj)(_snapshot(v, buffers, f"{key}/{i}") for i, v in enumerate(obj))
+    return copy.deepcopy(obj)
+
+
+class AsyncCheckpointWriter:
+    """Background checkpoint writer
+
+    Saving a checkpoint only takes a snapshot of the model and training state on the
+    calling thread: every tensor is copied into CPU staging buffers that are reused
+    from one checkpoint to the next. Serialization and the upload to the target file
+    system then happen on a background thread, while training continues.
+
+    Every file is first written under a temporary name and then renamed into place.
+    The model files are committed before the training checkpoint, which
+    `load_checkpoint` uses to pick the index of the model files to load, so an
+    interrupted save is never mixed with an older one. A failed write is raised by
+    `wait`, and by `load_checkpoint`.
+
+    Parameters
+    ----------
+    max_in_flight : int, optional
+        Maximum number of checkpoints being written at once. Each one owns a set of
+        staging buffers, `save` blocks until one of them is free, by default 2
+
+    Example
+    -------
+    >>> writer = AsyncCheckpointWriter(max_in_flight=2)
+    >>> future = writer.save("./checkpoints", models=model, optimizer=optimizer, epoch=1) # doctest: +SKIP
+    >>> writer.wait() # doctest: +SKIP
+    """
+
+    def __init__(self, max_in_flight: int = 2):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="checkpoint"
+        )
+        self._staging = queue.Queue()
+        for _ in range(max_in_flight):
+            self._staging.put({})
+        self._futures: List[Future] = []
+
+    def save(
+        self,
+        path: str,
+        models: Union[torch.nn.Module, List[torch.nn.Module], None] = None,
+        optimizer: Union[optimizer, None] = None,
+        scheduler: Union[scheduler, None] = None,
+        scaler: Union[scaler, None] = None,
+        epoch: Union[int, None] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Future:
+        """Snapshots the training state and schedules a checkpoint write, takes the
+        same arguments as `save_checkpoint`.
+
+        When `epoch` is None the next free index is looked up on the file system, so
+        this waits for the checkpoints that are still being written first.
+
+        Returns
+        -------
+        Future
+            Future resolved once all checkpoint files have been committed
+        """
+        if epoch is None:
+            self.wait()
+        _make_checkpoint_dir(path)
+
+        buffers = self._staging.get()
+        try:
+            jobs: List[Tuple[str, Union[physicsnemo.models.Module, None], Any]] = []
+            if models:
+                if not isinstance(models, list):
+                    models = [models]
+                for name, model in _unique_model_names(models).items():
+                    is_module = isinstance(model, physicsnemo.models.Module)
+                    file_name = _get_checkpoint_filename(
+                        path,
+                        name,
+                        index=epoch,
+                        saving=True,
+                        model_type="mdlus" if is_module else "pt",
+                    )
+                    state = _snapshot(model.state_dict(), buffers, name)
+                    jobs.append((file_name, model if is_module else None, state))
+
+            # The training checkpoint is written last, it commits the checkpoint
+            checkpoint_dict = _training_state_dict(
+                optimizer, scheduler, scaler, epoch, metadata
+            )
+            if checkpoint_dict:
+                output_filename = _get_checkpoint_filename(
+                    path, index=epoch, saving=True, model_type="pt"
+                )
+                state = _snapshot(checkpoint_dict, buffers, "checkpoint")
+                jobs.append((output_filename, None, state))
+
+            # Device to host copies into the staging buffers are asynchronous
+            if torch.cuda.is_initialized():
+                torch.cuda.synchronize()
+        except BaseException:
+            self._staging.put(buffers)
+            raise
+
+        future = self._executor.submit(self._write, jobs)
+        future.add_done_callback(lambda _: self._staging.put(buffers))
+        self._futures = [f for f in self._futures if not f.done()] + [future]
+        return future
+
+    @staticmethod
+    def _write(
+        jobs: List[Tuple[str, Union[physicsnemo.models.Module, None], Any]]
+    ) -> None:
+        for file_name, model, state in jobs:
+            tmp_file_name = file_name + ".tmp"
+            if model is not None:
+                fs = _get_fs(file_name)
+                model._save_state_dict(tmp_file_name, state)
+            else:
+                fs = fsspec.filesystem(fsspec.utils.get_protocol(file_name))
+                with fs.open(tmp_file_name, "wb") as fp:
+                    torch.save(state, fp)
+            fs.mv(tmp_file_name, file_name)
+            checkpoint_logging.success(f"Saved checkpoint file: {file_name}")
+
+    def wait(self) -> None:
+        """Blocks until all scheduled checkpoints have been written
+
+        Raises
+        ------
+        Exception
+            The first error raised while writing one of the checkpoints
+        """
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        """Waits for the scheduled checkpoints and stops the background thread"""
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "AsyncCheckpointWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+_async_writer: Union[AsyncCheckpointWriter, None] = None
+
+
+def _get_async_writer() -> AsyncCheckpointWriter:
+    global _async_writer
+    if _async_writer is None:
+        _async_writer = AsyncCheckpointWriter()
+    return _async_writer
+
+
+def wait_for_checkpoints() -> None:
+    """Blocks until all checkpoints saved with `save_checkpoint(..., async_save=True)`
+    have been written"""
+    if _async_writer is not None:
+        _async_writer.wait()
+
+
+def _load_training_state(
+    checkpoint_dict: Dict[str, Any],
+    optimizer: Union[optimizer, None] = None,
+    scheduler: Union[scheduler, None] = None,
+    scaler: Union[scaler, None] = None,
+    metadata_dict: Optional[Dict[str, Any]] = {},
+) -> int:
+    """Restores the training state gathered by `_training_state_dict` and returns the
+    saved epoch"""
+    # Optimizer state dict
+    if optimizer and "optimizer_state_dict" in checkpoint_dict:
+        optimizer.load_state_dict(checkpoint_dict["optimizer_state_dict"])
+        checkpoint_logging.success("Loaded optimizer state dictionary")
+
+    # Scheduler state dict
+    if scheduler and "scheduler_state_dict" in checkpoint_dict:
+        scheduler.load_state_dict(checkpoint_dict["scheduler_state_dict"])
+        checkpoint_logging.success("Loaded scheduler state dictionary")
+
+    # Scaler state dict
+    if scaler and "scaler_state_dict" in checkpoint_dict:
+        scaler.load_state_dict(checkpoint_dict["scaler_state_dict"])
+        checkpoint_logging.success("Loaded grad scaler state dictionary")
+
+    if "static_capture_state_dict" in checkpoint_dict:
+        _StaticCapture.load_state_dict(checkpoint_dict["static_capture_state_dict"])
+        checkpoint_logging.success("Loaded static capture state dictionary")
+
+    epoch = 0
+    if "epoch" in checkpoint_dict:
+        epoch = checkpoint_dict["epoch"]
+
+    # Update metadata if exists and the dictionary object is provided
+    metadata = checkpoint_dict.get("metadata", {})
+    for key, value in metadata.items():
+        metadata_dict[key] = value
+
+    return epoch
+
+
 def load_checkpoint(
     path: str,
     models: Union[torch.nn.Module, List[torch.nn.Module], None] = None,
@@ -340,7 +681,8 @@ def load_checkpoint(
         AMP grad scaler, by default None
     epoch : Union[int, None], optional
         Epoch checkpoint to load. If none is provided this will attempt to load the
-        checkpoint with the largest index, by default None
+        checkpoint with the largest index of the training checkpoint, or of each
+        model file without training checkpoint, by default None
     metadata_dict: Optional[Dict[str, Any]], optional
         Dictionary to store metadata from the checkpoint, by default None
     device : Union[str, torch.device], optional
@@ -350,7 +692,20 @@ def load_checkpoint(
     -------
     int
         Loaded epoch
+
+    Raises
+    ------
+    RuntimeError
+        If an asynchronous checkpoint write of this process failed
     """
+    # Never read a checkpoint this process is still writing
+    try:
+        wait_for_checkpoints()
+    except Exception as err:
+        raise RuntimeError(
+            "Asynchronous checkpoint write failed, the latest checkpoint was not saved"
+        ) from err
+
     fs = fsspec.filesystem(fsspec.utils.get_protocol(path))
     # Check if checkpoint directory exists
     if fs.exists(path):
@@ -364,6 +719,32 @@ def load_checkpoint(
         )
         return 0
 
+    # Incremental checkpoints have a manifest instead of checkpoint files
+    from physicsnemo.launch.utils.incremental_checkpoint import (
+        _find_manifest,
+        load_incremental_checkpoint,
+    )
+
+    if _find_manifest(path, epoch) is not None:
+        return load_incremental_checkpoint(
+            path,
+            models=models,
+            optimizer=optimizer,
+            scheduler=scheduler,
+            scaler=scaler,
+            epoch=epoch,
+            metadata_dict=metadata_dict,
+            device=device,
+        )
+
+    # The training checkpoint is written after the model files and commits a save,
+    # load the model files of its index so that an interrupted save is never mixed
+    # with an older one
+    if epoch is None:
+        checkpoint_filename = _get_checkpoint_filename(path, model_type="pt")
+        if fs.exists(checkpoint_filename):
+            epoch = int(checkpoint_filename.split(".")[-2])
+
     # == Loading model checkpoint ==
     if models:
         if not isinstance(models, list):
@@ -408,35 +789,9 @@ def load_checkpoint(
         f"Loaded checkpoint file {checkpoint_filename} to device {device}"
     )
 
-    # Optimizer state dict
-    if optimizer and "optimizer_state_dict" in checkpoint_dict:
-        optimizer.load_state_dict(checkpoint_dict["optimizer_state_dict"])
-        checkpoint_logging.success("Loaded optimizer state dictionary")
-
-    # Scheduler state dict
-    if scheduler and "scheduler_state_dict" in checkpoint_dict:
-        scheduler.load_state_dict(checkpoint_dict["scheduler_state_dict"])
-        checkpoint_logging.success("Loaded scheduler state dictionary")
-
-    # Scaler state dict
-    if scaler and "scaler_state_dict" in checkpoint_dict:
-        scaler.load_state_dict(checkpoint_dict["scaler_state_dict"])
-        checkpoint_logging.success("Loaded grad scaler state dictionary")
-
-    if "static_capture_state_dict" in checkpoint_dict:
-        _StaticCapture.load_state_dict(checkpoint_dict["static_capture_state_dict"])
-        checkpoint_logging.success("Loaded static capture state dictionary")
-
-    epoch = 0
-    if "epoch" in checkpoint_dict:
-        epoch = checkpoint_dict["epoch"]
-
-    # Update metadata if exists and the dictionary object is provided
-    metadata = checkpoint_dict.get("metadata", {})
-    for key, value in metadata.items():
-        metadata_dict[key] = value
-
-    return epoch
+    return _load_training_state(
+        checkpoint_dict, optimizer, scheduler, scaler, metadata_dict
+    )
 
 
 def get_checkpoint_dir(base_dir: str, model_name: str) -> str:
@@ -0,0 +1,376 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Content addressed, incremental checkpoints.
+
+Every tensor of the model and training state is stored once, as raw bytes, in a blob
+store under ``{path}/blobs`` and named after the SHA-256 digest of its content. Each
+save only writes a small manifest ``checkpoint.{model parallel id}.{index}.manifest.json``
+mapping the tensors of the state to their blob, together with a blob holding the
+structure of the state. Tensors that did not change since a previous save (frozen
+weights, embeddings, buffers) are not written again. The manifest is written last and
+marks the checkpoint as complete.
+
+Blobs are never removed when saving, `gc_checkpoint_blobs` deletes the ones that are
+no longer referenced by any manifest.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import fsspec
+import fsspec.utils
+import numpy as np
+import torch
+
+from physicsnemo.launch.logging import PythonLogger
+from physicsnemo.launch.utils.checkpoint import (
+    _cache_if_needed,
+    _flatten,
+    _get_checkpoint_filename,
+    _load_training_state,
+    _make_checkpoint_dir,
+    _training_state_dict,
+    _unflatten,
+    _unique_model_names,
+    optimizer,
+    scaler,
+    scheduler,
+)
+
+checkpoint_logging = PythonLogger("checkpoint")
+
+_BLOB_DIR = "blobs"
+_MANIFEST_EXTENSION = ".manifest.json"
+
+
+def _blob_path(path: str, digest: str) -> str:
+    return f"{path}/{_BLOB_DIR}/{digest[:2]}/{digest}"
+
+
+def _tensor_bytes(tensor: torch.Tensor) -> np.ndarray:
+    """Raw bytes of a tensor in row major order, without copy for contiguous CPU
+    tensors"""
+    if tensor.layout != torch.strided:
+        raise ValueError(
+            f"Incremental checkpoints only support strided tensors, got {tensor.layout}"
+        )
+    tensor = tensor.detach().cpu().contiguous()
+    return tensor.reshape(-1).view(torch.uint8).numpy()
+
+
+def _write_blob(fs: fsspec.AbstractFileSystem, blob: str, data: Any) -> bool:
+    """Writes a blob unless it already exists, returns whether it was written"""
+    if fs.exists(blob):
+        return False
+    fs.makedirs(blob.rsplit("/", 1)[0], exist_ok=True)
+    # Unique temporary name, other ranks or threads may write the same blob
+    tmp_blob = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with fs.open(tmp_blob, "wb") as fp:
+        fp.write(memoryview(data))
+    fs.mv(tmp_blob, blob)
+    return True
+
+
+def _read_blob(path: str, digest: str, dtype: torch.dtype, shape: List[int]):
+    """Memory maps a tensor blob, pages are only read when the tensor is accessed"""
+    numel = 1
+    for size in shape:
+        numel *= size
+    nbytes = numel * dtype.itemsize
+    if nbytes == 0:
+        return torch.empty(shape, dtype=dtype)
+    file_name = _cache_if_needed(_blob_path(path, digest))
+    storage = torch.UntypedStorage.from_file(file_name, shared=False, nbytes=nbytes)
+    return torch.empty(0, dtype=dtype).set_(storage, 0, shape)
+
+
+def _manifest_index(file_name: str) -> int:
+    return int(file_name[: -len(_MANIFEST_EXTENSION)].rsplit(".", 1)[1])
+
+
+def _find_manifest(path: str, epoch: Union[int, None] = None) -> Union[str, None]:
+    """Manifest of the incremental checkpoint to load from `path`, or None if the
+    checkpoint to load is a regular one"""
+    fs = fsspec.filesystem(fsspec.utils.get_protocol(path))
+    manifest = _get_checkpoint_filename(path, index=epoch, model_type="manifest")
+    if not fs.exists(manifest):
+        return None
+    if epoch is None:
+        # Both kinds of checkpoints in the same directory, load the latest one
+        latest = _get_checkpoint_filename(path, model_type="pt")
+        if fs.exists(latest) and int(latest.rsplit(".", 2)[1]) > _manifest_index(
+            manifest
+        ):
+            return None
+    return manifest
+
+
+def save_incremental_checkpoint(
+    path: str,
+    models: Union[torch.nn.Module, List[torch.nn.Module], None] = None,
+    optimizer: Union[optimizer, None] = None,
+    scheduler: Union[scheduler, None] = None,
+    scaler: Union[scaler, None] = None,
+    epoch: Union[int, None] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    num_workers: int = 8,
+) -> str:
+    """Saves a content addressed, incremental checkpoint
+
+    Only the tensors whose content is not in the blob store of `path` yet are
+    written. Tensors are hashed and written by `num_workers` threads.
+
+    Parameters
+    ----------
+    path : str
+        Path to save the training checkpoint
+    models : Union[torch.nn.Module, List[torch.nn.Module], None], optional
+        A single or list of PyTorch models, by default None
+    optimizer : Union[optimizer, None], optional
+        Optimizer, by default None
+    scheduler : Union[scheduler, None], optional
+        Learning rate scheduler, by default None
+    scaler : Union[scaler, None], optional
+        AMP grad scaler, by default None
+    epoch : Union[int, None], optional
+        Epoch of the checkpoint. If none this will save the checkpoint in the next
+        valid index, by default None
+    metadata : Optional[Dict[str, Any]], optional
+        Additional metadata to save, by default None
+    num_workers : int, optional
+        Number of threads hashing and writing tensors, by default 8
+
+    Returns
+    -------
+    str
+        File name of the manifest
+    """
+    fs = fsspec.filesystem(fsspec.utils.get_protocol(path))
+    _make_checkpoint_dir(path)
+
+    state = {"models": {}}
+    if models:
+        if not isinstance(models, list):
+            models = [models]
+        for name, model in _unique_model_names(models).items():
+            state["models"][name] = model.state_dict()
+    state["training"] = _training_state_dict(
+        optimizer, scheduler, scaler, epoch, metadata
+    )
+    tensors: Dict[str, torch.Tensor] = {}
+    skeleton = _flatten(state, "", tensors)
+
+    def _put(tensor: torch.Tensor) -> Tuple[str, int]:
+        data = _tensor_bytes(tensor)
+        # hashlib releases the GIL on large buffers, so threads hash in parallel
+        digest = hashlib.sha256(data).hexdigest()
+        written = _write_blob(fs, _blob_path(path, digest), data)
+        return digest, data.nbytes if written else 0
+
+    entries = {}
+    total_bytes = written_bytes = 0
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for (key, tensor), (digest, nbytes) in zip(
+            tensors.items(), executor.map(_put, tensors.values())
+        ):
+            entries[key] = {
+                "blob": digest,
+                "dtype": str(tensor.dtype).removeprefix("torch."),
+                "shape": list(tensor.shape),
+            }
+            total_bytes += tensor.numel() * tensor.element_size()
+            written_bytes += nbytes
+
+    buffer = io.BytesIO()
+    torch.save(skeleton, buffer)
+    skeleton_digest = hashlib.sha256(buffer.getbuffer()).hexdigest()
+    _write_blob(fs, _blob_path(path, skeleton_digest), buffer.getbuffer())
+
+    # The manifest commits the checkpoint
+    manifest = _get_checkpoint_filename(
+        path, index=epoch, saving=True, model_type="manifest"
+    )
+    with fs.open(manifest + ".tmp", "w") as fp:
+        json.dump(
+            {
+                "epoch": epoch,
+                "state": skeleton_digest,
+                "tensors": entries,
+                "total_bytes": total_bytes,
+                "written_bytes": written_bytes,
+            },
+            fp,
+        )
+    fs.mv(manifest + ".tmp", manifest)
+    checkpoint_logging.success(
+        f"Saved incremental checkpoint: {manifest}, wrote {written_bytes} of "
+        f"{total_bytes} bytes"
+    )
+    return manifest
+
+
+def load_incremental_checkpoint(
+    path: str,
+    models: Union[torch.nn.Module, List[torch.nn.Module], None] = None,
+    optimizer: Union[optimizer, None] = None,
+    scheduler: Union[scheduler, None] = None,
+    scaler: Union[scaler, None] = None,
+    epoch: Union[int, None] = None,
+    metadata_dict: Optional[Dict[str, Any]] = {},
+    device: Union[str, torch.device] = "cpu",
+) -> int:
+    """Loads an incremental checkpoint, `load_checkpoint` calls this method when the
+    checkpoint to load is an incremental one
+
+    Parameters
+    ----------
+    path : str
+        Path to training checkpoint
+    models : Union[torch.nn.Module, List[torch.nn.Module], None], optional
+        A single or list of PyTorch models, by default None
+    optimizer : Union[optimizer, None], optional
+        Optimizer, by default None
+    scheduler : Union[scheduler, None], optional
+        Learning rate scheduler, by default None
+    scaler : Union[scaler, None], optional
+        AMP grad scaler, by default None
+    epoch : Union[int, None], optional
+        Epoch checkpoint to load. If none is provided this will attempt to load the
+        checkpoint with the largest index, by default None
+    metadata_dict: Optional[Dict[str, Any]], optional
+        Dictionary to store metadata from the checkpoint, by default None
+    device : Union[str, torch.device], optional
+        Target device of the training state, by default "cpu"
+
+    Returns
+    -------
+    int
+        Loaded epoch
+    """
+    fs = fsspec.filesystem(fsspec.utils.get_protocol(path))
+    manifest_name = _get_checkpoint_filename(path, index=epoch, model_type="manifest")
+    if not fs.exists(manifest_name):
+        checkpoint_logging.warning(
+            "Could not find valid incremental checkpoint, skipping load"
+        )
+        return 0
+    with fs.open(manifest_name, "r") as fp:
+        manifest = json.load(fp)
+
+    state_file = _cache_if_needed(_blob_path(path, manifest["state"]))
+    with open(state_file, "rb") as fp:
+        skeleton = torch.load(fp, map_location="cpu")
+    tensors = {
+        key: _read_blob(
+            path, info["blob"], getattr(torch, info["dtype"]), info["shape"]
+        )
+        for key, info in manifest["tensors"].items()
+    }
+
+    # == Loading models ==
+    if models:
+        if not isinstance(models, list):
+            models = [models]
+        for name, model in _unique_model_names(models, loading=True).items():
+            if name not in skeleton["models"]:
+                checkpoint_logging.error(
+                    f"Could not find model {name} in {manifest_name}, skipping load"
+                )
+                continue
+            # Copies from the memory mapped blobs into the parameters
+            model.load_state_dict(_unflatten(skeleton["models"][name], tensors))
+            checkpoint_logging.success(
+                f"Loaded model state dictionary {name} from {manifest_name}"
+            )
+
+    # == Loading training state ==
+    checkpoint_dict = _unflatten(
+        skeleton["training"],
+        {k: v.to(device) for k, v in tensors.items() if k.startswith("training/")},
+    )
+    checkpoint_logging.success(
+        f"Loaded checkpoint file {manifest_name} to device {device}"
+    )
+    return _load_training_state(
+        checkpoint_dict, optimizer, scheduler, scaler, metadata_dict
+    )
+
+
+def _referenced_blobs(fs: fsspec.AbstractFileSystem, manifests: List[str]) -> Set[str]:
+    referenced = set()
+    for manifest_name in manifests:
+        with fs.open(manifest_name, "r") as fp:
+            manifest = json.load(fp)
+        referenced.add(manifest["state"])
+        referenced.update(info["blob"] for info in manifest["tensors"].values())
+    return referenced
+
+
+def gc_checkpoint_blobs(path: str, keep_last: Optional[int] = None) -> int:
+    """Deletes the blobs of the incremental checkpoints in `path` that are not
+    referenced by any manifest
+
+    Must not run while a checkpoint is being saved to `path`, the blobs of a
+    checkpoint are written before its manifest.
+
+    Parameters
+    ----------
+    path : str
+        Path to the checkpoints
+    keep_last : Optional[int], optional
+        If set, only the manifests with the `keep_last` largest indices of every model
+        parallel rank are kept and the older ones are deleted first, by default None
+
+    Returns
+    -------
+    int
+        Number of bytes freed
+    """
+    fs = fsspec.filesystem(fsspec.utils.get_protocol(path))
+    if not fs.exists(f"{path}/{_BLOB_DIR}"):
+        return 0
+    manifests = fs.glob(f"{path}/checkpoint.*{_MANIFEST_EXTENSION}")
+
+    if keep_last is not None:
+        by_rank: Dict[str, List[str]] = {}
+        for manifest_name in manifests:
+            rank = manifest_name.rsplit("/", 1)[-1].split(".")[1]
+            by_rank.setdefault(rank, []).append(manifest_name)
+        manifests = []
+        for names in by_rank.values():
+            names.sort(key=_manifest_index)
+            for manifest_name in names[: max(len(names) - keep_last, 0)]:
+                fs.rm(manifest_name)
+                checkpoint_logging.info(f"Deleted checkpoint manifest {manifest_name}")
+            manifests.extend(names[max(len(names) - keep_last, 0) :])
+
+    referenced = _referenced_blobs(fs, manifests)
+    freed = 0
+    for blob, info in fs.find(f"{path}/{_BLOB_DIR}", detail=True).items():
+        digest = blob.rsplit("/", 1)[-1]
+        # Temporary files belong to saves in progress or interrupted ones
+        if digest in referenced or digest.endswith(".tmp"):
+            continue
+        fs.rm(blob)
+        freed += info["size"]
+    checkpoint_logging.success(f"Freed {freed} bytes of unreferenced checkpoint blobs")
+    return freed
@@ -0,0 +1,489 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Sharded checkpoints for distributed models.
+
+A sharded checkpoint is a directory ``{path}/sharded.{index}`` holding:
+
+- ``shard.{rank}.pt``: the tensor data written by one rank,
+- ``state.pt``: the structure of the saved state dictionaries, in which every
+  tensor is replaced by a reference to the manifest,
+- ``manifest.json``: the global shape and dtype of every tensor together with the
+  list of chunks (rank, offsets and shape) it has been written as.
+
+Every rank writes in parallel and only the data it owns: the local shards of
+distributed tensors (``ShardTensor`` / ``DTensor``), deduplicated over replicated mesh
+dimensions, and a share of the regular tensors, which are assumed to be replicated
+on all ranks (data parallel or graph partitioned models). The manifest is written
+last and marks the checkpoint as complete.
+
+When loading, every rank reads the parts of the chunks overlapping with the local
+shard of its target tensors, so a checkpoint can be restored on a different device
+mesh or world size than the one it was saved with.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import fsspec
+import fsspec.utils
+import torch
+import torch.distributed as dist
+
+from physicsnemo.launch.logging import PythonLogger
+from physicsnemo.launch.utils.checkpoint import (
+    _cache_if_needed,
+    _flatten,
+    _load_training_state,
+    _make_checkpoint_dir,
+    _training_state_dict,
+    _unflatten,
+    _unique_model_names,
+    optimizer,
+    scaler,
+    scheduler,
+    wait_for_checkpoints,
+)
+
+try:
+    from torch.distributed.tensor import DTensor
+    from torch.distributed.tensor._utils import compute_local_shape_and_global_offset
+except ImportError:
+    DTensor = None
+
+try:
+    from physicsnemo.distributed import ShardTensor
+except ImportError:
+    ShardTensor = None
+
+checkpoint_logging = PythonLogger("checkpoint")
+
+
+def _dist_info() -> Tuple[int, int]:
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_rank(), dist.get_world_size()
+    return 0, 1
+
+
+def _barrier() -> None:
+    if dist.is_available() and dist.is_initialized():
+        dist.barrier()
+
+
+def _is_distributed(tensor: torch.Tensor) -> bool:
+    return DTensor is not None and isinstance(tensor, DTensor)
+
+
+def _local_chunk(tensor: torch.Tensor) -> Tuple[torch.Tensor, List[int], bool]:
+    """Local data of a distributed tensor, its offset in the global tensor and whether
+    this rank is the one writing it (the first rank along every replicated mesh
+    dimension)"""
+    placements = tensor.placements
+    if any(p.is_partial() for p in placements):
+        raise ValueError(
+            "Partial placements can not be checkpointed, reduce the tensor first"
+        )
+
+    if ShardTensor is not None and isinstance(tensor, ShardTensor):
+        spec = tensor._spec
+        spec.sharding_shapes()  # Makes sure the shapes of all shards are known
+        offsets = [0] * tensor.ndim
+        for mesh_dim, placement in enumerate(placements):
+            if placement.is_shard():
+                offsets[placement.dim] += spec.offsets(mesh_dim)
+    else:
+        _, offsets = compute_local_shape_and_global_offset(
+            tensor.shape, tensor.device_mesh, placements
+        )
+
+    coordinate = tensor.device_mesh.get_coordinate()
+    owner = all(c == 0 for c, p in zip(coordinate, placements) if not p.is_shard())
+    return tensor.to_local(), list(offsets), owner
+
+
+def _assign_replicated(
+    tensors: Dict[str, torch.Tensor], world_size: int
+) -> Dict[str, int]:
+    """Balances the writes of regular (replicated) tensors over the ranks, by bytes.
+    The assignment only depends on the keys, shapes and dtypes, so every rank
+    computes the same one without communication."""
+    keys = [k for k, t in tensors.items() if not _is_distributed(t)]
+    keys.sort(key=lambda k: (-tensors[k].numel() * tensors[k].element_size(), k))
+    load = [0] * world_size
+    owners = {}
+    for key in keys:
+        rank = load.index(min(load))
+        owners[key] = rank
+        load[rank] += tensors[key].numel() * tensors[key].element_size()
+    return owners
+
+
+def _sharded_indices(
+    fs: fsspec.AbstractFileSystem, path: str, committed: bool
+) -> List[int]:
+    """Indices of the sharded checkpoints found in path. Committed ones are the
+    checkpoints whose manifest has been written."""
+    indices = []
+    pattern = f"{path}/sharded.*/manifest.json" if committed else f"{path}/sharded.*"
+    for name in fs.glob(pattern):
+        if committed:
+            name = name.rsplit("/", 1)[0]
+        suffix = name.rsplit("sharded.", 1)[-1]
+        if suffix.isdigit():
+            indices.append(int(suffix))
+    return indices
+
+
+def _sharded_state(
+    models: Union[torch.nn.Module, List[torch.nn.Module], None],
+    optimizer: Union[optimizer, None],
+    scheduler: Union[scheduler, None],
+    scaler: Union[scaler, None],
+    epoch: Union[int, None],
+    metadata: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    state = {"models": {}, "training": {}}
+    if models:
+        if not isinstance(models, list):
+            models = [models]
+        for name, model in _unique_model_names(models).items():
+            state["models"][name] = model.state_dict()
+    state["training"] = _training_state_dict(
+        optimizer, scheduler, scaler, epoch, metadata
+    )
+    return state
+
+
+def save_sharded_checkpoint(
+    path: str,
+    models: Union[torch.nn.Module, List[torch.nn.Module], None] = None,
+    optimizer: Union[optimizer, None] = None,
+    scheduler: Union[scheduler, None] = None,
+    scaler: Union[scaler, None] = None,
+    epoch: Union[int, None] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Sharded training checkpoint saving utility
+
+    Saves the same state as `save_checkpoint`, but every rank only writes the data
+    it owns into ``{path}/sharded.{epoch/index}``: the local shards of `ShardTensor`
+    and `DTensor` parameters and states, and an even share of the regular tensors,
+    which are assumed to be identical on all ranks. Must be called on all ranks.
+
+    Parameters
+    ----------
+    path : str
+        Path to save the training checkpoint
+    models : Union[torch.nn.Module, List[torch.nn.Module], None], optional
+        A single or list of PyTorch models, by default None
+    optimizer : Union[optimizer, None], optional
+        Optimizer, by default None
+    scheduler : Union[scheduler, None], optional
+        Learning rate scheduler, by default None
+    scaler : Union[scaler, None], optional
+        AMP grad scaler, by default None
+    epoch : Union[int, None], optional
+        Epoch checkpoint to save. If none this will save the checkpoint in the next
+        valid index, by default None
+    metadata : Optional[Dict[str, Any]], optional
+        Additional metadata to save, by default None
+    """
+    rank, world_size = _dist_info()
+    fs = fsspec.filesystem(fsspec.utils.get_protocol(path))
+
+    tensors: Dict[str, torch.Tensor] = {}
+    skeleton = _flatten(
+        _sharded_state(models, optimizer, scheduler, scaler, epoch, metadata),
+        "",
+        tensors,
+    )
+
+    # Gather the data owned by this rank
+    owners = _assign_replicated(tensors, world_size)
+    local_data, local_chunks = {}, {}
+    with torch.no_grad():
+        for key, tensor in tensors.items():
+            if _is_distributed(tensor):
+                data, offsets, owner = _local_chunk(tensor)
+                if not owner:
+                    continue
+            elif owners[key] == rank:
+                data, offsets = tensor, [0] * tensor.ndim
+            else:
+                continue
+            data = data.detach().cpu()
+            # Do not serialize the whole storage of views
+            if data.untyped_storage().nbytes() != data.numel() * data.element_size():
+                data = data.clone()
+            local_data[key] = data
+            local_chunks[key] = {
+                "rank": rank,
+                "offsets": offsets,
+                "shape": list(data.shape),
+            }
+
+    # Checkpoint directory, all ranks agree on the index picked by rank 0
+    directory = [None]
+    if rank == 0:
+        _make_checkpoint_dir(path)
+        if epoch is None:
+            existing = _sharded_indices(fs, path, committed=False)
+            epoch = max(existing) + 1 if existing else 0
+        directory[0] = f"{path}/sharded.{epoch}"
+        fs.makedirs(directory[0], exist_ok=True)
+        # Uncommit a checkpoint saved before with the same index while the shards
+        # are overwritten. The other ranks wait for the broadcast before writing
+        if fs.exists(f"{directory[0]}/manifest.json"):
+            fs.rm(f"{directory[0]}/manifest.json")
+    if world_size > 1:
+        dist.broadcast_object_list(directory, src=0)
+    directory = directory[0]
+
+    with fs.open(f"{directory}/shard.{rank}.pt", "wb") as fp:
+        torch.save(local_data, fp)
+
+    # Collect the chunk layout of all ranks
+    if world_size > 1:
+        all_chunks = [None] * world_size if rank == 0 else None
+        dist.gather_object(local_chunks, all_chunks, dst=0)
+    else:
+        all_chunks = [local_chunks]
+
+    if rank == 0:
+        manifest = {
+            "world_size": world_size,
+            "tensors": {
+                key: {
+                    "shape": list(tensor.shape),
+                    "dtype": str(tensor.dtype).removeprefix("torch."),
+                    "chunks": [c[key] for c in all_chunks if key in c],
+                }
+                for key, tensor in tensors.items()
+            },
+        }
+        with fs.open(f"{directory}/state.pt", "wb") as fp:
+            torch.save(skeleton, fp)
+
+    # The manifest commits the checkpoint, only write it once all shards exist
+    _barrier()
+    if rank == 0:
+        with fs.open(f"{directory}/manifest.json", "w") as fp:
+            json.dump(manifest, fp)
+        checkpoint_logging.success(f"Saved sharded checkpoint: {directory}")
+    _barrier()
+
+
+class _ShardReader:
+    """Lazily opens the shard files of a sharded checkpoint. Local files are
+    memory-mapped with PyTorch 2.1 or later, so only the bytes of the chunks regions
+    that are read are paged in"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.protocol = fsspec.utils.get_protocol(directory)
+        self._shards: Dict[int, Dict[str, torch.Tensor]] = {}
+
+    def get(self, rank: int, key: str) -> torch.Tensor:
+        if rank not in self._shards:
+            file_name = f"{self.directory}/shard.{rank}.pt"
+            # Memory mapping requires PyTorch 2.1 or later
+            if self.protocol == "file" and torch.__version__ >= (2, 1):
+                self._shards[rank] = torch.load(
+                    file_name, map_location="cpu", mmap=True
+                )
+            else:
+                self._shards[rank] = torch.load(
+                    _cache_if_needed(file_name), map_location="cpu"
+                )
+        return self._shards[rank][key]
+
+    def read(
+        self,
+        key: str,
+        info: Dict[str, Any],
+        offsets: List[int],
+        out: torch.Tensor,
+    ) -> torch.Tensor:
+        """Fills `out` with the region of the global tensor starting at `offsets`"""
+        for chunk in info["chunks"]:
+            lo = [max(o, c) for o, c in zip(offsets, chunk["offsets"])]
+            hi = [
+                min(o + s, c + cs)
+                for o, s, c, cs in zip(
+                    offsets, out.shape, chunk["offsets"], chunk["shape"]
+                )
+            ]
+            if any(h <= lo_ for lo_, h in zip(lo, hi)):
+                continue
+            src = self.get(chunk["rank"], key)[
+                tuple(slice(a - c, b - c) for a, b, c in zip(lo, hi, chunk["offsets"]))
+            ]
+            dst = tuple(slice(a - o, b - o) for a, b, o in zip(lo, hi, offsets))
+            out[dst].copy_(src)
+        return out
+
+
+def _load_into(
+    reader: _ShardReader, key: str, info: Dict[str, Any], target: torch.Tensor
+) -> None:
+    """Loads a saved tensor in place into the local data of `target`"""
+    if list(target.shape) != info["shape"]:
+        raise ValueError(
+            f"Shape mismatch for {key}: checkpoint has {info['shape']} but the "
+            f"target tensor is {list(target.shape)}"
+        )
+    with torch.no_grad():
+        if _is_distributed(target):
+            local, offsets, _ = _local_chunk(target)
+        else:
+            local, offsets = target, [0] * target.ndim
+        buffer = torch.empty(local.shape, dtype=getattr(torch, info["dtype"]))
+        local.copy_(reader.read(key, info, offsets, buffer))
+
+
+def _read_full(
+    reader: _ShardReader,
+    key: str,
+    info: Dict[str, Any],
+    device: Union[str, torch.device],
+) -> torch.Tensor:
+    buffer = torch.empty(info["shape"], dtype=getattr(torch, info["dtype"]))
+    return reader.read(key, info, [0] * len(info["shape"]), buffer).to(device)
+
+
+def load_sharded_checkpoint(
+    path: str,
+    models: Union[torch.nn.Module, List[torch.nn.Module], None] = None,
+    optimizer: Union[optimizer, None] = None,
+    scheduler: Union[scheduler, None] = None,
+    scaler: Union[scaler, None] = None,
+    epoch: Union[int, None] = None,
+    metadata_dict: Optional[Dict[str, Any]] = {},
+    device: Union[str, torch.device] = "cpu",
+) -> int:
+    """Sharded checkpoint loading utility
+
+    Loads a checkpoint written by `save_sharded_checkpoint`, resharding the data to
+    the layout of the provided models and optimizer. Model weights are loaded in
+    place, distributed parameters keep their device mesh and placements which may
+    differ from the ones used when saving. Optimizer states of distributed
+    parameters follow the layout of their parameter.
+
+    Parameters
+    ----------
+    path : str
+        Path to training checkpoint
+    models : Union[torch.nn.Module, List[torch.nn.Module], None], optional
+        A single or list of PyTorch models, by default None
+    optimizer : Union[optimizer, None], optional
+        Optimizer, by default None
+    scheduler : Union[scheduler, None], optional
+        Learning rate scheduler, by default None
+    scaler : Union[scaler, None], optional
+        AMP grad scaler, by default None
+    epoch : Union[int, None], optional
+        Epoch checkpoint to load. If none is provided this will attempt to load the
+        checkpoint with the largest index, by default None
+    metadata_dict: Optional[Dict[str, Any]], optional
+        Dictionary to store metadata from the checkpoint, by default None
+    device : Union[str, torch.device], optional
+        Target device of regular tensors that are not loaded in place, by default "cpu"
+
+    Returns
+    -------
+    int
+        Loaded epoch
+    """
+    wait_for_checkpoints()
+
+    fs = fsspec.filesystem(fsspec.utils.get_protocol(path))
+    committed = _sharded_indices(fs, path, committed=True) if fs.exists(path) else []
+    if epoch is None:
+        epoch = max(committed) if committed else None
+    if epoch not in committed:
+        checkpoint_logging.warning(
+            "Could not find valid sharded checkpoint, skipping load"
+        )
+        return 0
+    directory = f"{path}/sharded.{epoch}"
+
+    with fs.open(f"{directory}/manifest.json", "r") as fp:
+        manifest = json.load(fp)["tensors"]
+    with fs.open(f"{directory}/state.pt", "rb") as fp:
+        skeleton = torch.load(fp, map_location="cpu")
+    reader = _ShardReader(directory)
+
+    # == Loading models ==
+    if models:
+        if not isinstance(models, list):
+            models = [models]
+        for name, model in _unique_model_names(models, loading=True).items():
+            prefix = f"models/{name}/"
+            saved = {k[len(prefix) :] for k in manifest if k.startswith(prefix)}
+            state_dict = model.state_dict()
+            missing = set(state_dict) - saved
+            unexpected = saved - set(state_dict)
+            if missing or unexpected:
+                raise KeyError(
+                    f"Checkpoint does not match model {name}, missing keys: "
+                    f"{sorted(missing)}, unexpected keys: {sorted(unexpected)}"
+                )
+            for key, target in state_dict.items():
+                _load_into(reader, prefix + key, manifest[prefix + key], target)
+            checkpoint_logging.success(f"Loaded model state dictionary {name}")
+
+    # == Loading training state ==
+    training = skeleton["training"]
+
+    # Targets of optimizer states: live states when they exist, otherwise tensors
+    # laid out like their (possibly distributed) parameter
+    targets: Dict[str, torch.Tensor] = {}
+    if optimizer and "optimizer_state_dict" in training:
+        _flatten(optimizer.state_dict(), "training/optimizer_state_dict", targets)
+        params = {}
+        for group, saved_group in zip(
+            optimizer.param_groups, training["optimizer_state_dict"]["param_groups"]
+        ):
+            params.update(zip(saved_group["params"], group["params"]))
+        for key, info in manifest.items():
+            parts = key.split("/")
+            if key in targets or parts[:3] != [
+                "training",
+                "optimizer_state_dict",
+                "state",
+            ]:
+                continue
+            param = params.get(int(parts[3]))
+            if param is not None and list(param.shape) == info["shape"]:
+                targets[key] = torch.empty_like(
+                    param.detach(), dtype=getattr(torch, info["dtype"])
+                )
+
+    tensors = {}
+    for key, info in manifest.items():
+        if not key.startswith("training/"):
+            continue
+        target = targets.get(key)
+        if target is not None and list(target.shape) == info["shape"]:
+            _load_into(reader, key, info, target)
+            tensors[key] = target
+        else:
+            tensors[key] = _read_full(reader, key, info, device)
+    checkpoint_dict = _unflatten(training, tensors)
+
+    return _load_training_state(
+        checkpoint_dict, optimizer, scheduler, scaler, metadata_dict
+    )
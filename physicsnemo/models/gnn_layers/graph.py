@@ -33,16 +33,10 @@ from physicsnemo.models.gnn_layers import (
     GraphPartition,
     partition_graph_by_coordinate_bbox,
 )
+from physicsnemo.utils.lazy_import import LazyModule, is_importable
 
-try:
-    from pylibcugraphops.pytorch import BipartiteCSC, StaticCSC
-
-    USE_CUGRAPHOPS = True
-
-except ImportError:
-    StaticCSC = None
-    BipartiteCSC = None
-    USE_CUGRAPHOPS = False
+# Only imported when a graph is first converted to a cugraph-ops graph
+cugraphops = LazyModule("pylibcugraphops.pytorch")
 
 
 class CuGraphCSC:
@@ -344,7 +338,7 @@ class CuGraphCSC:
 
         return self
 
-    def to_bipartite_csc(self, dtype=None) -> BipartiteCSC:
+    def to_bipartite_csc(self, dtype=None) -> "cugraphops.BipartiteCSC":
         """Converts the graph to a bipartite CSC graph.
 
         Parameters
@@ -358,7 +352,7 @@ class CuGraphCSC:
             The bipartite CSC graph.
         """
 
-        if not (USE_CUGRAPHOPS):
+        if not is_importable(cugraphops):
             raise RuntimeError(
                 "Conversion failed, expected cugraph-ops to be installed."
             )
@@ -384,7 +378,7 @@ class CuGraphCSC:
                 if self.ef_indices is not None:
                     graph_ef_indices = self.ef_indices.to(dtype=dtype)
 
-            graph = BipartiteCSC(
+            graph = cugraphops.BipartiteCSC(
                 graph_offsets,
                 graph_indices,
                 self.num_src_nodes,
@@ -395,7 +389,7 @@ class CuGraphCSC:
 
         return self.bipartite_csc
 
-    def to_static_csc(self, dtype=None) -> StaticCSC:
+    def to_static_csc(self, dtype=None) -> "cugraphops.StaticCSC":
         """Converts the graph to a static CSC graph.
 
         Parameters
@@ -409,7 +403,7 @@ class CuGraphCSC:
             The static CSC graph.
         """
 
-        if not (USE_CUGRAPHOPS):
+        if not is_importable(cugraphops):
             raise RuntimeError(
                 "Conversion failed, expected cugraph-ops to be installed."
             )
@@ -435,7 +429,7 @@ class CuGraphCSC:
                 if self.ef_indices is not None:
                     graph_ef_indices = self.ef_indices.to(dtype=dtype)
 
-            graph = StaticCSC(
+            graph = cugraphops.StaticCSC(
                 graph_offsets,
                 graph_indices,
                 graph_ef_indices,
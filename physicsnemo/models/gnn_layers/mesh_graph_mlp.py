@@ -23,16 +23,13 @@ from dgl import DGLGraph
 from torch import Tensor
 from torch.autograd.function import once_differentiable
 
-from .utils import CuGraphCSC, concat_efeat, sum_efeat
-
-try:
-    from transformer_engine import pytorch as te
+from physicsnemo.utils.lazy_import import LazyModule, is_importable
+from physicsnemo.utils.profiling import profile
 
-    te_imported = True
-except ImportError:
-    te_imported = False
+from .utils import CuGraphCSC, concat_efeat, sum_efeat
 
-from physicsnemo.utils.profiling import profile
+# Only imported when a TELayerNorm is created, importing it takes seconds
+te = LazyModule("transformer_engine.pytorch")
 
 
 class CustomSiLuLinearAutogradFunction(torch.autograd.Function):
@@ -155,9 +152,9 @@ class MeshGraphMLP(nn.Module):
                     raise ValueError(
                         f"Invalid norm type {norm_type}. Supported types are LayerNorm and TELayerNorm."
                     )
-                if norm_type == "TELayerNorm" and te_imported:
+                if norm_type == "TELayerNorm" and is_importable(te):
                     norm_layer = te.LayerNorm
-                elif norm_type == "TELayerNorm" and not te_imported:
+                elif norm_type == "TELayerNorm" and not is_importable(te):
                     raise ValueError(
                         "TELayerNorm requires transformer-engine to be installed."
                     )
@@ -364,9 +361,9 @@ class MeshGraphEdgeMLPSum(nn.Module):
                 raise ValueError(
                     f"Invalid norm type {norm_type}. Supported types are LayerNorm and TELayerNorm."
                 )
-            if norm_type == "TELayerNorm" and te_imported:
+            if norm_type == "TELayerNorm" and is_importable(te):
                 norm_layer = te.LayerNorm
-            elif norm_type == "TELayerNorm" and not te_imported:
+            elif norm_type == "TELayerNorm" and not is_importable(te):
                 raise ValueError(
                     "TELayerNorm requires transformer-engine to be installed."
                 )
@@ -23,21 +23,10 @@ from torch import Tensor
 from torch.utils.checkpoint import checkpoint
 
 from physicsnemo.models.gnn_layers import CuGraphCSC
+from physicsnemo.utils.lazy_import import LazyModule, is_importable
 
-try:
-    from pylibcugraphops.pytorch.operators import (
-        agg_concat_e2n,
-        update_efeat_bipartite_e2e,
-        update_efeat_static_e2e,
-    )
-
-    USE_CUGRAPHOPS = True
-
-except ImportError:
-    update_efeat_bipartite_e2e = None
-    update_efeat_static_e2e = None
-    agg_concat_e2n = None
-    USE_CUGRAPHOPS = False
+# Only imported when a CuGraphCSC graph is first used
+cugraphops = LazyModule("pylibcugraphops.pytorch.operators")
 
 
 def checkpoint_identity(layer: Callable, *args: Any, **kwargs: Any) -> Any:
@@ -172,7 +161,7 @@ def concat_efeat(
     """
     if isinstance(nfeat, Tensor):
         if isinstance(graph, CuGraphCSC):
-            if graph.dgl_graph is not None or not USE_CUGRAPHOPS:
+            if graph.dgl_graph is not None or not is_importable(cugraphops):
                 src_feat, dst_feat = nfeat, nfeat
                 if graph.is_distributed:
                     src_feat = graph.get_src_node_features_in_local_graph(nfeat)
@@ -186,13 +175,13 @@ def concat_efeat(
                     # torch.int64 to avoid indexing overflows due tu current behavior of cugraph-ops
                     bipartite_graph = graph.to_bipartite_csc(dtype=torch.int64)
                     dst_feat = nfeat
-                    efeat = update_efeat_bipartite_e2e(
+                    efeat = cugraphops.update_efeat_bipartite_e2e(
                         efeat, src_feat, dst_feat, bipartite_graph, "concat"
                     )
 
                 else:
                     static_graph = graph.to_static_csc()
-                    efeat = update_efeat_static_e2e(
+                    efeat = cugraphops.update_efeat_static_e2e(
                         efeat,
                         nfeat,
                         static_graph,
@@ -208,7 +197,7 @@ def concat_efeat(
         src_feat, dst_feat = nfeat
         # update edge features through concatenating edge and node features
         if isinstance(graph, CuGraphCSC):
-            if graph.dgl_graph is not None or not USE_CUGRAPHOPS:
+            if graph.dgl_graph is not None or not is_importable(cugraphops):
                 if graph.is_distributed:
                     src_feat = graph.get_src_node_features_in_local_graph(src_feat)
                 efeat = concat_efeat_dgl(
@@ -220,7 +209,7 @@ def concat_efeat(
                     src_feat = graph.get_src_node_features_in_local_graph(src_feat)
                 # torch.int64 to avoid indexing overflows due tu current behavior of cugraph-ops
                 bipartite_graph = graph.to_bipartite_csc(dtype=torch.int64)
-                efeat = update_efeat_bipartite_e2e(
+                efeat = cugraphops.update_efeat_bipartite_e2e(
                     efeat, src_feat, dst_feat, bipartite_graph, "concat"
                 )
         else:
@@ -281,7 +270,7 @@ def sum_efeat(
     """
     if isinstance(nfeat, Tensor):
         if isinstance(graph, CuGraphCSC):
-            if graph.dgl_graph is not None or not USE_CUGRAPHOPS:
+            if graph.dgl_graph is not None or not is_importable(cugraphops):
                 src_feat, dst_feat = nfeat, nfeat
                 if graph.is_distributed:
                     src_feat = graph.get_src_node_features_in_local_graph(src_feat)
@@ -294,13 +283,13 @@ def sum_efeat(
                     src_feat = graph.get_src_node_features_in_local_graph(nfeat)
                     dst_feat = nfeat
                     bipartite_graph = graph.to_bipartite_csc()
-                    sum_efeat = update_efeat_bipartite_e2e(
+                    sum_efeat = cugraphops.update_efeat_bipartite_e2e(
                         efeat, src_feat, dst_feat, bipartite_graph, mode="sum"
                     )
 
                 else:
                     static_graph = graph.to_static_csc()
-                    sum_efeat = update_efeat_bipartite_e2e(
+                    sum_efeat = cugraphops.update_efeat_bipartite_e2e(
                         efeat, nfeat, static_graph, mode="sum"
                     )
 
@@ -312,7 +301,7 @@ def sum_efeat(
     else:
         src_feat, dst_feat = nfeat
         if isinstance(graph, CuGraphCSC):
-            if graph.dgl_graph is not None or not USE_CUGRAPHOPS:
+            if graph.dgl_graph is not None or not is_importable(cugraphops):
                 if graph.is_distributed:
                     src_feat = graph.get_src_node_features_in_local_graph(src_feat)
 
@@ -324,7 +313,7 @@ def sum_efeat(
                     src_feat = graph.get_src_node_features_in_local_graph(src_feat)
 
                 bipartite_graph = graph.to_bipartite_csc()
-                sum_efeat = update_efeat_bipartite_e2e(
+                sum_efeat = cugraphops.update_efeat_bipartite_e2e(
                     efeat, src_feat, dst_feat, bipartite_graph, mode="sum"
                 )
         else:
@@ -415,12 +404,14 @@ def aggregate_and_concat(
         # gurantueed to be on the same rank on both cases due to our
         # partitioning scheme
 
-        if graph.dgl_graph is not None or not USE_CUGRAPHOPS:
+        if graph.dgl_graph is not None or not is_importable(cugraphops):
             cat_feat = agg_concat_dgl(efeat, nfeat, graph.to_dgl_graph(), aggregation)
 
         else:
             static_graph = graph.to_static_csc()
-            cat_feat = agg_concat_e2n(nfeat, efeat, static_graph, aggregation)
+            cat_feat = cugraphops.agg_concat_e2n(
+                nfeat, efeat, static_graph, aggregation
+            )
     else:
         cat_feat = agg_concat_dgl(efeat, nfeat, graph, aggregation)
 
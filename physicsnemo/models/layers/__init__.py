@@ -14,6 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from physicsnemo.utils.lazy_import import lazy_getattr
+
 from .activations import (
     CappedGELU,
     CappedLeakyReLU,
@@ -48,11 +50,16 @@ from .spectral_layers import (
     SpectralConv3d,
     SpectralConv4d,
 )
-from .transformer_layers import (
-    DecoderLayer,
-    EncoderLayer,
-    FuserLayer,
-    SwinTransformer,
-)
 from .weight_fact import WeightFactLinear
 from .weight_norm import WeightNormLinear
+
+# The transformer layers depend on timm, only import it when they are used
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "DecoderLayer": ".transformer_layers",
+        "EncoderLayer": ".transformer_layers",
+        "FuserLayer": ".transformer_layers",
+        "SwinTransformer": ".transformer_layers",
+    },
+)
@@ -17,6 +17,7 @@
 import copy
 import importlib
 import inspect
+import io
 import json
 import logging
 import os
@@ -27,6 +28,7 @@ from pathlib import Path
 from typing import Any, Dict, Optional, Union
 
 import torch
+from torch.overrides import TorchFunctionMode
 
 import physicsnemo
 from physicsnemo.models.meta import ModelMetaData
@@ -34,6 +36,75 @@ from physicsnemo.models.util_compatibility import convert_ckp_apex
 from physicsnemo.registry import ModelRegistry
 from physicsnemo.utils.filesystem import _download_cached, _get_fs
 
+# Random initializers, fills and tensor factories skipped while constructing a model
+# whose weights are then loaded
+_RANDOM_INITS = {
+    torch.nn.init.uniform_,
+    torch.nn.init.normal_,
+    torch.nn.init.trunc_normal_,
+    torch.nn.init.kaiming_uniform_,
+    torch.nn.init.kaiming_normal_,
+    torch.nn.init.xavier_uniform_,
+    torch.nn.init.xavier_normal_,
+    torch.nn.init.orthogonal_,
+    torch.nn.init.sparse_,
+    torch.Tensor.uniform_,
+    torch.Tensor.normal_,
+    torch.Tensor.random_,
+    torch.Tensor.bernoulli_,
+    torch.Tensor.exponential_,
+    torch.Tensor.cauchy_,
+    torch.Tensor.log_normal_,
+    torch.Tensor.geometric_,
+}
+_RANDOM_FACTORIES = {
+    torch.rand: torch.empty,
+    torch.randn: torch.empty,
+    torch.rand_like: torch.empty_like,
+    torch.randn_like: torch.empty_like,
+}
+
+
+class _SkipRandomInit(TorchFunctionMode):
+    """Leaves tensors uninitialized instead of filling them with random values
+
+    Torch function modes only apply to the thread that entered them, models built
+    concurrently by other threads are initialized normally.
+    """
+
+    def __torch_function__(self, func, types, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        if func in _RANDOM_INITS:
+            return args[0] if args else next(iter(kwargs.values()))
+        if func in _RANDOM_FACTORIES:
+            kwargs.pop("generator", None)
+            return _RANDOM_FACTORIES[func](*args, **kwargs)
+        return func(*args, **kwargs)
+
+
+def _tensors(value: Any):
+    """Tensors of a module attribute, including those held in lists and dicts"""
+    if isinstance(value, torch.Tensor):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from _tensors(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _tensors(v)
+
+
+def _has_meta_tensors(model: torch.nn.Module) -> bool:
+    """Whether any parameter, buffer or tensor attribute of a model is on meta"""
+    for module in model.modules():
+        tensors = list(module._parameters.values()) + list(module._buffers.values())
+        for name, value in vars(module).items():
+            if name not in ("_parameters", "_buffers", "_modules"):
+                tensors.extend(_tensors(value))
+        if any(t is not None and t.is_meta for t in tensors):
+            return True
+    return False
+
 
 class Module(torch.nn.Module):
     """The base class for all network models in PhysicsNeMo.
@@ -110,20 +181,6 @@ class Module(torch.nn.Module):
         self.logger.addHandler(handler)
         self.logger.setLevel(logging.WARNING)
 
-    @staticmethod
-    def _safe_members(tar, local_path):
-        for member in tar.getmembers():
-            if (
-                ".." in member.name
-                or os.path.isabs(member.name)
-                or os.path.realpath(os.path.join(local_path, member.name)).startswith(
-                    os.path.realpath(local_path)
-                )
-            ):
-                yield member
-            else:
-                print(f"Skipping potentially malicious file: {member.name}")
-
     @classmethod
     def _backward_compat_arg_mapper(
         cls, version: str, args: Dict[str, Any]
@@ -285,66 +342,178 @@ class Module(torch.nn.Module):
             self._orig_mod.save(file_name, verbose)
             return
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            local_path = Path(temp_dir)
+        if file_name is None:
+            file_name = self.meta.name + ".mdlus"
 
-            torch.save(self.state_dict(), local_path / "model.pt")
+        self._save_state_dict(file_name, self.state_dict(), verbose)
 
-            with open(local_path / "args.json", "w") as f:
-                json.dump(self._args, f)
+    def _save_state_dict(
+        self,
+        file_name: str,
+        state_dict: Dict[str, Any],
+        verbose: bool = False,
+    ) -> None:
+        """Writes a .mdlus archive of this model holding the provided state dictionary
 
-            # Save the physicsnemo version and git hash (if available)
-            metadata_info = {
-                "physicsnemo_version": physicsnemo.__version__,
-                "mdlus_file_version": self.__model_checkpoint_version__,
-            }
+        This is used by `save` as well as by checkpoint utilities that snapshot the
+        state dictionary ahead of time and write it from a background thread.
 
-            if verbose:
-                import git
+        Parameters
+        ----------
+        file_name : str
+            File name to write the archive to
+        state_dict : Dict[str, Any]
+            State dictionary to store as the model weights
+        verbose : bool, optional
+            Whether to include the git hash in the metadata, by default False
+        """
+        # Save the physicsnemo version and git hash (if available)
+        metadata_info = {
+            "physicsnemo_version": physicsnemo.__version__,
+            "mdlus_file_version": self.__model_checkpoint_version__,
+        }
 
-                try:
-                    repo = git.Repo(search_parent_directories=True)
-                    metadata_info["git_hash"] = repo.head.object.hexsha
-                except git.InvalidGitRepositoryError:
-                    metadata_info["git_hash"] = None
+        if verbose:
+            import git
 
-            with open(local_path / "metadata.json", "w") as f:
-                json.dump(metadata_info, f)
+            try:
+                repo = git.Repo(search_parent_directories=True)
+                metadata_info["git_hash"] = repo.head.object.hexsha
+            except git.InvalidGitRepositoryError:
+                metadata_info["git_hash"] = None
 
-            # Once all files are saved, package them into a tar file
-            with tarfile.open(local_path / "model.tar", "w") as tar:
-                for file in local_path.iterdir():
-                    tar.add(str(file), arcname=file.name)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_path = Path(temp_dir)
 
-            if file_name is None:
-                file_name = self.meta.name + ".mdlus"
+            torch.save(state_dict, local_path / "model.pt")
+
+            # Package everything into an uncompressed tar. The small json members go
+            # first and the weights last, so every member starts on a 512 byte block
+            # boundary and the 64 byte aligned records of model.pt stay aligned
+            # within the archive. This is what allows `load` to memory-map the
+            # weights in place without extracting them.
+            with tarfile.open(local_path / "model.tar", "w") as tar:
+                for name, info in (
+                    ("metadata.json", metadata_info),
+                    ("args.json", self._args),
+                ):
+                    data = json.dumps(info).encode("utf-8")
+                    member = tarfile.TarInfo(name)
+                    member.size = len(data)
+                    tar.addfile(member, io.BytesIO(data))
+                tar.add(str(local_path / "model.pt"), arcname="model.pt")
 
             # Save files to remote destination
             fs = _get_fs(file_name)
             fs.put(str(local_path / "model.tar"), file_name)
 
     @staticmethod
-    def _check_checkpoint(local_path: str) -> bool:
-        if not local_path.joinpath("args.json").exists():
+    def _check_checkpoint(members: Dict[str, tarfile.TarInfo]) -> None:
+        if "args.json" not in members:
             raise IOError("File 'args.json' not found in checkpoint")
 
-        if not local_path.joinpath("metadata.json").exists():
+        if "metadata.json" not in members:
             raise IOError("File 'metadata.json' not found in checkpoint")
 
-        if not local_path.joinpath("model.pt").exists():
+        if "model.pt" not in members:
             raise IOError("Model weights 'model.pt' not found in checkpoint")
 
-        if not local_path.joinpath("metadata.json").exists():
-            raise IOError("Metadata 'metadata.json' not found in checkpoint")
+    @staticmethod
+    def _checkpoint_members(tar: tarfile.TarFile) -> Dict[str, tarfile.TarInfo]:
+        """Index the regular file members of a checkpoint archive by name.
+
+        Members are never extracted, they are read directly from their offset in the
+        archive. Anything that is not a plain top level file is ignored.
+        """
+        members = {}
+        for member in tar.getmembers():
+            if not member.isfile() or ".." in member.name or os.path.isabs(member.name):
+                continue
+            members[os.path.normpath(member.name)] = member
+        Module._check_checkpoint(members)
+        return members
+
+    @staticmethod
+    def _read_json_member(tar: tarfile.TarFile, member: tarfile.TarInfo) -> Dict:
+        with tar.extractfile(member) as f:
+            return json.load(f)
+
+    @staticmethod
+    def _load_state_dict_member(
+        file_name: str,
+        tar: tarfile.TarFile,
+        member: tarfile.TarInfo,
+        map_location: Union[None, str, torch.device] = None,
+        mmap: bool = False,
+    ) -> Dict[str, torch.Tensor]:
+        """Loads the state dictionary stored in a tar member without extracting it.
+
+        Parameters
+        ----------
+        file_name : str
+            Local path of the checkpoint archive
+        tar : tarfile.TarFile
+            Opened checkpoint archive
+        member : tarfile.TarInfo
+            Archive member holding the serialized state dictionary
+        map_location : Union[None, str, torch.device], optional
+            Device to place the loaded tensors on, by default None
+        mmap : bool, optional
+            Memory-map the archive so that tensor data is only paged in (and moved to
+            ``map_location``) tensor by tensor as it is used, by default False
+
+        Returns
+        -------
+        Dict[str, torch.Tensor]
+            Model state dictionary
+        """
+        with tar.extractfile(member) as f:
+            if mmap and not isinstance(tar.fileobj, io.BufferedReader):
+                warnings.warn(
+                    "Compressed checkpoint archives cannot be memory-mapped, reading "
+                    "the weights into memory"
+                )
+            elif mmap and torch.__version__ < (2, 1):
+                warnings.warn(
+                    "Memory-mapped checkpoint loading requires PyTorch 2.1 or later, "
+                    "reading the weights into memory"
+                )
+            elif mmap and not torch.serialization._is_zipfile(f):
+                warnings.warn(
+                    "Checkpoints saved with the legacy serialization format cannot be "
+                    "memory-mapped, reading the weights into memory"
+                )
+            elif mmap:
+                # The weights are a torch zip archive living at a fixed offset of the
+                # (uncompressed) tar file. Map the whole tar once and hand torch a
+                # storage view starting at that offset, record offsets reported by
+                # the zip reader are then relative to the member.
+                storage = torch.UntypedStorage.from_file(
+                    str(file_name), False, os.path.getsize(file_name)
+                )
+                storage = storage[member.offset_data : member.offset_data + member.size]
+                with torch.serialization._open_zipfile_reader(f) as zip_file:
+                    return torch.serialization._load(
+                        zip_file,
+                        map_location,
+                        torch.serialization._weights_only_unpickler,
+                        overall_storage=storage,
+                        encoding="utf-8",
+                    )
+            return torch.load(f, map_location=map_location)
 
     def load(
         self,
         file_name: str,
         map_location: Union[None, str, torch.device] = None,
         strict: bool = True,
+        mmap: bool = False,
     ) -> None:
         """Simple utility for loading the model weights from checkpoint
 
+        The checkpoint archive is never extracted, the weights are read directly from
+        their offset inside of the archive.
+
         Parameters
         ----------
         file_name : str
@@ -353,6 +522,9 @@ class Module(torch.nn.Module):
             Map location for loading the model weights, by default None will use model's device
         strict: bool, optional
             whether to strictly enforce that the keys in state_dict match, by default True
+        mmap : bool, optional
+            Memory-map the checkpoint instead of reading all weights into host memory,
+            tensors are then materialized lazily one at a time, by default False
 
         Raises
         ------
@@ -363,36 +535,48 @@ class Module(torch.nn.Module):
         # Download and cache the checkpoint file if needed
         cached_file_name = _download_cached(file_name)
 
-        # Use a temporary directory to extract the tar file
-        with tempfile.TemporaryDirectory() as temp_dir:
-            local_path = Path(temp_dir)
-
-            # Open the tar file and extract its contents to the temporary directory
-            with tarfile.open(cached_file_name, "r") as tar:
-                tar.extractall(
-                    path=local_path, members=list(Module._safe_members(tar, local_path))
-                )
-
+        with tarfile.open(cached_file_name, "r") as tar:
             # Check if the checkpoint is valid
-            Module._check_checkpoint(local_path)
+            members = Module._checkpoint_members(tar)
 
             # Load the model weights
             device = map_location if map_location is not None else self.device
-            model_dict = torch.load(
-                local_path.joinpath("model.pt"), map_location=device
+            model_dict = Module._load_state_dict_member(
+                cached_file_name, tar, members["model.pt"], device, mmap
             )
             self.load_state_dict(model_dict, strict=strict)
 
     @classmethod
     def from_checkpoint(
-        cls, file_name: str, model_args: Optional[Dict] = None
+        cls,
+        file_name: str,
+        model_args: Optional[Dict] = None,
+        map_location: Union[None, str, torch.device] = None,
+        mmap: bool = False,
+        fast_init: bool = False,
     ) -> "Module":
         """Simple utility for constructing a model from a checkpoint
 
+        The checkpoint archive is never extracted, the arguments, metadata and weights
+        are read directly from their offsets inside of the archive.
+
         Parameters
         ----------
         file_name : str
             Checkpoint file name
+        model_args : Optional[Dict], optional
+            Arguments overriding the ones stored in the checkpoint, by default None
+        map_location : Union[None, str, torch.device], optional
+            Device the model is moved to before its weights are loaded straight onto
+            it, by default None will keep the model on the CPU
+        mmap : bool, optional
+            Memory-map the checkpoint instead of reading all weights into host memory,
+            tensors are then materialized lazily one at a time, by default False
+        fast_init : bool, optional
+            Construct the model without randomly initializing the weights that the
+            checkpoint overwrites. The parameters directly use the loaded (and
+            possibly memory-mapped) tensors when the model can be built on the meta
+            device, by default False
 
         Returns
         -------
@@ -407,31 +591,20 @@ class Module(torch.nn.Module):
         # Download and cache the checkpoint file if needed
         cached_file_name = _download_cached(file_name)
 
-        # Use a temporary directory to extract the tar file
-        with tempfile.TemporaryDirectory() as temp_dir:
-            local_path = Path(temp_dir)
-
-            # Open the tar file and extract its contents to the temporary directory
-            with tarfile.open(cached_file_name, "r") as tar:
-                tar.extractall(
-                    path=local_path, members=list(Module._safe_members(tar, local_path))
-                )
-
+        with tarfile.open(cached_file_name, "r") as tar:
             # Check if the checkpoint is valid
-            Module._check_checkpoint(local_path)
+            members = Module._checkpoint_members(tar)
 
             # Load model arguments and instantiate the model
-            with open(local_path.joinpath("args.json"), "r") as f:
-                args = json.load(f)
+            args = Module._read_json_member(tar, members["args.json"])
 
             ckp_args = copy.deepcopy(args)
 
             # Load metadata to get version
-            with open(local_path.joinpath("metadata.json"), "r") as f:
-                metadata = json.load(f)
-                version = metadata.get(
-                    "mdlus_file_version", cls.__model_checkpoint_version__
-                )
+            metadata = Module._read_json_member(tar, members["metadata.json"])
+            version = metadata.get(
+                "mdlus_file_version", cls.__model_checkpoint_version__
+            )
 
             # Get class from args
             _cls = Module._get_class_from_args(args)
@@ -453,16 +626,76 @@ class Module(torch.nn.Module):
             if model_args is not None:
                 args["__args__"].update(model_args)
 
-            # Instantiate the model
-            model = Module.instantiate(args)
-
             # Load the model weights
-            model_dict = torch.load(
-                local_path.joinpath("model.pt"), map_location=model.device
+            device = torch.device(map_location if map_location is not None else "cpu")
+            model_dict = Module._load_state_dict_member(
+                cached_file_name, tar, members["model.pt"], device, mmap
             )
-
             model_dict = convert_ckp_apex(ckp_args, model_args, model_dict)
-            model.load_state_dict(model_dict, strict=False)
+
+            model = None
+            if fast_init:
+                model = Module._instantiate_from_state_dict(args, model_dict, device)
+            if model is None:
+                # Instantiate the model
+                model = Module.instantiate(args)
+                if map_location is not None:
+                    model = model.to(map_location)
+                model.load_state_dict(model_dict, strict=False)
+        return model
+
+    @staticmethod
+    def _instantiate_from_state_dict(
+        arg_dict: Dict[str, Any],
+        state_dict: Dict[str, torch.Tensor],
+        device: torch.device,
+    ) -> Union["Module", None]:
+        """Instantiates a model from its weights without random initialization
+
+        The model is first built on the meta device and its parameters and buffers
+        are replaced by the loaded tensors. This fails for models computing tensors
+        in `__init__` which are not stored in the checkpoint, those are instead built
+        on `device` with random initialization skipped in the calling thread.
+
+        Parameters
+        ----------
+        arg_dict : Dict[str, Any]
+            Dictionary of arguments to instantiate the model with
+        state_dict : Dict[str, torch.Tensor]
+            Model weights, already on `device`
+        device : torch.device
+            Device the model is placed on
+
+        Returns
+        -------
+        Union[Module, None]
+            The model, None if the weights do not cover all of its parameters and
+            buffers, in which case it must be initialized normally
+        """
+        try:
+            with torch.device("meta"):
+                model = Module.instantiate(arg_dict)
+        except Exception:
+            # Model __init__ needs the values of the tensors it creates
+            model = None
+
+        # Tied parameters would be untied by assigning the loaded tensors
+        if model is not None and len(list(model.parameters())) == len(
+            list(model.named_parameters(remove_duplicate=False))
+        ):
+            try:
+                model.load_state_dict(state_dict, strict=False, assign=True)
+            except TypeError:  # PyTorch < 2.1
+                model = None
+            if model is not None and not _has_meta_tensors(model):
+                return model.to(device)
+
+        with _SkipRandomInit():
+            model = Module.instantiate(arg_dict)
+        model = model.to(device)
+        missing_keys, _ = model.load_state_dict(state_dict, strict=False)
+        if missing_keys:
+            return None
         return model
 
     @staticmethod
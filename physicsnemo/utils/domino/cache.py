@@ -0,0 +1,266 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections.abc
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from physicsnemo.utils.domino.utils import is_cupy_array
+from physicsnemo.utils.filesystem import LOCAL_CACHE, DiskCache, file_lock, remove_path
+
+# Manifest of the directories written by `write_cached_sample`
+MANIFEST = "manifest.json"
+CACHE_FORMAT_VERSION = 1
+
+
+def _plain(value: Any) -> Any:
+    """JSON serializable copy of `value`, converting numpy and cupy arrays,
+    sequences and mappings like OmegaConf containers and objects like bounding
+    boxes to lists and dictionaries"""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, collections.abc.Mapping):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, collections.abc.Sequence):
+        return [_plain(v) for v in value]
+    if hasattr(value, "__dict__"):
+        return _plain(vars(value))
+    return str(value)
+
+
+class GeometryCache(DiskCache):
+    """Local disk cache of arrays computed once per geometry
+
+    Preprocessing results that only depend on a geometry and the configuration, like
+    the signed distance fields on a fixed grid or the neighbors of all surface cells,
+    are computed on first access and stored as .npy files that later accesses, from
+    any process, read or memory map. Entries share the locking, json sidecars and
+    least recently used eviction of `DiskCache`.
+
+    Parameters
+    ----------
+    root : str, optional
+        Cache directory, preferably on a local disk, by default
+        $LOCAL_CACHE/domino_geometry
+    max_bytes : Optional[int], optional
+        Size budget of the cache in bytes, by default None for unbounded
+    """
+
+    def __init__(
+        self,
+        root: str = os.path.join(LOCAL_CACHE, "domino_geometry"),
+        max_bytes: Optional[int] = None,
+    ):
+        super().__init__(root, max_bytes=max_bytes)
+
+    @staticmethod
+    def key(filepath: Union[str, Path], *params: Any) -> str:
+        """Key of the arrays of the file `filepath` computed with `params`
+
+        The key changes when the file is modified, so stale entries are never read.
+        """
+        stat = os.stat(filepath)
+        return json.dumps(
+            [str(Path(filepath).resolve()), stat.st_size, stat.st_mtime_ns]
+            + _plain(list(params)),
+            sort_keys=True,
+        )
+
+    def get_array(
+        self,
+        key: str,
+        name: str,
+        compute: Callable[[], Any],
+        mmap: bool = True,
+    ) -> Any:
+        """Array `name` of the geometry `key`, computed and stored on first access
+
+        Parameters
+        ----------
+        key : str
+            Key of the geometry, from `GeometryCache.key`
+        name : str
+            Name of the array
+        compute : Callable[[], Any]
+            Computes the numpy or cupy array when it is not cached
+        mmap : bool, optional
+            Memory map cached arrays read only instead of reading them, by default
+            True
+
+        Returns
+        -------
+        Any
+            Result of `compute` on a miss, otherwise the cached numpy array
+        """
+        entry = self._entry(f"{key}/{name}")
+        with file_lock(entry + ".lock"):
+            if self._is_valid(entry):
+                if os.path.exists(entry + ".json"):
+                    os.utime(entry + ".json")
+                return np.load(entry, mmap_mode="r" if mmap else None)
+
+            array = compute()
+            host_array = array.get() if is_cupy_array(array) else np.asarray(array)
+            tmp_path = f"{entry}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+            try:
+                with open(tmp_path, "wb") as f:
+                    np.save(f, host_array)
+                size = os.path.getsize(tmp_path)
+                os.replace(tmp_path, entry)
+            finally:
+                remove_path(tmp_path)
+            meta = {"url": f"{key}/{name}", "size": size, "created": time.time()}
+            self._write_meta(entry, meta)
+
+        self.evict(keep=entry)
+        return array
+
+
+def _to_numpy(value: Any) -> np.ndarray:
+    if is_cupy_array(value):
+        return value.get()
+    if hasattr(value, "detach"):  # torch tensors
+        return value.detach().cpu().numpy()
+    return np.asarray(value)
+
+
+def write_cached_sample(path: Union[str, Path], sample: Mapping[str, Any]) -> None:
+    """Writes a preprocessed sample as a directory of one .npy file per array and a
+    JSON manifest, read by `CachedSample`
+
+    The arrays are stored uncompressed so that they can be memory mapped and read by
+    rows. Strings, numbers and lists are stored in the manifest, None values are
+    skipped. The directory is written under a temporary name and renamed into place,
+    so readers never see a partial sample.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        Directory of the sample, replaced if it exists
+    sample : Mapping[str, Any]
+        numpy, cupy or torch arrays, and JSON serializable values
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}-{uuid.uuid4().hex}")
+    tmp_path.mkdir(parents=True)
+    try:
+        arrays, attributes = {}, {}
+        for key, value in sample.items():
+            if value is None:
+                continue
+            if isinstance(value, (str, bool, int, float, list, tuple)):
+                attributes[key] = value
+                continue
+            array = _to_numpy(value)
+            if array.dtype.hasobject:
+                raise TypeError(f"Cannot cache {key}, arrays of objects need pickle")
+            np.save(tmp_path / f"{key}.npy", array)
+            arrays[key] = {
+                "file": f"{key}.npy",
+                "shape": list(array.shape),
+                "dtype": array.dtype.str,
+            }
+        manifest = {
+            "version": CACHE_FORMAT_VERSION,
+            "arrays": arrays,
+            "attributes": attributes,
+        }
+        with open(tmp_path / MANIFEST, "w") as f:
+            json.dump(manifest, f, indent=2)
+        remove_path(str(path))
+        os.replace(tmp_path, path)
+    finally:
+        remove_path(str(tmp_path))
+
+
+class CachedSample:
+    """Sample written by `write_cached_sample`
+
+    Arrays are memory mapped, reading rows only loads the pages holding them, so
+    many processes can sample the same files without loading them in memory.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        Directory of the sample
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path / MANIFEST, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != CACHE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported cache format version {manifest.get('version')} of "
+                f"{self.path}"
+            )
+        self._arrays = manifest["arrays"]
+        self.attributes: Dict[str, Any] = manifest["attributes"]
+
+    @staticmethod
+    def is_cached_sample(path: Union[str, Path]) -> bool:
+        """Whether `path` is a directory written by `write_cached_sample`"""
+        return os.path.isfile(os.path.join(path, MANIFEST))
+
+    def keys(self) -> List[str]:
+        """Names of the arrays"""
+        return list(self._arrays)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._arrays
+
+    def shape(self, key: str) -> Tuple[int, ...]:
+        """Shape of an array, without reading it"""
+        return tuple(self._arrays[key]["shape"])
+
+    def memmap(self, key: str) -> np.ndarray:
+        """Read only memory map of an array"""
+        return np.load(self.path / self._arrays[key]["file"], mmap_mode="r")
+
+    def read(self, key: str) -> np.ndarray:
+        """Reads a whole array"""
+        return np.load(self.path / self._arrays[key]["file"])
+
+    def read_rows(self, key: str, rows: np.ndarray) -> np.ndarray:
+        """Reads the rows `rows` of an array
+
+        Rows are read once each, in increasing order, so that rows sharing pages, or
+        on consecutive pages, are read together.
+
+        Parameters
+        ----------
+        key : str
+            Name of the array
+        rows : np.ndarray
+            Integer indices into the first dimension, of any shape
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape [*rows.shape, *shape[1:]]
+        """
+        rows = np.asarray(rows)
+        unique, inverse = np.unique(rows.reshape(-1), return_inverse=True)
+        data = np.asarray(self.memmap(key)[unique])
+        return data[inverse.reshape(-1)].reshape(rows.shape + data.shape[1:])
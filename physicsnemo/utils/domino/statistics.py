@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import torch
+
+
+@dataclass
+class FieldStatistics:
+    """Mergeable statistics of the fields of a set of files
+
+    Files are weighted equally: `mean` is the average of the means of the files and
+    `m2` the sum over the files of their variance plus the squared deviation of
+    their mean from `mean`, so that `m2 / num_files` is the average over the files
+    of the mean squared deviation of their points from `mean`. Statistics of
+    disjoint sets of files are merged with the parallel update of Welford's
+    algorithm by Chan et al.
+
+    `min` and `max` are the extrema of the points within `tolerance` standard
+    deviations of the mean of their file, outliers are ignored.
+
+    Parameters
+    ----------
+    num_files : int, optional
+        Number of files, by default 0
+    num_points : int, optional
+        Number of points of all files, by default 0
+    mean : Optional[np.ndarray], optional
+        Mean of every field, by default None
+    m2 : Optional[np.ndarray], optional
+        Sum of squared deviations of every field, by default None
+    min : Optional[np.ndarray], optional
+        Minimum of every field, by default None
+    max : Optional[np.ndarray], optional
+        Maximum of every field, by default None
+    """
+
+    num_files: int = 0
+    num_points: int = 0
+    mean: Optional[np.ndarray] = None
+    m2: Optional[np.ndarray] = None
+    min: Optional[np.ndarray] = None
+    max: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_fields(cls, fields: Any, tolerance: float = 12.0) -> "FieldStatistics":
+        """Statistics of the fields of one file
+
+        Parameters
+        ----------
+        fields : Any
+            numpy, cupy or torch array of shape [N, C]
+        tolerance : float, optional
+            Number of standard deviations beyond which points are outliers for the
+            extrema, by default 12.0
+
+        Returns
+        -------
+        FieldStatistics
+            Statistics of a single file
+        """
+        if hasattr(fields, "get"):  # cupy
+            fields = fields.get()
+        elif hasattr(fields, "detach"):  # torch
+            fields = fields.detach().cpu().numpy()
+        fields = np.asarray(fields, dtype=np.float64)
+        if len(fields) == 0:
+            return cls()
+        mean = fields.mean(0)
+        std = fields.std(0)
+        inliers = fields[np.all(np.abs(fields - mean) <= tolerance * std, axis=1)]
+        return cls(
+            num_files=1,
+            num_points=len(fields),
+            mean=mean,
+            m2=std**2,
+            min=inliers.min(0),
+            max=inliers.max(0),
+        )
+
+    @property
+    def std(self) -> np.ndarray:
+        """Standard deviation of every field"""
+        return np.sqrt(self.m2 / self.num_files)
+
+    def merge(self, other: "FieldStatistics") -> "FieldStatistics":
+        """Statistics of the union of two disjoint sets of files"""
+        if other.num_files == 0:
+            return self
+        if self.num_files == 0:
+            return other
+        num_files = self.num_files + other.num_files
+        delta = other.mean - self.mean
+        return FieldStatistics(
+            num_files=num_files,
+            num_points=self.num_points + other.num_points,
+            mean=self.mean + delta * other.num_files / num_files,
+            m2=self.m2
+            + other.m2
+            + delta**2 * self.num_files * other.num_files / num_files,
+            min=np.minimum(self.min, other.min),
+            max=np.maximum(self.max, other.max),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON serializable dictionary of the statistics"""
+        return {
+            k: v.tolist() if isinstance(v, np.ndarray) else v
+            for k, v in self.__dict__.items()
+        }
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "FieldStatistics":
+        """Statistics from a dictionary of `to_dict`"""
+        return cls(
+            **{
+                k: np.asarray(v, dtype=np.float64) if isinstance(v, list) else v
+                for k, v in values.items()
+            }
+        )
+
+
+def reduce_statistics(stats: Sequence[FieldStatistics]) -> FieldStatistics:
+    """Merges statistics pairwise, in a tree of depth log2(len(stats))"""
+    stats = list(stats)
+    if not stats:
+        return FieldStatistics()
+    while len(stats) > 1:
+        merged = [a.merge(b) for a, b in zip(stats[::2], stats[1::2])]
+        if len(stats) % 2:
+            merged.append(stats[-1])
+        stats = merged
+    return stats[0]
+
+
+def all_reduce_statistics(
+    stats: FieldStatistics, group: Optional[torch.distributed.ProcessGroup] = None
+) -> FieldStatistics:
+    """Merges the statistics of all ranks of a process group, on every rank"""
+    gathered = [None] * torch.distributed.get_world_size(group)
+    torch.distributed.all_gather_object(gathered, stats.to_dict(), group=group)
+    return reduce_statistics([FieldStatistics.from_dict(s) for s in gathered])
@@ -19,13 +19,18 @@ Important utilities for data processing and training, testing DoMINO.
 """
 
 import os
+import sys
+from pathlib import Path
 from typing import Any, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-from scipy.spatial import KDTree
+from scipy.spatial import KDTree, cKDTree
 
+from physicsnemo.utils.lazy_import import LazyModule
 from physicsnemo.utils.profiling import profile
 
+cuml = LazyModule("cuml")
+
 try:
     import cupy as cp
 
@@ -67,6 +72,44 @@ def array_type(arr: ArrayType):
         return np
 
 
+def is_cupy_array(arr: Any) -> bool:
+    """Whether `arr` is a cupy array, False when cupy is not installed"""
+    cupy = sys.modules.get("cupy")
+    return cupy is not None and isinstance(arr, cupy.ndarray)
+
+
+def nearest_neighbor_indices(
+    points: ArrayType, queries: ArrayType, k: int, workers: int = -1
+) -> ArrayType:
+    """Indices of the `k` nearest points of every query point
+
+    cupy arrays are searched on the GPU with cuML, numpy arrays on the CPU with a
+    KD-tree queried by `workers` threads.
+
+    Parameters
+    ----------
+    points : ArrayType
+        Points searched, of shape [N, 3]
+    queries : ArrayType
+        Query points, of shape [M, 3]
+    k : int
+        Number of neighbors, including the query point itself if it is in `points`
+    workers : int, optional
+        Number of threads of the CPU search, -1 uses all cores, by default -1
+
+    Returns
+    -------
+    ArrayType
+        Indices into `points` of shape [M, k], sorted by increasing distance
+    """
+    if is_cupy_array(points):
+        knn = cuml.neighbors.NearestNeighbors(n_neighbors=k, algorithm="rbc")
+        knn.fit(points)
+        return knn.kneighbors(queries, return_distance=False)
+    _, ii = cKDTree(points).query(queries, k=k, workers=workers)
+    return ii.reshape(len(queries), k)
+
+
 def calculate_center_of_mass(stl_centers: ArrayType, stl_sizes: ArrayType) -> ArrayType:
     """Function to calculate center of mass"""
     xp = array_type(stl_centers)
@@ -359,6 +402,44 @@ def get_filenames(filepath: str, exclude_dirs: bool = False) -> List[str]:
         FileNotFoundError()
 
 
+def convert_npy_to_npz(
+    filepath: Union[str, Path],
+    output_path: Union[str, Path, None] = None,
+    remove: bool = False,
+) -> Path:
+    """Converts a sample saved as a pickled dictionary in a .npy file to .npz
+
+    Loading the .npy file unpickles it, which can run arbitrary code: only convert
+    files from a trusted source. The .npz file is read without pickle.
+
+    Parameters
+    ----------
+    filepath : Union[str, Path]
+        Path of the .npy file
+    output_path : Union[str, Path, None], optional
+        Path of the .npz file, by default None for `filepath` with a .npz suffix
+    remove : bool, optional
+        Remove the .npy file once converted, by default False
+
+    Returns
+    -------
+    Path
+        Path of the .npz file
+    """
+    filepath = Path(filepath)
+    if output_path is None:
+        output_path = filepath.with_suffix(".npz")
+    data = np.load(filepath, allow_pickle=True).item()
+    arrays = {k: np.asarray(v) for k, v in data.items() if v is not None}
+    for key, value in arrays.items():
+        if value.dtype == object:
+            raise TypeError(f"{key} of {filepath} is not a numeric or string array")
+    np.savez(output_path, **arrays)
+    if remove:
+        os.remove(filepath)
+    return Path(output_path)
+
+
 def calculate_pos_encoding(nx: ArrayType, d: int = 8) -> ArrayType:
     """Function for calculating positional encoding"""
     vec = []
@@ -431,34 +512,125 @@ def dict_to_device(state_dict, device, exclude_keys=["filename"]):
     return new_state_dict
 
 
-def area_weighted_shuffle_array(
-    arr: ArrayType, npoin: int, area: ArrayType
-) -> Tuple[ArrayType, ArrayType]:
-    """Function for area weighted shuffling"""
-    xp = array_type(arr)
-    # Compute the total_area:
-    factor = 1.0
-    total_area = xp.sum(area**factor)
-    probs = area**factor / total_area
+def _random_state(xp: Any, seed: Optional[int] = None) -> Any:
+    """Random state of the array backend `xp`, the global one if `seed` is None"""
+    return xp.random if seed is None else xp.random.RandomState(seed)
 
-    if npoin > arr.shape[0]:
-        npoin = arr.shape[0]
 
-    idx = xp.arange(arr.shape[0])
+def build_alias_table(weights: ArrayType) -> Tuple[ArrayType, ArrayType]:
+    """Alias table of Walker's method to draw indices with probabilities
+    proportional to `weights`
 
-    # This is too memory intensive to run on the GPU.
-    if xp == cp:
-        idx = idx.get()
-        probs = probs.get()
-        # Under the hood, this has a search over the probabilities.
-        # It's very expensive in memory, as far as I can tell.
-        # In principle, we could use the Alias method to speed this up
-        # on the GPU but it's not yet a bottleneck.
-
-        ids = np.random.choice(idx, npoin, p=probs)
-        ids = xp.asarray(ids)
-    else:
-        # Chug along on the CPU:
-        ids = xp.random.choice(idx, npoin, p=probs)
+    The table is built with Vose's pairing of under and over full entries, done for
+    all entries at once in every round rather than one pair at a time, so it runs on
+    both numpy and cupy arrays without host copies. It only depends on the weights,
+    build it once per geometry and draw from it with `alias_sample`.
+
+    Parameters
+    ----------
+    weights : ArrayType
+        Non negative weights of shape [N], e.g. the areas of the surface cells
+
+    Returns
+    -------
+    Tuple[ArrayType, ArrayType]
+        Acceptance probabilities (float32) and aliases (int64) of shape [N]
+    """
+    xp = array_type(weights)
+    n = weights.shape[0]
+    q = weights.astype(xp.float64) * (n / weights.sum(dtype=xp.float64))
+    prob = xp.ones(n, dtype=xp.float64)
+    alias = xp.arange(n, dtype=xp.int64)
+    small = xp.flatnonzero(q < 1.0)
+    large = xp.flatnonzero(q >= 1.0)
+    while small.size > 0 and large.size > 0:
+        # Lay the deficits of the small entries and the surpluses of the large ones
+        # end to end, each small entry is aliased to the large one whose surplus
+        # covers the start of its deficit
+        deficit = 1.0 - q[small]
+        start = xp.cumsum(deficit) - deficit
+        surplus_end = xp.cumsum(q[large] - 1.0)
+        j = xp.searchsorted(surplus_end, start, side="right")
+        taken = j < large.size
+        if not bool(taken.any()):
+            break
+        s, j = small[taken], j[taken]
+        prob[s] = q[s]
+        alias[s] = large[j]
+        q[large] -= xp.bincount(j, weights=deficit[taken], minlength=large.size)
+        # Large entries that gave more than their surplus are now under full
+        small = xp.concatenate([small[~taken], large[q[large] < 1.0]])
+        large = large[q[large] >= 1.0]
+    # Entries left over by rounding errors keep a probability of 1
+    return prob.astype(xp.float32), alias
+
+
+def alias_sample(
+    prob: ArrayType, alias: ArrayType, npoin: int, seed: Optional[int] = None
+) -> ArrayType:
+    """Draws indices, with replacement, from an alias table of `build_alias_table`
+
+    Parameters
+    ----------
+    prob : ArrayType
+        Acceptance probabilities of shape [N]
+    alias : ArrayType
+        Aliases of shape [N]
+    npoin : int
+        Number of indices drawn
+    seed : Optional[int], optional
+        Seed of the draw, by default None uses the global random state of the
+        array backend
+
+    Returns
+    -------
+    ArrayType
+        Indices of shape [npoin]
+    """
+    xp = array_type(prob)
+    rng = _random_state(xp, seed)
+    idx = rng.randint(0, prob.shape[0], size=npoin)
+    accept = rng.random_sample(npoin) < prob[idx]
+    return xp.where(accept, idx, alias[idx])
+
+
+def area_weighted_sample_indices(
+    num_points: int,
+    npoin: int,
+    area: Optional[ArrayType] = None,
+    alias_table: Optional[Tuple[ArrayType, ArrayType]] = None,
+    seed: Optional[int] = None,
+) -> ArrayType:
+    """Draws the indices of `npoin` of `num_points` points, with replacement and with
+    probabilities proportional to `area`
+
+    With the `alias_table` of the areas, from `build_alias_table`, a draw costs
+    O(npoin) and `area` is not needed. Otherwise it searches the cumulative areas,
+    which is cheaper than building the table for a single draw.
+    """
+    npoin = min(npoin, num_points)
+    if alias_table is not None:
+        return alias_sample(*alias_table, npoin, seed=seed)
+    xp = array_type(area)
+    cdf = xp.cumsum(area, dtype=xp.float64)
+    u = _random_state(xp, seed).random_sample(npoin) * cdf[-1]
+    return xp.minimum(xp.searchsorted(cdf, u, side="right"), num_points - 1)
+
+
+def area_weighted_shuffle_array(
+    arr: ArrayType,
+    npoin: int,
+    area: ArrayType,
+    alias_table: Optional[Tuple[ArrayType, ArrayType]] = None,
+    seed: Optional[int] = None,
+) -> Tuple[ArrayType, ArrayType]:
+    """Function for area weighted shuffling
+
+    Points are drawn with replacement with probabilities proportional to `area`, on
+    the backend of the arrays, see `area_weighted_sample_indices`.
+    """
+    ids = area_weighted_sample_indices(
+        arr.shape[0], npoin, area, alias_table=alias_table, seed=seed
+    )
 
     return arr[ids], ids
@@ -19,15 +19,29 @@ import json
 import logging
 import os
 import re
+import shutil
+import threading
+import time
 import urllib.request
+import uuid
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import fsspec
-import fsspec.implementations.cached
 import fsspec.utils
-import requests
-import s3fs
-from tqdm import tqdm
+
+from physicsnemo.utils.lazy_import import LazyModule
+
+# Imported on first use, they account for most of the import time of this module
+requests = LazyModule("requests")
+s3fs = LazyModule("s3fs")
+
+try:
+    import fcntl
+except ImportError:  # Non POSIX platforms, no cross process locking
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
@@ -36,8 +50,16 @@ try:
 except KeyError:
     LOCAL_CACHE = os.environ["HOME"] + "/.cache/physicsnemo"
 
+# Optional size budget (bytes) and time to live (seconds) of the download cache
+CACHE_MAX_BYTES = os.environ.get("PHYSICSNEMO_CACHE_MAX_BYTES")
+CACHE_MAX_BYTES = int(CACHE_MAX_BYTES) if CACHE_MAX_BYTES else None
+CACHE_TTL = os.environ.get("PHYSICSNEMO_CACHE_TTL")
+CACHE_TTL = float(CACHE_TTL) if CACHE_TTL else None
+
 
 def _cache_fs(fs):
+    import fsspec.implementations.cached
+
     return fsspec.implementations.cached.CachingFileSystem(
         fs=fs, cache_storage=LOCAL_CACHE
     )
@@ -50,6 +72,114 @@ def _get_fs(path):
         return fsspec.filesystem(fsspec.utils.get_protocol(path))
 
 
+def _parse_content_range(value: str) -> Optional[int]:
+    """Total size from a `Content-Range: bytes start-end/total` header"""
+    match = re.match(r"bytes \d+-\d+/(\d+)", value or "")
+    return int(match.group(1)) if match else None
+
+
+def _download_http(
+    url: str,
+    out_path: str,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: int = 300,
+    num_connections: int = 8,
+    chunk_size: int = 16 * 1024**2,
+    desc: Optional[str] = None,
+) -> int:
+    """Downloads a file over HTTP(S), in concurrent range requests when supported
+
+    The first request asks for the first chunk only. If the server answers with a
+    partial response, the remaining chunks are fetched concurrently from the final
+    (post redirect) URL and written at their offset. Otherwise the full response is
+    streamed to disk.
+
+    Args:
+        url (str): URL to download
+        out_path (str): Output file path
+        headers (Dict[str, str], optional): Request headers. Defaults to None.
+        timeout (int): Time out of requests, default 5 minutes
+        num_connections (int): Number of concurrent range requests, default 8
+        chunk_size (int): Size of the range requests, default 16 MiB
+        desc (str, optional): Progress bar description. Defaults to None.
+
+    Raises:
+        IOError: Size of the downloaded file does not match the advertised one
+
+    Returns:
+        int: size of the downloaded file in bytes
+    """
+    from tqdm import tqdm
+
+    headers = dict(headers or {})
+    progress_bar = tqdm(unit="iB", unit_scale=True, desc=desc, disable=desc is None)
+    with requests.get(
+        url,
+        headers={**headers, "Range": f"bytes=0-{chunk_size - 1}"},
+        stream=True,
+        timeout=timeout,
+    ) as r:
+        r.raise_for_status()
+        # Partial content means the server supports range requests
+        ranged = r.status_code == 206
+        if ranged:
+            total = _parse_content_range(r.headers.get("Content-Range"))
+            if total is None:
+                raise IOError(f"Invalid Content-Range header received for {url}")
+        elif r.headers.get("Content-Encoding", "identity") == "identity":
+            total = int(r.headers.get("content-length", 0)) or None
+        else:  # The content length is the one of the encoded body
+            total = None
+        progress_bar.total = total
+        written = 0
+        with open(out_path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=1024**2):
+                progress_bar.update(len(chunk))
+                written += len(chunk)
+                f.write(chunk)
+        final_url = r.url
+        # Do not forward credentials to the host serving a redirect
+        if urllib.parse.urlparse(final_url).netloc != urllib.parse.urlparse(url).netloc:
+            headers.pop("Authorization", None)
+
+    if ranged and total > written:
+        lock = threading.Lock()
+
+        def fetch(start: int) -> None:
+            end = min(start + chunk_size, total) - 1
+            with requests.get(
+                final_url,
+                headers={**headers, "Range": f"bytes={start}-{end}"},
+                stream=True,
+                timeout=timeout,
+            ) as r, open(out_path, "r+b") as f:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise IOError(f"Range request not honored for {url}")
+                f.seek(start)
+                received = 0
+                for chunk in r.iter_content(chunk_size=1024**2):
+                    f.write(chunk)
+                    received += len(chunk)
+                    with lock:
+                        progress_bar.update(len(chunk))
+                if received != end - start + 1:
+                    raise IOError(f"Incomplete range {start}-{end} received for {url}")
+
+        with open(out_path, "r+b") as f:
+            f.truncate(total)
+        with ThreadPoolExecutor(max_workers=num_connections) as executor:
+            list(executor.map(fetch, range(written, total, chunk_size)))
+    progress_bar.close()
+
+    size = os.path.getsize(out_path)
+    if total is not None and size != total:
+        raise IOError(
+            f"Incomplete download of {url}: expected {total} bytes but got {size}"
+        )
+    return size
+
+
 def _download_ngc_model_file(path: str, out_path: str, timeout: int = 300) -> str:
     """Pulls files from model registry on NGC. Supports private registries when NGC
     API key is set the the `NGC_API_KEY` environment variable. If download file is a zip
@@ -124,18 +254,13 @@ def _download_ngc_model_file(path: str, out_path: str, timeout: int = 300) -> st
             file_url = f"https://api.ngc.nvidia.com/v2/models/{org}/{model}/versions/{version}/files/{filename}"
 
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    # Streaming here for larger files
-    with requests.get(file_url, headers=headers, stream=True, timeout=timeout) as r:
-        r.raise_for_status()
-        total_size_in_bytes = int(r.headers.get("content-length", 0))
-        chunk_size = 1024  # 1 kb
-        progress_bar = tqdm(total=total_size_in_bytes, unit="iB", unit_scale=True)
-        progress_bar.set_description(f"Fetching {filename}")
-        with open(out_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=chunk_size):
-                progress_bar.update(len(chunk))
-                f.write(chunk)
-        progress_bar.close()
+    _download_http(
+        file_url,
+        out_path,
+        headers=headers,
+        timeout=timeout,
+        desc=f"Fetching {filename}",
+    )
 
     # Unzip contents if zip file (most model files are)
     if zipfile.is_zipfile(out_path) and path.endswith(".zip"):
@@ -149,57 +274,307 @@ def _download_ngc_model_file(path: str, out_path: str, timeout: int = 300) -> st
     return out_path
 
 
-def _download_cached(
-    path: str, recursive: bool = False, local_cache_path: str = LOCAL_CACHE
-) -> str:
-    sha = hashlib.sha256(path.encode())
-    filename = sha.hexdigest()
-    try:
-        os.makedirs(local_cache_path, exist_ok=True)
-    except PermissionError as error:
-        logger.error(
-            "Failed to create cache folder, check permissions or set a cache"
-            + " location using the LOCAL_CACHE environment variable"
-        )
-        raise error
-    except OSError as error:
-        logger.error(
-            "Failed to create cache folder, set a cache"
-            + " location using the LOCAL_CACHE environment variable"
+@contextmanager
+def file_lock(path: str, shared: bool = False, blocking: bool = True) -> Iterator[bool]:
+    """Cross process advisory lock on the file `path`, created if needed
+
+    Args:
+        path (str): Lock file
+        shared (bool): Take a shared instead of an exclusive lock. Defaults to False
+        blocking (bool): Wait for the lock. Defaults to True
+
+    Yields:
+        bool: whether the lock was acquired, only False when not blocking
+    """
+    with open(path, "a+") as f:
+        if fcntl is None:
+            yield True
+            return
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(f, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _sha256_file(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024**2), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _disk_usage(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
         )
-        raise error
+    return os.path.getsize(path)
+
+
+def remove_path(path: str) -> None:
+    """Removes the file or directory `path` if it exists
+
+    Args:
+        path (str): File or directory to remove
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
 
-    cache_path = os.path.join(local_cache_path, filename)
+class DiskCache:
+    """Directory of cached entries, safe to share between processes
+
+    Entries are files or directories keyed by the sha256 of a name, each with a
+    lock file and a json sidecar storing its size and creation time. Subclasses
+    write entries while holding their lock, into a temporary file that is
+    atomically renamed into place.
+
+    The cache can be bounded in size, least recently used entries are evicted once
+    it grows over budget, and entries can expire after a time to live.
+
+    Args:
+        root (str): Cache directory
+        max_bytes (int, optional): Size budget of the cache. Defaults to None,
+            unbounded
+        ttl (float, optional): Time to live of entries in seconds. Defaults to None,
+            no expiry
+        verify (bool): Check the content checksum of entries on every access instead
+            of only their size. Defaults to False
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        verify: bool = False,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.verify = verify
+        try:
+            os.makedirs(root, exist_ok=True)
+        except PermissionError as error:
+            logger.error(
+                "Failed to create cache folder, check permissions or set a cache"
+                + " location using the LOCAL_CACHE environment variable"
+            )
+            raise error
+        except OSError as error:
+            logger.error(
+                "Failed to create cache folder, set a cache"
+                + " location using the LOCAL_CACHE environment variable"
+            )
+            raise error
 
-    url = urllib.parse.urlparse(path)
+    def _entry(self, path: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(path.encode()).hexdigest())
 
-    # TODO watch for race condition here
-    if not os.path.exists(cache_path):
-        logger.debug("Downloading %s to cache: %s", path, cache_path)
+    def _read_meta(self, entry: str) -> Optional[Dict]:
+        try:
+            with open(entry + ".json", "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry: str, meta: Dict) -> None:
+        with open(entry + ".json.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(entry + ".json.tmp", entry + ".json")
+
+    def _is_valid(self, entry: str, sha256: Optional[str] = None) -> bool:
+        """Whether a complete, unexpired and intact copy of the entry is cached"""
+        if not os.path.exists(entry):
+            return False
+        meta = self._read_meta(entry)
+        if meta is None:
+            # Entry written before sidecars existed, trust it unless asked not to
+            return sha256 is None
+        if self.ttl is not None and time.time() - meta["created"] > self.ttl:
+            logger.debug("Cache entry expired: %s", entry)
+            return False
+        if _disk_usage(entry) != meta["size"]:
+            logger.warning("Cache entry has the wrong size, discarding: %s", entry)
+            return False
+        if sha256 is not None and meta.get("sha256") != sha256:
+            return False
+        if self.verify and meta.get("sha256") and os.path.isfile(entry):
+            if _sha256_file(entry) != meta["sha256"]:
+                logger.warning("Cache entry is corrupted, discarding: %s", entry)
+                return False
+        return True
+
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """Lists the cache entries as (path, size, last access time)"""
+        entries = []
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if not re.fullmatch(r"[0-9a-f]{64}", name) or not os.path.exists(entry):
+                continue
+            meta = entry + ".json"
+            accessed = os.path.getmtime(meta if os.path.exists(meta) else entry)
+            entries.append((entry, _disk_usage(entry), accessed))
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Removes expired entries, then least recently used entries until the cache
+        fits its size budget. Entries currently being accessed are skipped.
+
+        Args:
+            keep (str, optional): Entry never to evict. Defaults to None
+
+        Returns:
+            int: number of bytes freed
+        """
+        if self.max_bytes is None and self.ttl is None:
+            return 0
+        freed = 0
+        with file_lock(os.path.join(self.root, ".evict.lock")):
+            entries = sorted(self.entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for entry, size, _ in entries:
+                meta = self._read_meta(entry)
+                expired = (
+                    self.ttl is not None
+                    and meta is not None
+                    and time.time() - meta["created"] > self.ttl
+                )
+                over_budget = self.max_bytes is not None and total > self.max_bytes
+                if entry == keep or not (expired or over_budget):
+                    continue
+                with file_lock(entry + ".lock", blocking=False) as acquired:
+                    if not acquired:
+                        continue
+                    logger.debug("Evicting cache entry: %s", entry)
+                    remove_path(entry)
+                    remove_path(entry + ".json")
+                total -= size
+                freed += size
+        return freed
+
+    def clear(self) -> None:
+        """Removes all entries from the cache"""
+        for entry, _, _ in self.entries():
+            with file_lock(entry + ".lock"):
+                remove_path(entry)
+                remove_path(entry + ".json")
+
+
+class DownloadCache(DiskCache):
+    """Local cache of remote files, safe to share between processes
+
+    Entries are keyed by the sha256 of their URL. Each entry is downloaded by a
+    single process holding the lock of the entry while the others wait for it, into
+    a temporary file that is atomically renamed into place. A json sidecar stores
+    the source URL, size, content checksum and download time of every entry.
+
+    Args:
+        root (str): Cache directory. Defaults to $LOCAL_CACHE or
+            $HOME/.cache/physicsnemo
+        max_bytes (int, optional): Size budget of the cache. Defaults to
+            $PHYSICSNEMO_CACHE_MAX_BYTES, unbounded when not set
+        ttl (float, optional): Time to live of entries in seconds. Defaults to
+            $PHYSICSNEMO_CACHE_TTL, no expiry when not set
+        verify (bool): Check the content checksum of entries on every access instead
+            of only their size. Defaults to False
+    """
+
+    def __init__(
+        self,
+        root: str = LOCAL_CACHE,
+        max_bytes: Optional[int] = CACHE_MAX_BYTES,
+        ttl: Optional[float] = CACHE_TTL,
+        verify: bool = False,
+    ):
+        super().__init__(root, max_bytes=max_bytes, ttl=ttl, verify=verify)
+
+    def _fetch(self, path: str, out_path: str, recursive: bool) -> str:
+        url = urllib.parse.urlparse(path)
         if url.scheme in ("s3", "msc"):
             fs = fsspec.filesystem(fsspec.utils.get_protocol(path))
-            fs.get(path, cache_path, recursive=recursive)
+            fs.get(path, out_path, recursive=recursive)
         elif path.startswith("ngc://models/"):
-            path = _download_ngc_model_file(path, cache_path)
-            return path
-        elif url.scheme == "http":
-            # urllib.request.urlretrieve(path, cache_path)
+            _download_ngc_model_file(path, out_path)
+        elif url.scheme in ("http", "https"):
             # TODO: Check if this supports directory fetches
-            response = requests.get(path, stream=True, timeout=5)
-            with open(cache_path, "wb") as output:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        output.write(chunk)
-        elif url.scheme == "file":
-            path = os.path.join(url.netloc, url.path)
-            return path
-        else:
+            _download_http(path, out_path, timeout=5)
+        return out_path
+
+    def get(
+        self, path: str, recursive: bool = False, sha256: Optional[str] = None
+    ) -> str:
+        """Get a local path to the item at ``path``, downloading it if needed
+
+        Args:
+            path (str): Remote path or URL
+            recursive (bool): Recursive fetch of object store directories. Defaults
+                to False
+            sha256 (str, optional): Expected checksum of the file. Defaults to None
+
+        Raises:
+            IOError: Downloaded file does not match the expected checksum
+
+        Returns:
+            str: local path of the cached item
+        """
+        url = urllib.parse.urlparse(path)
+        if url.scheme == "file":
+            return os.path.join(url.netloc, url.path)
+        if not (
+            url.scheme in ("s3", "msc", "http", "https")
+            or path.startswith("ngc://models/")
+        ):
             return path
 
-    else:
-        logger.debug("Opening from cache: %s", cache_path)
+        entry = self._entry(path)
+        with file_lock(entry + ".lock"):
+            if self._is_valid(entry, sha256):
+                logger.debug("Opening from cache: %s", entry)
+                # The sidecar modification time tracks the last access for LRU
+                if os.path.exists(entry + ".json"):
+                    os.utime(entry + ".json")
+                return entry
+
+            logger.debug("Downloading %s to cache: %s", path, entry)
+            tmp_path = f"{entry}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+            try:
+                self._fetch(path, tmp_path, recursive)
+                digest = _sha256_file(tmp_path) if os.path.isfile(tmp_path) else None
+                if sha256 is not None and digest != sha256:
+                    raise IOError(
+                        f"Checksum mismatch for {path}: expected {sha256}, got {digest}"
+                    )
+                size = _disk_usage(tmp_path)
+                remove_path(entry)
+                os.replace(tmp_path, entry)
+            finally:
+                remove_path(tmp_path)
+
+            meta = {"url": path, "size": size, "sha256": digest, "created": time.time()}
+            self._write_meta(entry, meta)
+
+        self.evict(keep=entry)
+        return entry
 
-    return cache_path
+
+def _download_cached(
+    path: str, recursive: bool = False, local_cache_path: str = LOCAL_CACHE
+) -> str:
+    return DownloadCache(local_cache_path).get(path, recursive=recursive)
 
 
 class Package:
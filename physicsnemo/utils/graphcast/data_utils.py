@@ -16,13 +16,16 @@
 
 import os
 
-import netCDF4 as nc
 import torch
 from torch import Tensor
 from torch.nn.functional import interpolate
 
+from physicsnemo.utils.lazy_import import LazyModule
+
 from .graph_utils import deg2rad
 
+nc = LazyModule("netCDF4")
+
 
 class StaticData:
     """Class to load static data from netCDF files. Static data includes land-sea mask,
@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Utilities for deferring the import of heavy or optional dependencies.
+
+Importing a dependency such as `s3fs`, `h5py` or `cupy` can take a significant part of
+the startup time and fails when an optional dependency is not installed. The helpers
+here defer the import until the dependency is first used.
+
+"""
+
+import importlib
+import importlib.util
+import types
+from typing import Any, Callable, Dict, List, Optional
+
+
+def is_available(name: str) -> bool:
+    """
+    Check if a module can be imported, without importing it.
+
+    Args:
+        name: Name of the module, e.g. 'transformer_engine'
+
+    Returns:
+        True if the module is installed
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # Parent package missing or broken
+        return False
+
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder of a module that imports it on first attribute access.
+
+    Example:
+        h5py = LazyModule("h5py")
+
+        def read(path):
+            # h5py is imported here, the first time read() is called
+            with h5py.File(path, "r") as f:
+                ...
+
+    Args:
+        name: Name of the module to import
+        hint: Optional message appended to the ImportError if the module is missing
+    """
+
+    def __init__(self, name: str, hint: Optional[str] = None):
+        super().__init__(name)
+        self.__dict__["_lazy_hint"] = hint
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_importable"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            try:
+                module = importlib.import_module(self.__name__)
+            except ImportError as err:
+                msg = f"Package {self.__name__} is required but not installed."
+                if self.__dict__["_lazy_hint"]:
+                    msg += " " + self.__dict__["_lazy_hint"]
+                raise ImportError(msg) from err
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        loaded = self.__dict__["_lazy_module"] is not None
+        return (
+            f"<lazy module '{self.__name__}' ({'loaded' if loaded else 'not loaded'})>"
+        )
+
+
+def is_importable(module: LazyModule) -> bool:
+    """
+    Check if a lazy module imports, importing it on the first call.
+
+    Unlike `is_available`, a module that is installed but fails to import, such as a
+    package built against another CUDA version, is reported as unavailable. The
+    result is cached in the lazy module.
+
+    Example:
+        te = LazyModule("transformer_engine.pytorch")
+
+        def norm_layer():
+            # transformer_engine is imported here, the first time it is needed
+            return te.LayerNorm if is_importable(te) else torch.nn.LayerNorm
+
+    Args:
+        module: Lazy module to import
+
+    Returns:
+        True if the module was imported
+    """
+    importable = module.__dict__["_lazy_importable"]
+    if importable is None:
+        try:
+            module._load()
+            importable = True
+        except (ImportError, OSError):
+            importable = False
+        module.__dict__["_lazy_importable"] = importable
+    return importable
+
+
+def lazy_getattr(module_name: str, attributes: Dict[str, str]) -> Callable[[str], Any]:
+    """
+    Build a module level `__getattr__` importing attributes on first access.
+
+    Used in `__init__.py` files to keep re-exports that pull in heavy dependencies
+    out of the import of the package itself.
+
+    Example:
+        __getattr__ = lazy_getattr(__name__, {"SwinTransformer": ".transformer_layers"})
+
+    Args:
+        module_name: `__name__` of the module defining `__getattr__`
+        attributes: Maps every lazy attribute to the module it is imported from.
+            Relative module names are resolved against `module_name`
+
+    Returns:
+        The `__getattr__` function of the module
+    """
+
+    def __getattr__(name: str) -> Any:
+        if name not in attributes:
+            raise AttributeError(f"module '{module_name}' has no attribute '{name}'")
+        module = importlib.import_module(attributes[name], module_name)
+        value = getattr(module, name)
+        # Cache in the module so that __getattr__ is only called once
+        setattr(importlib.import_module(module_name), name, value)
+        return value
+
+    return __getattr__
@@ -16,16 +16,27 @@
 
 # ruff: noqa: F401
 
+import sys
 import time
+from typing import Optional
 
-import cupy as cp
 import numpy as np
 import warp as wp
 from numpy.typing import NDArray
 
+from physicsnemo.utils.lazy_import import LazyModule
+
+cp = LazyModule("cupy")
+
 wp.config.quiet = True
 
 
+def _is_cupy_array(x) -> bool:
+    # An array can only be a cupy array if cupy was imported, which is not required
+    cupy = sys.modules.get("cupy")
+    return cupy is not None and isinstance(x, cupy.ndarray)
+
+
 @wp.kernel
 def _bvh_query_distance(
     mesh: wp.uint64,
@@ -84,6 +95,7 @@ def signed_distance_field(
     include_hit_points: bool = False,
     include_hit_points_id: bool = False,
     use_sign_winding_number: bool = False,
+    device: Optional[str] = None,
 ) -> wp.array:
     """
     Computes the signed distance field (SDF) for a given mesh and input points.
@@ -99,6 +111,10 @@ def signed_distance_field(
             the output. Default is False.
         include_hit_points_id (bool, optional): Whether to include hit point
             IDs in the output. Default is False.
+        use_sign_winding_number (bool, optional): Whether to compute the sign
+            with winding numbers instead of normals. Default is False.
+        device (str, optional): Warp device running the query, such as "cpu"
+            or "cuda:0". Default is None, the current Warp device.
 
     Returns:
     -------
@@ -115,19 +131,21 @@ def signed_distance_field(
     wp.init()
 
     # Get the current warp device string (e.g., "cuda:2")
-    try:
-        device = str(wp.get_device())
-    except Exception:
-        device = "cuda"
-
-    # If cupy arrays come in, we have to convert them to numpy arrays:
-    return_cupy = False
-    if isinstance(mesh_vertices, cp.ndarray):
-        return_cupy = True
-    if isinstance(mesh_indices, cp.ndarray):
-        return_cupy = True
-    if isinstance(input_points, cp.ndarray):
-        return_cupy = True
+    if device is None:
+        try:
+            device = str(wp.get_device())
+        except Exception:
+            device = "cuda"
+
+    # If cupy arrays come in, cupy arrays are returned:
+    return_cupy = any(
+        _is_cupy_array(x) for x in (mesh_vertices, mesh_indices, input_points)
+    )
+    if return_cupy and wp.get_device(device).is_cpu:
+        mesh_vertices, mesh_indices, input_points = (
+            cp.asnumpy(x) if _is_cupy_array(x) else x
+            for x in (mesh_vertices, mesh_indices, input_points)
+        )
 
     # Convert numpy to warp arrays:
     mesh_vertices = wp.array(mesh_vertices, dtype=wp.vec3, device=device)
@@ -156,25 +174,16 @@ def signed_distance_field(
         device=device,
     )
 
-    if return_cupy:
-        if include_hit_points and include_hit_points_id:
-            return (
-                cp.asarray(sdf),
-                cp.asarray(sdf_hit_point),
-                cp.asarray(sdf_hit_point_id),
-            )
-        elif include_hit_points:
-            return (cp.asarray(sdf), cp.asarray(sdf_hit_point))
-        elif include_hit_points_id:
-            return (cp.asarray(sdf), cp.asarray(sdf_hit_point_id))
-        else:
-            return cp.asarray(sdf)
+    outputs = [sdf]
+    if include_hit_points:
+        outputs.append(sdf_hit_point)
+    if include_hit_points_id:
+        outputs.append(sdf_hit_point_id)
+
+    if return_cupy and sdf.device.is_cuda:
+        outputs = [cp.asarray(x) for x in outputs]
     else:
-        if include_hit_points and include_hit_points_id:
-            return (sdf.numpy(), sdf_hit_point.numpy(), sdf_hit_point_id.numpy())
-        elif include_hit_points:
-            return (sdf.numpy(), sdf_hit_point.numpy())
-        elif include_hit_points_id:
-            return (sdf.numpy(), sdf_hit_point_id.numpy())
-        else:
-            return sdf.numpy()
+        outputs = [x.numpy() for x in outputs]
+        if return_cupy:
+            outputs = [cp.asarray(x) for x in outputs]
+    return outputs[0] if len(outputs) == 1 else tuple(outputs)
@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+import torch
+
+from physicsnemo.benchmarks import (
+    Benchmark,
+    BenchmarkResult,
+    compare_results,
+    list_benchmarks,
+    run_benchmark,
+)
+from physicsnemo.benchmarks.__main__ import main
+
+
+def test_run_benchmark():
+    """Test timing a benchmark"""
+
+    def setup(params, device):
+        x = torch.randn(params["n"], params["n"], device=device)
+        return lambda: x @ x, params["n"]
+
+    benchmark = Benchmark(name="test/matmul", setup=setup, sizes={"small": {"n": 64}})
+    result = run_benchmark(benchmark, "small", warmup=1, repeats=3)
+    assert result.skipped is None
+    assert result.repeats >= 3
+    assert result.wall_time_min <= result.wall_time
+    assert result.peak_memory_mb >= 0
+    assert result.throughput == pytest.approx(64 / result.wall_time)
+
+    # Benchmarks with missing requirements are skipped, not failed
+    benchmark = Benchmark(
+        name="test/skipped",
+        setup=setup,
+        sizes={"small": {"n": 64}},
+        requires=("not_a_real_module",),
+    )
+    assert "not_a_real_module" in run_benchmark(benchmark, "small").skipped
+    benchmark = Benchmark(
+        name="test/cuda", setup=setup, sizes={"small": {"n": 64}}, requires_cuda=True
+    )
+    assert run_benchmark(benchmark, "small", device="cpu").skipped is not None
+
+
+def test_compare_results():
+    """Test flagging regressions against a baseline"""
+
+    def result(name, wall_time, peak_memory_mb=100.0):
+        return BenchmarkResult(
+            name=name,
+            size="small",
+            device="cpu",
+            wall_time=wall_time,
+            peak_memory_mb=peak_memory_mb,
+        )
+
+    baseline = [result("a", 1.0), result("b", 1.0), result("c", 1.0)]
+    results = [
+        result("a", 1.05),
+        result("b", 2.0),
+        result("c", 0.5, peak_memory_mb=200.0),
+        result("d", 1.0),
+    ]
+    comparison = compare_results(results, baseline, time_tolerance=0.1)
+    assert sorted((r.key, r.metric) for r in comparison.regressions) == [
+        ("b[small]", "wall_time"),
+        ("c[small]", "peak_memory_mb"),
+    ]
+    assert [(r.key, r.metric) for r in comparison.improvements] == [
+        ("c[small]", "wall_time")
+    ]
+    assert comparison.missing == ["d[small]"]
+
+
+def test_benchmark_suites():
+    """Test that the suites register their benchmarks"""
+    names = [b.name for b in list_benchmarks()]
+    for model in ["fno", "afno", "meshgraphnet", "graphcast", "song_unet"]:
+        assert f"models/{model}/forward" in names
+        assert f"models/{model}/backward" in names
+    assert "datapipes/healpix_timeseries" in names
+    assert "metrics/power_spectrum" in names
+    assert [b.name for b in list_benchmarks("metrics/crps/*")] == [
+        "metrics/crps/histogram",
+        "metrics/crps/kernel",
+        "metrics/crps/sort",
+    ]
+
+
+def test_benchmark_cli(tmp_path):
+    """Test running the CPU benchmarks and comparing against a baseline"""
+    args = ["--filter", "metrics/*", "--size", "small", "--repeats", "2"]
+    baseline = tmp_path / "baseline.json"
+    assert main(args + ["--output", str(baseline)]) == 0
+    results = json.loads(baseline.read_text())["results"]
+    assert len(results) == len(list_benchmarks("metrics/*"))
+    assert all(r["skipped"] is None for r in results)
+
+    # A baseline that was much faster flags every benchmark as a regression
+    for r in results:
+        r["wall_time"] /= 100
+    baseline.write_text(json.dumps({"results": results}))
+    assert main(args + ["--baseline", str(baseline)]) == 1
+
+
+def test_model_benchmarks():
+    """Test the forward and backward model benchmarks on CPU"""
+    for benchmark in list_benchmarks("models/fno/*"):
+        result = run_benchmark(benchmark, "small", warmup=0, repeats=1)
+        assert result.skipped is None
+        assert result.wall_time > 0
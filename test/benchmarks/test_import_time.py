@@ -0,0 +1,82 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+
+import pytest
+from pytest_utils import import_or_fail
+
+from physicsnemo.benchmarks.import_time import measure_import_time
+from physicsnemo.utils.lazy_import import LazyModule, is_importable, lazy_getattr
+
+# Cold import budgets in seconds, on top of importing torch. Generous enough for slow
+# CI machines, but pulling in s3fs, timm or transformer_engine again exceeds them.
+IMPORT_BUDGETS = {
+    "physicsnemo": 1.0,
+    "physicsnemo.models.fno": 1.5,
+    "physicsnemo.models.meshgraphnet": 4.0,
+}
+
+# Heavy dependencies that must only be imported when they are used
+LAZY_DEPENDENCIES = ["s3fs", "requests", "timm", "transformer_engine", "h5py"]
+
+
+def _loaded_modules(module):
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    out = subprocess.run(
+        [sys.executable, "-c", code],  # noqa: S603 runs the current interpreter
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return set(out.split())
+
+
+@pytest.mark.parametrize("module", ["physicsnemo", "physicsnemo.models.fno"])
+def test_import_time_budget(module):
+    """Test the cold import time of the lightweight entry points"""
+    assert not _loaded_modules(module) & set(LAZY_DEPENDENCIES)
+    result = measure_import_time(module, repeats=3)
+    assert result.total < IMPORT_BUDGETS[module], result.top(10)
+
+
+@import_or_fail("dgl")
+def test_import_time_budget_meshgraphnet(pytestconfig):
+    """Test the cold import time of MeshGraphNet, DGL is its only heavy dependency"""
+    module = "physicsnemo.models.meshgraphnet"
+    assert not _loaded_modules(module) & set(LAZY_DEPENDENCIES)
+    result = measure_import_time(module, repeats=3)
+    assert result.total < IMPORT_BUDGETS[module], result.top(10)
+
+
+def test_lazy_module():
+    """Test deferred imports"""
+    json = LazyModule("json")
+    assert json.dumps([1]) == "[1]"
+    missing = LazyModule("physicsnemo_missing_module", hint="Install it")
+    with pytest.raises(ImportError, match="Install it"):
+        missing.anything
+    assert is_importable(json)
+    assert not is_importable(missing)
+
+    # Lazy re-exports through a module level __getattr__
+    getattr_ = lazy_getattr("physicsnemo.models.layers", {"Mlp": ".mlp_layers"})
+    from physicsnemo.models.layers.mlp_layers import Mlp
+
+    assert getattr_("Mlp") is Mlp
+    with pytest.raises(AttributeError):
+        getattr_("NotALayer")
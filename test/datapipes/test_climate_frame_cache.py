@@ -0,0 +1,142 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+
+import numpy as np
+import pytest
+from pytest_utils import import_or_fail
+
+from physicsnemo.datapipes.climate.utils.frame_cache import SharedFrameCache
+
+
+def test_frame_cache_shared_between_copies():
+    """Test frames written through an unpickled copy are read from the cache"""
+    frames = np.arange(4 * 2 * 3 * 5, dtype=np.float32).reshape(4, 2, 3, 5)
+    cache = SharedFrameCache((2, 3, 5), np.float32, max_bytes=8 * frames[0].nbytes)
+
+    # Workers receive the cache pickled and attach to the same segment
+    worker_cache = pickle.loads(pickle.dumps(cache))  # noqa: S301 pickled here
+    worker_cache.write(1, 10, frames)
+    worker_cache.close()
+
+    out = np.zeros((3, 2, 3, 5), dtype=np.float32)
+    missing = cache.read(1, [10, 12, 14], out)
+    assert missing == [2]
+    assert np.array_equal(out[:2], frames[[0, 2]])
+    assert cache.read(0, [10], out) == [0]
+    assert cache.stats == {
+        "hits": 2,
+        "misses": 2,
+        "frames_read": 4,
+        "bytes_read": frames.nbytes,
+    }
+
+
+def test_frame_cache_lru_eviction():
+    """Test the least recently used frames are evicted once the budget is full"""
+    frames = np.arange(6, dtype=np.float64).reshape(6, 1)
+    cache = SharedFrameCache((1,), np.float64, max_bytes=4 * 8)
+    out = np.zeros((6, 1))
+
+    cache.write(0, 0, frames[:4])
+    # Frame 0 becomes the most recently used
+    assert cache.read(0, [0], out) == []
+    cache.write(0, 4, frames[4:])
+    assert cache.read(0, list(range(6)), out) == [1, 2]
+    assert np.array_equal(out[[0, 3, 4, 5]], frames[[0, 3, 4, 5]])
+
+
+def test_frame_cache_blocks():
+    """Test missing time steps are expanded to merged aligned blocks"""
+    cache = SharedFrameCache((1,), np.float32, max_bytes=64, block_size=4)
+    assert cache.blocks([5, 6, 9], num_times=10) == [(4, 10)]
+    assert cache.blocks([1, 13], num_times=15) == [(0, 4), (12, 15)]
+    with pytest.raises(ValueError):
+        SharedFrameCache((16,), np.float32, max_bytes=32)
+
+
+@import_or_fail(["h5py", "pytz"])
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_climate_hdf5_source_frame_cache(tmp_path, shuffle, pytestconfig):
+    """Test the cached source returns the same sequences with fewer frames read"""
+    import h5py
+
+    from physicsnemo.datapipes.climate.climate import ClimateHDF5DaliExternalSource
+    from physicsnemo.datapipes.climate.utils.torch_engine import SampleInfo
+
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((2, 24, 4, 3, 5), dtype=np.float32)
+    for year in range(2):
+        with h5py.File(tmp_path / f"{2000 + year}.h5", "w") as f:
+            f.create_dataset("fields", data=data[year])
+
+    num_steps, stride = 3, 2
+    kwargs = dict(
+        data_paths=sorted(tmp_path.glob("*.h5")),
+        num_samples=2 * 20,
+        channels=[0, 2, 3],
+        num_steps=num_steps,
+        stride=stride,
+        dt=6.0,
+        start_year=2000,
+        num_samples_per_year=20,
+        latlon=np.zeros((2, 3, 5)),
+        aux_variables={},
+        shuffle=shuffle,
+    )
+    cache = SharedFrameCache(
+        (3, 3, 5), np.float32, max_bytes=48 * 3 * 3 * 5 * 4, block_size=8
+    )
+    source = ClimateHDF5DaliExternalSource(**kwargs)
+    cached_source = ClimateHDF5DaliExternalSource(**kwargs, frame_cache=cache)
+
+    for i in range(len(source)):
+        info = SampleInfo(i, 0, i, 0)
+        state_seq = source(info)[0]
+        assert np.array_equal(cached_source(info)[0], state_seq)
+
+    # Every frame is read once instead of once per sample it appears in
+    stats = cache.stats
+    assert stats["frames_read"] == 48
+    assert stats["hits"] + stats["misses"] == num_steps * len(source)
+
+
+@import_or_fail(["pytz"])
+def test_climate_source_without_frame_reads(pytestconfig):
+    """Test a source without frame reads is rejected only with a frame cache"""
+    from physicsnemo.datapipes.climate.climate import ClimateDaliExternalSource
+
+    class UncachedSource(ClimateDaliExternalSource):
+        def _load_sequence(self, year_idx, idx):
+            pass
+
+    kwargs = dict(
+        data_paths=[],
+        num_samples=4,
+        channels=[0],
+        num_steps=1,
+        stride=1,
+        dt=6.0,
+        start_year=2000,
+        num_samples_per_year=4,
+        latlon=np.zeros((2, 3, 5)),
+    )
+    UncachedSource(**kwargs)
+    cache = SharedFrameCache((1, 3, 5), np.float32, max_bytes=4 * 3 * 5 * 4)
+    with pytest.raises(NotImplementedError, match="UncachedSource"):
+        UncachedSource(**kwargs, frame_cache=cache)
+    cache.close()
@@ -0,0 +1,133 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import numpy as np
+import pytest
+import torch
+from pytest_utils import import_or_fail
+
+NUM_TIMES, CHANNELS, SHAPE = 10, 3, (4, 8)
+
+
+@pytest.fixture
+def climate_dir(tmp_path):
+    import h5py
+
+    rng = np.random.default_rng(0)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for year in range(2):
+        fields = rng.normal(size=(NUM_TIMES, CHANNELS, *SHAPE)).astype(np.float32)
+        fields[:, 1] = 100 * fields[:, 1] + 250
+        # Constant channels are decoded exactly
+        fields[:, 2] = 3.5
+        with h5py.File(data_dir / f"{2000 + year}.h5", "w") as f:
+            f["fields"] = fields
+
+    stats_dir = tmp_path / "stats"
+    stats_dir.mkdir()
+    np.save(stats_dir / "global_means.npy", np.ones((1, CHANNELS, 1, 1)))
+    np.save(stats_dir / "global_stds.npy", 2 * np.ones((1, CHANNELS, 1, 1)))
+    with open(tmp_path / "data.json", "w") as f:
+        json.dump({"coords": {"channel": [f"var{i}" for i in range(CHANNELS)]}}, f)
+    return tmp_path
+
+
+@import_or_fail("h5py")
+@pytest.mark.parametrize("dtype", ["int16", "uint16"])
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_pack_dataset(climate_dir, dtype, compression, pytestconfig):
+    """Test the quantization error of packed files is within the bound"""
+    import h5py
+
+    from physicsnemo.datapipes.climate.utils.quantize import pack_dataset
+
+    errors = pack_dataset(
+        climate_dir / "data",
+        climate_dir / "packed",
+        dtype=dtype,
+        compression=compression,
+        validate=True,
+    )
+    assert sorted(errors) == ["2000.h5", "2001.h5"]
+    for error in errors.values():
+        assert error["max_abs"].shape == (CHANNELS,)
+        assert (error["max_abs"] <= 1.01 * error["bound"] + 1e-6).all()
+        assert (error["rms"] <= error["max_abs"]).all()
+        assert error["max_abs"][2] == 0
+        # 16 bits resolve the range of the channels to a few parts in 1e5
+        assert error["max_abs"][1] < 1e-2
+
+    with h5py.File(climate_dir / "packed/2000.h5", "r") as f:
+        assert f["fields"].dtype == np.dtype(dtype)
+        assert f["fields"].shape == (NUM_TIMES, CHANNELS, *SHAPE)
+        assert f["scale"].shape == f["offset"].shape == (CHANNELS,)
+
+
+@import_or_fail("h5py")
+def test_pack_non_finite(tmp_path, pytestconfig):
+    import h5py
+
+    from physicsnemo.datapipes.climate.utils.quantize import pack_hdf5_file
+
+    with h5py.File(tmp_path / "nan.h5", "w") as f:
+        f["fields"] = np.full((2, 1, 2, 2), np.nan, dtype=np.float32)
+    with pytest.raises(ValueError):
+        pack_hdf5_file(tmp_path / "nan.h5", tmp_path / "packed.h5")
+
+
+@import_or_fail(["h5py", "pytz"])
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_packed_climate_datapipe(climate_dir, num_workers, pytestconfig):
+    """Test the torch engine decodes packed data like the original files"""
+    from physicsnemo.datapipes.climate import ClimateDatapipe, ClimateDataSourceSpec
+    from physicsnemo.datapipes.climate.utils.quantize import pack_dataset
+
+    pack_dataset(climate_dir / "data", climate_dir / "packed")
+
+    def first_batch(data_dir, file_type):
+        spec = ClimateDataSourceSpec(
+            data_dir=data_dir,
+            name="era5",
+            file_type=file_type,
+            stats_files={
+                "mean": climate_dir / "stats/global_means.npy",
+                "std": climate_dir / "stats/global_stds.npy",
+            },
+            metadata_path=climate_dir / "data.json",
+            variables=["var2", "var1"],
+            use_cos_zenith=True,
+            num_steps=2,
+        )
+        datapipe = ClimateDatapipe(
+            [spec],
+            batch_size=2,
+            start_year=2000,
+            shuffle=False,
+            num_workers=num_workers,
+            device="cpu",
+            engine="torch",
+        )
+        return next(iter(datapipe))[0]
+
+    packed = first_batch(climate_dir / "packed", "hdf5_packed")
+    data = first_batch(climate_dir / "data", "hdf5")
+    assert list(packed) == list(data)
+    assert packed["state_seq-era5"].dtype == torch.float32
+    assert torch.allclose(packed["state_seq-era5"], data["state_seq-era5"], atol=1e-2)
+    assert torch.equal(packed["cos_zenith-era5"], data["cos_zenith-era5"])
@@ -0,0 +1,160 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+
+import numpy as np
+import pytest
+import torch
+from pytest_utils import import_or_fail
+
+from . import common
+
+NUM_TIMES = 12
+CHANNELS = 3
+SHAPE = (8, 16)
+
+
+@pytest.fixture
+def era5_dir(tmp_path):
+    """Two years of synthetic data, whose values encode year, time and channel"""
+    import h5py
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for year in range(2):
+        t, c = np.meshgrid(np.arange(NUM_TIMES), np.arange(CHANNELS), indexing="ij")
+        fields = 1000 * year + 10 * t + c
+        fields = np.broadcast_to(fields[..., None, None], (NUM_TIMES, CHANNELS, *SHAPE))
+        with h5py.File(data_dir / f"{2000 + year}.h5", "w") as f:
+            f["fields"] = fields.astype(np.float32)
+
+    stats_dir = tmp_path / "stats"
+    stats_dir.mkdir()
+    np.save(stats_dir / "global_means.npy", np.ones((1, CHANNELS, 1, 1)))
+    np.save(stats_dir / "global_stds.npy", 2 * np.ones((1, CHANNELS, 1, 1)))
+    with open(tmp_path / "data.json", "w") as f:
+        json.dump({"coords": {"channel": [f"var{i}" for i in range(CHANNELS)]}}, f)
+    return tmp_path
+
+
+@import_or_fail("h5py")
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_era5_hdf5_torch_engine(era5_dir, num_workers, pytestconfig):
+    from physicsnemo.datapipes.climate import ERA5HDF5Datapipe
+
+    datapipe = ERA5HDF5Datapipe(
+        data_dir=era5_dir / "data",
+        stats_dir=era5_dir / "stats",
+        batch_size=2,
+        num_steps=2,
+        latlon_resolution=SHAPE,
+        use_cos_zenith=True,
+        cos_zenith_args={"dt": 6.0, "start_year": 2000},
+        use_time_of_year_index=True,
+        shuffle=False,
+        num_workers=num_workers,
+        device="cpu",
+        engine="torch",
+    )
+    # (12 - 2 steps) samples per year
+    assert len(datapipe) == 10
+    batches = list(datapipe)
+    assert len(batches) == 10
+
+    data = batches[0][0]
+    assert list(data) == ["invar", "outvar", "cos_zenith", "time_of_year_idx"]
+    common.check_datapipe_device(data["invar"], "cpu")
+    assert data["invar"].shape == (2, CHANNELS, *SHAPE)
+    assert data["outvar"].shape == (2, 2, CHANNELS, *SHAPE)
+    # Timestamps of the input, outputs and one extra step
+    assert data["cos_zenith"].shape == (2, 3, 1, *SHAPE)
+    # Sample 1 starts at time 1, outputs are normalized
+    expected = (10 * 1 + torch.arange(CHANNELS) - 1.0) / 2.0
+    assert torch.allclose(data["invar"][1, :, 0, 0], expected)
+    expected = (10 * 3 + torch.arange(CHANNELS) - 1.0) / 2.0
+    assert torch.allclose(data["outvar"][1, 1, :, 0, 0], expected)
+    assert data["time_of_year_idx"].flatten().tolist() == [0, 1]
+    assert (data["cos_zenith"].abs() <= 1).all()
+
+
+@import_or_fail("h5py")
+def test_era5_hdf5_torch_engine_shuffle(era5_dir, pytestconfig):
+    from physicsnemo.datapipes.climate import ERA5HDF5Datapipe
+
+    def first_values(rank, num_workers, epochs=2):
+        datapipe = ERA5HDF5Datapipe(
+            data_dir=era5_dir / "data",
+            batch_size=2,
+            shuffle=True,
+            num_workers=num_workers,
+            device="cpu",
+            process_rank=rank,
+            world_size=2,
+            engine="torch",
+        )
+        return [
+            [v for batch in datapipe for v in batch[0]["invar"][:, 0, 0, 0].tolist()]
+            for _ in range(epochs)
+        ]
+
+    # Shuffle is seeded per epoch and identical with any number of workers
+    values = first_values(0, num_workers=0)
+    assert values == first_values(0, num_workers=3)
+    assert values[0] != values[1]
+    # Ranks see disjoint shards of the samples
+    other = first_values(1, num_workers=0)
+    assert not set(values[0]) & set(other[0])
+
+
+@import_or_fail("h5py")
+def test_climate_torch_engine(era5_dir, pytestconfig):
+    from physicsnemo.datapipes.climate import ClimateDatapipe, ClimateDataSourceSpec
+    from physicsnemo.datapipes.climate.utils import invariant
+
+    spec = ClimateDataSourceSpec(
+        data_dir=era5_dir / "data",
+        name="era5",
+        stats_files={
+            "mean": era5_dir / "stats/global_means.npy",
+            "std": era5_dir / "stats/global_stds.npy",
+        },
+        metadata_path=era5_dir / "data.json",
+        variables=["var0", "var2"],
+        use_cos_zenith=True,
+        num_steps=2,
+    )
+    datapipe = ClimateDatapipe(
+        [spec],
+        invariants={"cos_latlon": invariant.LatLon()},
+        batch_size=3,
+        start_year=2000,
+        crop_window=((0, 4), (0, 8)),
+        shuffle=False,
+        num_workers=2,
+        device="cpu",
+        engine="torch",
+    )
+    data = next(iter(datapipe))[0]
+    assert list(data) == datapipe.pipe_outputs
+    assert data["state_seq-era5"].shape == (3, 2, 2, 4, 8)
+    assert data["timestamps-era5"].shape == (3, 2)
+    assert data["cos_zenith-era5"].shape == (3, 2, 1, 4, 8)
+    assert data["cos_latlon"].shape == (3, 4, 4, 8)
+    # Second channel is var2 of the second time step of the third sample
+    assert data["state_seq-era5"][2, 1, 1, 0, 0] == (10 * 3 + 2 - 1.0) / 2.0
+    assert data["timestamps-era5"][0, 1] - data["timestamps-era5"][0, 0] == 6 * 3600
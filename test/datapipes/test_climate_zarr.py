@@ -0,0 +1,130 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import numpy as np
+import pytest
+from pytest_utils import import_or_fail
+
+NUM_TIMES, NUM_CHANNELS = 20, 5
+
+
+@pytest.fixture
+def zarr_store(tmp_path):
+    import zarr
+
+    data = np.random.default_rng(0).standard_normal(
+        (NUM_TIMES, NUM_CHANNELS, 6, 8), dtype=np.float32
+    )
+    root = zarr.open_group(str(tmp_path / "era5.zarr"), mode="w")
+    fields = root.create_dataset(
+        "fields", shape=data.shape, chunks=(3, 2, 6, 8), dtype=data.dtype
+    )
+    fields[:] = data
+    with open(tmp_path / "data.json", "w") as f:
+        json.dump({"coords": {"channel": [f"var{i}" for i in range(5)]}}, f)
+    return tmp_path, data
+
+
+def _source_outputs(store, storage_options, channels, read_ahead):
+    from physicsnemo.datapipes.climate.climate import ClimateZarrDaliExternalSource
+    from physicsnemo.datapipes.climate.utils.torch_engine import SampleInfo
+
+    num_steps, stride = 3, 2
+    source = ClimateZarrDaliExternalSource(
+        data_paths=[store],
+        num_samples=NUM_TIMES - (num_steps - 1) * stride,
+        channels=channels,
+        num_steps=num_steps,
+        stride=stride,
+        dt=6.0,
+        start_year=2000,
+        num_samples_per_year=NUM_TIMES - (num_steps - 1) * stride,
+        latlon=np.zeros((2, 6, 8)),
+        aux_variables={},
+        shuffle=False,
+        backend_kwargs={
+            "storage_options": storage_options,
+            "num_threads": 4,
+            "read_ahead": read_ahead,
+        },
+    )
+    return [source(SampleInfo(i, 0, i, 0)) for i in range(len(source))]
+
+
+@import_or_fail(["zarr", "pytz"])
+@pytest.mark.parametrize("channels", [[0, 1, 2, 3, 4], [1, 2], [4, 0, 3]])
+@pytest.mark.parametrize("read_ahead", [0, 2])
+def test_zarr_source_local(zarr_store, channels, read_ahead, pytestconfig):
+    """Test the concurrent chunk reads of a local Zarr store"""
+    path, data = zarr_store
+    outputs = _source_outputs(str(path / "era5.zarr"), None, channels, read_ahead)
+    for (i, (state_seq, timestamps)) in enumerate(outputs):
+        assert np.array_equal(state_seq, data[i : i + 5 : 2][:, channels])
+        assert timestamps[1] - timestamps[0] == 2 * 6 * 3600
+
+
+@import_or_fail(["zarr", "pytz"])
+def test_zarr_spec(zarr_store, pytestconfig):
+    """Test a Zarr store is parsed as a single sequence of time steps"""
+    from physicsnemo.datapipes.climate import ClimateDataSourceSpec
+
+    path, data = zarr_store
+    spec = ClimateDataSourceSpec(
+        data_dir=str(path / "era5.zarr"),
+        file_type="zarr",
+        metadata_path=path / "data.json",
+        variables=["var1", "var3"],
+        num_steps=2,
+    )
+    spec.parse_dataset_files()
+    assert spec.channels == [1, 3]
+    assert spec.n_years == 1
+    assert spec.num_samples_per_year == NUM_TIMES - 1
+    assert spec.data_shape == (6, 8)
+
+
+@import_or_fail(["zarr", "pytz", "s3fs", "moto", "boto3"])
+def test_zarr_source_s3(zarr_store, pytestconfig):
+    """Test reading a Zarr store from a local S3 stand-in"""
+    import s3fs
+    from moto.server import ThreadedMotoServer
+
+    path, data = zarr_store
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        storage_options = {
+            "key": "testing",
+            "secret": "testing",  # noqa: S105 credentials of the stand-in
+            "client_kwargs": {
+                "endpoint_url": f"http://{host}:{port}",
+                "region_name": "us-east-1",
+            },
+        }
+        fs = s3fs.S3FileSystem(**storage_options)
+        fs.mkdir("climate")
+        fs.put(str(path / "era5.zarr"), "climate/era5.zarr", recursive=True)
+
+        outputs = _source_outputs(
+            "s3://climate/era5.zarr", storage_options, [0, 2, 3], read_ahead=1
+        )
+        for (i, (state_seq, _)) in enumerate(outputs):
+            assert np.array_equal(state_seq, data[i : i + 5 : 2][:, [0, 2, 3]])
+    finally:
+        server.stop()
@@ -128,3 +128,405 @@ def test_domino_datapipe(
         if key in sample:
             assert isinstance(sample[key], torch.Tensor)
             assert sample[key].device.type == "cuda" if gpu_output else "cpu"
+
+
+def _sphere_sample(resolution: int, num_points: int):
+    """DoMINO sample of a triangulated unit sphere in a cloud of volume points"""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    theta, phi = np.meshgrid(
+        np.linspace(0, np.pi, resolution),
+        np.linspace(0, 2 * np.pi, 2 * resolution),
+        indexing="ij",
+    )
+    vertices = np.stack(
+        [np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)],
+        axis=-1,
+    ).reshape(-1, 3)
+    ids = np.arange(theta.size).reshape(theta.shape)
+    a, b, c, d = ids[:-1, :-1], ids[:-1, 1:], ids[1:, :-1], ids[1:, 1:]
+    faces = np.concatenate(
+        [np.stack([a, c, b], -1).reshape(-1, 3), np.stack([b, c, d], -1).reshape(-1, 3)]
+    )
+    triangles = vertices[faces]
+    centers = triangles.mean(1)
+    areas = 0.5 * np.linalg.norm(
+        np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]),
+        axis=-1,
+    )
+    normals = centers / np.linalg.norm(centers, axis=-1, keepdims=True)
+    return {
+        "stl_coordinates": vertices.astype(np.float32),
+        "stl_centers": centers.astype(np.float32),
+        "stl_faces": faces.reshape(-1).astype(np.int32),
+        "stl_areas": areas.astype(np.float32),
+        "surface_mesh_centers": centers.astype(np.float32),
+        "surface_normals": normals.astype(np.float32),
+        "surface_areas": areas.astype(np.float32),
+        "surface_fields": rng.standard_normal((len(centers), 4), dtype=np.float32),
+        "volume_mesh_centers": rng.uniform(-2, 2, (num_points, 3)).astype(np.float32),
+        "volume_fields": rng.standard_normal((num_points, 5), dtype=np.float32),
+    }
+
+
+@import_or_fail(["warp", "scipy", "zarr"])
+def test_domino_datapipe_cpu(tmp_path, pytestconfig):
+    """Test preprocessing on CPU, with numpy, scipy and the Warp CPU device"""
+    import numpy as np
+
+    from physicsnemo.datapipes.cae.domino_datapipe import DoMINODataPipe
+    from physicsnemo.utils.domino.utils import nearest_neighbor_indices
+
+    np.savez(tmp_path / "sphere.npz", **_sphere_sample(24, 2000))
+    dataset = DoMINODataPipe(
+        input_path=tmp_path,
+        model_type="combined",
+        gpu_preprocessing=False,
+        gpu_output=False,
+        phase="test",
+        grid_resolution=[16, 16, 16],
+        sampling=True,
+        volume_points_sample=500,
+        surface_points_sample=200,
+        geom_points_sample=300,
+        num_surface_neighbors=5,
+        surface_sampling_algorithm="random",
+        bounding_box_dims=ConcreteBoundingBox(min=[-2, -2, -2], max=[2, 2, 2]),
+        bounding_box_dims_surf=ConcreteBoundingBox(
+            min=[-1.5, -1.5, -1.5], max=[1.5, 1.5, 1.5]
+        ),
+    )
+    assert dataset.array_provider is np
+    sample = dataset[0]
+
+    for key in ["volume_fields", "sdf_nodes", "surface_fields", "surface_normals"]:
+        assert isinstance(sample[key], torch.Tensor)
+        assert sample[key].device.type == "cpu"
+    assert sample["surface_mesh_neighbors"].shape == (200, 4, 3)
+    assert sample["sdf_grid"].shape == (16, 16, 16)
+
+    # The distance to the faceted sphere is close to the one to the unit sphere
+    radius = torch.linalg.norm(sample["volume_mesh_centers"], dim=-1)
+    torch.testing.assert_close(
+        sample["sdf_nodes"][:, 0].abs(), (radius - 1).abs(), atol=0.03, rtol=0
+    )
+
+    # The neighbors are those of a brute force search, the closest being the point
+    points = np.random.default_rng(0).uniform(size=(300, 3))
+    ii = nearest_neighbor_indices(points, points[:20], 4)
+    distances = np.linalg.norm(points[:20, None] - points[None], axis=-1)
+    np.testing.assert_array_equal(ii, np.argsort(distances, axis=-1)[:, :4])
+
+
+@import_or_fail(["warp", "scipy", "zarr"])
+def test_domino_pickled_npy(tmp_path, pytestconfig):
+    """Test pickled .npy samples are rejected and converted to .npz"""
+    import numpy as np
+
+    from physicsnemo.datapipes.cae.domino_datapipe import DoMINODataPipe
+    from physicsnemo.utils.domino.utils import convert_npy_to_npz
+
+    sample = _sphere_sample(12, 500)
+    np.save(tmp_path / "sphere.npy", {**sample, "filename": "sphere", "x": None})
+    config = dict(
+        input_path=tmp_path,
+        model_type="surface",
+        gpu_preprocessing=False,
+        gpu_output=False,
+        grid_resolution=[8, 8, 8],
+        sampling=False,
+    )
+    with pytest.raises(ValueError, match="convert_npy_to_npz"):
+        DoMINODataPipe(**config)
+
+    convert_npy_to_npz(tmp_path / "sphere.npy", remove=True)
+    dataset = DoMINODataPipe(**config)
+    assert dataset.filenames == ["sphere.npz"]
+    data = dataset.read_data(tmp_path / "sphere.npz")
+    np.testing.assert_array_equal(data["surface_fields"], sample["surface_fields"])
+
+
+@import_or_fail(["scipy", "zarr"])
+def test_domino_area_weighted_sampling(tmp_path, pytestconfig):
+    """Test alias table area weighted sampling, standalone and from the cache"""
+    import numpy as np
+
+    from physicsnemo.datapipes.cae.domino_datapipe import CachedDoMINODataset
+    from physicsnemo.utils.domino.cache import write_cached_sample
+    from physicsnemo.utils.domino.utils import (
+        alias_sample,
+        area_weighted_shuffle_array,
+        build_alias_table,
+    )
+
+    rng = np.random.default_rng(0)
+    areas = np.concatenate([rng.random(1000) ** 8, [0.0, 50.0]])
+    prob, alias = build_alias_table(areas)
+
+    # Each index keeps its own probability plus the rest of the entries aliasing it
+    implied = prob.astype(np.float64)
+    np.add.at(implied, alias, 1.0 - prob)
+    np.testing.assert_allclose(implied / len(areas), areas / areas.sum(), atol=1e-6)
+    assert implied[-2] == 0.0
+
+    # Both sampling paths follow the areas and are reproducible with a seed
+    for table in [(prob, alias), None]:
+        _, ids = area_weighted_shuffle_array(
+            areas, len(areas), areas, alias_table=table, seed=1
+        )
+        _, same_ids = area_weighted_shuffle_array(
+            areas, len(areas), areas, alias_table=table, seed=1
+        )
+        np.testing.assert_array_equal(ids, same_ids)
+    counts = np.bincount(alias_sample(prob, alias, 200_000, seed=2), minlength=1002)
+    assert counts[-2] == 0
+    assert abs(counts[-1] / 200_000 - areas[-1] / areas.sum()) < 0.01
+
+    sample = _sphere_sample(16, 10)
+    n = len(sample["surface_areas"])
+    neighbors = np.stack([np.arange(n), (np.arange(n) + 1) % n], -1)
+    cached = {
+        "surface_mesh_centers": sample["surface_mesh_centers"],
+        "surface_areas": sample["surface_areas"],
+        "surface_normals": sample["surface_normals"],
+        "surface_fields": sample["surface_fields"],
+        "neighbor_indices": neighbors,
+    }
+    write_cached_sample(tmp_path / "no_table", cached)
+    prob, alias = build_alias_table(sample["surface_areas"])
+    cached.update(surface_alias_prob=prob, surface_alias_index=alias)
+    write_cached_sample(tmp_path / "table", cached)
+
+    dataset = CachedDoMINODataset(
+        tmp_path,
+        sampling=True,
+        surface_points_sample=100,
+        deterministic_seed=True,
+        alias_table_cache_size=1,
+    )
+    for i in range(len(dataset)):
+        result = dataset[i]
+        assert result["surface_mesh_centers"].shape == (100, 3)
+        assert result["surface_mesh_neighbors"].shape == (100, 2, 3)
+        assert "surface_alias_prob" not in result
+        assert "neighbor_indices" not in result
+        np.testing.assert_array_equal(
+            result["surface_mesh_centers"], dataset[i]["surface_mesh_centers"]
+        )
+    assert len(dataset._alias_tables) == 1
+
+
+@import_or_fail(["warp", "scipy", "zarr"])
+def test_domino_geometry_cache(tmp_path, pytestconfig):
+    """Test the disk cache of the per geometry preprocessing"""
+    import time
+
+    import numpy as np
+    from omegaconf import OmegaConf
+
+    from physicsnemo.datapipes.cae.domino_datapipe import DoMINODataPipe
+    from physicsnemo.utils.domino.cache import GeometryCache
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    np.savez(data_dir / "sphere.npz", **_sphere_sample(24, 2000))
+
+    # Keys of configurations from Hydra match those of plain Python values
+    box = {"min": [-2, -2, -2], "max": [2, 2, 2]}
+    assert GeometryCache.key(
+        data_dir / "sphere.npz", OmegaConf.create([16, 16, 16]), OmegaConf.create(box)
+    ) == GeometryCache.key(
+        data_dir / "sphere.npz", [16, 16, 16], ConcreteBoundingBox(**box)
+    )
+
+    config = dict(
+        input_path=data_dir,
+        model_type="combined",
+        gpu_preprocessing=False,
+        gpu_output=False,
+        phase="test",
+        grid_resolution=OmegaConf.create([16, 16, 16]),
+        sampling=True,
+        volume_points_sample=500,
+        surface_points_sample=200,
+        geom_points_sample=300,
+        num_surface_neighbors=5,
+        surface_sampling_algorithm="area_weighted",
+        deterministic=True,
+        bounding_box_dims=ConcreteBoundingBox(min=[-2, -2, -2], max=[2, 2, 2]),
+        bounding_box_dims_surf=ConcreteBoundingBox(
+            min=[-1.5, -1.5, -1.5], max=[1.5, 1.5, 1.5]
+        ),
+    )
+    expected = DoMINODataPipe(**config)[0]
+    dataset = DoMINODataPipe(**config, geometry_cache_dir=tmp_path / "cache")
+    # Identical results when the arrays are computed, then read from the cache
+    for _ in range(2):
+        sample = dataset[0]
+        for key in ["sdf_grid", "sdf_surf_grid", "surface_mesh_neighbors"]:
+            torch.testing.assert_close(sample[key], expected[key])
+    assert len(dataset.geometry_cache.entries()) == 3
+
+    # Least recently used arrays are evicted over budget
+    cache = GeometryCache(str(tmp_path / "evicted"), max_bytes=2500)
+    for name in "abc":
+        cache.get_array("key", name, lambda: np.zeros(200))
+        time.sleep(0.05)
+    assert len(cache.entries()) == 1
+    np.testing.assert_array_equal(
+        cache.get_array("key", "c", lambda: np.ones(200)), np.zeros(200)
+    )
+
+
+@import_or_fail(["scipy", "zarr"])
+def test_domino_cached_dataset_partial_reads(tmp_path, pytestconfig):
+    """Test the cache format and the row reads of CachedDoMINODataset"""
+    import numpy as np
+
+    from physicsnemo.datapipes.cae.domino_datapipe import CachedDoMINODataset
+    from physicsnemo.utils.domino.cache import (
+        MANIFEST,
+        CachedSample,
+        write_cached_sample,
+    )
+
+    rng = np.random.default_rng(0)
+    n = 5000
+    cached = {
+        "volume_mesh_centers": rng.random((n, 3), dtype=np.float32),
+        "volume_fields": torch.arange(n * 2.0).reshape(n, 2),
+        "sdf_grid": rng.random((8, 8, 8), dtype=np.float32),
+        "geometry_coordinates": rng.random((300, 3), dtype=np.float32),
+        "filename": "run_1",
+        "surface_areas": None,
+    }
+    write_cached_sample(tmp_path / "run_1", cached)
+    assert (tmp_path / "run_1" / MANIFEST).exists()
+    assert not [p for p in tmp_path.iterdir() if ".tmp" in p.name]
+
+    sample = CachedSample(tmp_path / "run_1")
+    assert set(sample.keys()) == {
+        "volume_mesh_centers",
+        "volume_fields",
+        "sdf_grid",
+        "geometry_coordinates",
+    }
+    assert sample.attributes == {"filename": "run_1"}
+    assert sample.shape("volume_fields") == (n, 2)
+    rows = rng.integers(0, n, (40, 3))
+    np.testing.assert_array_equal(
+        sample.read_rows("volume_mesh_centers", rows),
+        cached["volume_mesh_centers"][rows],
+    )
+
+    # Whole samples without sampling
+    result = CachedDoMINODataset(tmp_path)[0]
+    assert result["filename"] == "run_1"
+    np.testing.assert_array_equal(result["volume_fields"], cached["volume_fields"])
+
+    # Rows of the same points in all arrays, whole arrays of the others
+    dataset = CachedDoMINODataset(
+        tmp_path, sampling=True, volume_points_sample=100, geom_points_sample=400
+    )
+    result = dataset[0]
+    assert result["volume_mesh_centers"].shape == (100, 3)
+    rows = (result["volume_fields"][:, 0] / 2).astype(np.int64)
+    np.testing.assert_array_equal(
+        result["volume_mesh_centers"], cached["volume_mesh_centers"][rows]
+    )
+    np.testing.assert_array_equal(result["sdf_grid"], cached["sdf_grid"])
+    # Padded when there are not enough points
+    assert result["geometry_coordinates"].shape == (400, 3)
+    assert np.all(result["geometry_coordinates"][300:] == -100.0)
+
+
+@import_or_fail(["warp", "scipy", "zarr"])
+def test_domino_scaling_factors(tmp_path, pytestconfig):
+    """Test the merged field statistics and the resumable scaling factors"""
+    import json
+
+    import numpy as np
+    from omegaconf import OmegaConf
+
+    from physicsnemo.datapipes.cae.domino_datapipe import (
+        DoMINODataPipe,
+        compute_scaling_factors,
+    )
+    from physicsnemo.utils.domino.statistics import (
+        FieldStatistics,
+        reduce_statistics,
+    )
+
+    # Merged statistics of files are those computed over all files at once
+    rng = np.random.default_rng(0)
+    files = [rng.normal(i, i + 1, (100 * (i + 1), 3)) for i in range(5)]
+    stats = reduce_statistics([FieldStatistics.from_fields(f) for f in files])
+    mean = np.mean([f.mean(0) for f in files], 0)
+    assert stats.num_files == 5
+    assert stats.num_points == 1500
+    np.testing.assert_allclose(stats.mean, mean)
+    np.testing.assert_allclose(
+        stats.std, np.sqrt(np.mean([((f - mean) ** 2).mean(0) for f in files], 0))
+    )
+    np.testing.assert_array_equal(stats.max, np.max([f.max(0) for f in files], 0))
+    np.testing.assert_array_equal(stats.min, np.min([f.min(0) for f in files], 0))
+    restored = FieldStatistics.from_dict(json.loads(json.dumps(stats.to_dict())))
+    np.testing.assert_array_equal(restored.m2, stats.m2)
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for i in range(3):
+        sample = _sphere_sample(12, 500)
+        sample["volume_fields"] = sample["volume_fields"] * (i + 1) + i
+        np.savez(data_dir / f"run_{i}.npz", **sample)
+    box = {"min": [-2, -2, -2], "max": [2, 2, 2]}
+    cfg = OmegaConf.create(
+        {
+            "project_dir": str(tmp_path),
+            "model": {
+                "model_type": "volume",
+                "normalization": "mean_std_scaling",
+                "interp_res": [8, 8, 8],
+            },
+            "variables": {"volume": {"solution": {"u": "vector", "p": "scalar"}}},
+            "data": {"bounding_box": box, "bounding_box_surface": box},
+        }
+    )
+    datapipe = DoMINODataPipe(
+        data_dir,
+        model_type="volume",
+        grid_resolution=[8, 8, 8],
+        sampling=False,
+        compute_scaling_factors=True,
+        gpu_preprocessing=False,
+        gpu_output=False,
+        bounding_box_dims=ConcreteBoundingBox(**box),
+        bounding_box_dims_surf=ConcreteBoundingBox(**box),
+    )
+    fields = [
+        datapipe.preprocess_data(datapipe.read_data(data_dir / f"run_{i}.npz"))[
+            "volume_fields"
+        ]
+        for i in range(3)
+    ]
+    expected = reduce_statistics([FieldStatistics.from_fields(f) for f in fields])
+
+    # Resume from the progress of a run interrupted after the first file, which is
+    # not read again
+    progress = {
+        "keys": ["volume"],
+        "files": [f"run_{i}.npz" for i in range(3)],
+        "done": ["run_0.npz"],
+        "volume": FieldStatistics.from_fields(fields[0]).to_dict(),
+    }
+    progress_path = tmp_path / "scaling_factors_progress_0_of_1.json"
+    progress_path.write_text(json.dumps(progress))
+    (data_dir / "run_0.npz").write_bytes(b"interrupted")
+
+    compute_scaling_factors(cfg, data_dir, use_cache=False, checkpoint_every=1)
+    factors = np.load(tmp_path / "volume_scaling_factors.npy")
+    assert factors.dtype == np.float32
+    np.testing.assert_allclose(factors[0], expected.mean, rtol=1e-5)
+    np.testing.assert_allclose(factors[1], expected.std, rtol=1e-5)
+    assert not progress_path.exists()
@@ -0,0 +1,91 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import numpy as np
+import pytest
+from pytest_utils import import_or_fail
+
+
+@pytest.fixture
+def h5_dir(tmp_path):
+    import h5py
+
+    rng = np.random.default_rng(0)
+    for year in range(2):
+        with h5py.File(tmp_path / f"{2000 + year}.h5", "w") as f:
+            f.create_dataset(
+                "fields",
+                data=rng.standard_normal((16, 5, 6, 8), dtype=np.float32),
+                chunks=(2, 1, 6, 8),
+                compression="gzip",
+            )
+    return tmp_path
+
+
+@import_or_fail("h5py")
+@pytest.mark.parametrize(
+    "channels, num_reads", [([0, 1, 2, 3, 4], 1), ([0, 1, 3], 2), ([4, 0, 1], 2)]
+)
+@pytest.mark.parametrize("num_history", [0, 2])
+def test_era5_source_coalesced_reads(
+    h5_dir, channels, num_reads, num_history, pytestconfig
+):
+    """Test the coalesced reads return the same data as one read per time step"""
+    import h5py
+
+    from physicsnemo.datapipes.climate.era5_hdf5 import ERA5DaliExternalSource
+    from physicsnemo.datapipes.climate.utils.torch_engine import SampleInfo
+
+    stride, num_steps = 2, 3
+    source = ERA5DaliExternalSource(
+        data_paths=sorted(h5_dir.glob("*.h5")),
+        num_samples=8,
+        channels=channels,
+        num_steps=num_steps,
+        num_history=num_history,
+        stride=stride,
+        num_samples_per_year=4,
+        use_cos_zenith=False,
+        cos_zenith_args={},
+        use_time_of_year_index=False,
+        shuffle=False,
+    )
+
+    with h5py.File(h5_dir / "2001.h5", "r") as f:
+        fields = f["fields"][:]
+    # Sample 6 is sample 2 of the second year
+    invar, outvar, _, _ = source(SampleInfo(6, 0, 6, 0))
+    in_times = [2 + i * stride for i in range(num_history + 1)]
+    out_times = [2 + (num_history + 1 + i) * stride for i in range(num_steps)]
+    expected_invar = fields[in_times][:, channels]
+    if num_history == 0:
+        expected_invar = expected_invar[0]
+    np.testing.assert_array_equal(invar, expected_invar)
+    np.testing.assert_array_equal(outvar, fields[out_times][:, channels])
+    # Inputs and outputs are views of the same buffer
+    assert invar.base is outvar.base
+
+    stats = source.last_read_stats
+    assert stats.reads == num_reads
+    assert stats.bytes_read == invar.nbytes + outvar.nbytes
+    # Time steps 2, 4, ... are in distinct chunks of 2 steps and one channel
+    num_times = num_history + num_steps + 1
+    assert stats.bytes_decompressed == num_times * len(channels) * 2 * 6 * 8 * 4
+
+    source(SampleInfo(7, 1, 7, 0))
+    assert source.read_stats.samples == 2
+    assert source.read_stats.bytes_read == 2 * stats.bytes_read
@@ -473,6 +473,214 @@ def test_TimeSeriesDataset_get(
     zarr_ds.close()
 
 
+def synthetic_healpix_dataset(num_times=20):
+    """Small in memory dataset with the layout of the HEALPix datasets"""
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    dims = ("time", "channel", "face", "height", "width")
+    shape = (num_times, 2, 12, 4, 4)
+    return xr.Dataset(
+        {
+            "inputs": (dims[:1] + ("channel_in",) + dims[2:], rng.normal(size=shape)),
+            "targets": (dims[:1] + ("channel_out",) + dims[2:], rng.normal(size=shape)),
+        },
+        coords={
+            "time": pd.date_range("2000-01-01", periods=num_times, freq="3h"),
+            "channel_in": ["t2m0", "z500"],
+            "channel_out": ["t2m0", "z500"],
+            "lat": (dims[2:], rng.uniform(-90, 90, shape[2:])),
+            "lon": (dims[2:], rng.uniform(0, 360, shape[2:])),
+        },
+    )
+
+
+@import_or_fail("omegaconf")
+@pytest.mark.parametrize("add_insolation", [False, True])
+def test_TimeSeriesDataset_window_cache(add_insolation, pytestconfig):
+    from physicsnemo.datapipes.healpix.timeseries_dataset import TimeSeriesDataset
+
+    ds = synthetic_healpix_dataset()
+    scaling = omegaconf.DictConfig(
+        {"t2m0": {"mean": 1.0, "std": 2.0}, "z500": {"mean": -1.0, "std": 0.5}}
+    )
+    kwargs = dict(
+        dataset=ds,
+        scaling=scaling,
+        input_time_dim=2,
+        output_time_dim=2,
+        batch_size=3,
+        add_insolation=add_insolation,
+    )
+    cached = TimeSeriesDataset(**kwargs)
+    uncached = TimeSeriesDataset(**kwargs, window_cache=False)
+
+    loaded = []
+    load = cached._load_normalized
+
+    def counting_load(start, stop):
+        loaded.append(stop - start)
+        return load(start, stop)
+
+    cached._load_normalized = counting_load
+
+    # Sequential pass, then random access
+    items = list(range(len(cached))) + [3, 0, len(cached) - 1, 1]
+    for item in items:
+        (inputs, targets), (ref_inputs, ref_targets) = cached[item], uncached[item]
+        assert len(inputs) == len(ref_inputs)
+        for x, ref in zip(inputs, ref_inputs):
+            np.testing.assert_array_equal(x, ref)
+        np.testing.assert_array_equal(targets, ref_targets)
+    # A sequential pass loads every time step once
+    assert sum(loaded[: len(cached)]) == ds.sizes["time"]
+
+    # Second input step of the third sample of batch 1, [B, F, T, C, H, W]
+    start = 1 * 3 + 2 + 1 * cached.interval
+    mean = np.array([1.0, -1.0])[:, None, None, None]
+    std = np.array([2.0, 0.5])[:, None, None, None]
+    expected = (ds.inputs.values[start] - mean) / std
+    np.testing.assert_allclose(
+        cached[1][0][0][2, :, 1], expected.transpose(1, 0, 2, 3), rtol=1e-6
+    )
+
+    # Forecast mode
+    init_times = ds.time.values[[6, 14, 10]]
+    kwargs.update(batch_size=1, forecast_init_times=init_times)
+    cached = TimeSeriesDataset(**kwargs)
+    uncached = TimeSeriesDataset(**kwargs, window_cache=False)
+    for item in range(len(cached)):
+        for x, ref in zip(cached[item], uncached[item]):
+            np.testing.assert_array_equal(x, ref)
+
+
+@import_or_fail(["omegaconf", "dask"])
+def test_TimeSeriesDataset_precomputed_insolation(pytestconfig):
+    import pandas as pd
+
+    from physicsnemo.datapipes.healpix.data_modules import insolation_dataarray
+    from physicsnemo.datapipes.healpix.timeseries_dataset import TimeSeriesDataset
+    from physicsnemo.utils.insolation import insolation
+
+    ds = synthetic_healpix_dataset()
+    # The day of year is counted from the start of the year of every date
+    dates = np.array(["1999-03-01T06", "2001-03-01T06", "2000-02-29T06"], "datetime64")
+    sol = insolation(dates, ds.lat.values, ds.lon.values)
+    np.testing.assert_allclose(sol[0], sol[1])
+    assert not np.allclose(sol[0], sol[2])
+    np.testing.assert_allclose(
+        sol, insolation(pd.DatetimeIndex(dates), ds.lat.values, ds.lon.values)
+    )
+
+    sol = insolation_dataarray(ds, chunk_size=7)
+    assert sol.dims == ("time", "face", "height", "width")
+    assert sol.chunks[0] == (7, 7, 6)
+    np.testing.assert_allclose(
+        sol.values, insolation(ds.time.values, ds.lat.values, ds.lon.values)
+    )
+
+    scaling = omegaconf.DictConfig(
+        {"t2m0": {"mean": 1.0, "std": 2.0}, "z500": {"mean": -1.0, "std": 0.5}}
+    )
+    kwargs = dict(
+        scaling=scaling,
+        input_time_dim=2,
+        output_time_dim=2,
+        batch_size=3,
+        add_insolation=True,
+    )
+    computed = TimeSeriesDataset(dataset=ds, **kwargs)
+    precomputed = TimeSeriesDataset(dataset=ds.assign(insolation=sol), **kwargs)
+    for item in range(len(computed)):
+        (inputs, _), (ref_inputs, _) = precomputed[item], computed[item]
+        np.testing.assert_allclose(inputs[1], ref_inputs[1], rtol=1e-6)
+
+
+def write_synthetic_variables(directory, num_times):
+    """Writes the files of individual variables of a synthetic dataset"""
+    ds = synthetic_healpix_dataset(num_times)
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    for i, variable in enumerate(ds.channel_in.values):
+        da = ds.inputs.isel(channel_in=i, drop=True).rename({"time": "sample"})
+        da.to_dataset(name=variable).to_netcdf(Path(directory, f"{variable}.nc"))
+
+
+@import_or_fail(["omegaconf", "netCDF4", "dask", "zarr"])
+def test_build_time_series(tmp_path, monkeypatch, pytestconfig):
+    from physicsnemo.datapipes.healpix import data_modules
+
+    variables = ["t2m0", "z500"]
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write_synthetic_variables(src, num_times=12)
+    kwargs = dict(
+        src_directory=src,
+        dst_directory=dst,
+        dataset_name="built",
+        input_variables=variables,
+        time_chunk_size=4,
+        window_length=3,
+        chunks_per_task=1,
+    )
+
+    # Interrupted by a failing region, then resumed
+    write_region = data_modules._write_time_region
+    written = []
+
+    def failing_write_region(*args, **kwargs):
+        if len(written) == 1:
+            raise RuntimeError("interrupted")
+        written.append(write_region(*args, **kwargs))
+        return written[-1]
+
+    monkeypatch.setattr(data_modules, "_write_time_region", failing_write_region)
+    with pytest.raises(RuntimeError, match="interrupted"):
+        data_modules.build_time_series_dataset_classic(**kwargs)
+    progress_path = dst / "built.zarr.progress.json"
+    assert progress_path.exists()
+
+    monkeypatch.setattr(data_modules, "_write_time_region", write_region)
+    built = data_modules.build_time_series_dataset_classic(**kwargs)
+    assert not progress_path.exists()
+    assert built.inputs.encoding["chunks"] == (4, 2, 12, 4, 4)
+    reference = data_modules.create_time_series_dataset_classic(
+        src_directory=src,
+        dst_directory=tmp_path,
+        dataset_name="reference",
+        input_variables=variables,
+    )
+    xr.testing.assert_allclose(built.inputs.load(), reference.inputs)
+
+    # A complete dataset is opened without merging the source files
+    plan_path = dst / "built.zarr.plan.json"
+    plan_mtime = plan_path.stat().st_mtime_ns
+
+    def failing_open_build_source(*args, **kwargs):
+        raise AssertionError("source files merged for a complete dataset")
+
+    monkeypatch.setattr(data_modules, "_open_build_source", failing_open_build_source)
+    built = data_modules.build_time_series_dataset_classic(**kwargs)
+    assert built.sizes["time"] == 12
+    assert plan_path.stat().st_mtime_ns == plan_mtime
+    monkeypatch.undo()
+
+    # New time steps in the source files are appended
+    kwargs["src_directory"] = tmp_path / "src_extended"
+    write_synthetic_variables(kwargs["src_directory"], num_times=18)
+    built = data_modules.build_time_series_dataset_classic(**kwargs)
+    reference = data_modules._merge_time_series_dataset_classic(
+        src_directory=kwargs["src_directory"], input_variables=variables
+    )
+    assert built.sizes["time"] == 18
+    xr.testing.assert_allclose(built.targets.load(), reference.targets)
+
+    # A window of 3 time steps overlaps 1.5 chunks of 4 time steps on average
+    plan = data_modules.rechunk_plan(built, window_length=3)
+    assert plan["variables"]["inputs"]["chunks_per_sample"] == 1.5
+    assert plan["read_amplification"] == pytest.approx(2.0)
+    step_bytes = 2 * 12 * 4 * 4 * built.inputs.dtype.itemsize
+    assert plan["bytes_per_sample"] == 2 * 6 * step_bytes
+
+
 @import_or_fail("omegaconf")
 @import_or_fail("netCDF4")
 def test_TimeSeriesDataModule_initialization(
@@ -269,21 +269,20 @@ def test_TrailingAverageCoupler(data_dir, dataset_name, scaling_dict, pytestconf
     ds_path = Path(data_dir, dataset_name + ".zarr")
     zarr_ds = xr.open_zarr(ds_path)
 
-    # test fail initialization when trying to prepare data
-    with pytest.raises(
-        NotImplementedError, match=("Data preparation not yet implemented")
-    ):
-        coupler = TrailingAverageCoupler(
-            dataset=zarr_ds,
-            batch_size=batch_size,
-            variables=variables,
-            presteps=presteps,
-            averaging_window=averaging_window,
-            input_times=input_times,
-            input_time_dim=input_time_dim,
-            output_time_dim=output_time_dim,
-            prepared_coupled_data=False,
-        )
+    # trailing averages of data that is not prepared
+    coupler = TrailingAverageCoupler(
+        dataset=zarr_ds,
+        batch_size=batch_size,
+        variables=variables,
+        presteps=presteps,
+        averaging_window=averaging_window,
+        input_times=input_times,
+        input_time_dim=input_time_dim,
+        output_time_dim=output_time_dim,
+        prepared_coupled_data=False,
+    )
+    expected_shape = zarr_ds.inputs.sel(channel_in=variables).shape
+    assert coupler.coupled_inputs.shape == expected_shape
 
     # test fail when input times aren't evenly divisible by dataset dt
     with pytest.raises(ValueError, match=("Coupled input times")):
@@ -404,6 +403,21 @@ def test_TrailingAverageCoupler(data_dir, dataset_name, scaling_dict, pytestconf
     )
     coupler.set_coupled_fields(coupled_fields)
     assert list(coupler.preset_coupled_fields.shape) == expected_shape
+    # compare to the mean of every averaging slice
+    expected = th.concat(
+        [
+            th.concat(
+                [
+                    coupled_fields[:, :, s].mean(dim=2, keepdim=True)
+                    for s in coupler.averaging_slices[j]
+                ],
+                dim=3,
+            )
+            for j in range(coupler.coupled_integration_dim)
+        ],
+        dim=2,
+    ).permute(2, 0, 3, 1, 4, 5)
+    assert th.allclose(expected, coupler.preset_coupled_fields)
 
     # check reset
     assert coupler.coupled_mode
@@ -414,6 +428,67 @@ def test_TrailingAverageCoupler(data_dir, dataset_name, scaling_dict, pytestconf
     DistributedManager.cleanup()
 
 
+@import_or_fail(["omegaconf", "dask", "zarr"])
+def test_TrailingAverageCoupler_averages(tmp_path, scaling_dict, pytestconfig):
+    from physicsnemo.datapipes.healpix.couplers import (
+        TrailingAverageCoupler,
+        cache_trailing_averages,
+        trailing_average_name,
+    )
+
+    rng = np.random.default_rng(0)
+    variables = ["z500", "z1000"]
+    ds = xr.Dataset(
+        {
+            "inputs": (
+                ("time", "channel_in", "face", "height", "width"),
+                rng.normal(size=(16, 3, 12, 4, 4)).astype("float32"),
+            )
+        },
+        coords={
+            "time": pd.date_range("2000-01-01", periods=16, freq="3h"),
+            "channel_in": ["t2m0", "z500", "z1000"],
+        },
+    )
+    path = tmp_path / "coupled.zarr"
+    ds.chunk({"time": 5}).to_zarr(path)
+
+    kwargs = dict(
+        batch_size=3,
+        variables=variables,
+        averaging_window="9h",
+        input_times=["6h", "12h"],
+        prepared_coupled_data=False,
+    )
+    coupler = TrailingAverageCoupler(dataset=xr.open_zarr(path), **kwargs)
+    coupled = ds.inputs.sel(channel_in=variables).values.astype("float64")
+    # averages over the last 3 time steps, or all of the first ones
+    expected = np.stack(
+        [coupled[max(t - 2, 0) : t + 1].mean(axis=0) for t in range(len(coupled))]
+    )
+    np.testing.assert_allclose(coupler.coupled_inputs.values, expected, rtol=1e-5)
+
+    # cached in the prebuilt dataset
+    cache_trailing_averages(path, variables, averaging_window="9h")
+    cached = TrailingAverageCoupler(dataset=xr.open_zarr(path), **kwargs)
+    assert trailing_average_name("9h") in cached.ds.data_vars
+    np.testing.assert_allclose(cached.coupled_inputs.values, expected, rtol=1e-5)
+
+    # gathered batches match the coupled fields of every sample
+    scaling_df = pd.DataFrame.from_dict(omegaconf.OmegaConf.to_object(scaling_dict)).T
+    cached.set_scaling(scaling_df.to_xarray().astype("float32"))
+    cached.compute_coupled_indices(interval=2, data_time_step=pd.Timedelta("3h"))
+    couplings = cached.construct_integrated_couplings({"time": slice(4, 9)}, bsize=2)
+    mean = cached.coupled_scaling["mean"][0]
+    std = cached.coupled_scaling["std"][0]
+    for b in range(2):
+        for i in range(cached.coupled_integration_dim):
+            sample = (expected[4 + cached._coupled_offsets[b, i]] - mean) / std
+            np.testing.assert_allclose(
+                couplings[i, b], sample.reshape((-1,) + sample.shape[2:]), rtol=1e-5
+            )
+
+
 @import_or_fail("omegaconf")
 @import_or_fail("netCDF4")
 @import_or_fail("xarray")
@@ -148,3 +148,35 @@ def test_kelvin_helmholtz_cudagraphs(device, pytestconfig):
     )
 
     assert common.check_cuda_graphs(datapipe, input_fn)
+
+
+@import_or_fail("warp")
+@pytest.mark.parametrize("device", ["cuda:0", "cpu"])
+def test_kelvin_helmholtz_2d_async(device, pytestconfig):
+
+    from physicsnemo.datapipes.benchmarks.kelvin_helmholtz import KelvinHelmholtz2D
+
+    # construct data pipe
+    datapipe = KelvinHelmholtz2D(
+        resolution=32,
+        batch_size=2,
+        seq_length=2,
+        nr_snapshots=4,
+        iteration_per_snapshot=8,
+        device=device,
+        async_generation=True,
+    )
+
+    # iterate over the samples of three simulations
+    density = None
+    for i, data in enumerate(datapipe):
+        assert common.check_datapipe_device(data["density"], device)
+        assert common.check_batch_size([data["density"], data["velocity"]], 2)
+        assert common.check_channels([data["velocity"]], 2, axis=2)
+        assert torch.isfinite(data["pressure"]).all()
+        # outputs are static tensors, as needed by CUDA graphs
+        if density is None:
+            density = data["density"]
+        assert data["density"].data_ptr() == density.data_ptr()
+        if i == 3 * (4 - 2):
+            break
@@ -29,7 +29,12 @@ from pathlib import Path
 
 from ort_utils import check_ort_version
 
-from physicsnemo.deploy.onnx import export_to_onnx_stream, run_onnx_inference
+from physicsnemo.deploy.onnx import (
+    OrtSessionConfig,
+    OrtSessionPool,
+    export_to_onnx_stream,
+    run_onnx_inference,
+)
 from physicsnemo.models.mlp import FullyConnected
 
 Tensor = torch.Tensor
@@ -93,3 +98,67 @@ def test_onnx_bytestream(device, model, rtol: float = 1e-3, atol: float = 1e-3):
 
     assert torch.allclose(outvar, outvar_ort_file, rtol, atol)
     assert torch.allclose(outvar, outvar_ort, rtol, atol)
+
+
+@check_ort_version()
+def test_onnx_session_pool(model, rtol: float = 1e-3, atol: float = 1e-3):
+    """Test sessions are reused across calls and outputs with dynamic batch"""
+    model = model.eval().cpu()
+    onnx_stream = export_to_onnx_stream(model, torch.randn(4, 32), dynamic_batch=True)
+    pool = OrtSessionPool(sessions_per_model=2, max_models=1)
+
+    with pool.session(onnx_stream, device="cpu") as sess:
+        first = sess
+    with pool.session(onnx_stream, device="cpu") as sess:
+        assert sess is first
+        # Concurrent checkout creates a second session
+        with pool.session(onnx_stream, device="cpu") as other:
+            assert other is not sess
+
+    for bsize in [1, 3, 16]:
+        invar = torch.randn(bsize, 32)
+        outvar = run_onnx_inference(onnx_stream, invar, device="cpu", pool=pool)
+        assert len(outvar) == 1
+        assert outvar[0].shape == (bsize, 8)
+        assert outvar[0].device == torch.device("cpu")
+        assert torch.allclose(model(invar), outvar[0], rtol, atol)
+
+    # bfloat16 has no numpy element type to bind with
+    with pytest.raises(ValueError, match="bfloat16"):
+        run_onnx_inference(
+            onnx_stream, invar.to(torch.bfloat16), device="cpu", pool=pool
+        )
+
+    # Least recently used model is evicted
+    other_stream = export_to_onnx_stream(model, torch.randn(2, 32))
+    with pool.session(other_stream, device="cpu"):
+        pass
+    with pool.session(onnx_stream, device="cpu") as sess:
+        assert sess is not first
+
+
+@check_ort_version()
+def test_onnx_session_config(model, tmp_path, rtol: float = 1e-3, atol: float = 1e-3):
+    """Test session config persistence and optimized model reuse"""
+    config = OrtSessionConfig(
+        graph_optimization_level="extended",
+        intra_op_num_threads=1,
+        optimized_model_dir=str(tmp_path / "optimized"),
+    )
+    config.save(tmp_path / "config.json")
+    assert OrtSessionConfig.load(tmp_path / "config.json") == config
+
+    model = model.eval().cpu()
+    invar = torch.randn(8, 32)
+    onnx_stream = export_to_onnx_stream(model, invar)
+    for _ in range(2):
+        # Second pool loads the optimized model saved by the first
+        pool = OrtSessionPool()
+        outvar = run_onnx_inference(
+            onnx_stream, invar, device="cpu", config=config, pool=pool
+        )
+        assert torch.allclose(model(invar), outvar[0], rtol, atol)
+        assert len(list((tmp_path / "optimized").glob("*.onnx"))) == 1
+
+    with pytest.raises(ValueError):
+        OrtSessionConfig(graph_optimization_level="fast").session_options()
@@ -0,0 +1,125 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+import torch
+
+from physicsnemo.deploy.server import InferenceServer, ModelConfig
+from physicsnemo.models.mlp import FullyConnected
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    model = FullyConnected(in_features=4, out_features=2, num_layers=1, layer_size=8)
+    file_name = str(tmp_path / "mlp.mdlus")
+    model.save(file_name)
+    return model.eval(), file_name
+
+
+def _post(url, payload):
+    request = urllib.request.Request(  # noqa: S310 local server
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:  # noqa: S310 local server
+        return json.loads(response.read())
+
+
+def _get(url):
+    with urllib.request.urlopen(url) as response:  # noqa: S310 local server
+        return json.loads(response.read())
+
+
+def test_server_dynamic_batching(checkpoint):
+    """Test concurrent HTTP requests are batched and answered correctly"""
+    model, file_name = checkpoint
+    config = ModelConfig(
+        "mlp", checkpoint=file_name, max_batch_size=8, max_queue_delay=0.2
+    )
+    with InferenceServer([config], port=0, num_workers=2) as server:
+        assert _get(f"{server.url}/v2/health/ready") == {}
+        assert _get(f"{server.url}/v2/models/mlp")["max_batch_size"] == 8
+
+        invars = [torch.randn(2, 4) for _ in range(4)]
+        results = [None] * len(invars)
+
+        def request(i):
+            results[i] = _post(
+                f"{server.url}/v2/models/mlp/infer",
+                {
+                    "id": str(i),
+                    "inputs": [
+                        {
+                            "name": "input0",
+                            "shape": list(invars[i].shape),
+                            "datatype": "FP32",
+                            "data": invars[i].flatten().tolist(),
+                        }
+                    ],
+                },
+            )
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i, result in enumerate(results):
+            assert result["id"] == str(i)
+            output = result["outputs"][0]
+            assert output["shape"] == [2, 2]
+            outvar = torch.tensor(output["data"]).reshape(output["shape"])
+            assert torch.allclose(outvar, model(invars[i]), atol=1e-5)
+
+        stats = _get(f"{server.url}/v2/models/mlp/stats")
+        assert stats["requests"] == 4
+        assert stats["samples"] == 8
+        assert stats["batches"] < 4
+        assert server.stats()["mlp"]["failures"] == 0
+
+        with pytest.raises(urllib.error.HTTPError) as e:
+            _get(f"{server.url}/v2/models/unknown")
+        assert e.value.code == 404
+
+
+def test_batcher_split_and_errors(checkpoint):
+    """Test batches respect the max batch size and input shapes"""
+    model, _ = checkpoint
+    with InferenceServer(port=0) as server:
+        batcher = server.add_model(
+            ModelConfig("mlp", max_batch_size=4, max_queue_delay=0.1), model
+        )
+        invars = [torch.randn(3, 4), torch.randn(2, 4), torch.randn(6, 4)]
+        futures = [batcher.submit([x]) for x in invars]
+        for x, future in zip(invars, futures):
+            assert torch.allclose(future.result()[0], model(x), atol=1e-5)
+        # A request larger than the max batch size runs alone
+        assert batcher.stats.batches == 3
+
+        with pytest.raises(ValueError):
+            batcher.submit([torch.randn(2, 4), torch.randn(3, 4)])
+        # Model errors are forwarded to the request
+        with pytest.raises(RuntimeError):
+            server.infer("mlp", [torch.randn(2, 5)])
+        assert batcher.stats.failures == 1
@@ -0,0 +1,190 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 - 2024 NVIDIA CORPORATION & AFFILIATES.
+# SPDX-FileCopyrightText: All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import torch
+import torch.distributed as dist
+from distributed_utils_for_testing import modify_environment
+
+from physicsnemo.utils.version_check import check_module_requirements
+
+try:
+    check_module_requirements("physicsnemo.distributed.shard_tensor")
+    from torch.distributed.device_mesh import init_device_mesh
+    from torch.distributed.tensor import DTensor, distribute_tensor
+    from torch.distributed.tensor.placement_types import Shard
+
+    from physicsnemo.distributed import ShardTensor
+except ImportError:
+    pytest.skip(
+        "Skipping test because physicsnemo.distributed.shard_tensor is not available",
+        allow_module_level=True,
+    )
+
+from physicsnemo.launch.utils import load_sharded_checkpoint, save_sharded_checkpoint
+
+
+class ShardedModel(torch.nn.Module):
+    """Model with two sharded weights and a replicated one. The second weight is
+    unevenly sharded when using ShardTensor"""
+
+    def __init__(self, mesh=None, seed=0, shard_tensor=False):
+        super().__init__()
+        generator = torch.Generator().manual_seed(seed)
+        weight = torch.randn(12, 4, generator=generator)
+        uneven = torch.randn(2, 9, generator=generator)
+        self.bias = torch.nn.Parameter(torch.randn(4, generator=generator))
+        if mesh is None:
+            self.weight = torch.nn.Parameter(weight)
+            self.uneven = torch.nn.Parameter(uneven)
+        else:
+            self.weight = torch.nn.Parameter(
+                distribute_tensor(weight, mesh, [Shard(0)])
+            )
+            if shard_tensor:
+                # Uneven split of the second dimension, rank i gets i + 1 columns
+                splits = [1 + i for i in range(mesh.size())]
+                splits[-1] += 9 - sum(splits)
+                local = torch.split(uneven, splits, dim=1)[mesh.get_coordinate()[0]]
+                uneven = ShardTensor.from_local(
+                    local.to(mesh.device_type),
+                    mesh,
+                    [Shard(1)],
+                    sharding_shapes="infer",
+                ).detach()
+            else:
+                uneven = distribute_tensor(uneven, mesh, [Shard(1)])
+            self.uneven = torch.nn.Parameter(uneven)
+
+    def step(self, optimizer):
+        """One optimizer step so that the optimizer state gets populated"""
+        optimizer.zero_grad()
+        loss = 0
+        for p in self.parameters():
+            loss = loss + (p.full_tensor() if hasattr(p, "full_tensor") else p).sum()
+        loss.backward()
+        optimizer.step()
+
+    def full_state(self):
+        return {
+            k: (v.full_tensor() if hasattr(v, "full_tensor") else v).detach().clone()
+            for k, v in self.state_dict().items()
+        }
+
+
+def _run(rank, world_size, port, path, mode, seed, device_type):
+    with modify_environment(
+        RANK=f"{rank}",
+        WORLD_SIZE=f"{world_size}",
+        MASTER_ADDR="localhost",
+        MASTER_PORT=str(port),
+    ):
+        if device_type == "cuda":
+            torch.cuda.set_device(rank)
+        dist.init_process_group(
+            "nccl" if device_type == "cuda" else "gloo",
+            rank=rank,
+            world_size=world_size,
+        )
+        mesh = init_device_mesh(device_type, (world_size,))
+        model = ShardedModel(mesh, seed=seed, shard_tensor=device_type == "cuda")
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.1)
+        if mode == "save":
+            model.step(optimizer)
+            save_sharded_checkpoint(
+                path, models=model, optimizer=optimizer, epoch=seed, metadata={"a": 1}
+            )
+        else:
+            metadata = {}
+            epoch = load_sharded_checkpoint(
+                path, models=model, optimizer=optimizer, metadata_dict=metadata
+            )
+            assert epoch == 1
+            assert metadata == {"a": 1}
+            reference = ShardedModel(seed=1)
+            reference.step(torch.optim.Adam(reference.parameters(), lr=0.1))
+            reference = reference.state_dict()
+            for key, value in model.full_state().items():
+                assert torch.allclose(value.cpu(), reference[key]), key
+            # Optimizer states follow the layout of their parameters
+            for p in model.parameters():
+                exp_avg = optimizer.state[p]["exp_avg"]
+                if isinstance(p, DTensor):
+                    assert exp_avg.placements == p.placements
+                    exp_avg = exp_avg.full_tensor()
+                assert torch.allclose(exp_avg.cpu(), torch.full(p.shape, 0.1))
+        dist.destroy_process_group()
+
+
+def test_sharded_checkpoint_single_process(tmp_path, monkeypatch):
+    """Round trip of a sharded checkpoint without torch.distributed"""
+    model = ShardedModel(seed=1)
+    save_sharded_checkpoint(str(tmp_path), models=model, metadata={"a": 1})
+    save_sharded_checkpoint(str(tmp_path), models=model)
+    assert (tmp_path / "sharded.1" / "manifest.json").exists()
+
+    new_model = ShardedModel(seed=2)
+    metadata = {}
+    load_sharded_checkpoint(
+        str(tmp_path), models=new_model, epoch=0, metadata_dict=metadata
+    )
+    assert metadata == {"a": 1}
+    for key, value in new_model.state_dict().items():
+        assert torch.equal(value, model.state_dict()[key])
+
+    # An interrupted save over an existing index leaves it uncommitted
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(torch, "save", fail)
+    with pytest.raises(OSError):
+        save_sharded_checkpoint(str(tmp_path), models=ShardedModel(seed=3), epoch=1)
+    monkeypatch.undo()
+    assert not (tmp_path / "sharded.1" / "manifest.json").exists()
+    metadata = {}
+    load_sharded_checkpoint(str(tmp_path), models=new_model, metadata_dict=metadata)
+    assert metadata == {"a": 1}
+
+
+def _save_and_reshard(path, save_size, load_size, device_type):
+    torch.multiprocessing.spawn(
+        _run,
+        args=(save_size, 29517, str(path), "save", 1, device_type),
+        nprocs=save_size,
+        join=True,
+    )
+    assert len(list(path.glob("sharded.1/shard.*.pt"))) == save_size
+    torch.multiprocessing.spawn(
+        _run,
+        args=(load_size, 29518, str(path), "load", 2, device_type),
+        nprocs=load_size,
+        join=True,
+    )
+
+
+@pytest.mark.parametrize("save_size,load_size", [(2, 3), (3, 1)])
+def test_sharded_checkpoint_reshard(tmp_path, save_size, load_size):
+    """Save DTensors on one mesh size and load them on another"""
+    _save_and_reshard(tmp_path, save_size, load_size, "cpu")
+
+
+@pytest.mark.multigpu
+def test_sharded_checkpoint_reshard_shard_tensor(tmp_path):
+    """Save uneven ShardTensors on all GPUs and load them on half of them"""
+    num_gpus = torch.cuda.device_count()
+    if num_gpus < 2:
+        pytest.skip("Not enough GPUs available for distributed tests")
+    _save_and_reshard(tmp_path, num_gpus, num_gpus // 2, "cuda")
@@ -14,6 +14,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import tarfile
+import threading
+import warnings
 from pathlib import Path
 
 import pytest
@@ -54,3 +57,118 @@ def test_from_checkpoint_custom(device, LoadModel):
     LoadModel.from_checkpoint("checkpoint.mdlus")
     # Delete checkpoint file (it should exist!)
     Path("checkpoint.mdlus").unlink(missing_ok=False)
+
+
+@pytest.mark.parametrize("device", ["cuda:0", "cpu"])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_from_checkpoint_mmap(tmp_path, device, mmap):
+    """Test loading checkpoints in place from the archive, with and without mmap"""
+    torch.manual_seed(0)
+
+    file_name = str(tmp_path / "checkpoint.mdlus")
+    mock_model = MockModel()
+    mock_model.save(file_name)
+
+    # Weights are stored last and aligned so they can be mapped in place
+    with tarfile.open(file_name, "r") as tar:
+        members = tar.getmembers()
+    assert [m.name for m in members] == ["metadata.json", "args.json", "model.pt"]
+    assert members[-1].offset_data % 512 == 0
+
+    # Construct directly on the target device, mapping does not fall back to
+    # reading the weights into memory
+    with warnings.catch_warnings():
+        warnings.filterwarnings("error", message=".*into memory")
+        model = MockModel.from_checkpoint(file_name, map_location=device, mmap=mmap)
+    assert model.device == torch.device(device)
+    assert model.layer.weight.device == torch.device(device)
+    assert torch.equal(model.layer.weight.cpu(), mock_model.layer.weight)
+
+    # Load into an existing model
+    model = MockModel().to(device)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("error", message=".*into memory")
+        model.load(file_name, mmap=mmap)
+    assert torch.equal(model.layer.bias.cpu(), mock_model.layer.bias)
+
+
+class BufferModel(physicsnemo.Module):
+    """Fake model computing a non-persistent buffer in __init__"""
+
+    def __init__(self, layer_size=16):
+        super().__init__()
+        self.layer = torch.nn.Linear(layer_size, layer_size)
+        self.register_buffer("grid", torch.linspace(0, 1, layer_size), persistent=False)
+
+
+class TiedModel(physicsnemo.Module):
+    """Fake model sharing a parameter between two layers"""
+
+    def __init__(self, layer_size=16):
+        super().__init__()
+        self.encoder = torch.nn.Linear(layer_size, layer_size)
+        self.decoder = torch.nn.Linear(layer_size, layer_size)
+        self.decoder.weight = self.encoder.weight
+
+
+class SpectralModel(physicsnemo.Module):
+    """Fake model initializing its weights with torch.rand and holding a list of
+    tensors computed in __init__"""
+
+    def __init__(self, modes=4):
+        super().__init__()
+        self.weights = torch.nn.Parameter(torch.rand(2, modes, modes))
+        self.frequencies = [torch.arange(modes), torch.arange(modes) * 2]
+
+
+@pytest.mark.parametrize(
+    "LoadModel", [MockModel, BufferModel, TiedModel, SpectralModel]
+)
+@pytest.mark.parametrize("mmap", [True, False])
+def test_from_checkpoint_fast_init(tmp_path, LoadModel, mmap):
+    """Test models constructed without random init match the saved model"""
+    torch.manual_seed(0)
+
+    file_name = str(tmp_path / "checkpoint.mdlus")
+    saved_model = LoadModel()
+    saved_model.save(file_name)
+
+    model = LoadModel.from_checkpoint(file_name, mmap=mmap, fast_init=True)
+    assert type(model) is LoadModel
+    assert model.device == torch.device("cpu")
+    for key, value in saved_model.state_dict().items():
+        assert torch.equal(model.state_dict()[key], value)
+    for name, buffer in saved_model.named_buffers():
+        assert torch.equal(dict(model.named_buffers())[name], buffer)
+    if LoadModel is TiedModel:
+        assert model.decoder.weight is model.encoder.weight
+    if LoadModel is SpectralModel:
+        assert torch.equal(model.frequencies[1], torch.arange(4) * 2)
+    assert all(p.requires_grad for p in model.parameters())
+
+    # Regular construction gives the same model
+    reference = LoadModel.from_checkpoint(file_name, fast_init=False)
+    for key, value in reference.state_dict().items():
+        assert torch.equal(model.state_dict()[key], value)
+
+
+def test_skip_random_init_thread_local():
+    """Test random initialization is only skipped in the thread loading a model"""
+    from physicsnemo.models.module import _SkipRandomInit
+
+    torch.manual_seed(0)
+    expected = torch.nn.Linear(8, 8).weight.detach()
+    result = {}
+
+    def build():
+        torch.manual_seed(0)
+        result["weight"] = torch.nn.Linear(8, 8).weight.detach()
+
+    with _SkipRandomInit():
+        thread = threading.Thread(target=build)
+        thread.start()
+        thread.join()
+        torch.manual_seed(0)
+        skipped = torch.nn.init.kaiming_uniform_(torch.zeros(8, 8))
+        assert torch.equal(skipped, torch.zeros(8, 8))
+    assert torch.equal(result["weight"], expected)
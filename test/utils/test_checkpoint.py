@@ -219,3 +219,159 @@ def test_compiled_model_checkpointing(
     new_output = uncompiled_model(sample_input).detach().cpu()
 
     assert torch.allclose(original_output, new_output, rtol=rtol, atol=atol)
+
+
+@pytest.mark.parametrize("device", ["cpu", "cuda:0"])
+def test_async_checkpointing(
+    tmp_path, monkeypatch, device, rtol: float = 1e-3, atol: float = 1e-3
+):
+    """Test background checkpoint writes with staging buffer reuse"""
+
+    if device.startswith("cuda") and not torch.cuda.is_available():
+        pytest.skip("CUDA not available in the test environment")
+
+    from physicsnemo.launch.utils import (
+        AsyncCheckpointWriter,
+        load_checkpoint,
+        save_checkpoint,
+        wait_for_checkpoints,
+    )
+
+    DistributedManager.initialize()
+
+    model = FullyConnected(
+        in_features=4, out_features=4, num_layers=2, layer_size=8
+    ).to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.1)
+    sample_input = torch.randn(2, 4, device=device)
+
+    ckpt_dir = (tmp_path / "async_ckpt").as_posix()
+    with AsyncCheckpointWriter(max_in_flight=1) as writer:
+        outputs = []
+        for epoch in range(1, 4):
+            optimizer.zero_grad()
+            model(sample_input).sum().backward()
+            optimizer.step()
+            outputs.append(model(sample_input).detach().cpu())
+            future = writer.save(
+                ckpt_dir, models=model, optimizer=optimizer, epoch=epoch
+            )
+            # Training keeps mutating the weights, the snapshot must not change
+            with torch.no_grad():
+                for p in model.parameters():
+                    p.add_(1.0)
+        future.result()
+
+    # No temporary files are left behind once all writes are committed
+    assert not list((tmp_path / "async_ckpt").glob("*.tmp"))
+    assert len(list((tmp_path / "async_ckpt").glob("*.mdlus"))) == 3
+
+    # Every epoch loads back to the state at the time it was saved
+    for epoch, output in enumerate(outputs, start=1):
+        model = FullyConnected(
+            in_features=4, out_features=4, num_layers=2, layer_size=8
+        ).to(device)
+        loaded_epoch = load_checkpoint(
+            ckpt_dir, models=model, epoch=epoch, device=device
+        )
+        assert loaded_epoch == epoch
+        new_output = model(sample_input).detach().cpu()
+        assert torch.allclose(output, new_output, rtol=rtol, atol=atol)
+
+    # An interrupted save wrote the model file but not the training checkpoint, the
+    # model is loaded from the last complete checkpoint
+    (tmp_path / "async_ckpt" / "checkpoint.0.3.pt").unlink()
+    model = FullyConnected(
+        in_features=4, out_features=4, num_layers=2, layer_size=8
+    ).to(device)
+    assert load_checkpoint(ckpt_dir, models=model, device=device) == 2
+    new_output = model(sample_input).detach().cpu()
+    assert torch.allclose(outputs[1], new_output, rtol=rtol, atol=atol)
+
+    # Module level writer used by save_checkpoint
+    future = save_checkpoint(ckpt_dir, models=model, async_save=True)
+    wait_for_checkpoints()
+    assert future.done()
+
+    # Failed writes are raised when loading
+    def fail(jobs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(AsyncCheckpointWriter, "_write", staticmethod(fail))
+    save_checkpoint(ckpt_dir, models=model, optimizer=optimizer, async_save=True)
+    with pytest.raises(RuntimeError, match="checkpoint write failed"):
+        load_checkpoint(ckpt_dir, models=model, device=device)
+
+
+def test_incremental_checkpointing(tmp_path, rtol: float = 1e-3, atol: float = 1e-3):
+    """Test content addressed checkpoints, only changed tensors are written"""
+
+    import json
+
+    from physicsnemo.launch.utils import (
+        gc_checkpoint_blobs,
+        load_checkpoint,
+        save_checkpoint,
+    )
+
+    DistributedManager.initialize()
+
+    def model_generator():
+        return nn.Sequential(nn.Linear(4, 64), nn.ReLU(), nn.Linear(64, 4))
+
+    model = model_generator()
+    # Frozen first layer, its blobs are shared by all checkpoints
+    model[0].requires_grad_(False)
+    optimizer = torch.optim.Adam(model[2].parameters(), lr=0.1)
+    sample_input = torch.randn(2, 4)
+
+    ckpt_dir = tmp_path / "incremental_ckpt"
+    outputs = []
+    for epoch in range(1, 4):
+        optimizer.zero_grad()
+        model(sample_input).sum().backward()
+        optimizer.step()
+        outputs.append(model(sample_input).detach())
+        save_checkpoint(
+            ckpt_dir.as_posix(),
+            models=model,
+            optimizer=optimizer,
+            epoch=epoch,
+            metadata={"epoch": epoch},
+            incremental=True,
+        )
+
+    manifests = sorted(ckpt_dir.glob("checkpoint.0.*.manifest.json"))
+    assert len(manifests) == 3
+    frozen_bytes = sum(p.numel() * p.element_size() for p in model[0].parameters())
+    for manifest in manifests[1:]:
+        manifest = json.loads(manifest.read_text())
+        assert manifest["written_bytes"] <= manifest["total_bytes"] - frozen_bytes
+
+    # Every epoch loads back to the state at the time it was saved
+    for epoch, output in enumerate(outputs, start=1):
+        model = model_generator()
+        optimizer = torch.optim.Adam(model[2].parameters(), lr=0.1)
+        metadata = {}
+        loaded_epoch = load_checkpoint(
+            ckpt_dir.as_posix(),
+            models=model,
+            optimizer=optimizer,
+            epoch=epoch,
+            metadata_dict=metadata,
+        )
+        assert loaded_epoch == epoch
+        assert metadata == {"epoch": epoch}
+        assert len(optimizer.state) == 2
+        assert torch.allclose(output, model(sample_input), rtol=rtol, atol=atol)
+
+    # Latest checkpoint when no epoch is given
+    assert load_checkpoint(ckpt_dir.as_posix(), models=model_generator()) == 3
+
+    # Only the blobs referenced by the remaining manifests are kept
+    assert gc_checkpoint_blobs(ckpt_dir.as_posix()) == 0
+    assert gc_checkpoint_blobs(ckpt_dir.as_posix(), keep_last=1) > 0
+    assert len(list(ckpt_dir.glob("*.manifest.json"))) == 1
+    model = model_generator()
+    assert load_checkpoint(ckpt_dir.as_posix(), models=model, epoch=3) == 3
+    assert torch.allclose(outputs[-1], model(sample_input), rtol=rtol, atol=atol)
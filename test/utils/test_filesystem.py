@@ -15,7 +15,12 @@
 # limitations under the License.
 
 import hashlib
+import http.server
+import multiprocessing
 import os
+import re
+import threading
+import time
 from pathlib import Path
 
 import pytest
@@ -114,3 +119,140 @@ def test_ngc_model_file_invalid():
     package = filesystem.Package(test_url, seperator="/")
     with pytest.raises(ValueError):
         package.get("dlwp_cubesphere.zip")
+
+
+class _RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler with support for single range requests"""
+
+    requests = multiprocessing.Value("i", 0)
+    ranges = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.requests.get_lock():
+            self.requests.value += 1
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if match and self.ranges:
+            start, end = int(match.group(1)), min(int(match.group(2)), len(data) - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            data = data[start : end + 1]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Local HTTP server serving the files in tmp_path / "www" """
+    root = tmp_path / "www"
+    root.mkdir()
+
+    def handler(*args, **kwargs):
+        return _RangeRequestHandler(*args, directory=str(root), **kwargs)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _RangeRequestHandler.requests.value = 0
+    yield root, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    _RangeRequestHandler.ranges = True
+
+
+@pytest.mark.parametrize("ranges", [True, False])
+def test_download_http_ranges(http_server, tmp_path, ranges):
+    root, url = http_server
+    _RangeRequestHandler.ranges = ranges
+    data = os.urandom(10 * 1024 + 7)
+    (root / "data.bin").write_bytes(data)
+
+    out_path = tmp_path / "out.bin"
+    size = filesystem._download_http(
+        f"{url}/data.bin", str(out_path), chunk_size=1024, num_connections=4
+    )
+    assert size == len(data)
+    assert out_path.read_bytes() == data
+    # One request per chunk with range requests, a single one otherwise
+    assert _RangeRequestHandler.requests.value == (11 if ranges else 1)
+
+
+def _cached_get(url, cache_root):
+    return filesystem.DownloadCache(cache_root).get(url)
+
+
+def test_download_cache_concurrent(http_server, tmp_path):
+    root, url = http_server
+    data = os.urandom(64 * 1024)
+    (root / "model.mdlus").write_bytes(data)
+
+    cache_root = str(tmp_path / "cache")
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(8) as pool:
+        paths = pool.starmap(_cached_get, [(f"{url}/model.mdlus", cache_root)] * 8)
+
+    # Only one process downloaded the file, the others waited for it
+    assert len(set(paths)) == 1
+    assert Path(paths[0]).read_bytes() == data
+    assert _RangeRequestHandler.requests.value == 1
+    # No temporary files are left behind
+    assert not [p for p in os.listdir(cache_root) if ".tmp" in p]
+
+
+def test_download_cache_eviction(http_server, tmp_path):
+    root, url = http_server
+    for name in "abc":
+        (root / name).write_bytes(os.urandom(1000))
+
+    cache = filesystem.DownloadCache(str(tmp_path / "cache"), max_bytes=2500)
+    path_a = cache.get(f"{url}/a")
+    time.sleep(0.05)
+    path_b = cache.get(f"{url}/b")
+    time.sleep(0.05)
+    # Touch a so that b is the least recently used entry
+    assert cache.get(f"{url}/a") == path_a
+    time.sleep(0.05)
+    path_c = cache.get(f"{url}/c")
+
+    assert os.path.exists(path_a)
+    assert not os.path.exists(path_b)
+    assert os.path.exists(path_c)
+    assert sum(size for _, size, _ in cache.entries()) <= 2500
+
+
+def test_download_cache_ttl_and_integrity(http_server, tmp_path):
+    root, url = http_server
+    data = b"physicsnemo" * 100
+    (root / "file").write_bytes(data)
+    checksum = hashlib.sha256(data).hexdigest()
+
+    cache = filesystem.DownloadCache(str(tmp_path / "cache"), ttl=0.1, verify=True)
+    path = cache.get(f"{url}/file", sha256=checksum)
+    assert cache.get(f"{url}/file") == path
+    assert _RangeRequestHandler.requests.value == 1
+
+    # Corrupted entries are downloaded again
+    Path(path).write_bytes(b"x" * len(data))
+    assert Path(cache.get(f"{url}/file")).read_bytes() == data
+    assert _RangeRequestHandler.requests.value == 2
+
+    # So are expired ones
+    time.sleep(0.2)
+    cache.get(f"{url}/file")
+    assert _RangeRequestHandler.requests.value == 3
+
+    # Checksum mismatches are errors
+    with pytest.raises(IOError):
+        filesystem.DownloadCache(str(tmp_path / "other")).get(
+            f"{url}/file", sha256="0" * 64
+        )
@@ -93,3 +93,23 @@ def test_sdf(pytestconfig):
         atol=1e-7,
     )
     np.testing.assert_allclose(sdf_hit_point_id, [3, 0], atol=1e-7)
+
+
+@import_or_fail("warp")
+def test_sdf_cpu_device(pytestconfig):
+
+    from physicsnemo.utils.sdf import signed_distance_field
+
+    sdf_tet, sdf_hit_point = signed_distance_field(
+        tet_verts(),
+        np.array([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11], dtype=np.int32),
+        np.array([1, 1, 1, 0.12, 0.11, 0.1], dtype=np.float64),
+        include_hit_points=True,
+        device="cpu",
+    )
+    np.testing.assert_allclose(sdf_tet, [1.15470052, -0.1], atol=1e-7)
+    np.testing.assert_allclose(
+        sdf_hit_point,
+        [[0.33333322, 0.33333334, 0.3333334], [0.12000002, 0.11, 0.0]],
+        atol=1e-7,
+    )